@@ -11,6 +11,12 @@
  * SCK      -> Pin 13
  * MOSI     -> Pin 11
  * MISO     -> Pin 12
+ * 
+ * loop() never blocks: serial input is parsed a byte at a time into a fixed
+ * buffer, and replies are queued and written only as fast as the UART's
+ * transmit buffer drains, so the 50Hz radio tick is never held up by the PC.
+ * The sketch also builds on Linux against the stubs in host/ (see
+ * host/run_host.py), which replay serial byte streams and time the ticks.
  */
 
 #include <SPI.h>
@@ -42,6 +48,24 @@ DroneControl controlPacket;
 unsigned long lastTransmission = 0;
 const unsigned long transmissionInterval = 20; // 50Hz transmission rate
 
+// Serial command input: one line at a time, upper-cased and trimmed as it
+// arrives. Longer lines are cut short and answered "Unknown command!".
+const uint8_t COMMAND_BUFFER_SIZE = 64;
+char commandBuffer[COMMAND_BUFFER_SIZE];
+uint8_t commandLength = 0;
+bool commandOverflow = false;
+bool commandReady = false;
+
+// Serial replies wait here until the UART has room for them
+const uint8_t OUTPUT_BUFFER_SIZE = 192;
+char outputBuffer[OUTPUT_BUFFER_SIZE];
+uint8_t outputHead = 0;
+uint8_t outputCount = 0;
+
+// Room a command needs in outputBuffer before it is processed: the
+// "Processing command: " echo of a full line plus the longest result line
+const uint8_t REPLY_RESERVE = 20 + (COMMAND_BUFFER_SIZE - 1) + 2 + 32;
+
 void setup() {
   Serial.begin(115200);
   Serial.println("P8 PRO Drone Controller Initializing...");
@@ -81,109 +105,186 @@ void setup() {
   Serial.println();
   Serial.println("Ready for commands!");
   Serial.println("Commands: TAKEOFF, LAND, UP, DOWN, LEFT, RIGHT, FORWARD, BACKWARD, ROTATE_LEFT, ROTATE_RIGHT, STOP");
+  
+  lastTransmission = millis();
 }
 
 void loop() {
-  // Check for serial commands from PC
-  if (Serial.available()) {
-    String command = Serial.readStringUntil('\n');
-    command.trim();
-    command.toUpperCase();
-    
-    processCommand(command);
+  // Send control packet at regular intervals, on a fixed 20ms grid
+  unsigned long now = millis();
+  if (now - lastTransmission >= transmissionInterval) {
+    sendControlPacket();
+    lastTransmission += transmissionInterval;
+    if (now - lastTransmission >= transmissionInterval) {
+      // More than a whole interval behind: start a new grid, don't burst
+      lastTransmission = now;
+    }
   }
   
-  // Send control packet at regular intervals
-  if (millis() - lastTransmission >= transmissionInterval) {
-    sendControlPacket();
-    lastTransmission = millis();
+  // Check for serial commands from PC (only bytes that already arrived)
+  readSerialInput();
+  if (commandReady && outputSpace() >= REPLY_RESERVE) {
+    processCommand(commandBuffer);
+    commandLength = 0;
+    commandOverflow = false;
+    commandReady = false;
+  }
+  
+  flushOutput();
+}
+
+// Serial input ---------------------------------------------------------------
+
+void readSerialInput() {
+  // Stop at a complete line; the rest waits in the UART buffer until the
+  // line has been processed
+  while (!commandReady && Serial.available() > 0) {
+    char c = (char)Serial.read();
+    if (c == '\n' || c == '\r') {
+      // Skip empty lines (and the '\n' after a '\r')
+      commandReady = commandLength > 0 || commandOverflow;
+      if (commandReady) {
+        trimCommand();
+      }
+    } else if (commandLength == 0 && (c == ' ' || c == '\t')) {
+      // Leading whitespace
+    } else if (commandLength < COMMAND_BUFFER_SIZE - 1) {
+      if (c >= 'a' && c <= 'z') {
+        c -= 'a' - 'A';
+      }
+      commandBuffer[commandLength++] = c;
+    } else {
+      commandOverflow = true;
+    }
+  }
+}
+
+void trimCommand() {
+  while (commandLength > 0 && (commandBuffer[commandLength - 1] == ' ' ||
+                               commandBuffer[commandLength - 1] == '\t')) {
+    commandLength--;
+  }
+  commandBuffer[commandLength] = '\0';
+}
+
+// Serial output --------------------------------------------------------------
+
+uint8_t outputSpace() {
+  return OUTPUT_BUFFER_SIZE - outputCount;
+}
+
+void queueText(const char *text) {
+  // Callers check outputSpace() first; anything that still doesn't fit is dropped
+  while (*text && outputCount < OUTPUT_BUFFER_SIZE) {
+    outputBuffer[(outputHead + outputCount) % OUTPUT_BUFFER_SIZE] = *text++;
+    outputCount++;
   }
 }
 
-void processCommand(String command) {
-  Serial.print("Processing command: ");
-  Serial.println(command);
+void queueLine(const char *text) {
+  queueText(text);
+  queueText("\r\n");
+}
+
+void flushOutput() {
+  // Write only what the UART buffer takes without blocking
+  int room = Serial.availableForWrite();
+  while (outputCount > 0 && room > 0) {
+    Serial.write((uint8_t)outputBuffer[outputHead]);
+    outputHead = (outputHead + 1) % OUTPUT_BUFFER_SIZE;
+    outputCount--;
+    room--;
+  }
+}
+
+// Commands -------------------------------------------------------------------
+
+void processCommand(const char *command) {
+  queueText("Processing command: ");
+  queueLine(command);
   
-  if (command == "TAKEOFF") {
+  if (commandOverflow) {
+    queueLine("Unknown command!");
+  } else if (strcmp(command, "TAKEOFF") == 0) {
     takeoff();
-  } else if (command == "LAND") {
+  } else if (strcmp(command, "LAND") == 0) {
     land();
-  } else if (command == "UP") {
+  } else if (strcmp(command, "UP") == 0) {
     moveUp();
-  } else if (command == "DOWN") {
+  } else if (strcmp(command, "DOWN") == 0) {
     moveDown();
-  } else if (command == "LEFT") {
+  } else if (strcmp(command, "LEFT") == 0) {
     moveLeft();
-  } else if (command == "RIGHT") {
+  } else if (strcmp(command, "RIGHT") == 0) {
     moveRight();
-  } else if (command == "FORWARD") {
+  } else if (strcmp(command, "FORWARD") == 0) {
     moveForward();
-  } else if (command == "BACKWARD") {
+  } else if (strcmp(command, "BACKWARD") == 0) {
     moveBackward();
-  } else if (command == "ROTATE_LEFT") {
+  } else if (strcmp(command, "ROTATE_LEFT") == 0) {
     rotateLeft();
-  } else if (command == "ROTATE_RIGHT") {
+  } else if (strcmp(command, "ROTATE_RIGHT") == 0) {
     rotateRight();
-  } else if (command == "STOP") {
+  } else if (strcmp(command, "STOP") == 0) {
     stopDrone();
-  } else if (command.startsWith("CUSTOM:")) {
+  } else if (strncmp(command, "CUSTOM:", 7) == 0) {
     // Custom command format: CUSTOM:throttle,yaw,pitch,roll
-    parseCustomCommand(command);
+    parseCustomCommand(command + 7);
   } else {
-    Serial.println("Unknown command!");
+    queueLine("Unknown command!");
   }
 }
 
 void takeoff() {
   resetControlPacket();
   controlPacket.throttle = 180;  // Moderate throttle for takeoff
-  Serial.println("TAKEOFF initiated");
+  queueLine("TAKEOFF initiated");
 }
 
 void land() {
   resetControlPacket();
   controlPacket.throttle = 0;    // Zero throttle for landing
-  Serial.println("LANDING initiated");
+  queueLine("LANDING initiated");
 }
 
 void moveUp() {
   controlPacket.throttle = min(255, controlPacket.throttle + 30);
-  Serial.println("Moving UP");
+  queueLine("Moving UP");
 }
 
 void moveDown() {
   controlPacket.throttle = max(0, controlPacket.throttle - 30);
-  Serial.println("Moving DOWN");
+  queueLine("Moving DOWN");
 }
 
 void moveLeft() {
   controlPacket.roll = max(0, 128 - 60);  // Roll left
-  Serial.println("Moving LEFT");
+  queueLine("Moving LEFT");
 }
 
 void moveRight() {
   controlPacket.roll = min(255, 128 + 60);  // Roll right
-  Serial.println("Moving RIGHT");
+  queueLine("Moving RIGHT");
 }
 
 void moveForward() {
   controlPacket.pitch = max(0, 128 - 60);  // Pitch forward
-  Serial.println("Moving FORWARD");
+  queueLine("Moving FORWARD");
 }
 
 void moveBackward() {
   controlPacket.pitch = min(255, 128 + 60);  // Pitch backward
-  Serial.println("Moving BACKWARD");
+  queueLine("Moving BACKWARD");
 }
 
 void rotateLeft() {
   controlPacket.yaw = max(0, 128 - 60);  // Yaw left
-  Serial.println("Rotating LEFT");
+  queueLine("Rotating LEFT");
 }
 
 void rotateRight() {
   controlPacket.yaw = min(255, 128 + 60);  // Yaw right
-  Serial.println("Rotating RIGHT");
+  queueLine("Rotating RIGHT");
 }
 
 void stopDrone() {
@@ -192,26 +293,25 @@ void stopDrone() {
   controlPacket.yaw = 128;
   controlPacket.pitch = 128;
   controlPacket.roll = 128;
-  Serial.println("STOPPING - hovering");
+  queueLine("STOPPING - hovering");
 }
 
-void parseCustomCommand(String command) {
-  // Parse custom command: CUSTOM:throttle,yaw,pitch,roll
-  command.remove(0, 7); // Remove "CUSTOM:"
+void parseCustomCommand(const char *values) {
+  // Parse custom values: throttle,yaw,pitch,roll (what follows "CUSTOM:")
+  const char *commaIndex1 = strchr(values, ',');
+  const char *commaIndex2 = commaIndex1 ? strchr(commaIndex1 + 1, ',') : NULL;
+  const char *commaIndex3 = commaIndex2 ? strchr(commaIndex2 + 1, ',') : NULL;
   
-  int commaIndex1 = command.indexOf(',');
-  int commaIndex2 = command.indexOf(',', commaIndex1 + 1);
-  int commaIndex3 = command.indexOf(',', commaIndex2 + 1);
-  
-  if (commaIndex1 != -1 && commaIndex2 != -1 && commaIndex3 != -1) {
-    controlPacket.throttle = constrain(command.substring(0, commaIndex1).toInt(), 0, 255);
-    controlPacket.yaw = constrain(command.substring(commaIndex1 + 1, commaIndex2).toInt(), 0, 255);
-    controlPacket.pitch = constrain(command.substring(commaIndex2 + 1, commaIndex3).toInt(), 0, 255);
-    controlPacket.roll = constrain(command.substring(commaIndex3 + 1).toInt(), 0, 255);
+  if (commaIndex1 != NULL && commaIndex2 != NULL && commaIndex3 != NULL) {
+    // atol() stops at the comma, like String::toInt() on each substring
+    controlPacket.throttle = constrain(atol(values), 0, 255);
+    controlPacket.yaw = constrain(atol(commaIndex1 + 1), 0, 255);
+    controlPacket.pitch = constrain(atol(commaIndex2 + 1), 0, 255);
+    controlPacket.roll = constrain(atol(commaIndex3 + 1), 0, 255);
     
-    Serial.println("Custom command executed");
+    queueLine("Custom command executed");
   } else {
-    Serial.println("Invalid custom command format");
+    queueLine("Invalid custom command format");
   }
 }
 
@@ -260,4 +360,4 @@ void printControlStatus() {
   Serial.print(controlPacket.pitch);
   Serial.print(", Roll: ");
   Serial.println(controlPacket.roll);
-}
\ No newline at end of file
+}
@@ -0,0 +1,90 @@
+/*
+ * Arduino core stand-in for building sketches on Linux (see host_sim.h)
+ *
+ * Only what the sketches in this repository use: timing, HardwareSerial
+ * (including the blocking readStringUntil() and print() paths) and a small
+ * String class.
+ */
+
+#ifndef ARDUINO_H
+#define ARDUINO_H
+
+#include <stdint.h>
+#include <stdlib.h>
+#include <string.h>
+#include <string>
+
+#include "host_sim.h"
+
+typedef uint8_t byte;
+typedef bool boolean;
+
+#define HEX 16
+#define DEC 10
+
+#define min(a, b) ((a) < (b) ? (a) : (b))
+#define max(a, b) ((a) > (b) ? (a) : (b))
+#define constrain(x, low, high) ((x) < (low) ? (low) : ((x) > (high) ? (high) : (x)))
+
+unsigned long millis();
+unsigned long micros();
+void delay(unsigned long ms);
+void delayMicroseconds(unsigned int us);
+
+class String {
+ public:
+  String() {}
+  String(const char *text) : s_(text) {}
+  String(const std::string &text) : s_(text) {}
+
+  unsigned int length() const { return s_.size(); }
+  const char *c_str() const { return s_.c_str(); }
+  char operator[](unsigned int i) const { return s_[i]; }
+  bool operator==(const char *text) const { return s_ == text; }
+  bool operator==(const String &other) const { return s_ == other.s_; }
+  String &operator+=(char c) { s_ += c; return *this; }
+  String &operator+=(const char *text) { s_ += text; return *this; }
+
+  void trim();
+  void toUpperCase();
+  bool startsWith(const char *prefix) const { return s_.compare(0, strlen(prefix), prefix) == 0; }
+  void remove(unsigned int index, unsigned int count) { s_.erase(index, count); }
+  int indexOf(char c, unsigned int from = 0) const;
+  String substring(unsigned int from) const { return from < s_.size() ? String(s_.substr(from)) : String(); }
+  String substring(unsigned int from, unsigned int to) const;
+  long toInt() const { return atol(s_.c_str()); }
+
+ private:
+  std::string s_;
+};
+
+class HardwareSerial {
+ public:
+  void begin(unsigned long baud);
+  void setTimeout(unsigned long ms);
+  int available();
+  int read();
+  int peek();
+  int availableForWrite();
+  String readStringUntil(char terminator);
+
+  size_t write(uint8_t b);
+  size_t write(const char *text);
+  size_t print(const char *text) { return write(text); }
+  size_t print(const String &text) { return write(text.c_str()); }
+  size_t print(char c) { return write((uint8_t)c); }
+  size_t print(long n, int base = DEC);
+  size_t print(int n, int base = DEC) { return print((long)n, base); }
+  size_t print(unsigned long n, int base = DEC);
+  size_t print(unsigned int n, int base = DEC) { return print((unsigned long)n, base); }
+  size_t print(unsigned char n, int base = DEC) { return print((unsigned long)n, base); }
+  size_t println() { return write("\r\n"); }
+  template <typename T>
+  size_t println(const T &value) { size_t n = print(value); return n + println(); }
+  template <typename T>
+  size_t println(const T &value, int base) { size_t n = print(value, base); return n + println(); }
+};
+
+extern HardwareSerial Serial;
+
+#endif
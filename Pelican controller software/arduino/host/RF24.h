@@ -0,0 +1,29 @@
+/*
+ * RF24 stand-in: write() records when each packet went out and takes
+ * host::sim.radio_write_us of virtual time
+ */
+
+#ifndef RF24_H
+#define RF24_H
+
+#include <stdint.h>
+
+enum rf24_datarate_e { RF24_1MBPS, RF24_2MBPS, RF24_250KBPS };
+enum rf24_pa_dbm_e { RF24_PA_MIN, RF24_PA_LOW, RF24_PA_HIGH, RF24_PA_MAX };
+
+class RF24 {
+ public:
+  RF24(uint16_t ce_pin, uint16_t csn_pin) { (void)ce_pin; (void)csn_pin; }
+
+  bool begin() { return true; }
+  void setChannel(uint8_t channel) { (void)channel; }
+  void setDataRate(rf24_datarate_e rate) { (void)rate; }
+  void setPALevel(uint8_t level) { (void)level; }
+  void setRetries(uint8_t delay, uint8_t count) { (void)delay; (void)count; }
+  void setAutoAck(bool enable) { (void)enable; }
+  void openWritingPipe(const uint8_t *address) { (void)address; }
+  void stopListening() {}
+  bool write(const void *buf, uint8_t len);
+};
+
+#endif
@@ -0,0 +1,8 @@
+/* SPI stand-in: the host build has no bus (see RF24.h) */
+
+#ifndef SPI_H
+#define SPI_H
+
+#include "Arduino.h"
+
+#endif
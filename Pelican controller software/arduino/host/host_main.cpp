@@ -0,0 +1,360 @@
+/*
+ * Host harness: runs a sketch's setup() and loop() against a replayed serial
+ * byte stream and reports how regular its radio ticks were
+ *
+ * Replay files have one write per line:
+ *
+ *     <at_ms> <gap_us> <text>
+ *
+ * The bytes of <text> (C escapes \n \r \t \\ \xNN allowed) start arriving
+ * at <at_ms> after setup() returns, or when the previous write has finished,
+ * whichever is later, one every <gap_us> (never faster than the baud rate).
+ * Blank lines and lines starting with '#' are ignored.
+ *
+ * Usage:
+ *     firmware_host [--replay FILE] [--duration-ms 5000] [--loop-us 20]
+ *                   [--radio-write-us 500] [--baud 115200] [--echo]
+ *
+ * Prints one JSON object with the tick and command statistics.
+ */
+
+#include <math.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <algorithm>
+#include <fstream>
+#include <string>
+#include <vector>
+
+#include "Arduino.h"
+#include "RF24.h"
+
+// The core's min()/max() macros would rewrite std::min()/std::max()
+#undef min
+#undef max
+
+void setup();
+void loop();
+
+namespace host {
+
+Sim sim;
+
+void Sim::advance_to(uint64_t t) {
+  if (t > now_us) {
+    now_us = t;
+  }
+  receive();
+}
+
+void Sim::receive() {
+  // The UART interrupt: bytes that arrived by now go into the ring, or are
+  // lost when it is full
+  while (!arrivals.empty() && arrivals.front().first <= now_us) {
+    if (rx.size() < SERIAL_RX_CAPACITY) {
+      rx.push_back(arrivals.front().second);
+    } else {
+      rx_dropped++;
+    }
+    arrivals.pop_front();
+  }
+}
+
+size_t Sim::tx_queued() const {
+  double pending = tx_busy_until_us - (double)now_us;
+  if (pending <= 0) {
+    return 0;
+  }
+  return (size_t)(pending / byte_us + 0.999);
+}
+
+}  // namespace host
+
+using host::sim;
+
+// Arduino core ----------------------------------------------------------------
+
+unsigned long millis() { return (unsigned long)(sim.now_us / 1000); }
+unsigned long micros() { return (unsigned long)sim.now_us; }
+void delay(unsigned long ms) { sim.advance((uint64_t)ms * 1000); }
+void delayMicroseconds(unsigned int us) { sim.advance(us); }
+
+void String::trim() {
+  size_t start = s_.find_first_not_of(" \t\r\n\v\f");
+  if (start == std::string::npos) {
+    s_.clear();
+    return;
+  }
+  size_t end = s_.find_last_not_of(" \t\r\n\v\f");
+  s_ = s_.substr(start, end - start + 1);
+}
+
+void String::toUpperCase() {
+  for (size_t i = 0; i < s_.size(); i++) {
+    if (s_[i] >= 'a' && s_[i] <= 'z') {
+      s_[i] -= 'a' - 'A';
+    }
+  }
+}
+
+int String::indexOf(char c, unsigned int from) const {
+  size_t i = s_.find(c, from);
+  return i == std::string::npos ? -1 : (int)i;
+}
+
+String String::substring(unsigned int from, unsigned int to) const {
+  if (from > to) {
+    std::swap(from, to);
+  }
+  if (from >= s_.size()) {
+    return String();
+  }
+  return String(s_.substr(from, to - from));
+}
+
+HardwareSerial Serial;
+
+void HardwareSerial::begin(unsigned long baud) { sim.byte_us = 10e6 / baud; }
+void HardwareSerial::setTimeout(unsigned long ms) { sim.timeout_ms = ms; }
+
+int HardwareSerial::available() {
+  sim.receive();
+  return (int)sim.rx.size();
+}
+
+int HardwareSerial::read() {
+  sim.receive();
+  if (sim.rx.empty()) {
+    return -1;
+  }
+  int c = sim.rx.front();
+  sim.rx.pop_front();
+  return c;
+}
+
+int HardwareSerial::peek() {
+  sim.receive();
+  return sim.rx.empty() ? -1 : sim.rx.front();
+}
+
+int HardwareSerial::availableForWrite() {
+  return (int)(host::SERIAL_TX_CAPACITY - std::min(sim.tx_queued(), host::SERIAL_TX_CAPACITY));
+}
+
+String HardwareSerial::readStringUntil(char terminator) {
+  // Stream::timedRead(): waits up to the timeout for every character
+  std::string line;
+  while (true) {
+    uint64_t deadline = sim.now_us + (uint64_t)sim.timeout_ms * 1000;
+    int c = read();
+    while (c < 0 && sim.now_us < deadline) {
+      uint64_t next = sim.arrivals.empty() ? deadline : std::min(deadline, sim.arrivals.front().first);
+      sim.advance_to(next);
+      c = read();
+    }
+    if (c < 0 || c == terminator) {
+      return String(line);
+    }
+    line += (char)c;
+  }
+}
+
+size_t HardwareSerial::write(uint8_t b) {
+  if (sim.tx_queued() >= host::SERIAL_TX_CAPACITY) {
+    // Blocks until the UART has sent one byte
+    uint64_t start = sim.now_us;
+    sim.advance_to((uint64_t)(sim.tx_busy_until_us - host::SERIAL_TX_CAPACITY * sim.byte_us + 0.999));
+    sim.tx_blocked_us += sim.now_us - start;
+  }
+  sim.tx_busy_until_us = std::max(sim.tx_busy_until_us, (double)sim.now_us) + sim.byte_us;
+  sim.tx_log += (char)b;
+  return 1;
+}
+
+size_t HardwareSerial::write(const char *text) {
+  size_t n = 0;
+  while (*text) {
+    n += write((uint8_t)*text++);
+  }
+  return n;
+}
+
+size_t HardwareSerial::print(long n, int base) {
+  if (n < 0) {
+    write('-');
+    return 1 + print((unsigned long)-n, base);
+  }
+  return print((unsigned long)n, base);
+}
+
+size_t HardwareSerial::print(unsigned long n, int base) {
+  char digits[33];
+  int i = 0;
+  do {
+    int d = n % base;
+    digits[i++] = (char)(d < 10 ? '0' + d : 'A' + d - 10);
+    n /= base;
+  } while (n > 0);
+  size_t written = 0;
+  while (i > 0) {
+    written += write((uint8_t)digits[--i]);
+  }
+  return written;
+}
+
+bool RF24::write(const void *buf, uint8_t len) {
+  (void)buf;
+  (void)len;
+  sim.radio_writes.push_back(sim.now_us);
+  sim.advance(sim.radio_write_us);
+  return true;
+}
+
+// Harness ---------------------------------------------------------------------
+
+static std::string unescape(const std::string &text) {
+  std::string out;
+  for (size_t i = 0; i < text.size(); i++) {
+    if (text[i] != '\\' || i + 1 >= text.size()) {
+      out += text[i];
+      continue;
+    }
+    char e = text[++i];
+    if (e == 'n') {
+      out += '\n';
+    } else if (e == 'r') {
+      out += '\r';
+    } else if (e == 't') {
+      out += '\t';
+    } else if (e == 'x' && i + 2 < text.size()) {
+      out += (char)strtol(text.substr(i + 1, 2).c_str(), NULL, 16);
+      i += 2;
+    } else {
+      out += e;
+    }
+  }
+  return out;
+}
+
+static bool load_replay(const char *path, uint64_t base_us, size_t *written) {
+  std::ifstream file(path);
+  if (!file) {
+    fprintf(stderr, "Cannot read %s\n", path);
+    return false;
+  }
+  std::string line;
+  double t = (double)base_us;
+  while (std::getline(file, line)) {
+    if (!line.empty() && line[line.size() - 1] == '\r') {
+      line.erase(line.size() - 1);
+    }
+    if (line.empty() || line[0] == '#') {
+      continue;
+    }
+    char *end;
+    double at_ms = strtod(line.c_str(), &end);
+    double gap_us = strtod(end, &end);
+    if (*end == ' ') {
+      end++;
+    }
+    std::string data = unescape(end);
+    t = std::max(t, base_us + at_ms * 1000);
+    for (size_t i = 0; i < data.size(); i++) {
+      t += std::max(gap_us, sim.byte_us);
+      sim.arrivals.push_back(std::make_pair((uint64_t)t, (uint8_t)data[i]));
+    }
+    *written += data.size();
+  }
+  return true;
+}
+
+static size_t count(const std::string &text, const char *needle) {
+  size_t n = 0;
+  for (size_t i = text.find(needle); i != std::string::npos; i = text.find(needle, i + 1)) {
+    n++;
+  }
+  return n;
+}
+
+int main(int argc, char **argv) {
+  const char *replay = NULL;
+  double duration_ms = 5000;
+  uint64_t loop_us = 20;
+  bool echo = false;
+  unsigned long baud = 115200;
+  for (int i = 1; i < argc; i++) {
+    std::string arg = argv[i];
+    bool has_value = i + 1 < argc;
+    if (arg == "--replay" && has_value) {
+      replay = argv[++i];
+    } else if (arg == "--duration-ms" && has_value) {
+      duration_ms = atof(argv[++i]);
+    } else if (arg == "--loop-us" && has_value) {
+      loop_us = strtoull(argv[++i], NULL, 10);
+    } else if (arg == "--radio-write-us" && has_value) {
+      sim.radio_write_us = strtoull(argv[++i], NULL, 10);
+    } else if (arg == "--baud" && has_value) {
+      baud = strtoul(argv[++i], NULL, 10);
+    } else if (arg == "--echo") {
+      echo = true;
+    } else {
+      fprintf(stderr, "Unknown argument: %s\n", arg.c_str());
+      return 2;
+    }
+  }
+
+  sim.byte_us = 10e6 / baud;
+  setup();
+  uint64_t start = sim.now_us;
+  size_t boot_ticks = sim.radio_writes.size();
+  size_t boot_output = sim.tx_log.size();
+  size_t written = 0;
+  if (replay != NULL && !load_replay(replay, start, &written)) {
+    return 2;
+  }
+
+  uint64_t end = start + (uint64_t)(duration_ms * 1000);
+  uint64_t longest_loop = 0;
+  while (sim.now_us < end) {
+    uint64_t before = sim.now_us;
+    loop();
+    longest_loop = std::max(longest_loop, sim.now_us - before);
+    sim.advance(loop_us);
+  }
+
+  std::vector<double> late;
+  double interval_min = 0, interval_max = 0, interval_sum = 0;
+  const double nominal = 20000;
+  for (size_t i = boot_ticks + 1; i < sim.radio_writes.size(); i++) {
+    double interval = (double)(sim.radio_writes[i] - sim.radio_writes[i - 1]);
+    interval_min = late.empty() ? interval : std::min(interval_min, interval);
+    interval_max = late.empty() ? interval : std::max(interval_max, interval);
+    interval_sum += interval;
+    late.push_back(fabs(interval - nominal));
+  }
+  std::sort(late.begin(), late.end());
+  double jitter_p99 = late.empty() ? 0 : late[(size_t)((late.size() - 1) * 0.99)];
+  double jitter_max = late.empty() ? 0 : late.back();
+  size_t ticks = sim.radio_writes.size() - boot_ticks;
+  // Ticks the 50Hz grid called for but that never happened
+  long missed = (long)(duration_ms / 20) - (long)ticks;
+
+  std::string output = sim.tx_log.substr(boot_output);
+  if (echo) {
+    fputs(output.c_str(), stderr);
+  }
+  printf("{\"ticks\": %zu, \"missed_ticks\": %ld, "
+         "\"interval_mean_us\": %.1f, \"interval_min_us\": %.1f, \"interval_max_us\": %.1f, "
+         "\"jitter_p99_us\": %.1f, \"jitter_max_us\": %.1f, \"longest_loop_us\": %llu, "
+         "\"bytes_in\": %zu, \"rx_dropped\": %llu, \"bytes_out\": %zu, \"tx_blocked_us\": %llu, "
+         "\"answered\": %zu, \"unknown\": %zu, \"invalid\": %zu}\n",
+         ticks, missed > 0 ? missed : 0,
+         late.empty() ? 0.0 : interval_sum / late.size(), interval_min, interval_max,
+         jitter_p99, jitter_max, (unsigned long long)longest_loop,
+         written, (unsigned long long)sim.rx_dropped, output.size(),
+         (unsigned long long)sim.tx_blocked_us,
+         count(output, "Processing command:"), count(output, "Unknown command!"),
+         count(output, "Invalid custom command format"));
+  return 0;
+}
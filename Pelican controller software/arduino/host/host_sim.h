@@ -0,0 +1,52 @@
+/*
+ * Simulated Arduino Uno for running sketches on Linux
+ *
+ * Time is virtual (microseconds since reset) and only moves when the sketch
+ * waits: delay(), a Serial.write() into a full transmit buffer, a
+ * readStringUntil() waiting for bytes, radio.write(), and the fixed cost the
+ * harness charges for every pass through loop(). Received bytes arrive at the
+ * times a replay stream gives them and are dropped, like on the real UART,
+ * when the 64-byte receive buffer is full.
+ */
+
+#ifndef HOST_SIM_H
+#define HOST_SIM_H
+
+#include <stdint.h>
+#include <stddef.h>
+#include <deque>
+#include <string>
+#include <vector>
+
+namespace host {
+
+// Serial buffer sizes of the AVR HardwareSerial core (one slot stays empty)
+const size_t SERIAL_RX_CAPACITY = 63;
+const size_t SERIAL_TX_CAPACITY = 63;
+
+struct Sim {
+  uint64_t now_us = 0;
+  uint64_t radio_write_us = 500;        // radio.write() of one packet at 250kbps
+  std::vector<uint64_t> radio_writes;   // time of every radio.write() call
+
+  // Serial
+  double byte_us = 86.8;                // 10 bits at 115200 baud
+  unsigned long timeout_ms = 1000;      // Stream::setTimeout() default
+  std::deque<std::pair<uint64_t, uint8_t> > arrivals;
+  std::deque<uint8_t> rx;
+  uint64_t rx_dropped = 0;
+  double tx_busy_until_us = 0;          // when the last queued byte leaves
+  std::string tx_log;                   // everything the sketch wrote
+  uint64_t tx_blocked_us = 0;           // time spent in write() waiting for room
+
+  void advance_to(uint64_t t);
+  void advance(uint64_t us) { advance_to(now_us + us); }
+  void receive();
+  size_t tx_queued() const;
+};
+
+extern Sim sim;
+
+}  // namespace host
+
+#endif
@@ -0,0 +1,6 @@
+/* nRF24L01 register map stand-in: nothing in the sketches uses it directly */
+
+#ifndef NRF24L01_H
+#define NRF24L01_H
+
+#endif
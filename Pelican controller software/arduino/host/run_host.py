@@ -0,0 +1,197 @@
+"""
+Build drone_controller.ino for Linux and time its radio ticks under serial load
+
+The sketch is compiled with g++ against the Arduino/RF24 stand-ins in this
+directory (prototypes are generated the way the Arduino IDE does it), then
+run by host_main.cpp on a virtual clock against replayed serial byte streams:
+
+- idle:      no input
+- burst:     100 commands in writes of 10, each written back to back at the
+             line rate (a long batch: the controller never has more than
+             max_in_flight commands, or one batch, unanswered)
+- paced:     one command every 10 ms, like the controller's command queue
+- slow:      commands dribbled in one byte every 4 ms (a slow or stalled
+             USB writer)
+- partial:   half a CUSTOM line, a 300 ms pause, then the rest
+- overlong:  300 bytes without a newline, then a valid command
+
+For each, the 50Hz tick intervals are measured. The run fails (exit status
+1) if a tick is ever more than --max-jitter-ms off its 20 ms interval, if a
+received byte is lost to a full UART buffer, or if a command goes
+unanswered. A host that writes much more than 10 commands without waiting
+for answers does overrun the 64-byte receive buffer, whatever the sketch
+does: every answer is longer than its command, so the replies cannot keep up
+with the line rate.
+--baseline runs the same streams against the sketch at a git revision, for
+comparison.
+
+Usage:
+    python run_host.py
+    python run_host.py --baseline HEAD~1
+    python run_host.py --replay capture.txt --duration-ms 10000
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+
+HOST_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SKETCH = os.path.join(os.path.dirname(HOST_DIR), 'drone_controller.ino')
+
+# A function definition starting at column 0, as the IDE's prototype
+# generator finds them
+DEFINITION = re.compile(r'^([A-Za-z_][\w\s\*&]*?[\s\*&])([A-Za-z_]\w*)\s*\(([^;{}()]*)\)\s*\{?\s*$')
+KEYWORDS = {'if', 'while', 'for', 'switch', 'return', 'else'}
+
+COMMANDS = ("TAKEOFF", "UP", "FORWARD", "ROTATE_LEFT", "CUSTOM:200,128,100,150",
+            "RIGHT", "DOWN", "CUSTOM:180,90,128,128", "STOP", "LAND")
+
+
+def sketch_to_cpp(source, name):
+    """The sketch as a C++ file: Arduino.h, generated prototypes, the source"""
+    prototypes = []
+    for line in source.splitlines():
+        match = DEFINITION.match(line)
+        if match and match.group(2) not in KEYWORDS and not match.group(1).strip().startswith(('struct', 'class')):
+            prototypes.append(f"{match.group(1).strip()} {match.group(2)}({match.group(3).strip()});")
+    return ("#include <Arduino.h>\n" + "\n".join(prototypes)
+            + f'\n#line 1 "{name}"\n' + source)
+
+
+def build(source, name, build_dir, cxx):
+    """Compile a sketch with the harness; returns the executable path"""
+    cpp = os.path.join(build_dir, name + '.cpp')
+    with open(cpp, 'w', newline='\n') as f:
+        f.write(sketch_to_cpp(source, name))
+    binary = os.path.join(build_dir, name + '_host')
+    subprocess.run([cxx, '-std=c++11', '-O2', '-Wall', '-Wno-unused-variable',
+                    '-I', HOST_DIR, cpp, os.path.join(HOST_DIR, 'host_main.cpp'), '-o', binary],
+                   check=True)
+    return binary
+
+
+def escape(data):
+    return (data.replace('\\', '\\\\').replace('\n', '\\n')
+            .replace('\r', '\\r').replace('\t', '\\t'))
+
+
+def scenarios():
+    """Replay streams by name: lists of (at_ms, gap_us, text)"""
+    commands = [COMMANDS[i % len(COMMANDS)] for i in range(100)]
+    return {
+        'idle': [],
+        'burst': [(i * 250, 0, "".join(c + "\n" for c in commands[i * 10:i * 10 + 10]))
+                  for i in range(len(commands) // 10)],
+        'paced': [(i * 10, 0, c + "\n") for i, c in enumerate(commands)],
+        'slow': [(i * 200, 4000, c + "\n") for i, c in enumerate(commands[:20])],
+        'partial': [item for i in range(10)
+                    for item in ((i * 400, 0, "CUSTOM:200,1"), (i * 400 + 300, 0, "28,100,128\n"))],
+        'overlong': [(0, 0, "X" * 300), (100, 0, "\nLAND\n")],
+    }
+
+
+def expected_answers(stream):
+    """Commands in a stream: one answer is due for every line it ends"""
+    return sum(text.count("\n") for _, _, text in stream)
+
+
+def write_replay(stream, path):
+    with open(path, 'w', newline='\n') as f:
+        for at_ms, gap_us, text in stream:
+            f.write(f"{at_ms} {gap_us} {escape(text)}\n")
+
+
+def run(binary, replay, args):
+    command = [binary, '--duration-ms', str(args.duration_ms), '--loop-us', str(args.loop_us),
+               '--radio-write-us', str(args.radio_write_us)]
+    if replay:
+        command += ['--replay', replay]
+    result = subprocess.run(command, check=True, capture_output=True, text=True)
+    return json.loads(result.stdout)
+
+
+def git_sketch(revision):
+    """drone_controller.ino at a git revision"""
+    return subprocess.run(['git', 'show', f'{revision}:./drone_controller.ino'],
+                          cwd=os.path.dirname(DEFAULT_SKETCH), check=True,
+                          capture_output=True, text=True).stdout
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sketch", default=DEFAULT_SKETCH, help="Sketch to build")
+    parser.add_argument("--baseline", help="Also run the sketch at this git revision")
+    parser.add_argument("--replay", help="Run this replay file instead of the built-in streams")
+    parser.add_argument("--duration-ms", type=float, default=5000, help="Virtual run time per stream")
+    parser.add_argument("--loop-us", type=int, default=20, help="Cost of one loop() pass")
+    parser.add_argument("--radio-write-us", type=int, default=500, help="Cost of one radio.write()")
+    parser.add_argument("--max-jitter-ms", type=float, default=1.0,
+                        help="Largest acceptable tick deviation from 20 ms")
+    parser.add_argument("--output", help="Write the results as JSON here")
+    parser.add_argument("--cxx", default=os.environ.get('CXX', 'g++'), help="C++ compiler")
+    args = parser.parse_args()
+
+    if shutil.which(args.cxx) is None:
+        print(f"No C++ compiler '{args.cxx}' found")
+        sys.exit(2)
+
+    sketches = {}
+    with open(args.sketch, encoding='utf-8') as f:
+        sketches['sketch'] = f.read()
+    if args.baseline:
+        sketches['baseline'] = git_sketch(args.baseline)
+
+    results = {}
+    build_dir = tempfile.mkdtemp(prefix='firmware_host_')
+    try:
+        expected = {}
+        if args.replay:
+            replays = {os.path.basename(args.replay): os.path.abspath(args.replay)}
+        else:
+            replays = {}
+            for name, stream in scenarios().items():
+                path = os.path.join(build_dir, name + '.txt')
+                write_replay(stream, path)
+                replays[name] = path
+                expected[name] = expected_answers(stream)
+        for label, source in sketches.items():
+            binary = build(source, label, build_dir, args.cxx)
+            results[label] = {name: run(binary, path, args) for name, path in replays.items()}
+    finally:
+        shutil.rmtree(build_dir, ignore_errors=True)
+
+    failed = False
+    print(f"{'stream':<10} {'sketch':<9} {'ticks':>6} {'missed':>6} {'p99 ms':>8} {'max ms':>8} "
+          f"{'answered':>9} {'rx lost':>7}")
+    for name in replays:
+        for label in sketches:
+            r = results[label][name]
+            answered = f"{r['answered']}/{expected[name]}" if name in expected else str(r['answered'])
+            problems = []
+            if r['jitter_max_us'] > args.max_jitter_ms * 1000:
+                problems.append("jitter")
+            if r['rx_dropped']:
+                problems.append("rx lost")
+            if name in expected and r['answered'] < expected[name]:
+                problems.append("unanswered")
+            print(f"{name:<10} {label:<9} {r['ticks']:>6} {r['missed_ticks']:>6} "
+                  f"{r['jitter_p99_us'] / 1000:>8.3f} {r['jitter_max_us'] / 1000:>8.3f} "
+                  f"{answered:>9} {r['rx_dropped']:>7}"
+                  + (f"  {', '.join(problems)}" if problems else ""))
+            if label == 'sketch' and problems:
+                failed = True
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    print("FAIL" if failed else "PASS")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Bounded, batched activity log for the P8 PRO Drone Controller GUI
+
+Inserting into a Tk text widget and scrolling it on every message gets slower
+as the widget grows, and only the Tk thread may touch the widget at all. The
+ActivityLog splits the work:
+
+- post() may be called from any thread; it timestamps the message and appends
+  it to a pending list under a lock
+- one after() tick on the Tk thread takes the whole pending list, writes it to
+  the history file and inserts it into the widget with a single insert()
+- the widget keeps at most max_lines lines; older ones are deleted in bulk
+  once the overflow passes trim_slack, so trimming is rare and cheap
+"""
+
+import os
+import threading
+from datetime import datetime
+
+
+class ActivityLog:
+    """Thread-safe log feeding a Tk text widget and a history file"""
+
+    def __init__(self, widget, max_lines=1000, history_path=None, interval_ms=50,
+                 trim_slack=None):
+        """
+        Args:
+            widget: Tk Text/ScrolledText showing the recent lines
+            max_lines (int): Lines kept in the widget
+            history_path (str): File every message is appended to (None: no
+                history, the widget is all there is)
+            interval_ms (int): How often pending messages are drained
+            trim_slack (int): Lines allowed over max_lines before trimming
+                (default: a tenth of max_lines)
+        """
+        if max_lines < 1:
+            raise ValueError("max_lines must be at least 1")
+        self.widget = widget
+        self.max_lines = max_lines
+        self.interval_ms = interval_ms
+        self.trim_slack = max_lines // 10 if trim_slack is None else trim_slack
+        self.history_path = history_path
+
+        self._pending = []
+        self._lock = threading.Lock()
+        self._lines = 0
+        self._after_id = None
+        self._history = None
+        if history_path:
+            directory = os.path.dirname(history_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._history = open(history_path, "a", encoding="utf-8")
+            self._history.write(f"--- session started {datetime.now():%Y-%m-%d %H:%M:%S} ---\n")
+
+        self.posted = 0
+        self.batches = 0
+        self.trimmed = 0
+
+    def post(self, message):
+        """Queue a message for the log; safe from any thread"""
+        entry = f"[{datetime.now():%H:%M:%S}] {message}\n"
+        with self._lock:
+            self._pending.append(entry)
+            self.posted += 1
+
+    def start(self):
+        """Begin draining on the widget's Tk event loop"""
+        if self._after_id is None:
+            self._after_id = self.widget.after(self.interval_ms, self._tick)
+
+    def stop(self):
+        """Stop draining, flush what is pending and close the history file"""
+        if self._after_id is not None:
+            self.widget.after_cancel(self._after_id)
+            self._after_id = None
+        try:
+            self.drain()
+        except Exception:
+            # The widget may already be destroyed; the history still gets it
+            with self._lock:
+                batch, self._pending = self._pending, []
+            self._write_history(batch)
+        if self._history is not None:
+            self._history.close()
+            self._history = None
+
+    def drain(self):
+        """Move every pending message into the widget (Tk thread only)"""
+        with self._lock:
+            if not self._pending:
+                return 0
+            batch, self._pending = self._pending, []
+        self._write_history(batch)
+
+        # Lines that would be trimmed straight away are never inserted
+        shown = batch[-self.max_lines:]
+        widget = self.widget
+        at_bottom = widget.yview()[1] >= 1.0
+        widget.insert("end", "".join(shown))
+        self._lines += len(shown)
+
+        excess = self._lines - self.max_lines
+        if excess > self.trim_slack:
+            widget.delete("1.0", f"{excess + 1}.0")
+            self._lines -= excess
+            self.trimmed += excess
+        if at_bottom:
+            widget.see("end")
+        self.batches += 1
+        return len(batch)
+
+    def clear(self):
+        """Empty the widget (the history file is kept)"""
+        self.widget.delete("1.0", "end")
+        self._lines = 0
+
+    def get_stats(self):
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            'posted': self.posted,
+            'pending': pending,
+            'batches': self.batches,
+            'lines': self._lines,
+            'trimmed': self.trimmed,
+        }
+
+    def _tick(self):
+        try:
+            self.drain()
+        finally:
+            self._after_id = self.widget.after(self.interval_ms, self._tick)
+
+    def _write_history(self, batch):
+        if self._history is not None and batch:
+            self._history.write("".join(batch))
+            self._history.flush()
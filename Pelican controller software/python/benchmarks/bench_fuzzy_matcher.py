@@ -0,0 +1,207 @@
+"""
+Accuracy and latency of the fuzzy intent fallback over noisy transcripts
+
+Builds a corpus of misrecognized commands the exact IntentMatcher cannot
+parse: sound-alike word swaps ("take of", "lend", "rotate rite"), dropped,
+doubled and swapped letters, wrapped in filler words; plus non-command
+speech that must not be guessed at all. Reports how many are recovered
+correctly, recovered wrongly or left alone, and the lookup latency of the
+indexed FuzzyIntentMatcher next to a brute-force edit-distance scan of every
+phrase.
+
+The run fails (exit status 1) if a SAFETY_CRITICAL intent is ever guessed
+wrongly or if the p99 lookup takes longer than --max-lookup-us.
+
+Usage:
+    python benchmarks/bench_fuzzy_matcher.py [--size 2000] [--seed 7]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from difflib import SequenceMatcher
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_intent_matcher import PHRASES, FILLERS, NOISE  # noqa: E402
+from fuzzy_matcher import FuzzyIntentMatcher, SAFETY_CRITICAL  # noqa: E402
+from intent_matcher import IntentMatcher, COMMAND_PATTERNS  # noqa: E402
+from latency_trace import percentile  # noqa: E402
+
+# What recognizers make of command words
+SOUND_ALIKES = {
+    "off": ["of", "often"], "take": ["tape", "tak"], "land": ["lend", "lands", "plan"],
+    "right": ["rite", "write", "bright"], "left": ["lift", "lest", "laughed"],
+    "up": ["op", "app"], "down": ["dawn", "town"], "forward": ["foreword", "forwards"],
+    "back": ["buck", "beck", "bag"], "rotate": ["rotated", "rotates"], "hover": ["hoover", "hovel"],
+    "stop": ["stock", "step"], "climb": ["clime", "climbed"], "descend": ["decent", "dissent"],
+    "launch": ["lunch", "lawn"], "spin": ["spun", "pin"], "yaw": ["your", "yo"],
+    "turn": ["tern", "torn"], "drift": ["drifts", "draft"], "touch": ["dutch"],
+    "reverse": ["reverb"], "halt": ["hold", "salt"], "flying": ["fine", "frying"],
+    "ahead": ["a head"], "still": ["steal", "spill"], "emergency": ["emergent"],
+}
+
+# Speech that is not a command and must not become one
+NOT_COMMANDS = NOISE + [
+    "let's have lunch", "write that down for me", "the weather looks fine",
+    "is the battery ok", "what time is it", "turn on the camera", "record a video",
+    "how far away is it", "show me the map", "thank you", "good job",
+    "that was fun", "are we recording", "check the signal", "I can't see it",
+]
+
+
+def misspell(word, rng):
+    """Drop, double or swap a letter"""
+    if len(word) < 4:
+        return word
+    i = rng.randrange(1, len(word) - 1)
+    edit = rng.choice(("drop", "double", "swap"))
+    if edit == "drop":
+        return word[:i] + word[i + 1:]
+    if edit == "double":
+        return word[:i] + word[i] + word[i:]
+    return word[:i - 1] + word[i] + word[i - 1] + word[i + 1:]
+
+
+def corrupt(phrase, rng):
+    words = phrase.split()
+    i = rng.randrange(len(words))
+    if words[i] in SOUND_ALIKES and rng.random() < 0.7:
+        words[i] = rng.choice(SOUND_ALIKES[words[i]])
+    else:
+        words[i] = misspell(words[i], rng)
+    return " ".join(words)
+
+
+def build_corpus(size, seed=7):
+    """
+    (transcript, expected command or None) pairs the exact matcher misses
+
+    Returns:
+        list: Misheard commands, then an eighth as many non-commands
+    """
+    rng = random.Random(seed)
+    exact = IntentMatcher(COMMAND_PATTERNS)
+    corpus = []
+    attempts = 0
+    while len(corpus) < size and attempts < size * 50:
+        attempts += 1
+        phrase = rng.choice(PHRASES)
+        text = corrupt(phrase, rng)
+        if exact.parse(text) is not None:
+            continue
+        if rng.random() < 0.3:
+            text = f"{rng.choice(FILLERS)} {text}"
+        if rng.random() < 0.2:
+            text = f"{text} {rng.choice(('please', 'now'))}"
+        if exact.parse(text) is None:
+            corpus.append((text, exact.parse(phrase)))
+    for _ in range(max(1, size // 8)):
+        text = rng.choice(NOT_COMMANDS)
+        if exact.parse(text) is None:
+            corpus.append((text, None))
+    return corpus
+
+
+def brute_force(vocabulary, text):
+    """Edit-distance ratio against every phrase: what the index avoids"""
+    words = text.lower().split()
+    best, best_score = None, 0.0
+    for phrase, command in vocabulary.items():
+        n = len(phrase.split())
+        for start in range(len(words) - n + 1):
+            score = SequenceMatcher(None, " ".join(words[start:start + n]), phrase).ratio()
+            if score > best_score:
+                best, best_score = command, score
+    return best
+
+
+def time_lookups(lookup, corpus):
+    samples = []
+    for text, _ in corpus:
+        start = time.perf_counter()
+        lookup(text)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def run(size=2000, seed=7):
+    """Run the comparison and return a result dict"""
+    corpus = build_corpus(size, seed)
+    matcher = FuzzyIntentMatcher(COMMAND_PATTERNS, cache_size=0)
+
+    correct = wrong = abstained = false_positives = unsafe = 0
+    commands = [(t, e) for t, e in corpus if e is not None]
+    examples = []
+    for text, expected in corpus:
+        guess = matcher.match(text)
+        command = guess.command if guess else None
+        if expected is None:
+            if command is not None:
+                false_positives += 1
+                examples.append((text, command))
+        elif command is None:
+            abstained += 1
+        elif command == expected:
+            correct += 1
+        else:
+            wrong += 1
+            examples.append((text, command))
+        if command in SAFETY_CRITICAL and command != expected:
+            unsafe += 1
+
+    indexed = time_lookups(matcher.best, corpus)
+    brute = time_lookups(lambda t: brute_force(matcher.vocabulary, t), corpus)
+    return {
+        "transcripts": len(commands),
+        "non_commands": len(corpus) - len(commands),
+        "phrases": len(matcher.vocabulary),
+        "recovered_pct": correct / len(commands) * 100,
+        "wrong_pct": wrong / len(commands) * 100,
+        "abstained_pct": abstained / len(commands) * 100,
+        "false_positive_pct": false_positives / max(1, len(corpus) - len(commands)) * 100,
+        "unsafe_guesses": unsafe,
+        "lookup_p50_us": percentile(indexed, 0.50) * 1e6,
+        "lookup_p99_us": percentile(indexed, 0.99) * 1e6,
+        "brute_force_p50_us": percentile(brute, 0.50) * 1e6,
+        "brute_force_p99_us": percentile(brute, 0.99) * 1e6,
+        "examples": examples[:8],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=2000, help="Misheard transcripts")
+    parser.add_argument("--seed", type=int, default=7, help="Corpus random seed")
+    parser.add_argument("--max-lookup-us", type=float, default=1000.0,
+                        help="Slowest acceptable p99 lookup")
+    args = parser.parse_args()
+
+    result = run(args.size, args.seed)
+    print(f"Corpus: {result['transcripts']} misheard commands, {result['non_commands']} non-commands, "
+          f"{result['phrases']} indexed phrases")
+    print(f"Recovered:  {result['recovered_pct']:6.1f} %")
+    print(f"Wrong:      {result['wrong_pct']:6.1f} %")
+    print(f"Abstained:  {result['abstained_pct']:6.1f} %")
+    print(f"Non-commands guessed: {result['false_positive_pct']:.1f} %")
+    print(f"Indexed lookup:   p50 {result['lookup_p50_us']:8.1f} us  p99 {result['lookup_p99_us']:8.1f} us")
+    print(f"Brute force scan: p50 {result['brute_force_p50_us']:8.1f} us  "
+          f"p99 {result['brute_force_p99_us']:8.1f} us")
+    for text, command in result["examples"]:
+        print(f"  '{text}' -> {command}")
+
+    failed = False
+    if result["unsafe_guesses"]:
+        print(f"FAIL {result['unsafe_guesses']} wrong guesses of {', '.join(SAFETY_CRITICAL)}")
+        failed = True
+    if result["lookup_p99_us"] > args.max_lookup_us:
+        print(f"FAIL p99 lookup {result['lookup_p99_us']:.0f} us (limit {args.max_lookup_us:.0f} us)")
+        failed = True
+    print("FAIL" if failed else "PASS")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Micro-benchmark: compiled IntentMatcher vs. the original pattern-by-pattern loop
+
+Builds a corpus of a few thousand utterances (commands wrapped in filler words,
+emergency phrases, speed modifiers and plain noise), checks that both parsers
+agree on every phrase and reports the throughput of each.
+
+Usage:
+    python benchmarks/bench_intent_matcher.py [--size 5000] [--repeat 5]
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from intent_matcher import IntentMatcher, COMMAND_PATTERNS  # noqa: E402
+
+PHRASES = [
+    "take off", "launch", "lift off", "start flying", "begin flight",
+    "land", "come down", "touch down", "stop flying", "end flight",
+    "go up", "move up", "climb", "fly higher", "increase altitude",
+    "go down", "descend", "move down", "fly lower", "drop",
+    "go forward", "move ahead", "fly forward", "go back", "reverse",
+    "go left", "drift left", "turn left", "go right", "drift right",
+    "rotate left", "spin left", "yaw left", "rotate right", "spin right",
+    "twist right", "stop", "hover", "hold position", "stay still",
+    "emergency", "help", "kill", "stop now",
+]
+
+FILLERS = [
+    "please", "now", "drone", "hey", "okay", "can you", "slowly", "quickly",
+    "a little", "the", "and then", "right away", "fast", "um",
+]
+
+NOISE = [
+    "what is the weather", "hello there", "play some music", "battery status",
+    "how high are we", "take a picture", "nothing", "testing one two three",
+]
+
+
+def legacy_parse(command_patterns, text):
+    """The original DroneNLPController.parse_natural_language loop"""
+    text = text.lower().strip()
+    for command, patterns in command_patterns.items():
+        for pattern in patterns:
+            if re.search(pattern, text, re.IGNORECASE):
+                return command.upper()
+    if re.search(r'\b(emergency|help|stop\s*now|kill)\b', text, re.IGNORECASE):
+        return "LAND"
+    speed_match = re.search(r'\b(slowly|slow|fast|quickly|quick)\b', text, re.IGNORECASE)
+    if speed_match:
+        pass
+    return None
+
+
+def build_corpus(size, seed=1234):
+    """Generate `size` utterances with a fixed seed"""
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(size):
+        roll = rng.random()
+        if roll < 0.1:
+            corpus.append(rng.choice(NOISE))
+            continue
+        words = [rng.choice(PHRASES)]
+        for _ in range(rng.randint(0, 4)):
+            words.insert(rng.randint(0, len(words)), rng.choice(FILLERS))
+        if roll > 0.85:
+            words.append(rng.choice(PHRASES))
+        text = " ".join(words)
+        if rng.random() < 0.3:
+            text = text.upper()
+        corpus.append(text)
+    return corpus
+
+
+def time_parser(parse, corpus, repeat):
+    """Best-of-`repeat` wall time for parsing the whole corpus once"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in corpus:
+            parse(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(size=5000, repeat=5):
+    """Run the comparison and return a result dict"""
+    corpus = build_corpus(size)
+    matcher = IntentMatcher(COMMAND_PATTERNS)
+    cold_matcher = IntentMatcher(COMMAND_PATTERNS, cache_size=0)
+
+    mismatches = [
+        text for text in corpus
+        if legacy_parse(COMMAND_PATTERNS, text) != matcher.parse(text)
+    ]
+
+    legacy = time_parser(lambda t: legacy_parse(COMMAND_PATTERNS, t), corpus, repeat)
+    uncached = time_parser(cold_matcher.parse, corpus, repeat)
+    cached = time_parser(matcher.parse, corpus, repeat)
+
+    return {
+        "corpus_size": len(corpus),
+        "unique_phrases": len(set(corpus)),
+        "mismatches": len(mismatches),
+        "legacy_us_per_phrase": legacy / len(corpus) * 1e6,
+        "compiled_us_per_phrase": uncached / len(corpus) * 1e6,
+        "cached_us_per_phrase": cached / len(corpus) * 1e6,
+        "speedup_compiled": legacy / uncached,
+        "speedup_cached": legacy / cached,
+        "examples": mismatches[:5],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=5000, help="Number of utterances")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing repetitions")
+    args = parser.parse_args()
+
+    result = run(args.size, args.repeat)
+    print(f"Corpus: {result['corpus_size']} phrases ({result['unique_phrases']} unique)")
+    print(f"Legacy loop:       {result['legacy_us_per_phrase']:8.2f} us/phrase")
+    print(f"Compiled matcher:  {result['compiled_us_per_phrase']:8.2f} us/phrase "
+          f"({result['speedup_compiled']:.1f}x)")
+    print(f"Compiled + cache:  {result['cached_us_per_phrase']:8.2f} us/phrase "
+          f"({result['speedup_cached']:.1f}x)")
+    if result["mismatches"]:
+        print(f"MISMATCHES: {result['mismatches']} e.g. {result['examples']}")
+        sys.exit(1)
+    print("All phrases agree with the legacy parser")
+
+
+if __name__ == "__main__":
+    main()
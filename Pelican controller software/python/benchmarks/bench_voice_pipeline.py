@@ -0,0 +1,131 @@
+"""
+Benchmark: voice pipeline throughput and end-to-end latency from WAV input
+
+Without arguments a synthetic WAV is generated (tone bursts separated by
+silence, one burst per utterance) and recognized by a scripted recognizer
+that returns a known phrase after a configurable delay, so capture/VAD and
+pipelining overhead can be measured with no microphone, model or network.
+Pass --wav and --vosk-model to measure a real recording with a real engine.
+
+Usage:
+    python benchmarks/bench_voice_pipeline.py [--utterances 50] [--delay-ms 150]
+    python benchmarks/bench_voice_pipeline.py --wav session.wav --vosk-model model/
+"""
+
+import argparse
+import math
+import os
+import struct
+import sys
+import tempfile
+import time
+import wave
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from intent_matcher import IntentMatcher  # noqa: E402
+from voice_pipeline import (OfflineRecognizer, VoicePipeline, WavFileSource,  # noqa: E402
+                            VoskRecognizer, DEFAULT_SAMPLE_RATE)
+
+PHRASES = ["take off", "move forward", "rotate left", "go up", "stop", "land"]
+
+
+class ScriptedRecognizer(OfflineRecognizer):
+    """Returns PHRASES in order, taking `delay` seconds per segment"""
+
+    name = 'scripted'
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.index = 0
+
+    def recognize(self, pcm, sample_rate):
+        time.sleep(self.delay)
+        text = PHRASES[self.index % len(PHRASES)]
+        self.index += 1
+        return text
+
+
+def write_synthetic_wav(path, utterances, speech_ms=600, gap_ms=700,
+                        sample_rate=DEFAULT_SAMPLE_RATE):
+    """Tone bursts (stand-ins for speech) separated by near-silence"""
+    frames = bytearray()
+    for _ in range(utterances):
+        for n in range(sample_rate * gap_ms // 1000):
+            frames += struct.pack('<h', int(20 * math.sin(n * 0.3)))
+        for n in range(sample_rate * speech_ms // 1000):
+            frames += struct.pack('<h', int(8000 * math.sin(2 * math.pi * 220 * n / sample_rate)))
+    for n in range(sample_rate * gap_ms // 1000):
+        frames += struct.pack('<h', 0)
+    with wave.open(path, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(bytes(frames))
+    return (speech_ms + gap_ms) * utterances / 1000 + gap_ms / 1000
+
+
+def run(wav_path, recognizer, realtime=False):
+    """Run the pipeline over one WAV file and return a result dict"""
+    matcher = IntentMatcher()
+    intents = []
+    source = WavFileSource(wav_path, realtime=realtime)
+    duration = source.wav.getnframes() / source.sample_rate
+    pipeline = VoicePipeline(source, recognizer,
+                             lambda result: intents.append(matcher.parse(result.text)),
+                             intent_filter=matcher.parse_all,
+                             # Offline runs must not drop segments to keep up
+                             max_pending=4 if realtime else 0)
+    start = time.perf_counter()
+    pipeline.run()
+    elapsed = time.perf_counter() - start
+    stats = pipeline.get_stats()
+    stats.update({
+        'recognizer': recognizer.name,
+        'audio_seconds': duration,
+        'wall_seconds': elapsed,
+        'realtime_factor': duration / elapsed if elapsed else float('inf'),
+        'intents': sum(1 for i in intents if i),
+    })
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--wav', help='16-bit mono WAV to process (default: synthetic)')
+    parser.add_argument('--vosk-model', help='Vosk model directory for a real recognizer')
+    parser.add_argument('--utterances', type=int, default=50, help='Synthetic utterance count')
+    parser.add_argument('--delay-ms', type=float, default=150, help='Scripted recognizer delay')
+    parser.add_argument('--realtime', action='store_true', help='Feed audio at 1x speed')
+    args = parser.parse_args()
+
+    if args.vosk_model:
+        recognizer = VoskRecognizer(args.vosk_model)
+    else:
+        recognizer = ScriptedRecognizer(args.delay_ms / 1000)
+
+    tmp = None
+    wav_path = args.wav
+    if wav_path is None:
+        tmp = tempfile.NamedTemporaryFile(suffix='.wav', delete=False)
+        tmp.close()
+        wav_path = tmp.name
+        write_synthetic_wav(wav_path, args.utterances)
+    try:
+        result = run(wav_path, recognizer, args.realtime)
+    finally:
+        if tmp is not None:
+            os.unlink(tmp.name)
+
+    print(f"Recognizer:   {result['recognizer']}")
+    print(f"Audio:        {result['audio_seconds']:.1f} s processed in {result['wall_seconds']:.2f} s "
+          f"({result['realtime_factor']:.1f}x real time)")
+    print(f"Segments:     {result['segments']} (dropped {result['dropped_segments']})")
+    print(f"Recognized:   {result['recognized']} ({result['early_results']} early), "
+          f"{result['intents']} with an intent")
+    print(f"Latency:      mean {result['latency_mean'] * 1000:.1f} ms, "
+          f"max {result['latency_max'] * 1000:.1f} ms after end of speech")
+
+
+if __name__ == '__main__':
+    main()
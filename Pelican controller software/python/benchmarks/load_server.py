@@ -0,0 +1,261 @@
+"""
+Load test for the headless control server (control_server.py)
+
+Hundreds of WebSocket clients and a few HTTP pollers drive one ControlServer
+connected to the pty device emulator. WebSocket clients send commands (single
+and batched) and status requests and apply every state push they receive;
+HTTP clients poll /status. The run fails (exit status 1) if any call fails,
+if a reply takes longer than --max-reply-ms at p99, or if a client's state,
+rebuilt from the pushes, differs from the server's once the load stops.
+
+Usage:
+    python benchmarks/load_server.py
+    python benchmarks/load_server.py --clients 500 --duration 10
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import os
+import random
+import secrets
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+logging.basicConfig(level=logging.WARNING)
+
+from control_server import (ControlServer, encode_frame, read_message,  # noqa: E402
+                            OP_TEXT, OP_CLOSE, WebSocketClosed)
+from device_emulator import DeviceEmulator  # noqa: E402
+from latency_trace import percentile  # noqa: E402
+
+PHRASES = ("take off", "go up", "move forward", "turn left", "stop", "descend", "land")
+
+
+class WebSocketClient:
+    """Just enough of a WebSocket client to talk to the control server"""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.state = {}
+        self.pushes = 0
+        self.log_lines = 0
+        self._next_id = 0
+        self._replies = {}
+        self._listener = asyncio.ensure_future(self._listen())
+
+    @classmethod
+    async def connect(cls, host, port, token):
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.write((f"GET /ws HTTP/1.1\r\nHost: {host}:{port}\r\n"
+                      f"Authorization: Bearer {token}\r\n"
+                      "Upgrade: websocket\r\nConnection: Upgrade\r\n"
+                      "Sec-WebSocket-Key: dGhlIHNhbXBsZSBub25jZQ==\r\n"
+                      "Sec-WebSocket-Version: 13\r\n\r\n").encode('ascii'))
+        head = await reader.readuntil(b'\r\n\r\n')
+        if not head.startswith(b'HTTP/1.1 101'):
+            raise RuntimeError(f"Handshake refused: {head.splitlines()[0]!r}")
+        return cls(reader, writer)
+
+    async def _listen(self):
+        try:
+            while True:
+                _, payload = await read_message(self.reader, self.writer, require_mask=False)
+                message = json.loads(payload)
+                kind = message['type']
+                if kind == 'state':
+                    self.state.update(message['state'])
+                    self.pushes += 1
+                elif kind == 'log':
+                    self.log_lines += len(message['lines'])
+                else:
+                    future = self._replies.pop(message['id'], None)
+                    if future is not None and not future.done():
+                        future.set_result(message)
+        except (WebSocketClosed, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            for future in self._replies.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("WebSocket closed"))
+
+    async def request(self, op, **args):
+        self._next_id += 1
+        future = asyncio.get_running_loop().create_future()
+        self._replies[self._next_id] = future
+        payload = json.dumps(dict(args, id=self._next_id, op=op)).encode('utf-8')
+        self.writer.write(encode_frame(OP_TEXT, payload, mask=os.urandom(4)))
+        message = await future
+        if message['type'] == 'error':
+            raise RuntimeError(message['error'])
+        return message['result']
+
+    async def close(self):
+        with contextlib.suppress(ConnectionError):
+            self.writer.write(encode_frame(OP_CLOSE, b'\x03\xe8', mask=os.urandom(4)))
+            await self.writer.drain()
+        await asyncio.wait([self._listener], timeout=1)
+        self.writer.close()
+
+
+async def http_get(host, port, path, token):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write((f"GET {path} HTTP/1.1\r\nHost: {host}\r\nAuthorization: Bearer {token}\r\n"
+                  "Connection: close\r\n\r\n").encode('ascii'))
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b'\r\n\r\n')
+    if not head.startswith(b'HTTP/1.1 200'):
+        raise RuntimeError(f"GET {path}: {head.splitlines()[0]!r}")
+    return json.loads(body)
+
+
+class Stats:
+    def __init__(self):
+        self.latency = {}
+        self.errors = []
+
+    def add(self, name, seconds):
+        self.latency.setdefault(name, []).append(seconds)
+
+
+async def websocket_client(client, index, stop, stats, rng):
+    while not stop.is_set():
+        roll = rng.random()
+        if roll < 0.5:
+            name, call = 'get_status', client.request('get_status')
+        elif roll < 0.85:
+            name, call = 'send_command', client.request('send_command', command=rng.choice(PHRASES))
+        else:
+            commands = [rng.choice(PHRASES) for _ in range(rng.randint(2, 5))]
+            name, call = 'send_commands', client.request('send_commands', commands=commands)
+        start = time.perf_counter()
+        try:
+            await call
+            stats.add(name, time.perf_counter() - start)
+        except Exception as e:
+            stats.errors.append(f"client {index}: {name}: {e}")
+            return
+        # Think time, so the clients do not all fire in lockstep
+        await asyncio.sleep(rng.uniform(0, 0.05))
+
+
+async def http_poller(host, port, token, stop, stats):
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            await http_get(host, port, '/status', token)
+            stats.add('http_status', time.perf_counter() - start)
+        except Exception as e:
+            stats.errors.append(f"http: {e}")
+            return
+        await asyncio.sleep(0.01)
+
+
+async def drive(host, port, server, args):
+    stats = Stats()
+    connect_start = time.perf_counter()
+    clients = await asyncio.gather(*(WebSocketClient.connect(host, port, server.token)
+                                     for _ in range(args.clients)))
+    connect_s = time.perf_counter() - connect_start
+
+    stop = asyncio.Event()
+    tasks = [asyncio.ensure_future(websocket_client(c, i, stop, stats, random.Random(args.seed + i)))
+             for i, c in enumerate(clients)]
+    tasks += [asyncio.ensure_future(http_poller(host, port, server.token, stop, stats))
+              for _ in range(args.pollers)]
+    start = time.perf_counter()
+    await asyncio.sleep(args.duration)
+    stop.set()
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+
+    # Let the last commands reach the device and their pushes reach everyone
+    expected = {}
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        await asyncio.sleep(0.2)
+        expected = server.api.get_state()
+        if all(c.state == expected for c in clients):
+            break
+    stale = sum(1 for c in clients if c.state != expected)
+    if stale:
+        stats.errors.append(f"{stale} clients ended with a state different from the server's")
+
+    pushes = [c.pushes for c in clients]
+    await asyncio.gather(*(c.close() for c in clients))
+    return stats, elapsed, connect_s, pushes
+
+
+def run(args):
+    with DeviceEmulator(baud_rate=args.baud) as emulator, \
+            contextlib.redirect_stdout(io.StringIO()):
+        server = ControlServer(host='127.0.0.1', port=0, workers=args.workers,
+                               token=secrets.token_urlsafe(16))
+        if not server.api.connect(emulator.port)["connected"]:
+            raise RuntimeError(f"Could not connect to the emulator on {emulator.port}")
+        port = server.start()
+        try:
+            stats, elapsed, connect_s, pushes = asyncio.run(drive('127.0.0.1', port, server, args))
+            server_stats = server.get_stats()
+            device = server.api.get_latency_stats()
+        finally:
+            server.stop()
+            server.api.disconnect()
+    return {
+        'elapsed': elapsed,
+        'connect_s': connect_s,
+        'stats': stats,
+        'pushes': pushes,
+        'server': server_stats,
+        'device': device,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clients", type=int, default=200, help="Concurrent WebSocket clients")
+    parser.add_argument("--pollers", type=int, default=8, help="Concurrent HTTP /status pollers")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds to run")
+    parser.add_argument("--workers", type=int, default=4, help="Server worker threads")
+    parser.add_argument("--max-reply-ms", type=float, default=500.0,
+                        help="Slowest acceptable p99 reply time")
+    parser.add_argument("--baud", type=int, default=115200, help="Emulated line rate")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed for the call mix")
+    args = parser.parse_args()
+
+    result = run(args)
+    stats = result['stats']
+    total = sum(len(s) for s in stats.latency.values())
+    print(f"{args.clients} WebSocket clients connected in {result['connect_s'] * 1000:.0f} ms")
+    print(f"{total} calls in {result['elapsed']:.1f} s ({total / result['elapsed']:.0f}/s)")
+    failed = False
+    for name, samples in sorted(stats.latency.items()):
+        p99 = percentile(samples, 0.99) * 1000
+        print(f"  {name:<14} {len(samples):>7}  p50 {percentile(samples, 0.50) * 1000:7.2f} ms  "
+              f"p99 {p99:7.2f} ms  max {max(samples) * 1000:7.2f} ms")
+        if p99 > args.max_reply_ms:
+            print(f"FAIL {name} p99 {p99:.1f} ms (limit {args.max_reply_ms:.0f} ms)")
+            failed = True
+    server = result['server']
+    print(f"server: {server['commands']} commands in {server['command_jobs']} worker jobs, "
+          f"{server['pushes']} pushes, {min(result['pushes'])}-{max(result['pushes'])} "
+          f"state updates per client")
+    written = result['device']['stages'].get('written')
+    if written:
+        print(f"queue-to-wire p99 {written['p99_ms']:.2f} ms over {written['count']} commands")
+    for message in stats.errors[:20]:
+        print("ERROR", message)
+        failed = True
+    print("FAIL" if failed else "PASS")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,693 @@
+"""
+End-to-end benchmark suite for the controller stack
+
+Runs headless against the pty device emulator (device_emulator.py), so no
+Arduino is needed, and measures the hot paths:
+
+- parse:      natural-language parse throughput over a generated utterance corpus
+- fuzzy:      misheard-command recovery: share recovered, guessed wrongly and
+              left alone, and the fallback lookup latency
+- queue:      queue-to-wire and queue-to-acknowledgement latency through
+              process_commands, one command at a time
+- sustained:  highest command rate the scheduler, serial link and device sustain
+- api:        DroneAPI call latency with several concurrent callers
+- gui:        Tk activity-log and status-panel update cost (skipped without a display)
+- vocabulary: command vocabulary load time, cold (compiling everything) and
+              from the disk cache, and reload time after a one-phrase edit
+- startup:    module import, controller construction, connect (until the
+              firmware's ready banner) and reconnect time
+- outage:     the emulated cable is pulled and plugged back in; time until
+              the serial link is up again and commands sent meanwhile arrive
+- fleet:      a Fleet of emulated bridges: parallel connect time, and the
+              skew and acknowledgement latency of commands sent to all of them
+- mission:    a timed mission of short steps: how late each setpoint change
+              is queued and written, and whether lateness builds up
+- batch:      chained utterances ("go forward then rotate right and climb"),
+              text and binary protocol: time until the last step is
+              acknowledged when written as one batch, and when each step is
+              sent as its own command
+
+Results are written as JSON. With --baseline, every metric is compared with
+a saved run and the exit status is 1 if any got worse by more than the
+tolerance. Metric names say which way is better: '*_per_s' is higher-better;
+'*_ms' and '*_us' are lower-better. Any other metric is informational.
+
+Usage:
+    python benchmarks/run_benchmarks.py --output results.json
+    python benchmarks/run_benchmarks.py --baseline baseline.json --tolerance 0.25
+    python benchmarks/run_benchmarks.py --only parse queue --save-baseline baseline.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The controller configures INFO logging on import; keep the runs quiet
+logging.basicConfig(level=logging.WARNING)
+
+from bench_intent_matcher import build_corpus  # noqa: E402
+import bench_fuzzy_matcher  # noqa: E402
+from device_emulator import DeviceEmulator  # noqa: E402
+from drone_nlp_controller import DroneNLPController  # noqa: E402
+from fleet import Fleet, broadcast_skew  # noqa: E402
+from intent_matcher import IntentMatcher, COMMAND_PATTERNS  # noqa: E402
+from latency_trace import CommandTrace, percentile, ENQUEUED, WRITTEN, ACKNOWLEDGED  # noqa: E402
+
+SCHEMA_VERSION = 1
+
+# Latency differences smaller than this are timer noise, never a regression
+NOISE_FLOOR = {"_ms": 0.5, "_us": 0.5}
+
+
+@contextlib.contextmanager
+def quiet():
+    """Swallow the controller's console chatter (spoken confirmations etc.)"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+@contextlib.contextmanager
+def emulated_controller(baud_rate, protocol="text"):
+    """A controller connected to a fresh emulated drone_controller.ino (or bridge)"""
+    firmware = "bridge" if protocol == "binary" else "controller"
+    with DeviceEmulator(firmware, baud_rate=baud_rate) as emulator, quiet():
+        controller = DroneNLPController(arduino_port=emulator.port, protocol=protocol)
+        if not controller.connect_arduino():
+            raise RuntimeError(f"Could not connect to the emulator on {emulator.port}")
+        try:
+            yield controller, emulator
+        finally:
+            controller.disconnect_arduino()
+
+
+def wait_for_outcomes(traces, timeout):
+    """Wait until every trace has been recorded (acknowledged, lost, ...)"""
+    deadline = time.monotonic() + timeout
+    while any(t.outcome is None for t in traces):
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.001)
+    return True
+
+
+def wait_until(condition, timeout):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.005)
+    return True
+
+
+def summarize_ms(samples, prefix):
+    return {
+        f"{prefix}_p50_ms": percentile(samples, 0.50) * 1000,
+        f"{prefix}_p95_ms": percentile(samples, 0.95) * 1000,
+        f"{prefix}_p99_ms": percentile(samples, 0.99) * 1000,
+    }
+
+
+def custom_command(i):
+    # CUSTOM: is never coalesced, so every command reaches the device
+    return f"CUSTOM:{100 + i % 100},128,128,128"
+
+
+# Benchmarks ------------------------------------------------------------------
+
+def bench_parse(args):
+    corpus = build_corpus(args.corpus)
+    with quiet():
+        controller = DroneNLPController()
+    cold = IntentMatcher(controller.command_patterns, cache_size=0)
+
+    start = time.perf_counter()
+    for text in corpus:
+        cold.parse(text)
+    uncached = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        for text in corpus:
+            controller.parse_natural_language(text)
+    cached = (time.perf_counter() - start) / args.repeat
+
+    return {
+        "phrases": len(corpus),
+        "uncached_per_s": len(corpus) / uncached,
+        "uncached_us": uncached / len(corpus) * 1e6,
+        "cached_per_s": len(corpus) / cached,
+        "cached_us": cached / len(corpus) * 1e6,
+    }
+
+
+def bench_fuzzy(args):
+    result = bench_fuzzy_matcher.run(args.fuzzy_corpus)
+    return {name: result[name] for name in (
+        "transcripts", "recovered_pct", "wrong_pct", "abstained_pct", "false_positive_pct",
+        "unsafe_guesses", "lookup_p50_us", "lookup_p99_us")}
+
+
+def bench_queue(args):
+    to_wire = []
+    to_ack = []
+    lost = 0
+    with emulated_controller(args.baud) as (controller, _):
+        for i in range(args.commands):
+            trace = CommandTrace()
+            controller.enqueue_command(custom_command(i), trace)
+            if not wait_for_outcomes([trace], timeout=2.0) or trace.outcome != 'ok':
+                lost += 1
+                continue
+            stamps = trace.stamps
+            to_wire.append((stamps[WRITTEN] - stamps[ENQUEUED]) / 1e9)
+            to_ack.append((stamps[ACKNOWLEDGED] - stamps[ENQUEUED]) / 1e9)
+
+    metrics = {"commands": args.commands, "not_acknowledged": lost}
+    metrics.update(summarize_ms(to_wire, "queue_to_wire"))
+    metrics.update(summarize_ms(to_ack, "queue_to_ack"))
+    return metrics
+
+
+def bench_sustained(args):
+    with emulated_controller(args.baud) as (controller, emulator):
+        traces = [CommandTrace() for _ in range(args.commands)]
+        start = time.perf_counter()
+        for i, trace in enumerate(traces):
+            controller.enqueue_command(custom_command(i), trace)
+        finished = wait_for_outcomes(traces, timeout=args.commands * 0.05 + 5)
+        elapsed = time.perf_counter() - start
+        device_commands = emulator.get_stats()['commands']
+
+    outcomes = {}
+    for trace in traces:
+        outcomes[trace.outcome] = outcomes.get(trace.outcome, 0) + 1
+    return {
+        "commands": args.commands,
+        "completed": finished,
+        "acknowledged": outcomes.get('ok', 0),
+        "lost": outcomes.get('lost', 0),
+        "device_received": device_commands,
+        "elapsed_s": elapsed,
+        "commands_per_s": outcomes.get('ok', 0) / elapsed,
+    }
+
+
+def bench_api(args):
+    from drone_app import DroneAPI
+
+    latencies = {'get_status': [], 'send_command': []}
+    lock = threading.Lock()
+    calls_per_thread = args.api_calls // args.callers
+
+    def caller(api, index):
+        mine = {name: [] for name in latencies}
+        for i in range(calls_per_thread):
+            # Mostly status polling, like the web UI, with a command every tenth call
+            if i % 10 == index % 10:
+                name, call = 'send_command', lambda: api.send_command("hover")
+            else:
+                name, call = 'get_status', api.get_status
+            start = time.perf_counter()
+            call()
+            mine[name].append(time.perf_counter() - start)
+        with lock:
+            for name, samples in mine.items():
+                latencies[name].extend(samples)
+
+    with DeviceEmulator(baud_rate=args.baud) as emulator, quiet():
+        api = DroneAPI()
+        if not api.connect(emulator.port)["connected"]:
+            raise RuntimeError(f"Could not connect to the emulator on {emulator.port}")
+        try:
+            threads = [threading.Thread(target=caller, args=(api, i)) for i in range(args.callers)]
+            start = time.perf_counter()
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            elapsed = time.perf_counter() - start
+        finally:
+            api.disconnect()
+
+    total = sum(len(s) for s in latencies.values())
+    metrics = {"callers": args.callers, "calls": total, "calls_per_s": total / elapsed}
+    for name, samples in latencies.items():
+        metrics.update(summarize_ms(samples, name))
+    return metrics
+
+
+def bench_gui(args):
+    try:
+        import tkinter as tk
+        root = tk.Tk()
+    except Exception as e:
+        return {"skipped": f"Tk unavailable: {e}"}
+    root.withdraw()
+
+    from drone_gui import DroneControllerGUI
+
+    try:
+        with emulated_controller(args.baud) as (controller, _):
+            gui = DroneControllerGUI(root, log_file="")
+            gui.controller = controller
+
+            # Drain explicitly so the timing covers the widget work, not only
+            # the hand-off to the log queue
+            start = time.perf_counter()
+            for i in range(args.gui_updates):
+                gui.log_message(f"⚡ Quick command: benchmark {i}")
+                if i % 50 == 0:
+                    gui.activity_log.drain()
+                    root.update()
+            gui.activity_log.drain()
+            root.update()
+            log_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            for _ in range(args.gui_updates):
+                gui.update_drone_status()
+            root.update()
+            status_time = time.perf_counter() - start
+    finally:
+        root.destroy()
+
+    return {
+        "updates": args.gui_updates,
+        "log_message_us": log_time / args.gui_updates * 1e6,
+        "update_status_us": status_time / args.gui_updates * 1e6,
+    }
+
+
+def bench_startup(args):
+    here = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    def python_ms(code):
+        samples = []
+        for _ in range(args.startup_runs):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, "-c", code], cwd=here, check=True,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            samples.append(time.perf_counter() - start)
+        return min(samples) * 1000
+
+    # Interpreter start-up is not ours; subtract it
+    import_ms = python_ms("import drone_nlp_controller") - python_ms("pass")
+
+    construct, connect, reconnect = [], [], []
+    with DeviceEmulator(baud_rate=args.baud) as emulator, quiet():
+        for _ in range(args.startup_runs):
+            start = time.perf_counter()
+            controller = DroneNLPController(arduino_port=emulator.port, fast_start=True)
+            construct.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            if not controller.connect_arduino():
+                raise RuntimeError(f"Could not connect to the emulator on {emulator.port}")
+            connect.append(time.perf_counter() - start)
+            if not controller.drone_state['device_ready']:
+                raise RuntimeError("Connected without the ready banner")
+
+            controller.disconnect_arduino()
+            # Let the emulator notice the port closing, as a real reset would
+            time.sleep(0.1)
+            start = time.perf_counter()
+            controller.connect_arduino()
+            reconnect.append(time.perf_counter() - start)
+            controller.disconnect_arduino()
+            time.sleep(0.1)
+
+    return {
+        "import_ms": import_ms,
+        "construct_ms": min(construct) * 1000,
+        "connect_ms": min(connect) * 1000,
+        "reconnect_ms": min(reconnect) * 1000,
+    }
+
+
+def bench_vocabulary(args):
+    import re
+    import fuzzy_matcher
+    import intent_matcher
+    from vocabulary import VocabularyStore
+
+    def forget_compiled():
+        # What a fresh interpreter has: no compiled patterns or phrase keys
+        re.purge()
+        intent_matcher.compile_pattern.cache_clear()
+        fuzzy_matcher.phrase_trigrams.cache_clear()
+        fuzzy_matcher.pattern_matches.cache_clear()
+
+    syllables = ("ka", "zo", "mi", "tu", "ren", "vash", "lo", "pim", "dax", "ul")
+    commands = list(COMMAND_PATTERNS)
+    extra = {}
+    for i in range(args.vocab_phrases):
+        word = "".join(syllables[int(d)] for d in f"{i:03d}")
+        extra.setdefault(commands[i % len(commands)], []).append(f"drone {word}")
+
+    directory = tempfile.mkdtemp(prefix="drone-vocab-")
+    path = os.path.join(directory, "commands.json")
+    cache_dir = os.path.join(directory, "cache")
+    with open(path, "w") as f:
+        json.dump({"commands": extra}, f)
+
+    cold, cached, reload, full_reload = [], [], [], []
+    for run in range(args.startup_runs):
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        VocabularyStore(path, cache_dir=cache_dir)
+        forget_compiled()
+        start = time.perf_counter()
+        VocabularyStore(path, cache_dir=cache_dir)
+        cached.append(time.perf_counter() - start)
+
+        # Without the disk cache; this also leaves every pattern and phrase
+        # compiled in-process for the incremental reload
+        forget_compiled()
+        start = time.perf_counter()
+        store = VocabularyStore(path, cache_dir=None)
+        cold.append(time.perf_counter() - start)
+
+        # One more phrase: everything else is already compiled
+        extra["land"].append(f"set it down {run}")
+        with open(path, "w") as f:
+            json.dump({"commands": extra}, f)
+        start = time.perf_counter()
+        if not store.reload():
+            raise RuntimeError(f"Vocabulary not reloaded: {store.last_error}")
+        reload.append(time.perf_counter() - start)
+
+        extra["land"].append(f"put it down {run}")
+        with open(path, "w") as f:
+            json.dump({"commands": extra}, f)
+        forget_compiled()
+        start = time.perf_counter()
+        store.reload()
+        full_reload.append(time.perf_counter() - start)
+        if store.current.matcher.parse(f"put it down {run}") != "LAND":
+            raise RuntimeError("Reloaded vocabulary does not know the new phrase")
+    shutil.rmtree(directory, ignore_errors=True)
+
+    return {
+        "patterns": sum(len(p) for p in store.current.patterns.values()),
+        "cold_load_ms": min(cold) * 1000,
+        "cached_load_ms": min(cached) * 1000,
+        "reload_ms": min(reload) * 1000,
+        "full_reload_ms": min(full_reload) * 1000,
+    }
+
+
+def bench_outage(args):
+    link = os.path.join(tempfile.mkdtemp(prefix="drone-bench-"), "ttyDRONE")
+    reconnect, delivered, expected = [], 0, 0
+    with DeviceEmulator(baud_rate=args.baud, link=link) as emulator, quiet():
+        controller = DroneNLPController(arduino_port=link, fast_start=True)
+        if not controller.connect_arduino():
+            raise RuntimeError(f"Could not connect to the emulator on {link}")
+        try:
+            for i in range(args.outages):
+                emulator.unplug(args.outage_s)
+                if not wait_until(lambda: not controller.link.is_up, 2.0):
+                    raise RuntimeError("The link did not notice the cable being pulled")
+                before = emulator.commands
+                for j in range(args.outage_commands):
+                    controller.send_command_to_arduino(custom_command(i * args.outage_commands + j))
+                expected += args.outage_commands
+
+                if not controller.link.wait_up(args.outage_s + 5.0):
+                    raise RuntimeError("The link did not come back")
+                reconnect.append(controller.get_link_stats()["last_reconnect_ms"] - args.outage_s * 1000)
+                wait_until(lambda: emulator.commands - before >= args.outage_commands, 2.0)
+                delivered += emulator.commands - before
+        finally:
+            controller.disconnect_arduino()
+
+    return {
+        "outages": args.outages,
+        "delivered": delivered,
+        "lost": expected - delivered,
+        "replug_to_up_p50_ms": percentile(reconnect, 0.50),
+        "replug_to_up_max_ms": max(reconnect),
+    }
+
+
+def bench_fleet(args):
+    emulators = [DeviceEmulator("bridge", baud_rate=args.baud) for _ in range(args.drones)]
+    fleet = Fleet(protocol="binary", baud_rate=args.baud)
+    skews, to_last_ack = [], []
+    lost = 0
+    try:
+        for i, emulator in enumerate(emulators):
+            fleet.add_drone(f"drone{i}", emulator.start())
+        start = time.perf_counter()
+        connected = sum(fleet.connect().values())
+        connect_ms = (time.perf_counter() - start) * 1000
+        if connected != args.drones:
+            raise RuntimeError(f"Only {connected} of {args.drones} emulated bridges connected")
+
+        for i in range(args.broadcasts):
+            broadcast = fleet.send(custom_command(i))
+            if not wait_for_outcomes(broadcast.traces, timeout=2.0):
+                lost += sum(t.outcome is None for t in broadcast.traces)
+            lost += sum(t.outcome not in (None, 'ok') for t in broadcast.traces)
+            skew = broadcast_skew(broadcast)
+            if skew is not None:
+                skews.append(skew)
+            acked = [t.stamps[ACKNOWLEDGED] for t in broadcast.traces if t.outcome == 'ok']
+            if acked:
+                to_last_ack.append((max(acked) - broadcast.traces[0].stamps[ENQUEUED]) / 1e9)
+    finally:
+        fleet.disconnect()
+        for emulator in emulators:
+            emulator.stop()
+
+    metrics = {
+        "drones": args.drones,
+        "broadcasts": args.broadcasts,
+        "not_acknowledged": lost,
+        "connect_all_ms": connect_ms,
+    }
+    metrics.update(summarize_ms(skews, "broadcast_skew"))
+    metrics.update(summarize_ms(to_last_ack, "send_to_last_ack"))
+    return metrics
+
+
+def bench_mission(args):
+    moves = ("go left", "go right", "go forward", "go back", "rotate left", "rotate right")
+    step_s = args.mission_step_ms / 1000
+    script = ", ".join(["take off for 0.1 seconds"]
+                       + [f"{moves[i % len(moves)]} for {step_s} seconds"
+                          for i in range(args.mission_steps)]
+                       + ["land"])
+    with emulated_controller(args.baud) as (controller, _):
+        runner = controller.run_mission(script)
+        if not runner.wait(runner.mission.duration + 5.0):
+            raise RuntimeError("The mission did not finish")
+        wait_for_outcomes([t.trace for t in runner.timings], timeout=2.0)
+        stats = runner.get_stats()
+        rows = runner.report()
+
+    queued = [r['queued_late_ms'] / 1000 for r in rows]
+    written = [r['written_late_ms'] / 1000 for r in rows if r['written_late_ms'] is not None]
+    tail = queued[-len(queued) // 4:]
+    metrics = {
+        "changes": stats['changes'],
+        "sent": stats['sent'],
+        "completed": stats['status'] == 'done',
+        "overrun_ms": (stats['elapsed_s'] - stats['planned_s']) * 1000,
+        # No drift: the last quarter of the changes is no later than the rest
+        "last_quarter_late_p50_ms": percentile(tail, 0.50) * 1000,
+    }
+    metrics.update(summarize_ms(queued, "queued_late"))
+    metrics.update(summarize_ms(written, "written_late"))
+    return metrics
+
+
+def bench_batch(args):
+    steps = (("go forward slowly", "rotate right", "climb"),
+             ("go back", "rotate left fast", "descend a bit"))
+    metrics = {"utterances": args.batches, "steps_per_utterance": len(steps[0])}
+    for protocol in ("text", "binary"):
+        batched, sequential = [], []
+        with emulated_controller(args.baud, protocol) as (controller, _):
+            controller.process_text_command("take off")
+            for i in range(args.batches):
+                phrases = steps[i % len(steps)]
+                trace = CommandTrace()
+                controller.process_text_command(" then ".join(phrases), trace)
+                if not wait_for_outcomes([trace], timeout=2.0):
+                    raise RuntimeError("A batch was not acknowledged")
+                if trace.outcome == 'ok':
+                    batched.append((trace.stamps[ACKNOWLEDGED] - trace.stamps[ENQUEUED]) / 1e9)
+
+                traces = [CommandTrace() for _ in phrases]
+                for phrase, trace in zip(phrases, traces):
+                    controller.process_text_command(phrase, trace)
+                if not wait_for_outcomes(traces, timeout=2.0):
+                    raise RuntimeError("A chained command was not acknowledged")
+                acked = [t.stamps[ACKNOWLEDGED] for t in traces if t.outcome == 'ok']
+                if acked:
+                    sequential.append((max(acked) - traces[0].stamps[ENQUEUED]) / 1e9)
+        metrics.update(summarize_ms(batched, f"{protocol}_batch_to_last_ack"))
+        metrics.update(summarize_ms(sequential, f"{protocol}_sequential_to_last_ack"))
+    return metrics
+
+
+BENCHMARKS = {
+    "parse": bench_parse,
+    "fuzzy": bench_fuzzy,
+    "queue": bench_queue,
+    "sustained": bench_sustained,
+    "api": bench_api,
+    "gui": bench_gui,
+    "vocabulary": bench_vocabulary,
+    "startup": bench_startup,
+    "outage": bench_outage,
+    "fleet": bench_fleet,
+    "mission": bench_mission,
+    "batch": bench_batch,
+}
+
+
+# Baseline comparison -----------------------------------------------------------
+
+def metric_direction(name):
+    """+1 if higher is better, -1 if lower is better, 0 if not compared"""
+    if name.endswith("_per_s"):
+        return 1
+    if name.endswith(("_ms", "_us")):
+        return -1
+    return 0
+
+
+def compare(current, baseline, tolerance):
+    """
+    Compare two result documents
+
+    Returns:
+        list: (benchmark, metric, baseline, current, relative_change, regressed)
+        for every metric present in both, relative_change > 0 meaning better
+    """
+    rows = []
+    for bench, result in current["benchmarks"].items():
+        old = baseline.get("benchmarks", {}).get(bench)
+        if not old or "metrics" not in old or "metrics" not in result:
+            continue
+        for name, value in result["metrics"].items():
+            direction = metric_direction(name)
+            previous = old["metrics"].get(name)
+            if not direction or not previous:
+                continue
+            change = (value - previous) / previous * direction
+            floor = next((v for suffix, v in NOISE_FLOOR.items() if name.endswith(suffix)), 0)
+            regressed = change < -tolerance and abs(value - previous) >= floor
+            rows.append((bench, name, previous, value, change, regressed))
+    return rows
+
+
+def run_suite(args):
+    results = {}
+    for name in args.only or BENCHMARKS:
+        print(f"Running {name}...", flush=True)
+        start = time.perf_counter()
+        try:
+            metrics = BENCHMARKS[name](args)
+        except Exception as e:
+            results[name] = {"error": f"{type(e).__name__}: {e}"}
+            continue
+        if "skipped" in metrics:
+            results[name] = metrics
+        else:
+            results[name] = {"metrics": metrics, "wall_s": time.perf_counter() - start}
+    return {
+        "schema": SCHEMA_VERSION,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {key: getattr(args, key) for key in
+                     ("baud", "corpus", "repeat", "commands", "callers", "api_calls", "gui_updates",
+                      "startup_runs")},
+        "benchmarks": results,
+    }
+
+
+def print_results(document):
+    for bench, result in document["benchmarks"].items():
+        if "metrics" not in result:
+            print(f"{bench:<10} {result.get('skipped') or result.get('error')}")
+            continue
+        for name, value in result["metrics"].items():
+            shown = f"{value:.3f}" if isinstance(value, float) else value
+            print(f"{bench:<10} {name:<24} {shown}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="Benchmarks to run")
+    parser.add_argument("--output", help="Write results JSON here")
+    parser.add_argument("--baseline", help="Compare with a previous results JSON")
+    parser.add_argument("--save-baseline", help="Also write results JSON here as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed relative regression before failing (default 0.25)")
+    parser.add_argument("--baud", type=int, default=115200, help="Emulated line rate")
+    parser.add_argument("--corpus", type=int, default=5000, help="Utterances for the parse benchmark")
+    parser.add_argument("--repeat", type=int, default=5, help="Cached parse repetitions")
+    parser.add_argument("--fuzzy-corpus", type=int, default=2000,
+                        help="Misheard transcripts for the fuzzy benchmark")
+    parser.add_argument("--commands", type=int, default=200, help="Commands for queue/sustained")
+    parser.add_argument("--callers", type=int, default=8, help="Concurrent DroneAPI callers")
+    parser.add_argument("--api-calls", type=int, default=4000, help="Total DroneAPI calls")
+    parser.add_argument("--gui-updates", type=int, default=2000, help="GUI updates to time")
+    parser.add_argument("--startup-runs", type=int, default=3,
+                        help="Repetitions of the startup measurements (best is kept)")
+    parser.add_argument("--vocab-phrases", type=int, default=300,
+                        help="Extra phrases in the vocabulary benchmark's file")
+    parser.add_argument("--outages", type=int, default=3, help="Cable pulls for the outage benchmark")
+    parser.add_argument("--outage-s", type=float, default=0.3, help="Seconds the cable stays out")
+    parser.add_argument("--outage-commands", type=int, default=5,
+                        help="Commands sent during each outage")
+    parser.add_argument("--drones", type=int, default=24, help="Emulated bridges in the fleet benchmark")
+    parser.add_argument("--broadcasts", type=int, default=100,
+                        help="Commands sent to the whole fleet")
+    parser.add_argument("--mission-steps", type=int, default=100, help="Movement steps in the mission")
+    parser.add_argument("--batches", type=int, default=100,
+                        help="Chained utterances in the batch benchmark, per mode")
+    parser.add_argument("--mission-step-ms", type=float, default=20.0,
+                        help="Length of each mission step")
+    args = parser.parse_args()
+
+    document = run_suite(args)
+    print_results(document)
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(document, f, indent=2)
+            print(f"Results written to {path}")
+
+    failed = any("error" in r for r in document["benchmarks"].values())
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        rows = compare(document, baseline, args.tolerance)
+        print(f"\nCompared with {args.baseline} (tolerance {args.tolerance:.0%}):")
+        for bench, name, previous, value, change, regressed in rows:
+            flag = "REGRESSION" if regressed else ""
+            print(f"{bench:<10} {name:<24} {previous:>12.3f} -> {value:>12.3f} {change:+7.1%} {flag}")
+        failed = failed or any(row[-1] for row in rows)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+Concurrency stress test for DroneAPI
+
+Many threads call the API at once against the pty device emulator: status
+reads, natural-language commands, latency queries and, on one extra thread,
+disconnect/reconnect cycles. The run fails (exit status 1) if any call raises,
+if a caller ever sees a torn or out-of-order state snapshot, or if a status
+read takes longer than --max-status-ms.
+
+Checked invariants:
+- every DroneState version a caller sees is >= the previous one it saw from
+  the same controller
+- armed == flying in every snapshot (TAKEOFF sets both, LAND clears both, so
+  a snapshot that disagrees was read half-updated)
+
+Usage:
+    python benchmarks/stress_api.py
+    python benchmarks/stress_api.py --callers 64 --duration 10 --reconnects 3
+"""
+
+import argparse
+import contextlib
+import io
+import logging
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+logging.basicConfig(level=logging.WARNING)
+
+from device_emulator import DeviceEmulator  # noqa: E402
+from drone_app import DroneAPI  # noqa: E402
+from latency_trace import percentile  # noqa: E402
+
+PHRASES = ("take off", "land", "go up", "move forward", "turn left", "stop", "descend")
+
+
+class CallerStats:
+    def __init__(self):
+        self.calls = {}
+        self.status_latency = []
+        self.errors = []
+        self.violations = []
+
+
+def caller(api, index, stop, stats, rng):
+    last_seen = {}
+    while not stop.is_set():
+        roll = rng.random()
+        start = time.perf_counter()
+        try:
+            if roll < 0.6:
+                name = 'get_status'
+                ctrl = api.controller
+                state = ctrl.state if ctrl is not None else None
+                status = api.get_status()
+                stats.status_latency.append(time.perf_counter() - start)
+                if state is not None:
+                    key = id(ctrl)
+                    if state.version < last_seen.get(key, -1):
+                        stats.violations.append(
+                            f"caller {index}: version went back {last_seen[key]} -> {state.version}")
+                    last_seen[key] = state.version
+                    if state.armed != state.flying:
+                        stats.violations.append(f"caller {index}: torn snapshot {state}")
+                if status['armed'] != status['flying']:
+                    stats.violations.append(f"caller {index}: torn status {status}")
+            elif roll < 0.9:
+                name = 'send_command'
+                api.send_command(rng.choice(PHRASES))
+            else:
+                name = 'get_latency_stats'
+                api.get_latency_stats()
+        except Exception as e:
+            stats.errors.append(f"caller {index}: {type(e).__name__}: {e}")
+            name = 'error'
+        stats.calls[name] = stats.calls.get(name, 0) + 1
+
+
+def reconnector(api, port, cycles, stop, stats, interval):
+    for _ in range(cycles):
+        if stop.wait(interval):
+            return
+        try:
+            api.disconnect()
+            # Give the emulator time to see the port close, so it resets and
+            # prints its banner like a real board
+            time.sleep(0.1)
+            if not api.connect(port)["connected"]:
+                stats.errors.append("reconnect failed")
+        except Exception as e:
+            stats.errors.append(f"reconnect: {type(e).__name__}: {e}")
+        stats.calls['reconnect'] = stats.calls.get('reconnect', 0) + 1
+
+
+def run(args):
+    with DeviceEmulator(baud_rate=args.baud) as emulator, \
+            contextlib.redirect_stdout(io.StringIO()):
+        api = DroneAPI()
+        if not api.connect(emulator.port)["connected"]:
+            raise RuntimeError(f"Could not connect to the emulator on {emulator.port}")
+
+        stop = threading.Event()
+        per_caller = [CallerStats() for _ in range(args.callers)]
+        threads = [threading.Thread(target=caller,
+                                    args=(api, i, stop, per_caller[i], random.Random(args.seed + i)))
+                   for i in range(args.callers)]
+        reconnect_stats = CallerStats()
+        if args.reconnects:
+            threads.append(threading.Thread(
+                target=reconnector,
+                args=(api, emulator.port, args.reconnects, stop, reconnect_stats,
+                      args.duration / (args.reconnects + 1))))
+
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        time.sleep(args.duration)
+        stop.set()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+        api.disconnect()
+
+    calls = {}
+    latency, errors, violations = [], [], []
+    for stats in per_caller + [reconnect_stats]:
+        for name, count in stats.calls.items():
+            calls[name] = calls.get(name, 0) + count
+        latency.extend(stats.status_latency)
+        errors.extend(stats.errors)
+        violations.extend(stats.violations)
+    return {
+        'elapsed': elapsed,
+        'calls': calls,
+        'status_p50_ms': percentile(latency, 0.50) * 1000 if latency else 0.0,
+        'status_p99_ms': percentile(latency, 0.99) * 1000 if latency else 0.0,
+        'status_max_ms': max(latency) * 1000 if latency else 0.0,
+        'errors': errors,
+        'violations': violations,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--callers", type=int, default=32, help="Concurrent API callers")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds to run")
+    parser.add_argument("--reconnects", type=int, default=1,
+                        help="Disconnect/connect cycles during the run")
+    parser.add_argument("--max-status-ms", type=float, default=250.0,
+                        help="Slowest acceptable get_status call")
+    parser.add_argument("--baud", type=int, default=115200, help="Emulated line rate")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed for the call mix")
+    args = parser.parse_args()
+
+    result = run(args)
+    total = sum(result['calls'].values())
+    print(f"{total} calls from {args.callers} callers in {result['elapsed']:.1f} s "
+          f"({total / result['elapsed']:.0f}/s)")
+    for name, count in sorted(result['calls'].items()):
+        print(f"  {name:<18} {count}")
+    print(f"get_status p50 {result['status_p50_ms']:.3f} ms, p99 {result['status_p99_ms']:.3f} ms, "
+          f"max {result['status_max_ms']:.3f} ms")
+
+    failed = False
+    for message in result['errors'][:20]:
+        print("ERROR", message)
+        failed = True
+    for message in result['violations'][:20]:
+        print("VIOLATION", message)
+        failed = True
+    if result['status_max_ms'] > args.max_status_ms:
+        print(f"FAIL get_status took {result['status_max_ms']:.1f} ms "
+              f"(limit {args.max_status_ms:.0f} ms)")
+        failed = True
+    print("FAIL" if failed else "PASS")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""
+Priority command scheduler for the P8 PRO Drone Controller
+
+Replaces the plain FIFO command queue. Commands are held in priority classes
+(LAND before STOP before everything else) and pending work is coalesced so a
+backlog never delays a safety command and the device never receives moves
+that a later command would undo anyway:
+
+- LAND drops everything still pending
+- STOP drops every pending normal command (the firmware's STOP resets all
+  sticks, so the final state is the same)
+- consecutive UP/DOWN merge into one throttle delta
+- a newer direction on the roll/pitch/yaw axis replaces an older one
+
+Coalescing never crosses TAKEOFF, CUSTOM or a batch (several commands from
+one utterance, written together), which reset or overwrite the sticks
+themselves.
+"""
+
+import queue
+import threading
+import time
+from collections import deque
+
+PRIORITY_CRITICAL = 0
+PRIORITY_HIGH = 1
+PRIORITY_NORMAL = 2
+
+COMMAND_PRIORITY = {
+    'LAND': PRIORITY_CRITICAL,
+    'STOP': PRIORITY_HIGH,
+}
+
+THROTTLE_DIRECTION = {'UP': 1, 'DOWN': -1}
+
+# Command word of a batch entry; the commands themselves are in entry.batch
+BATCH = 'BATCH'
+
+COMMAND_AXIS = {
+    'LEFT': 'roll', 'RIGHT': 'roll',
+    'FORWARD': 'pitch', 'BACKWARD': 'pitch',
+    'ROTATE_LEFT': 'yaw', 'ROTATE_RIGHT': 'yaw',
+}
+
+
+class ScheduledCommand:
+    """A queued command; throttle_steps > 1 in size means merged UP/DOWN"""
+
+    __slots__ = ('command', 'priority', 'enqueue_time', 'throttle_steps', 'merged', 'trace', 'batch')
+
+    def __init__(self, command, priority, trace=None, batch=None):
+        self.command = command
+        self.priority = priority
+        self.trace = trace
+        self.batch = batch
+        self.enqueue_time = time.monotonic()
+        self.throttle_steps = THROTTLE_DIRECTION.get(command, 0)
+        self.merged = 0
+
+    @property
+    def axis(self):
+        if self.throttle_steps:
+            return 'throttle'
+        return COMMAND_AXIS.get(self.command)
+
+    def __repr__(self):
+        if self.throttle_steps and abs(self.throttle_steps) != 1:
+            return f"ScheduledCommand(throttle {self.throttle_steps:+d})"
+        if self.batch is not None:
+            return f"ScheduledCommand(batch of {len(self.batch)})"
+        return f"ScheduledCommand({self.command})"
+
+
+class CommandScheduler:
+    """Thread-safe priority queue with coalescing, used as command_queue"""
+
+    def __init__(self, on_drop=None):
+        """
+        Args:
+            on_drop (callable): Called with each ScheduledCommand discarded by
+                coalescing (under the scheduler lock - keep it cheap)
+        """
+        self.on_drop = on_drop
+        self._queues = (deque(), deque(), deque())
+        lock = threading.RLock()
+        self._cond = threading.Condition(lock)
+        # Separate waiters, so put()'s notify() always reaches a consumer
+        self._emptied = threading.Condition(lock)
+        self._unfinished = 0
+
+        self.enqueued = 0
+        self.dispatched = 0
+        self.dropped = 0
+        self.merged = 0
+
+    # queue.Queue-compatible interface -------------------------------------
+
+    def put(self, command, trace=None):
+        """
+        Schedule a command word (e.g. 'UP', 'LAND', 'CUSTOM:...')
+
+        Args:
+            command (str): Command word
+            trace (CommandTrace): Latency trace travelling with the command
+        """
+        command = command.strip().upper()
+        self._schedule(ScheduledCommand(command, COMMAND_PRIORITY.get(command, PRIORITY_NORMAL), trace))
+
+    def put_batch(self, intents, trace=None):
+        """
+        Schedule several commands to be written to the device together
+
+        The batch is one entry with the priority of its most urgent command:
+        one ending in LAND still clears everything pending. It is never
+        coalesced with other entries.
+
+        Args:
+            intents (sequence): Objects with a .command word (e.g.
+                intent_matcher.Intent), in the order they are to run
+            trace (CommandTrace): Latency trace travelling with the batch
+        """
+        intents = tuple(intents)
+        priority = min(COMMAND_PRIORITY.get(i.command, PRIORITY_NORMAL) for i in intents)
+        self._schedule(ScheduledCommand(BATCH, priority, trace, batch=intents))
+
+    def _schedule(self, entry):
+        priority = entry.priority
+        with self._cond:
+            self.enqueued += 1
+            if priority == PRIORITY_CRITICAL:
+                self._drop(self._queues[PRIORITY_HIGH])
+                self._drop(self._queues[PRIORITY_NORMAL])
+                if not self._queues[PRIORITY_CRITICAL]:
+                    self._append(entry)
+                else:
+                    self.merged += 1
+                    self._discard(entry)
+            elif priority == PRIORITY_HIGH:
+                self._drop(self._queues[PRIORITY_NORMAL])
+                if not self._queues[PRIORITY_HIGH]:
+                    self._append(entry)
+                else:
+                    self.merged += 1
+                    self._discard(entry)
+            else:
+                self._put_normal(entry)
+            self._cond.notify()
+            # UP then DOWN cancel out and can leave nothing pending
+            self._notify_if_empty()
+
+    def get(self, block=True, timeout=None):
+        """
+        Take the next command, highest priority first
+
+        Raises:
+            queue.Empty: If nothing arrives before the timeout
+        """
+        with self._cond:
+            if not self._cond.wait_for(self._has_items, timeout if block else 0):
+                raise queue.Empty
+            for pending in self._queues:
+                if pending:
+                    self.dispatched += 1
+                    entry = pending.popleft()
+                    self._notify_if_empty()
+                    return entry
+
+    def task_done(self):
+        with self._cond:
+            self._unfinished = max(0, self._unfinished - 1)
+            if self._unfinished == 0:
+                self._cond.notify_all()
+
+    def join(self):
+        with self._cond:
+            self._cond.wait_for(lambda: self._unfinished == 0)
+
+    def qsize(self):
+        with self._cond:
+            return sum(len(q) for q in self._queues)
+
+    def empty(self):
+        return self.qsize() == 0
+
+    def wait_empty(self, timeout=None):
+        """
+        Block until nothing is pending: every entry taken by get() or dropped
+
+        Unlike join() this does not wait for task_done(), so a producer can
+        hand over the next command while the previous one is being sent.
+
+        Returns:
+            bool: False if entries were still pending at the timeout
+        """
+        with self._cond:
+            return self._emptied.wait_for(lambda: not self._has_items(), timeout)
+
+    # Scheduler specifics ---------------------------------------------------
+
+    def has_critical(self):
+        """True while a LAND is waiting (used to cut pacing short)"""
+        return bool(self._queues[PRIORITY_CRITICAL])
+
+    def clear(self):
+        """Drop every pending command"""
+        with self._cond:
+            for pending in self._queues:
+                self._drop(pending)
+            self._notify_if_empty()
+
+    def get_stats(self):
+        with self._cond:
+            return {
+                'depth': sum(len(q) for q in self._queues),
+                'depth_by_priority': [len(q) for q in self._queues],
+                'enqueued': self.enqueued,
+                'dispatched': self.dispatched,
+                'dropped': self.dropped,
+                'merged': self.merged,
+            }
+
+    def _has_items(self):
+        return any(self._queues)
+
+    def _notify_if_empty(self):
+        if not self._has_items():
+            self._emptied.notify_all()
+
+    def _append(self, entry):
+        self._queues[entry.priority].append(entry)
+        self._unfinished += 1
+
+    def _discard(self, entry):
+        if self.on_drop is not None:
+            self.on_drop(entry)
+
+    def _drop(self, pending):
+        count = len(pending)
+        if count:
+            for entry in pending:
+                self._discard(entry)
+            pending.clear()
+            self.dropped += count
+            self._unfinished = max(0, self._unfinished - count)
+
+    def _put_normal(self, entry):
+        pending = self._queues[PRIORITY_NORMAL]
+        axis = entry.axis
+        if axis is not None:
+            # Look back to the most recent barrier (TAKEOFF/CUSTOM) only
+            for existing in reversed(pending):
+                existing_axis = existing.axis
+                if existing_axis is None:
+                    break
+                if existing_axis != axis:
+                    continue
+                self.merged += 1
+                if axis == 'throttle':
+                    existing.throttle_steps += entry.throttle_steps
+                    existing.merged += 1
+                    self._discard(entry)
+                    if existing.throttle_steps == 0:
+                        # UP then DOWN cancel out
+                        pending.remove(existing)
+                        self._unfinished -= 1
+                        self._discard(existing)
+                    elif existing.throttle_steps > 0:
+                        existing.command = 'UP'
+                    else:
+                        existing.command = 'DOWN'
+                    return
+                # Absolute stick position: the newer direction wins
+                pending.remove(existing)
+                self._unfinished -= 1
+                self._discard(existing)
+                entry.merged = existing.merged + 1
+                break
+        self._append(entry)
@@ -0,0 +1,707 @@
+"""
+Headless HTTP/WebSocket control server for the P8 PRO Drone Controller
+
+drone_app.py serves one desktop window through pywebview's js_api. This
+module serves the same DroneAPI to any number of ground-station clients over
+the network, using only asyncio and the standard library:
+
+- HTTP for one-shot calls (JSON in, JSON out):
+
+      GET  /status          current state (connected, armed, flying, ...)
+      GET  /ports           serial ports
+      GET  /latency         per-stage command latency
+      GET  /link            serial link statistics
+      POST /connect         {"port": "COM3"}
+      POST /disconnect
+      POST /command         {"command": "take off"} or {"commands": [...]}
+      POST /voice/start
+      POST /voice/stop
+
+- WebSocket on /ws: the server sends the full state on connect, then state
+  diffs and batches of controller log lines as they happen (merged to at most
+  one push per display frame, like the desktop app). Clients send requests
+  named after the DroneAPI methods and get a reply with the same id:
+
+      {"id": 1, "op": "send_command", "command": "go up"}
+      {"id": 2, "op": "send_commands", "commands": ["take off", "go forward"]}
+      {"id": 3, "op": "connect", "port": "COM3"}
+      -> {"type": "result", "id": 1, "result": {"sent": true}}
+
+Every request carries the shared token given with --token, as an
+"Authorization: Bearer <token>" header; a WebSocket handshake may pass it as
+/ws?token=<token> instead, since browsers cannot add headers to one. POST
+bodies must be sent as application/json. No cross-origin (CORS) headers are
+sent and a request whose Origin is not the server itself is refused, so a web
+page the operator happens to have open cannot drive the drone.
+
+The event loop never waits on the serial port or the controller. Status
+reads are lock-free snapshots served on the loop. Connects, voice control and
+statistics run on a small worker pool. Commands from every client are handed
+to the controller's scheduler together, one worker job at a time, so a burst
+from hundreds of clients costs a few thread hops rather than one each. Each
+push is encoded once for all clients; a client that falls too far behind
+skips to a fresh full state instead of holding memory for it.
+
+Usage:
+    python control_server.py --token SECRET --connect COM3
+    python control_server.py --token SECRET --emulate --host 0.0.0.0 --port 8765
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import struct
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import urlsplit, parse_qs
+
+from drone_app import DroneAPI
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+# Largest request body or WebSocket message accepted from a client
+MAX_MESSAGE = 64 * 1024
+# Most commands accepted in one send_commands request
+MAX_BATCH = 100
+# Pushes queued for a client before it is skipped to a fresh full state
+MAX_PENDING_PUSHES = 256
+
+WEBSOCKET_GUID = b'258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+OP_CONTINUATION = 0x0
+OP_TEXT = 0x1
+OP_BINARY = 0x2
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+
+# DroneAPI methods that may block (serial port, threads), run on the worker
+# pool, with the JSON arguments they take
+BLOCKING_OPERATIONS = {
+    'get_serial_ports': (),
+    'connect': ('port',),
+    'disconnect': (),
+    'start_voice': (),
+    'stop_voice': (),
+    'get_latency_stats': (),
+    'get_link_stats': (),
+}
+
+ROUTES = {
+    ('GET', '/status'): 'get_status',
+    ('GET', '/ports'): 'get_serial_ports',
+    ('GET', '/latency'): 'get_latency_stats',
+    ('GET', '/link'): 'get_link_stats',
+    ('POST', '/connect'): 'connect',
+    ('POST', '/disconnect'): 'disconnect',
+    ('POST', '/command'): 'send_command',
+    ('POST', '/voice/start'): 'start_voice',
+    ('POST', '/voice/stop'): 'stop_voice',
+}
+
+logger = logging.getLogger(__name__)
+
+
+class RequestError(Exception):
+    """A client request that cannot be served; `status` is the HTTP status"""
+
+    def __init__(self, message, status=HTTPStatus.BAD_REQUEST):
+        super().__init__(message)
+        self.status = status
+
+
+class WebSocketClosed(Exception):
+    """The peer closed the WebSocket or broke the protocol (`code` to send back)"""
+
+    def __init__(self, code=1000):
+        super().__init__(code)
+        self.code = code
+
+
+# WebSocket framing (RFC 6455) ---------------------------------------------------
+
+def _mask(payload, key):
+    # XOR as one big integer: far faster than a per-byte loop in Python
+    n = len(payload)
+    if not n:
+        return payload
+    stream = (key * (n // 4 + 1))[:n]
+    return (int.from_bytes(payload, 'big') ^ int.from_bytes(stream, 'big')).to_bytes(n, 'big')
+
+
+def encode_frame(opcode, payload, mask=None):
+    """
+    One final WebSocket frame
+
+    Args:
+        opcode (int): OP_TEXT, OP_CLOSE, ...
+        payload (bytes): Frame data
+        mask (bytes): 4-byte masking key; clients must mask, servers must not
+    """
+    n = len(payload)
+    mask_bit = 0x80 if mask else 0
+    if n < 126:
+        header = struct.pack('!BB', 0x80 | opcode, mask_bit | n)
+    elif n < 1 << 16:
+        header = struct.pack('!BBH', 0x80 | opcode, mask_bit | 126, n)
+    else:
+        header = struct.pack('!BBQ', 0x80 | opcode, mask_bit | 127, n)
+    if mask:
+        return header + mask + _mask(payload, mask)
+    return header + payload
+
+
+async def read_frame(reader, require_mask=True):
+    """
+    Read one WebSocket frame
+
+    Returns:
+        tuple: (fin, opcode, payload)
+
+    Raises:
+        WebSocketClosed: The frame is too large or masked the wrong way
+        asyncio.IncompleteReadError: The connection closed
+    """
+    first, second = await reader.readexactly(2)
+    length = second & 0x7F
+    if length == 126:
+        length, = struct.unpack('!H', await reader.readexactly(2))
+    elif length == 127:
+        length, = struct.unpack('!Q', await reader.readexactly(8))
+    if length > MAX_MESSAGE:
+        raise WebSocketClosed(1009)
+    masked = bool(second & 0x80)
+    if masked != require_mask:
+        raise WebSocketClosed(1002)
+    key = await reader.readexactly(4) if masked else None
+    payload = await reader.readexactly(length)
+    if key:
+        payload = _mask(payload, key)
+    return bool(first & 0x80), first & 0x0F, payload
+
+
+async def read_message(reader, writer, require_mask=True):
+    """
+    Read one complete data message, answering pings on the way
+
+    Returns:
+        tuple: (opcode, payload) of a text or binary message
+
+    Raises:
+        WebSocketClosed: On a close frame or a protocol error
+    """
+    opcode, parts, size = None, [], 0
+    while True:
+        fin, op, payload = await read_frame(reader, require_mask)
+        if op == OP_CLOSE:
+            code = struct.unpack('!H', payload[:2])[0] if len(payload) >= 2 else 1000
+            raise WebSocketClosed(code)
+        if op == OP_PING:
+            writer.write(encode_frame(OP_PONG, payload))
+            continue
+        if op == OP_PONG:
+            continue
+        if op == OP_CONTINUATION:
+            if opcode is None:
+                raise WebSocketClosed(1002)
+        elif op in (OP_TEXT, OP_BINARY) and opcode is None:
+            opcode = op
+        else:
+            raise WebSocketClosed(1002)
+        size += len(payload)
+        if size > MAX_MESSAGE:
+            raise WebSocketClosed(1009)
+        parts.append(payload)
+        if fin:
+            return opcode, b''.join(parts)
+
+
+def accept_key(key):
+    """Sec-WebSocket-Accept for a client's Sec-WebSocket-Key"""
+    return base64.b64encode(hashlib.sha1(key.encode('ascii') + WEBSOCKET_GUID).digest()).decode('ascii')
+
+
+def _json_frame(message):
+    return encode_frame(OP_TEXT, json.dumps(message, default=str).encode('utf-8'))
+
+
+# Server -------------------------------------------------------------------------
+
+class CommandBatcher:
+    """
+    Hands commands from every client to the controller in shared worker jobs
+
+    Only one job runs at a time; commands arriving meanwhile wait and go in
+    the next one, so batches grow with load and the order in which the loop
+    received commands is the order the scheduler gets them.
+    """
+
+    def __init__(self, api, loop, executor):
+        self.api = api
+        self.loop = loop
+        self.executor = executor
+        self._pending = []
+        self._running = False
+        self.jobs = 0
+        self.commands = 0
+
+    def submit(self, commands):
+        """
+        Queue commands for the controller (call on the event loop)
+
+        Returns:
+            asyncio.Future: Resolves to one DroneAPI.send_command result per command
+        """
+        future = self.loop.create_future()
+        self._pending.append((commands, future))
+        if not self._running:
+            self._running = True
+            self.loop.call_soon(self._start_job)
+        return future
+
+    def _start_job(self):
+        pending, self._pending = self._pending, []
+        if not pending:
+            self._running = False
+            return
+        job = self.loop.run_in_executor(self.executor, self._send_all, [c for c, _ in pending])
+        job.add_done_callback(lambda job: self._finish_job(pending, job))
+
+    def _send_all(self, batches):
+        # Worker thread
+        results = []
+        for commands in batches:
+            replies = []
+            for command in commands:
+                try:
+                    replies.append(self.api.send_command(command))
+                except Exception as e:
+                    replies.append({"sent": False, "reason": str(e)})
+            results.append(replies)
+        return results
+
+    def _finish_job(self, pending, job):
+        self.jobs += 1
+        error = job.exception()
+        for i, (commands, future) in enumerate(pending):
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(job.result()[i])
+            self.commands += len(commands)
+        self._start_job()
+
+
+class _Client:
+    """A WebSocket client: its queued pushes and replies, drained by one writer task"""
+
+    def __init__(self, writer, address):
+        self.writer = writer
+        self.address = address
+        # (state version or None for log lines, encoded frame)
+        self.pushes = deque()
+        self.replies = deque()
+        self.wake = asyncio.Event()
+        # Version of the last full state sent; older diffs are skipped
+        self.version = -1
+        self.resync = False
+        self.closed = False
+        self.dropped = 0
+
+
+class ControlServer:
+    """
+    Serves a DroneAPI over HTTP and WebSocket
+
+    Run it on the current thread with serve_forever(), or in the background
+    with start() and stop() (tests, benchmarks).
+    """
+
+    def __init__(self, api=None, host=DEFAULT_HOST, port=DEFAULT_PORT, workers=4, token=None):
+        """
+        Args:
+            api (DroneAPI): API to serve (default: a new one)
+            host (str): Address to listen on
+            port (int): TCP port; 0 picks a free one (see `port` after start)
+            workers (int): Threads for blocking API calls and command jobs
+            token (str): Shared secret every request must carry (required)
+        """
+        if not token:
+            raise ValueError("The control server needs a token")
+        self.token = token
+        self.api = api or DroneAPI()
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.loop = None
+        self.executor = None
+        self.commands = None
+        self._server = None
+        self._clients = set()
+        self._thread = None
+        self._ready = threading.Event()
+        self._stopped = None
+        self.requests = 0
+        self.pushes = 0
+
+    # Lifecycle
+
+    async def start_async(self):
+        """Listen and start pushing updates (call on the loop that will serve)"""
+        self.loop = asyncio.get_running_loop()
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='control-server')
+        self.commands = CommandBatcher(self.api, self.loop, self.executor)
+        self._stopped = asyncio.Event()
+        self._server = await asyncio.start_server(self._handle, self.host, self.port,
+                                                  limit=MAX_MESSAGE, backlog=1024)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self.api.attach_sink(self._push_threadsafe)
+        logger.info(f"Control server listening on http://{self.host}:{self.port}")
+
+    async def close_async(self):
+        self.api.detach()
+        self._server.close()
+        for client in list(self._clients):
+            client.closed = True
+            client.wake.set()
+            client.writer.close()
+        await self._server.wait_closed()
+        self.executor.shutdown(wait=False)
+
+    async def _serve(self):
+        await self.start_async()
+        self._ready.set()
+        try:
+            await self._stopped.wait()
+        finally:
+            await self.close_async()
+
+    def serve_forever(self):
+        """Serve on this thread until stop() or Ctrl+C"""
+        try:
+            asyncio.run(self._serve())
+        except KeyboardInterrupt:
+            pass
+
+    def start(self, timeout=5.0):
+        """Serve on a background thread; returns the port once listening"""
+        self._thread = threading.Thread(target=lambda: asyncio.run(self._serve()),
+                                        name='control-server', daemon=True)
+        self._thread.start()
+        if not self._ready.wait(timeout):
+            raise RuntimeError("Control server did not start")
+        return self.port
+
+    def stop(self):
+        if self.loop is not None and self._stopped is not None:
+            self.loop.call_soon_threadsafe(self._stopped.set)
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def get_stats(self):
+        return {"clients": len(self._clients), "requests": self.requests, "pushes": self.pushes,
+                "command_jobs": self.commands.jobs if self.commands else 0,
+                "commands": self.commands.commands if self.commands else 0}
+
+    # API calls
+
+    async def call(self, op, args):
+        """
+        Run one DroneAPI operation for a client
+
+        Raises:
+            RequestError: Unknown operation or bad arguments
+        """
+        self.requests += 1
+        if op == 'get_status':
+            # Lock-free snapshot: cheap enough for the loop itself
+            return self.api.get_state()
+        if op == 'get_server_stats':
+            return self.get_stats()
+        if op == 'send_command':
+            command = args.get('command')
+            if not isinstance(command, str) or not command.strip():
+                raise RequestError("'command' must be a non-empty string")
+            return (await self.commands.submit([command]))[0]
+        if op == 'send_commands':
+            commands = args.get('commands')
+            if (not isinstance(commands, list) or not commands
+                    or not all(isinstance(c, str) for c in commands)):
+                raise RequestError("'commands' must be a non-empty list of strings")
+            if len(commands) > MAX_BATCH:
+                raise RequestError(f"At most {MAX_BATCH} commands per request")
+            return {"results": await self.commands.submit(commands)}
+        if op not in BLOCKING_OPERATIONS:
+            raise RequestError(f"Unknown operation '{op}'", HTTPStatus.NOT_FOUND)
+        params = []
+        for name in BLOCKING_OPERATIONS[op]:
+            if name not in args:
+                raise RequestError(f"Missing '{name}'")
+            params.append(args[name])
+        return await self.loop.run_in_executor(self.executor, getattr(self.api, op), *params)
+
+    # Pushes
+
+    def _push_threadsafe(self, update):
+        # UIPublisher thread
+        self.loop.call_soon_threadsafe(self._push, update)
+
+    def _push(self, update):
+        """Encode an update once and queue it for every WebSocket client"""
+        if not self._clients:
+            return
+        self.pushes += 1
+        state = update.get('state')
+        state_frame = _json_frame({"type": "state", "state": state}) if state else None
+        version = state.get('version', 0) if state else 0
+        log_frame = _json_frame({"type": "log", "lines": update['log']}) if update.get('log') else None
+        for client in self._clients:
+            if len(client.pushes) >= MAX_PENDING_PUSHES:
+                # Too slow to keep up: forget the backlog, send a full state next
+                client.dropped += len(client.pushes)
+                client.pushes.clear()
+                client.resync = True
+            if state_frame is not None and version > client.version:
+                client.pushes.append((version, state_frame))
+            if log_frame is not None:
+                client.pushes.append((None, log_frame))
+            client.wake.set()
+
+    def _full_state_frame(self, client):
+        state = self.api.get_state()
+        client.version = state['version']
+        return _json_frame({"type": "state", "state": state, "full": True})
+
+    async def _write_client(self, client):
+        """Drain a client's replies and pushes, one write per wake-up"""
+        writer = client.writer
+        while not client.closed:
+            await client.wake.wait()
+            client.wake.clear()
+            chunks = []
+            if client.resync:
+                client.resync = False
+                chunks.append(self._full_state_frame(client))
+            while client.replies:
+                chunks.append(client.replies.popleft())
+            while client.pushes:
+                version, frame = client.pushes.popleft()
+                # A diff computed before the full state was taken is stale
+                if version is None or version > client.version:
+                    chunks.append(frame)
+            if chunks and not client.closed:
+                writer.write(b''.join(chunks))
+                await writer.drain()
+
+    # Connections
+
+    async def _handle(self, reader, writer):
+        address = writer.get_extra_info('peername')
+        try:
+            while True:
+                request = await _read_request(reader)
+                if request is None:
+                    break
+                method, path, query, headers, body = request
+                self._authorize(method, path, query, headers)
+                if path == '/ws' and headers.get('upgrade', '').lower() == 'websocket':
+                    await self._websocket(reader, writer, headers, address)
+                    break
+                status, payload = await self._http(method, path, body)
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                writer.write(_http_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except RequestError as e:
+            writer.write(_http_response(e.status, {"error": str(e)}, False))
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            pass
+        except Exception:
+            logger.exception(f"Control server error with {address}")
+        finally:
+            writer.close()
+
+    def _authorize(self, method, path, query, headers):
+        """
+        Refuse a request from another origin, without the token, or (POST) not JSON
+
+        Raises:
+            RequestError: 403, 401 or 415
+        """
+        origin = headers.get('origin')
+        if origin is not None and urlsplit(origin).netloc.lower() != headers.get('host', '').lower():
+            raise RequestError(f"Cross-origin request from {origin} refused", HTTPStatus.FORBIDDEN)
+        scheme, _, token = headers.get('authorization', '').partition(' ')
+        if scheme.lower() != 'bearer' and path == '/ws':
+            token = parse_qs(query).get('token', [''])[0]
+        if not hmac.compare_digest(token.strip().encode('utf-8'), self.token.encode('utf-8')):
+            raise RequestError("Missing or wrong token", HTTPStatus.UNAUTHORIZED)
+        if method == 'POST':
+            content_type = headers.get('content-type', '').partition(';')[0].strip().lower()
+            if content_type != 'application/json':
+                raise RequestError("Send requests as application/json", HTTPStatus.UNSUPPORTED_MEDIA_TYPE)
+
+    async def _http(self, method, path, body):
+        op = ROUTES.get((method, path))
+        if op is None:
+            known = [m for m, p in ROUTES if p == path]
+            if known:
+                return HTTPStatus.METHOD_NOT_ALLOWED, {"error": f"Use {' or '.join(known)}"}
+            return HTTPStatus.NOT_FOUND, {"error": f"No route {path}"}
+        try:
+            args = json.loads(body) if body else {}
+        except ValueError:
+            return HTTPStatus.BAD_REQUEST, {"error": "Body is not JSON"}
+        if not isinstance(args, dict):
+            return HTTPStatus.BAD_REQUEST, {"error": "Body must be a JSON object"}
+        if op == 'send_command' and 'commands' in args:
+            op = 'send_commands'
+        try:
+            return HTTPStatus.OK, await self.call(op, args)
+        except RequestError as e:
+            return e.status, {"error": str(e)}
+
+    async def _websocket(self, reader, writer, headers, address):
+        key = headers.get('sec-websocket-key')
+        if not key or headers.get('sec-websocket-version') != '13':
+            raise RequestError("Expected a version 13 WebSocket handshake")
+        writer.write(("HTTP/1.1 101 Switching Protocols\r\n"
+                      "Upgrade: websocket\r\nConnection: Upgrade\r\n"
+                      f"Sec-WebSocket-Accept: {accept_key(key)}\r\n\r\n").encode('ascii'))
+        client = _Client(writer, address)
+        client.replies.append(self._full_state_frame(client))
+        self._clients.add(client)
+        client.wake.set()
+        pump = asyncio.ensure_future(self._write_client(client))
+        code = 1000
+        try:
+            while True:
+                opcode, payload = await read_message(reader, writer)
+                client.replies.append(_json_frame(await self._websocket_request(opcode, payload)))
+                client.wake.set()
+        except WebSocketClosed as e:
+            code = e.code
+        except (ConnectionError, asyncio.IncompleteReadError):
+            code = None
+        finally:
+            self._clients.discard(client)
+            client.closed = True
+            client.wake.set()
+            pump.cancel()
+        if code is not None:
+            try:
+                writer.write(encode_frame(OP_CLOSE, struct.pack('!H', code)))
+                await writer.drain()
+            except ConnectionError:
+                pass
+
+    async def _websocket_request(self, opcode, payload):
+        request_id = None
+        try:
+            if opcode != OP_TEXT:
+                raise RequestError("Requests are JSON text messages")
+            try:
+                request = json.loads(payload)
+            except ValueError:
+                raise RequestError("Message is not JSON")
+            if not isinstance(request, dict):
+                raise RequestError("Message must be a JSON object")
+            request_id = request.get('id')
+            result = await self.call(request.get('op'), request)
+            return {"type": "result", "id": request_id, "result": result}
+        except RequestError as e:
+            return {"type": "error", "id": request_id, "error": str(e)}
+
+
+# HTTP/1.1 ------------------------------------------------------------------------
+
+async def _read_request(reader):
+    """
+    Read one HTTP request
+
+    Returns:
+        tuple: (method, path, query, headers, body), or None if the client
+            closed the connection between requests
+    """
+    try:
+        head = await reader.readuntil(b'\r\n\r\n')
+    except asyncio.IncompleteReadError as e:
+        if not e.partial:
+            return None
+        raise
+    lines = head.decode('latin-1').split('\r\n')
+    try:
+        method, target, _ = lines[0].split(' ', 2)
+    except ValueError:
+        raise RequestError("Malformed request line")
+    headers = {}
+    for line in lines[1:]:
+        name, sep, value = line.partition(':')
+        if sep:
+            headers[name.strip().lower()] = value.strip()
+    if 'transfer-encoding' in headers:
+        raise RequestError("Chunked bodies are not supported", HTTPStatus.LENGTH_REQUIRED)
+    try:
+        length = int(headers.get('content-length', 0))
+    except ValueError:
+        raise RequestError("Bad Content-Length")
+    if length > MAX_MESSAGE:
+        raise RequestError("Body too large", HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+    body = await reader.readexactly(length) if length else b''
+    url = urlsplit(target)
+    return method.upper(), url.path.rstrip('/') or '/', url.query, headers, body
+
+
+def _http_response(status, payload, keep_alive):
+    body = b'' if payload is None else json.dumps(payload, default=str).encode('utf-8')
+    status = HTTPStatus(status)
+    head = (f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode('latin-1') + body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default=DEFAULT_HOST, help='Address to listen on')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='TCP port')
+    parser.add_argument('--connect', metavar='PORT', help='Connect to this serial port at startup')
+    parser.add_argument('--emulate', action='store_true',
+                        help='Connect to an emulated drone_controller.ino (device_emulator.py)')
+    parser.add_argument('--workers', type=int, default=4, help='Threads for blocking calls')
+    parser.add_argument('--token', required=True,
+                        help='Shared secret clients send as "Authorization: Bearer TOKEN"')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server = ControlServer(host=args.host, port=args.port, workers=args.workers, token=args.token)
+    emulator = None
+    try:
+        port = args.connect
+        if args.emulate:
+            from device_emulator import DeviceEmulator
+            emulator = DeviceEmulator()
+            port = emulator.start()
+        if port and not server.api.connect(port)["connected"]:
+            print(f"Could not connect to {port}")
+        print(f"🛰️  Control server on http://{args.host}:{server.port} (WebSocket: /ws)")
+        server.serve_forever()
+    finally:
+        server.api.disconnect()
+        if emulator is not None:
+            emulator.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,695 @@
+"""
+Arduino device emulator for the P8 PRO Drone Controller
+
+Runs the serial side of the Arduino sketches in Python behind a
+pseudo-terminal, so DroneNLPController, the Tk GUI and the web app can connect
+to it like a real port and tests can run without hardware:
+
+- 'controller' firmware: drone_controller.ino - processCommand, the
+  throttle/stick arithmetic, CUSTOM: parsing, its serial text output and the
+  50 Hz radio packet tick
+- 'bridge' firmware: arduino_bridge.ino - 0xFF-framed stick packets answered
+  with 0xAA/0xEE, plus its own 50 Hz tick
+
+Like an Uno, the sketch restarts and prints its banner each time the port is
+opened. Serial traffic in both directions is paced at the configured baud
+rate, every packet the sketch would have sent over the radio is recorded,
+and latency and faults (lost commands, corrupted bytes, radio failures, a
+missing radio, a pulled cable) can be injected.
+
+Pseudo-terminals need a POSIX system (Linux, macOS, WSL).
+
+Usage:
+    python device_emulator.py [--firmware bridge] [--baud 115200] [--latency-ms 5]
+    python device_emulator.py --launch gui
+"""
+
+import argparse
+import fcntl
+import os
+import pty
+import random
+import select
+import threading
+import time
+import tty
+from collections import deque, namedtuple
+
+from packet_codec import DRONE_CONTROL, CONTROL_PACKET, START_BYTE, ACK_OK, ACK_FAIL
+from serial_reader import ACTION_LINES
+from setpoint import NEUTRAL, apply_command
+
+FIRMWARES = ('controller', 'bridge')
+
+# Settings printed by drone_controller.ino's setup()
+DRONE_ADDRESS = (0x55, 0x55, 0x55, 0x55, 0x55)
+DRONE_CHANNEL = 22
+COMMAND_LIST = ("Commands: TAKEOFF, LAND, UP, DOWN, LEFT, RIGHT, FORWARD, BACKWARD, "
+                "ROTATE_LEFT, ROTATE_RIGHT, STOP")
+
+TRANSMISSION_INTERVAL = 0.020   # 50 Hz, both sketches
+COMMAND_BUFFER_SIZE = 64        # drone_controller.ino's line buffer, NUL included
+BITS_PER_BYTE = 10              # 8N1: start bit + 8 data bits + stop bit
+RX_PIECE = 8                    # bytes of a host write handed to the sketch at a time
+
+# Extra ports listed by the GUI and the web app (see drone_nlp_controller.list_serial_ports)
+EXTRA_PORTS_ENV = 'DRONE_EXTRA_PORTS'
+
+# Confirmation line printed for each accepted command word
+RESPONSE_LINES = {command: line for line, command in ACTION_LINES.items()}
+
+RadioPacket = namedtuple('RadioPacket', ['timestamp', 'payload', 'ok', 'reason'])
+RadioPacket.__doc__ = "One radio.write() call: raw 7-byte payload, result, 'tick' or 'frame'"
+
+ReceivedCommand = namedtuple('ReceivedCommand', ['timestamp', 'command', 'accepted'])
+ReceivedCommand.__doc__ = "A command line or frame the sketch processed"
+
+
+class FaultInjector:
+    """Latency and failure injection, reproducible with a seed"""
+
+    def __init__(self, latency=0.0, jitter=0.0, drop_rate=0.0, corrupt_rate=0.0,
+                 radio_fail_rate=0.0, radio_present=True, disconnect_after=None,
+                 replug_after=None, seed=None):
+        """
+        Args:
+            latency (float): Seconds added before the sketch sees incoming data
+            jitter (float): Extra uniformly distributed delay, 0..jitter seconds
+            drop_rate (float): Probability a command line or frame is lost
+            corrupt_rate (float): Probability each incoming byte is flipped
+            radio_fail_rate (float): Probability radio.write() fails
+            radio_present (bool): False emulates a missing nRF24L01 (the
+                controller sketch stops in setup(), the bridge NACKs everything)
+            disconnect_after (int): Pull the cable after this many commands
+            replug_after (float): Plug it back in after this many seconds (and
+                pull it again every disconnect_after commands); the port name
+                only survives this with DeviceEmulator(link=...)
+            seed (int): Random seed
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.drop_rate = drop_rate
+        self.corrupt_rate = corrupt_rate
+        self.radio_fail_rate = radio_fail_rate
+        self.radio_present = radio_present
+        self.disconnect_after = disconnect_after
+        self.replug_after = replug_after
+        self.random = random.Random(seed)
+
+    def delay(self):
+        if self.jitter:
+            return self.latency + self.random.uniform(0, self.jitter)
+        return self.latency
+
+    def drop(self):
+        return self.drop_rate > 0 and self.random.random() < self.drop_rate
+
+    def corrupt(self, data):
+        """Return data with some bytes flipped, and how many"""
+        if self.corrupt_rate <= 0:
+            return data, 0
+        data = bytearray(data)
+        count = 0
+        for i in range(len(data)):
+            if self.random.random() < self.corrupt_rate:
+                data[i] ^= 1 << self.random.randrange(8)
+                count += 1
+        return bytes(data), count
+
+    def radio_ok(self):
+        if not self.radio_present:
+            return False
+        return self.radio_fail_rate <= 0 or self.random.random() >= self.radio_fail_rate
+
+
+class _LinePacer:
+    """Completion times of transfers over a serial line of a given baud rate"""
+
+    def __init__(self, baud_rate):
+        self.byte_time = BITS_PER_BYTE / baud_rate if baud_rate else 0.0
+        self.busy_until = 0.0
+
+    def reserve(self, nbytes, now):
+        start = max(now, self.busy_until)
+        self.busy_until = start + nbytes * self.byte_time
+        return self.busy_until
+
+
+class ControllerFirmware:
+    """drone_controller.ino: text commands, one 'Processing command:' echo each"""
+
+    name = 'controller'
+    layout = DRONE_CONTROL
+    # Ticks stay on a fixed 20 ms grid instead of counting from the last send
+    fixed_grid = True
+
+    def __init__(self, device):
+        self.device = device
+        self.setpoint = NEUTRAL
+        self.overflow = False
+
+    def setup(self):
+        """Print the banner; False if the sketch halts (no radio)"""
+        device = self.device
+        device.println("P8 PRO Drone Controller Initializing...")
+        if not device.faults.radio_present:
+            device.println("ERROR: nRF24L01 not detected!")
+            return False
+        self.setpoint = NEUTRAL
+        device.println("nRF24L01 Configuration:")
+        device.println(f"Channel: {DRONE_CHANNEL}")
+        # The sketch uses print (not println) here, so the lines run together
+        device.print("Data Rate: 250kbps")
+        device.print("Address: ")
+        device.println(":".join(f"0x{b:02X}" for b in DRONE_ADDRESS))
+        device.println("Ready for commands!")
+        device.println(COMMAND_LIST)
+        return True
+
+    def read(self, rx):
+        """
+        Take the next complete line from the receive buffer like readSerialInput()
+
+        A partial line waits for the rest however long it takes. '\\r' ends a
+        line too, empty lines are skipped, and a line is cut at 63 characters
+        (and then answered "Unknown command!").
+
+        Args:
+            rx (bytearray): Received bytes; consumed in place
+        """
+        while True:
+            ends = [i for i in (rx.find(b'\n'), rx.find(b'\r')) if i >= 0]
+            if not ends:
+                return None
+            end = min(ends)
+            line = bytes(rx[:end]).decode('latin-1').lstrip(' \t')
+            del rx[:end + 1]
+            if line:
+                break
+        self.overflow = len(line) > COMMAND_BUFFER_SIZE - 1
+        return line[:COMMAND_BUFFER_SIZE - 1].rstrip(' \t').upper()
+
+    def process(self, command):
+        """processCommand(): returns True if the command was accepted"""
+        device = self.device
+        device.println(f"Processing command: {command}")
+        if self.overflow:
+            device.println("Unknown command!")
+            return False
+        setpoint = apply_command(self.setpoint, command)
+        if setpoint is None:
+            if command.startswith("CUSTOM:"):
+                device.println("Invalid custom command format")
+            else:
+                device.println("Unknown command!")
+            return False
+        self.setpoint = setpoint
+        device.println(RESPONSE_LINES['CUSTOM' if command.startswith("CUSTOM:") else command])
+        return True
+
+    def wire_values(self):
+        return self.layout.to_wire(self.setpoint)
+
+
+class BridgeFirmware:
+    """arduino_bridge.ino: 7-byte 0xFF frames, one ACK byte per frame"""
+
+    name = 'bridge'
+    layout = CONTROL_PACKET
+    frame_size = CONTROL_PACKET.frame_struct.size
+    fixed_grid = False
+
+    def __init__(self, device):
+        self.device = device
+        self.values = [0] * len(self.layout.fields)
+
+    def setup(self):
+        # radio.begin()'s result is ignored by this sketch
+        self.values = [0] * len(self.layout.fields)
+        self.device.println("Arduino Drone Bridge Ready")
+        return True
+
+    def read(self, rx):
+        """Take the next frame: needs 7 bytes available, skips a bad start byte"""
+        while len(rx) >= self.frame_size:
+            start = rx.pop(0)
+            if start == START_BYTE:
+                frame = bytes([start]) + bytes(rx[:self.frame_size - 1])
+                del rx[:self.frame_size - 1]
+                return frame
+        return None
+
+    def process(self, frame):
+        """Store the sticks, transmit once and acknowledge the result"""
+        self.values = list(self.layout.frame_struct.unpack(frame)[1:])
+        ok = self.device.transmit(self.values, 'frame')
+        self.device.write(bytes([ACK_OK if ok else ACK_FAIL]))
+        return ok
+
+    def wire_values(self):
+        return self.values
+
+
+class DeviceEmulator:
+    """An emulated Arduino running one of the sketches on a pseudo-terminal"""
+
+    def __init__(self, firmware='controller', baud_rate=115200, faults=None,
+                 tick_interval=TRANSMISSION_INTERVAL, boot_delay=0.0,
+                 record_limit=100000, link=None):
+        """
+        Args:
+            firmware (str): 'controller' (drone_controller.ino) or 'bridge'
+                (arduino_bridge.ino)
+            baud_rate (int): Line rate both directions are paced at (0 = unlimited)
+            faults (FaultInjector): Latency and failures to inject
+            tick_interval (float): Seconds between periodic radio packets
+            boot_delay (float): Seconds between the port opening and setup()
+                (a real Uno spends about 1.5 s in its bootloader)
+            record_limit (int): Most radio packets and commands kept
+            link (str): Optional symlink to create for the pty (e.g. /tmp/ttyDRONE)
+        """
+        if firmware not in FIRMWARES:
+            raise ValueError(f"Unknown firmware '{firmware}', expected one of {FIRMWARES}")
+        self.firmware = (ControllerFirmware if firmware == 'controller' else BridgeFirmware)(self)
+        self.baud_rate = baud_rate
+        self.faults = faults or FaultInjector()
+        self.tick_interval = tick_interval
+        self.boot_delay = boot_delay
+        self.link = link
+        self.port = None
+
+        self._master = None
+        self._thread = None
+        self._running = False
+        self._cond = threading.Condition()
+        self._packets = deque(maxlen=record_limit)
+        self._commands = deque(maxlen=record_limit)
+
+        self._rx_pacer = _LinePacer(baud_rate)
+        self._tx_pacer = _LinePacer(baud_rate)
+        self._incoming = deque()   # (due, bytes) still "on the wire" to the sketch
+        self._outgoing = deque()   # (due, bytes) still "on the wire" to the host
+        self._rx = bytearray()     # the sketch's serial receive buffer
+        self._next_tick = 0.0
+        self.host_connected = False
+        self.running_sketch = False
+        self._disconnect_at = self.faults.disconnect_after
+        self._plug_timer = None
+
+        self.boots = 0
+        self.unplugs = 0
+        self.commands = 0
+        self.rejected = 0
+        self.dropped = 0
+        self.corrupted_bytes = 0
+        self.radio_failures = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.output_dropped = 0
+
+    # Lifecycle ---------------------------------------------------------------
+
+    def start(self):
+        """Create the pty and start the sketch; returns the port name"""
+        master, slave = pty.openpty()
+        tty.setraw(slave)
+        self.port = os.ttyname(slave)
+        # Only the host keeps the slave open, so its opening and closing
+        # the port can be seen (as the Uno sees DTR) and reset the sketch
+        os.close(slave)
+        fcntl.fcntl(master, fcntl.F_SETFL, fcntl.fcntl(master, fcntl.F_GETFL) | os.O_NONBLOCK)
+        self._master = master
+        if self.link:
+            if os.path.islink(self.link):
+                os.unlink(self.link)
+            os.symlink(self.port, self.link)
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self.link or self.port
+
+    def stop(self, timeout=1.0):
+        """Stop the sketch and remove the pty"""
+        if self._plug_timer is not None:
+            self._plug_timer.cancel()
+            self._plug_timer = None
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self._close()
+
+    def disconnect(self):
+        """Pull the USB cable: the host's next read or write fails"""
+        self._running = False
+        # Let the sketch thread finish its pass before its pty goes away
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(1.0)
+        self._close()
+
+    def unplug(self, duration=None):
+        """
+        Pull the USB cable, optionally plugging it back in later
+
+        Args:
+            duration (float): Seconds until plug() (None: stay unplugged).
+                Use DeviceEmulator(link=...) so the port keeps its name.
+        """
+        self.unplugs += 1
+        self.disconnect()
+        if duration is not None:
+            self._plug_timer = threading.Timer(duration, self.plug)
+            self._plug_timer.daemon = True
+            self._plug_timer.start()
+
+    def plug(self):
+        """Plug the cable back in: a fresh pty, and the sketch boots when opened"""
+        self._plug_timer = None
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(1.0)
+        self._thread = None
+        self.host_connected = False
+        self.running_sketch = False
+        return self.start()
+
+    @property
+    def plug_pending(self):
+        """Unplugged, with plug() scheduled"""
+        return self._plug_timer is not None
+
+    def _close(self):
+        if self._master is not None:
+            try:
+                os.close(self._master)
+            except OSError:
+                pass
+            self._master = None
+        if self.link and os.path.islink(self.link):
+            os.unlink(self.link)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @property
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    # Serial output, called by the firmware -----------------------------------
+
+    def print(self, text):
+        self.write(text.encode('latin-1', 'replace'))
+
+    def println(self, text=""):
+        self.write(text.encode('latin-1', 'replace') + b"\r\n")
+
+    def write(self, data):
+        now = time.monotonic()
+        self._outgoing.append((self._tx_pacer.reserve(len(data), now), data))
+
+    def transmit(self, values, reason):
+        """radio.write() of the current packet; records it and returns success"""
+        layout = self.firmware.layout
+        payload = layout.packet_struct.pack(*values, layout.checksum(values))
+        ok = self.faults.radio_ok()
+        if not ok:
+            self.radio_failures += 1
+        with self._cond:
+            self._packets.append(RadioPacket(time.monotonic(), payload, ok, reason))
+            self._cond.notify_all()
+        return ok
+
+    # Recorded traffic ----------------------------------------------------------
+
+    def packets(self, reason=None):
+        """Radio packets sent so far, optionally only 'tick' or 'frame' ones"""
+        with self._cond:
+            packets = list(self._packets)
+        if reason is not None:
+            packets = [p for p in packets if p.reason == reason]
+        return packets
+
+    def setpoints(self, reason=None):
+        """Recorded radio packets decoded to Setpoints (DroneControl units)"""
+        layout = self.firmware.layout
+        return [layout.from_wire(layout.packet_struct.unpack(p.payload)[:-1])
+                for p in self.packets(reason)]
+
+    def received(self):
+        """Commands (controller) or frames (bridge) the sketch processed"""
+        with self._cond:
+            return list(self._commands)
+
+    def clear_records(self):
+        with self._cond:
+            self._packets.clear()
+            self._commands.clear()
+
+    def wait_for_commands(self, count, timeout=5.0):
+        """Block until `count` commands have been processed since start"""
+        with self._cond:
+            return self._cond.wait_for(lambda: self.commands >= count, timeout)
+
+    def wait_for_packets(self, count, timeout=5.0):
+        """Block until at least `count` radio packets are recorded"""
+        with self._cond:
+            return self._cond.wait_for(lambda: len(self._packets) >= count, timeout)
+
+    @property
+    def current_setpoint(self):
+        """Stick values the sketch is transmitting now"""
+        return self.firmware.layout.from_wire(self.firmware.wire_values())
+
+    @property
+    def output_backlog(self):
+        """Seconds until serial output written so far has reached the host"""
+        return max(0.0, self._tx_pacer.busy_until - time.monotonic())
+
+    def get_stats(self):
+        with self._cond:
+            packets = len(self._packets)
+        return {
+            'firmware': self.firmware.name,
+            'port': self.port,
+            'host_connected': self.host_connected,
+            'boots': self.boots,
+            'unplugs': self.unplugs,
+            'commands': self.commands,
+            'rejected': self.rejected,
+            'dropped': self.dropped,
+            'corrupted_bytes': self.corrupted_bytes,
+            'radio_packets': packets,
+            'radio_failures': self.radio_failures,
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'output_dropped': self.output_dropped,
+            'output_backlog_s': self.output_backlog,
+        }
+
+    # Sketch main loop ----------------------------------------------------------
+
+    def _host_opened(self):
+        """False while nobody has the slave side open (reads fail with EIO)"""
+        readable, _, _ = select.select([self._master], [], [], 0)
+        if not readable:
+            return True
+        try:
+            data = os.read(self._master, 4096)
+        except BlockingIOError:
+            return True
+        except OSError:
+            return False
+        self._receive(data, time.monotonic())
+        return True
+
+    def _reset(self):
+        """The host opened the port: DTR resets the board and setup() runs"""
+        self._incoming.clear()
+        self._outgoing.clear()
+        self._rx.clear()
+        self.boots += 1
+        if self.boot_delay:
+            time.sleep(self.boot_delay)
+        self.running_sketch = self.firmware.setup()
+        self._next_tick = time.monotonic()
+
+    def _receive(self, data, now):
+        self.bytes_in += len(data)
+        data, flipped = self.faults.corrupt(data)
+        self.corrupted_bytes += flipped
+        delay = self.faults.delay()
+        # A UART hands bytes over as they arrive, so the first line of a long
+        # write is processed before its last byte is on the wire
+        for i in range(0, len(data), RX_PIECE):
+            piece = data[i:i + RX_PIECE]
+            due = self._rx_pacer.reserve(len(piece), now) + delay
+            self._incoming.append((due, piece))
+
+    def _run(self):
+        while self._running and self._master is not None:
+            if not self.host_connected:
+                if not self._host_opened():
+                    time.sleep(self.tick_interval)
+                    continue
+                self.host_connected = True
+                self._reset()
+
+            now = time.monotonic()
+            deadline = self._next_tick if self.running_sketch else now + 0.1
+            if self._incoming:
+                deadline = min(deadline, self._incoming[0][0])
+            if self._outgoing:
+                deadline = min(deadline, self._outgoing[0][0])
+
+            try:
+                readable, _, _ = select.select([self._master], [], [], max(0.0, deadline - now))
+            except (OSError, ValueError):
+                break
+            now = time.monotonic()
+            if readable:
+                try:
+                    data = os.read(self._master, 4096)
+                except BlockingIOError:
+                    data = None
+                except OSError:
+                    # The host closed the port
+                    self.host_connected = False
+                    continue
+                if data:
+                    self._receive(data, now)
+
+            while self._incoming and self._incoming[0][0] <= now:
+                self._rx += self._incoming.popleft()[1]
+
+            if self.running_sketch:
+                self._loop(now)
+            self._flush(now)
+
+    def _loop(self, now):
+        """One pass of the sketch's loop(): serial input, then the radio tick"""
+        firmware = self.firmware
+        while True:
+            command = firmware.read(self._rx)
+            if command is None:
+                break
+            if self.faults.drop():
+                self.dropped += 1
+                continue
+            accepted = firmware.process(command)
+            with self._cond:
+                self.commands += 1
+                if not accepted:
+                    self.rejected += 1
+                self._commands.append(ReceivedCommand(now, command, accepted))
+                self._cond.notify_all()
+            limit = self._disconnect_at
+            if limit is not None and self.commands >= limit:
+                self._flush(time.monotonic() + 1.0)
+                self._disconnect_at += self.faults.disconnect_after
+                self.unplug(self.faults.replug_after)
+                return
+
+        if now >= self._next_tick:
+            self.transmit(firmware.wire_values(), 'tick')
+            if firmware.fixed_grid and now - self._next_tick < self.tick_interval:
+                self._next_tick += self.tick_interval
+            else:
+                # lastTransmit = millis() after the send (the bridge), or more
+                # than a whole interval behind: a late tick delays every later one
+                self._next_tick = now + self.tick_interval
+
+    def _flush(self, now):
+        """Hand serial output whose transfer time has elapsed to the host"""
+        while self._outgoing and self._outgoing[0][0] <= now and self._master is not None:
+            data = self._outgoing.popleft()[1]
+            try:
+                os.write(self._master, data)
+                self.bytes_out += len(data)
+            except BlockingIOError:
+                # Nobody is reading; USB serial drops what it cannot buffer
+                self.output_dropped += len(data)
+            except OSError:
+                self.host_connected = False
+                self._outgoing.clear()
+                return
+
+
+def advertise_port(port):
+    """Add a port to DRONE_EXTRA_PORTS so UIs started from this process list it"""
+    ports = [p for p in os.environ.get(EXTRA_PORTS_ENV, '').split(os.pathsep) if p]
+    if port not in ports:
+        ports.append(port)
+    os.environ[EXTRA_PORTS_ENV] = os.pathsep.join(ports)
+
+
+def run_cli_session(port, protocol):
+    """Text-mode controller session against the emulator"""
+    from drone_nlp_controller import DroneNLPController
+    controller = DroneNLPController(arduino_port=port, protocol=protocol)
+    if not controller.connect_arduino():
+        return
+    try:
+        controller.run_text_mode()
+    finally:
+        controller.disconnect_arduino()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--firmware', choices=FIRMWARES, default='controller')
+    parser.add_argument('--baud', type=int, default=115200, help='Line rate (0 = unlimited)')
+    parser.add_argument('--boot-delay', type=float, default=0.0, help='Seconds before setup() runs')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Delay before input is seen')
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help='Random extra delay')
+    parser.add_argument('--drop-rate', type=float, default=0.0, help='Lost command probability')
+    parser.add_argument('--corrupt-rate', type=float, default=0.0, help='Flipped byte probability')
+    parser.add_argument('--radio-fail-rate', type=float, default=0.0, help='radio.write() failure probability')
+    parser.add_argument('--no-radio', action='store_true', help='Emulate a missing nRF24L01')
+    parser.add_argument('--disconnect-after', type=int, help='Pull the cable after N commands')
+    parser.add_argument('--replug-after', type=float,
+                        help='Plug the cable back in after S seconds (use with --link)')
+    parser.add_argument('--seed', type=int, help='Random seed for injected faults')
+    parser.add_argument('--link', help='Symlink to create for the pty, e.g. /tmp/ttyDRONE')
+    parser.add_argument('--launch', choices=('cli', 'gui', 'app'),
+                        help='Start a controller front end connected to the emulator')
+    args = parser.parse_args()
+
+    faults = FaultInjector(latency=args.latency_ms / 1000, jitter=args.jitter_ms / 1000,
+                           drop_rate=args.drop_rate, corrupt_rate=args.corrupt_rate,
+                           radio_fail_rate=args.radio_fail_rate, radio_present=not args.no_radio,
+                           disconnect_after=args.disconnect_after,
+                           replug_after=args.replug_after, seed=args.seed)
+    emulator = DeviceEmulator(args.firmware, baud_rate=args.baud, faults=faults,
+                              boot_delay=args.boot_delay, link=args.link)
+    port = emulator.start()
+    advertise_port(port)
+    print(f"Emulating {args.firmware} firmware on {port}")
+
+    try:
+        if args.launch == 'cli':
+            run_cli_session(port, 'binary' if args.firmware == 'bridge' else 'text')
+        elif args.launch == 'gui':
+            import drone_gui
+            drone_gui.main()
+        elif args.launch == 'app':
+            import drone_app
+            drone_app.start_webview()
+        else:
+            print(f"Connect with: DroneNLPController(arduino_port='{port}')")
+            print("Press Ctrl+C to stop")
+            while emulator.is_running or emulator.plug_pending:
+                time.sleep(0.5)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stats = emulator.get_stats()
+        emulator.stop()
+        print(f"Processed {stats['commands']} commands ({stats['rejected']} rejected, "
+              f"{stats['dropped']} dropped), sent {stats['radio_packets']} radio packets")
+
+
+if __name__ == '__main__':
+    main()
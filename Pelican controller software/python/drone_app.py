@@ -3,55 +3,222 @@ PyWebView desktop application for P8 PRO Drone Controller
 
 This file exposes a small API used by the frontend (web/app.js) to control the
 `DroneNLPController` backend and provides an embedded desktop UI via pywebview.
+
+State changes and backend log lines are pushed to the page through
+`evaluate_js` (see UIPublisher) instead of being polled by the frontend.
 """
 import os
 import threading
 import json
-import webview
+import logging
+import time
+from collections import deque
 from pathlib import Path
 
-from drone_nlp_controller import DroneNLPController
+from drone_nlp_controller import DroneNLPController, list_serial_ports
+from mission import MissionError
+from state_store import INITIAL_STATE
 
 BASE_DIR = Path(__file__).parent
 WEB_DIR = BASE_DIR / 'web'
 INDEX_FILE = WEB_DIR / 'index.html'
 
+# One push per display frame at most; bursts in between are merged
+PUSH_INTERVAL = 1 / 60
+# Log lines kept while the page is busy (the page keeps its own bounded list)
+MAX_PENDING_LOG = 500
+
+_UNSET = object()
+
+
+class UIPublisher:
+    """
+    Pushes state diffs and log batches to the pywebview window
+
+    Producers only flag that something changed (or queue a log line) and never
+    take a lock, so status readers and command senders cannot contend here;
+    the publisher thread snapshots the state, diffs it against what the page
+    already shows and sends one `droneUI.apply({...})` call per frame.
+    """
+
+    def __init__(self, snapshot, interval=PUSH_INTERVAL):
+        """
+        Args:
+            snapshot (callable): Returns the current UI state as a flat dict
+            interval (float): Minimum seconds between two pushes
+        """
+        self.snapshot = snapshot
+        self.interval = interval
+        self.window = None
+        self._send = None
+        self._wake = threading.Event()
+        self._resync = False
+        # deque.append/popleft are atomic, so log() needs no lock
+        self._log = deque(maxlen=MAX_PENDING_LOG)
+        # Only touched by the publisher thread
+        self._published = {}
+        self._thread = None
+        self._running = False
+        self.pushes = 0
+
+    def start(self, window=None, send=None):
+        """
+        Args:
+            window: pywebview window; updates go to droneUI.apply() in the page
+            send (callable): Called with each update dict instead, on the
+                publisher thread (e.g. control_server.py)
+        """
+        self.window = window
+        self._send = send or self._push_to_window
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    def notify(self):
+        """Mark the state as changed (cheap, callable from any thread)"""
+        # is_set() is lock-free; set() is only paid once per push
+        if not self._wake.is_set():
+            self._wake.set()
+
+    def log(self, level, message):
+        self._log.append([time.time() * 1000, level, message])
+        self.notify()
+
+    def resync(self):
+        """Send the full state on the next push (e.g. after a page reload)"""
+        self._resync = True
+        self.notify()
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            if not self._running:
+                return
+            # Let the rest of a burst arrive, then send it as one update
+            time.sleep(self.interval)
+            self._wake.clear()
+            if self._resync:
+                self._resync = False
+                self._published = {}
+            lines = []
+            while self._log:
+                lines.append(self._log.popleft())
+            state = self.snapshot()
+            diff = {k: v for k, v in state.items() if self._published.get(k, _UNSET) != v}
+            update = {}
+            if diff:
+                update['state'] = diff
+            if lines:
+                update['log'] = lines
+            if not update:
+                continue
+            try:
+                self._send(update)
+            except Exception as e:
+                print('UI push failed:', e)
+                continue
+            self._published.update(diff)
+            self.pushes += 1
+
+    def _push_to_window(self, update):
+        self.window.evaluate_js(f"window.droneUI && droneUI.apply({json.dumps(update, default=str)})")
+
+
+class _PublisherLogHandler(logging.Handler):
+    """Forwards controller log records to the page"""
+
+    def __init__(self, publisher):
+        super().__init__(level=logging.INFO)
+        self.publisher = publisher
+
+    def emit(self, record):
+        try:
+            self.publisher.log(record.levelname.lower(), record.getMessage())
+        except Exception:
+            self.handleError(record)
+
+
 class DroneAPI:
     def __init__(self):
         self.controller = None
+        # Serializes connect/disconnect only; every other call reads the
+        # current controller and its state snapshot without locking
         self.lock = threading.Lock()
+        self.publisher = UIPublisher(self._ui_state)
+        self._log_handler = None
+
+    def attach_window(self, window):
+        """Start pushing state and controller log lines to `window`"""
+        self._attach(window=window)
+
+    def attach_sink(self, send):
+        """Start pushing the same updates to `send(update)` (headless servers)"""
+        self._attach(send=send)
+
+    def detach(self):
+        """Stop pushing updates"""
+        if self._log_handler is not None:
+            logging.getLogger(DroneNLPController.__module__).removeHandler(self._log_handler)
+            self._log_handler = None
+        self.publisher.stop()
+
+    def _attach(self, window=None, send=None):
+        self._log_handler = _PublisherLogHandler(self.publisher)
+        logging.getLogger(DroneNLPController.__module__).addHandler(self._log_handler)
+        self.publisher.start(window, send)
+
+    def _bind(self, controller):
+        controller.on_state_change = self.publisher.notify
+        self.publisher.notify()
+
+    def _snapshot(self):
+        ctrl = self.controller
+        return ctrl.state if ctrl is not None else INITIAL_STATE
+
+    def _ui_state(self):
+        # Runs on the publisher thread
+        s = self._snapshot()
+        return {"connected": s.connected, "link_up": s.link_up, "armed": s.armed,
+                "flying": s.flying, "last_command": s.last_command,
+                "device_ready": s.device_ready, "last_error": s.last_error,
+                "version": s.version}
 
     def _ensure_controller(self):
         if self.controller is None:
             # Default port left empty; GUI will request explicit port
-            self.controller = DroneNLPController(arduino_port="COM3")
+            self.controller = DroneNLPController(arduino_port="COM3", fast_start=True)
+            self._bind(self.controller)
         return self.controller
 
     # Exposed methods for JS (pywebview will call them)
     def get_serial_ports(self):
-        import serial.tools.list_ports
-        ports = [p.device for p in serial.tools.list_ports.comports()]
-        return ports
+        return list_serial_ports()
 
     def connect(self, port):
         with self.lock:
-            self.controller = DroneNLPController(arduino_port=port)
-            ok = self.controller.connect_arduino()
+            # One controller for the whole session; reconnects only reopen the port
+            ok = self._ensure_controller().connect_arduino(port)
             return {"connected": ok}
 
     def disconnect(self):
         with self.lock:
             if self.controller:
                 self.controller.disconnect_arduino()
-                self.controller = None
             return {"disconnected": True}
 
     def send_command(self, command):
-        with self.lock:
-            if not self.controller or not self.controller.is_connected:
-                return {"sent": False, "reason": "not_connected"}
-            self.controller.process_text_command(command)
-            return {"sent": True}
+        ctrl = self.controller
+        if not ctrl or not ctrl.is_connected:
+            return {"sent": False, "reason": "not_connected"}
+        ctrl.process_text_command(command)
+        return {"sent": True}
 
     def start_voice(self):
         # Start voice recognition in a background thread
@@ -61,28 +228,79 @@ class DroneAPI:
             except Exception as e:
                 print('Voice thread error:', e)
 
-        with self.lock:
-            if not self.controller:
-                return {"started": False, "reason": "not_connected"}
-            t = threading.Thread(target=voice_loop, args=(self.controller,), daemon=True)
-            t.start()
-            return {"started": True}
+        ctrl = self.controller
+        if not ctrl or not ctrl.is_connected:
+            return {"started": False, "reason": "not_connected"}
+        t = threading.Thread(target=voice_loop, args=(ctrl,), daemon=True)
+        t.start()
+        return {"started": True}
 
     def stop_voice(self):
-        # The controller's run_voice_mode reacts to user stopping; we can try to set a flag
-        # but the simple controller uses KeyboardInterrupt or local flow; leave as best-effort
-        # For now just return success; real implementation could add an event to break loop
+        ctrl = self.controller
+        if ctrl:
+            ctrl.stop_voice_mode()
         return {"stopped": True}
 
     def get_status(self):
-        with self.lock:
-            if not self.controller:
-                return {"armed": False, "flying": False, "last_command": None}
-            s = self.controller.drone_state
-            return {"armed": bool(s.get('armed')), "flying": bool(s.get('flying')), "last_command": s.get('last_command')}
+        # Initial state only; later changes are pushed by self.publisher
+        self.publisher.resync()
+        s = self._snapshot()
+        return {"connected": s.connected, "armed": s.armed, "flying": s.flying,
+                "last_command": s.last_command, "version": s.version}
+
+    def get_state(self):
+        """The full pushed state, without resending it to the page"""
+        return self._ui_state()
+
+    def run_mission(self, script):
+        ctrl = self.controller
+        if not ctrl or not ctrl.is_connected:
+            return {"started": False, "reason": "not_connected"}
+        try:
+            runner = ctrl.run_mission(
+                script,
+                on_change=lambda change: self.publisher.log("info", f"Mission: {change.command}"),
+                on_finish=lambda runner: self.publisher.log("info", f"Mission {runner.status}"))
+        except MissionError as e:
+            return {"started": False, "reason": str(e)}
+        return {"started": True, "steps": len(runner.mission.steps),
+                "duration_s": runner.mission.duration}
+
+    def abort_mission(self, land=False):
+        ctrl = self.controller
+        return {"aborted": bool(ctrl and ctrl.abort_mission(land))}
+
+    def get_mission_status(self):
+        ctrl = self.controller
+        runner = ctrl.mission if ctrl else None
+        if runner is None:
+            return {}
+        return dict(runner.get_stats(), steps_report=runner.report())
+
+    def get_latency_stats(self):
+        ctrl = self.controller
+        if not ctrl:
+            return {}
+        return ctrl.get_latency_stats()
+
+    def get_link_stats(self):
+        ctrl = self.controller
+        return (ctrl.get_link_stats() if ctrl else None) or {}
+
+    def export_latency(self, path):
+        ctrl = self.controller
+        if not ctrl:
+            return {"exported": False, "reason": "not_connected"}
+        try:
+            return {"exported": True, "path": ctrl.export_latency(path)}
+        except OSError as e:
+            return {"exported": False, "reason": str(e)}
 
 # Launch function used by webview
 def start_webview():
+    # Imported here so DroneAPI can be used headless (benchmarks, scripts)
+    import webview
+
     api = DroneAPI()
 
     # Determine index file path
@@ -90,6 +308,7 @@ def start_webview():
 
     # Create the window with the Python API bound to `window.pywebview.api` in JS
     window = webview.create_window('P8 PRO Drone Controller', index_path, js_api=api, width=1000, height=700)
+    api.attach_window(window)
 
     # Try preferred GUI backends in order. On Windows, edgechromium (WebView2) is preferred.
     try:
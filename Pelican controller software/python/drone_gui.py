@@ -7,32 +7,54 @@ Provides both voice and text input capabilities with real-time status monitoring
 
 import tkinter as tk
 from tkinter import ttk, scrolledtext, messagebox
-import threading
+import os
 import queue
-import time
 from datetime import datetime
-import serial.tools.list_ports
 
 # Import the drone controller
-from drone_nlp_controller import DroneNLPController
+from drone_nlp_controller import DroneNLPController, list_serial_ports
+from mission import MissionError
+from activity_log import ActivityLog
+
+# Full activity history; the window only shows the most recent lines
+LOG_DIRECTORY = "activity_logs"
+# Latency panel refresh period (ms); independent of the state panel
+LATENCY_REFRESH_MS = 500
 
 class DroneControllerGUI:
-    def __init__(self, root):
+    def __init__(self, root, log_lines=1000, log_file=None):
+        """
+        Args:
+            root: Tk root window
+            log_lines (int): Lines kept in the Activity Log panel
+            log_file (str): History file (default: a new file per session in
+                activity_logs/; "" disables the history)
+        """
         self.root = root
+        self.log_lines = log_lines
+        if log_file is None:
+            log_file = os.path.join(LOG_DIRECTORY,
+                                    datetime.now().strftime("activity-%Y%m%d-%H%M%S.log"))
+        self.log_file = log_file
         self.root.title("P8 PRO Drone Natural Language Controller")
         self.root.geometry("800x600")
         self.root.configure(bg='#f0f0f0')
 
         # Initialize controller
         self.controller = None
-        self.voice_thread = None
+        self.voice_pipeline = None
         self.voice_listening = False
+        # DroneState version the status panel shows
+        self.shown_version = None
+        # Trace count the latency panel shows
+        self.shown_recorded = None
 
         # Status update queue
         self.status_queue = queue.Queue()
 
         self.setup_ui()
         self.update_status_display()
+        self.update_latency_display()
 
     def setup_ui(self):
         """Create the user interface"""
@@ -96,6 +118,19 @@ class DroneControllerGUI:
         self.send_btn = ttk.Button(input_frame, text="Send", command=self.send_text_command)
         self.send_btn.grid(row=1, column=1)
 
+        ttk.Label(input_frame, text="Mission (e.g. take off, forward for 2 seconds, land):").grid(
+            row=2, column=0, sticky=tk.W, pady=(10, 0))
+        self.mission_entry = ttk.Entry(input_frame, font=('Arial', 11))
+        self.mission_entry.grid(row=3, column=0, sticky=(tk.W, tk.E), padx=(0, 10))
+        self.mission_entry.bind('<Return>', self.run_mission)
+
+        mission_buttons = ttk.Frame(input_frame)
+        mission_buttons.grid(row=3, column=1)
+        self.mission_btn = ttk.Button(mission_buttons, text="Run", width=6, command=self.run_mission)
+        self.mission_btn.grid(row=0, column=0)
+        self.abort_btn = ttk.Button(mission_buttons, text="Abort", width=6, command=self.abort_mission)
+        self.abort_btn.grid(row=0, column=1, padx=(5, 0))
+
         # Voice control frame
         voice_frame = ttk.Frame(control_frame)
         voice_frame.grid(row=0, column=1, sticky=(tk.W, tk.E), padx=(10, 0))
@@ -133,6 +168,9 @@ class DroneControllerGUI:
 
         self.log_text = scrolledtext.ScrolledText(log_frame, height=15, font=('Consolas', 9))
         self.log_text.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        self.activity_log = ActivityLog(self.log_text, max_lines=self.log_lines,
+                                        history_path=self.log_file or None)
+        self.activity_log.start()
 
         # Status frame
         status_frame = ttk.LabelFrame(main_frame, text="Drone Status", padding="10")
@@ -152,14 +190,17 @@ class DroneControllerGUI:
         self.last_cmd_label = ttk.Label(status_frame, text="None")
         self.last_cmd_label.grid(row=1, column=1, columnspan=3, sticky=tk.W, padx=(10, 0))
 
+        ttk.Label(status_frame, text="Latency:").grid(row=2, column=0, sticky=tk.W)
+        self.latency_label = ttk.Label(status_frame, text="-", font=('Consolas', 9), justify=tk.LEFT)
+        self.latency_label.grid(row=2, column=1, columnspan=3, sticky=tk.W, padx=(10, 0))
+
         # Initialize log
         self.log_message("🚁 P8 PRO Drone Controller initialized")
         self.log_message("📝 Enter commands like: 'take off', 'move forward', 'land'")
 
     def get_serial_ports(self):
         """Get list of available serial ports"""
-        ports = serial.tools.list_ports.comports()
-        return [port.device for port in ports]
+        return list_serial_ports()
 
     def connect_controller(self):
         """Connect to the drone controller"""
@@ -169,8 +210,12 @@ class DroneControllerGUI:
             return
 
         try:
-            self.controller = DroneNLPController(arduino_port=port)
-            if self.controller.connect_arduino():
+            # Reconnects reuse the controller (its threads, speech and microphone)
+            if self.controller is None:
+                self.controller = DroneNLPController(arduino_port=port, fast_start=True)
+                self.shown_version = None
+                self.shown_recorded = None
+            if self.controller.connect_arduino(port):
                 self.connect_btn.config(state='disabled')
                 self.disconnect_btn.config(state='normal')
                 self.status_label.config(text="● Connected", foreground='green')
@@ -186,7 +231,6 @@ class DroneControllerGUI:
         """Disconnect from the drone controller"""
         if self.controller:
             self.controller.disconnect_arduino()
-            self.controller = None
 
         self.connect_btn.config(state='normal')
         self.disconnect_btn.config(state='disabled')
@@ -222,9 +266,43 @@ class DroneControllerGUI:
             return
 
         self.log_message(f"⚡ Quick command: {command}")
-        self.controller.command_queue.put(command)
+        self.controller.enqueue_command(command)
         self.update_drone_status()
 
+    def run_mission(self, event=None):
+        """Fly the timed mission typed in the mission box"""
+        if not self.controller or not self.controller.is_connected:
+            messagebox.showwarning("Warning", "Not connected to drone controller")
+            return
+
+        script = self.mission_entry.get().strip()
+        if not script:
+            return
+        try:
+            runner = self.controller.run_mission(
+                script,
+                on_change=lambda change: self.log_message(
+                    f"🧭 {change.at:.2f} s: {change.command}"),
+                on_finish=self.on_mission_finished)
+        except MissionError as e:
+            messagebox.showerror("Mission Error", str(e))
+            return
+        self.log_message(f"🧭 Mission: {len(runner.mission.steps)} steps, "
+                         f"{runner.mission.duration:.1f} s")
+
+    def abort_mission(self):
+        """Stop the running mission; the sticks are centred and the drone hovers"""
+        if self.controller and self.controller.abort_mission():
+            self.log_message("🛑 Mission aborted")
+
+    def on_mission_finished(self, runner):
+        """Mission over (called on the mission thread)"""
+        stats = runner.get_stats()
+        reason = f" ({stats['reason']})" if stats['reason'] else ""
+        self.log_message(f"🧭 Mission {stats['status']}{reason}: {stats['sent']}/{stats['changes']} "
+                         f"changes, late p50 {stats['queued_late_p50_ms']:.1f} ms, "
+                         f"max {stats['queued_late_max_ms']:.1f} ms")
+
     def toggle_voice_control(self):
         """Toggle voice control on/off"""
         if not self.controller or not self.controller.is_connected:
@@ -232,66 +310,90 @@ class DroneControllerGUI:
             return
 
         if not self.voice_listening:
-            # Start voice control
+            # Start voice control: capture and recognition run in the background
+            try:
+                self.voice_pipeline = self.controller.create_voice_pipeline(self.on_voice_result)
+                self.voice_pipeline.start()
+            except Exception as e:
+                self.log_message(f"🎤 Voice error: {str(e)}")
+                return
             self.voice_listening = True
             self.voice_btn.config(text="🎤 Stop Voice Control", style="Accent.TButton")
-            self.voice_thread = threading.Thread(target=self.voice_control_loop, daemon=True)
-            self.voice_thread.start()
             self.log_message("🎙️ Voice control activated - speak your commands")
         else:
             # Stop voice control
             self.voice_listening = False
+            if self.voice_pipeline:
+                self.voice_pipeline.stop()
+                self.voice_pipeline = None
             self.voice_btn.config(text="🎤 Start Voice Control", style="TButton")
             self.log_message("🔇 Voice control deactivated")
 
-    def voice_control_loop(self):
-        """Voice control background loop"""
-        while self.voice_listening:
-            try:
-                if hasattr(self.controller, 'listen_for_voice_command'):
-                    text = self.controller.listen_for_voice_command()
-                    if text and self.voice_listening:
-                        self.root.after(0, lambda: self.process_voice_command(text))
-                time.sleep(0.1)
-            except Exception as e:
-                self.root.after(0, lambda: self.log_message(f"🎤 Voice error: {str(e)}"))
-                break
+    def on_voice_result(self, result):
+        """Recognized speech (called on the recognizer thread)"""
+        controller = self.controller
+        if self.voice_listening and controller:
+            self.process_voice_command(result)
 
-    def process_voice_command(self, text):
-        """Process voice command in main thread"""
-        self.log_message(f"🗣️ Voice: {text}")
-        self.controller.process_text_command(text)
-        self.update_drone_status()
+    def process_voice_command(self, result):
+        """
+        Process a voice command (any thread: the controller queues the
+        command, and the status panel picks up the change on its next update)
+        """
+        self.log_message(f"🗣️ Voice: {result.text}")
+        self.controller.process_voice_result(result)
 
     def log_message(self, message):
-        """Add message to activity log"""
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        log_entry = f"[{timestamp}] {message}\n"
-
-        self.log_text.insert(tk.END, log_entry)
-        self.log_text.see(tk.END)
+        """Add message to activity log (safe from any thread)"""
+        self.activity_log.post(message)
 
     def update_drone_status(self):
         """Update drone status display"""
         if not self.controller:
             return
 
-        # Update status indicators
-        state = self.controller.drone_state
+        # One consistent snapshot; nothing to redraw if it has not changed
+        state = self.controller.state
+        if state.version == self.shown_version:
+            return
+        self.shown_version = state.version
 
-        if state['armed']:
+        if state.connected:
+            if state.link_up:
+                self.status_label.config(text="● Connected", foreground='green')
+            else:
+                self.status_label.config(text="● Reconnecting...", foreground='orange')
+
+        if state.armed:
             self.armed_label.config(text="✅ Yes", foreground='green')
         else:
             self.armed_label.config(text="❌ No", foreground='red')
 
-        if state['flying']:
+        if state.flying:
             self.flying_label.config(text="✅ Yes", foreground='green')
         else:
             self.flying_label.config(text="❌ No", foreground='red')
 
-        last_cmd = state['last_command'] or "None"
+        last_cmd = state.last_command or "None"
         self.last_cmd_label.config(text=last_cmd)
 
+    def update_latency_display(self):
+        """
+        Redraw the per-stage latency table when new traces have been recorded
+
+        Runs on its own timer: latency figures arrive with acknowledgements,
+        which do not always change the drone state the status panel follows.
+        """
+        try:
+            if self.controller:
+                latency = self.controller.latency
+                if latency.recorded and latency.recorded != self.shown_recorded:
+                    self.shown_recorded = latency.recorded
+                    self.latency_label.config(text=latency.format_table())
+            self.root.after(LATENCY_REFRESH_MS, self.update_latency_display)
+        except:
+            pass
+
     def update_status_display(self):
         """Periodic status update"""
         try:
@@ -307,10 +409,13 @@ class DroneControllerGUI:
         """Handle window closing"""
         if self.voice_listening:
             self.voice_listening = False
+            if self.voice_pipeline:
+                self.voice_pipeline.stop()
 
         if self.controller:
             self.controller.disconnect_arduino()
 
+        self.activity_log.stop()
         self.root.destroy()
 
 
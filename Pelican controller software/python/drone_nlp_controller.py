@@ -8,68 +8,161 @@ Requirements:
 - pip install pyserial speech_recognition pyttsx3 nltk tkinter
 """
 
+import os
+import sys
+import argparse
+import importlib.util
 import serial
+import serial.tools.list_ports
 import time
 import threading
-import re
 import json
 from datetime import datetime
+from collections import deque
 import queue
 import logging
 
-# Optional imports for voice recognition (install if needed)
-try:
-    import speech_recognition as sr
-    VOICE_AVAILABLE = True
-except ImportError:
-    VOICE_AVAILABLE = False
-    print("Speech recognition not available. Install with: pip install speechrecognition")
+from vocabulary import shared_store, VOCABULARY_FILE, parse_intents, recover_intent
+from packet_codec import FrameCodec
+from setpoint import NEUTRAL, THROTTLE_STEP, apply_command, clamp, idempotent_prefix, to_custom_command
+from setpoint_streamer import SetpointStreamer, MIN_RATE_HZ, max_rate_hz
+from command_scheduler import CommandScheduler, BATCH
+from speech_output import SpeechWorker
+from voice_pipeline import VoicePipeline, MicrophoneSource, default_recognizer
+from serial_reader import (AckTracker, EVENT_READY, EVENT_ERROR,
+                           EVENT_UNKNOWN, EVENT_INVALID, EVENT_NACK)
+import serial_link
+from serial_link import OutagePolicy, SerialLinkDown, WRITE_BUFFERED
+from flight_log import FlightRecorder
+from mission import MissionRunner, MissionError, compile_mission, load_mission_file, MISSION_PREEMPTED
+from state_store import StateStore
+from latency_trace import (CommandTrace, LatencyRecorder, percentile, STAGES, CAPTURED, RECOGNIZED,
+                           PARSED, ENQUEUED, DEQUEUED, WRITTEN, ACKNOWLEDGED)
 
-try:
-    import pyttsx3
-    TTS_AVAILABLE = True
-except ImportError:
-    TTS_AVAILABLE = False
-    print("Text-to-speech not available. Install with: pip install pyttsx3")
+# Optional voice recognition and speech packages (install if needed). They are
+# slow to import, so only their presence is checked here; they are imported
+# where first used.
+VOICE_AVAILABLE = importlib.util.find_spec("speech_recognition") is not None
+if not VOICE_AVAILABLE:
+    print("Speech recognition not available. Install with: pip install speechrecognition", file=sys.stderr)
+
+TTS_AVAILABLE = importlib.util.find_spec("pyttsx3") is not None
+if not TTS_AVAILABLE:
+    print("Text-to-speech not available. Install with: pip install pyttsx3", file=sys.stderr)
+
+# Commands a batch always sends as words, whatever their magnitude (they
+# arm, disarm or reset the firmware rather than move a stick)
+WORD_COMMANDS = ("TAKEOFF", "LAND", "STOP")
+
+# Longest wait for the firmware's startup banner after opening the port (the
+# board resets on open; the bootloader alone takes about 1.5 s)
+READY_TIMEOUT = 3.0
+
+# Longest wait for the outcomes of a batch's last commands once all are sent
+# (the device answers within AckTracker's 1 s timeout or the command is lost)
+BATCH_DRAIN_TIMEOUT = 5.0
+
+def list_serial_ports():
+    """Detected serial ports plus any listed in DRONE_EXTRA_PORTS (e.g. device_emulator.py)"""
+    ports = [port.device for port in serial.tools.list_ports.comports()]
+    extra = os.environ.get('DRONE_EXTRA_PORTS', '')
+    ports.extend(p for p in extra.split(os.pathsep) if p and p not in ports)
+    return ports
 
 class DroneNLPController:
-    def __init__(self, arduino_port="COM3", baud_rate=115200):
+    PROTOCOLS = ("text", "binary")
+    
+    def __init__(self, arduino_port="COM3", baud_rate=115200, protocol="text",
+                 fast_start=False, voice=True, vocabulary_file=VOCABULARY_FILE,
+                 calibrate=True, tts=True):
         """
         Initialize the drone controller
         
         Args:
             arduino_port (str): Serial port for Arduino connection
             baud_rate (int): Serial communication baud rate
+            protocol (str): "text" sends command words to drone_controller.ino,
+                "binary" sends 0xFF-framed stick values to arduino_bridge.ino
+            fast_start (bool): Return without waiting for the 2 s microphone
+                calibration, which then runs in the background (GUIs; the
+                console asks the user to be quiet and waits for it)
+            voice (bool): Use the microphone and speak confirmations; False
+                for controllers driven by a program (e.g. each drone of a
+                fleet.Fleet), which only log
+            vocabulary_file (str): JSON file of extra command phrases,
+                reloaded while connected (see vocabulary.py); None for the
+                built-in table only
+            calibrate (bool): False skips the microphone calibration (voice
+                mode still works; it opens its own MicrophoneSource)
+            tts (bool): False prints confirmations without speaking them
         """
+        if protocol not in self.PROTOCOLS:
+            raise ValueError(f"Unknown protocol '{protocol}', expected one of {self.PROTOCOLS}")
+        
         self.arduino_port = arduino_port
         self.baud_rate = baud_rate
-        self.serial_connection = None
-        self.is_connected = False
+        self.protocol = protocol
+        # The port is owned by a shared, self-reconnecting serial_link.SerialLink
+        self.link = None
+        self.link_client = None
+        # What happens to commands while the link is reconnecting
+        self.outage_policy = OutagePolicy()
+        # Drone and connection state, published as immutable snapshots
+        self.state_store = StateStore(on_change=lambda state: self._state_changed())
+        # Called (from any thread) after the state changes
+        self.on_state_change = None
+        # Called (from any thread) with each CommandTrace once it has an outcome
+        self.on_trace_finished = None
+        self.streamer = None
+        
+        # Per-command stage timestamps, from capture to device acknowledgement
+        self.latency = LatencyRecorder()
+        # Binary flight recorder (start_flight_log)
+        self.flight_recorder = None
+        # Timed mission being flown (run_mission)
+        self.mission = None
+        
+        # Device output is matched to written commands
+        self.ack_tracker = AckTracker(on_lost=lambda entry: self._finish_trace(entry.trace, 'lost'))
+        self.device_ready = threading.Event()
         
         # Voice recognition setup
-        if VOICE_AVAILABLE:
-            self.recognizer = sr.Recognizer()
-            self.microphone = sr.Microphone()
-            self.adjust_microphone()
+        self.voice_pipeline = None
+        self.recognizer = None
+        self.microphone = None
+        self.microphone_ready = threading.Event()
+        self.voice = voice
+        if VOICE_AVAILABLE and voice and calibrate:
+            if fast_start:
+                threading.Thread(target=self._adjust_microphone_in_background,
+                                 daemon=True).start()
+            else:
+                self.adjust_microphone()
+        else:
+            self.microphone_ready.set()
         
-        # Text-to-speech setup
-        if TTS_AVAILABLE:
-            self.tts_engine = pyttsx3.init()
-            self.setup_tts()
+        # Text-to-speech runs on its own worker thread, which creates the engine
+        self.tts_engine = None
+        self.speech_worker = (SpeechWorker(self.create_tts_engine)
+                              if TTS_AVAILABLE and voice and tts else None)
         
-        # Command queue for threaded processing
-        self.command_queue = queue.Queue()
+        # Priority command scheduler for threaded processing
+        self.command_queue = CommandScheduler(
+            on_drop=lambda entry: self._finish_trace(entry.trace, 'dropped'))
+        # Pacing: at most this many commands unanswered by the device, and
+        # never wait longer than ack_wait for an answer before sending on
+        self.max_in_flight = 2
+        self.ack_wait = 0.1
         
-        # Drone state
-        self.drone_state = {
-            'armed': False,
-            'flying': False,
-            'last_command': None,
-            'last_command_time': None
-        }
+        # Absolute stick values the last command produced on the device
+        self.setpoint = NEUTRAL
+        self.packet_codec = FrameCodec() if protocol == "binary" else None
         
-        # Natural language patterns
-        self.command_patterns = self.load_command_patterns()
+        # Natural language patterns, compiled into a single-pass matcher and
+        # a fallback for misheard phrases ("take of", "lend"); recompiled and
+        # swapped in whole when the vocabulary file changes (watched while
+        # connected; shared with the other controllers using the same file)
+        self.vocabulary = shared_store(vocabulary_file)
         
         # Setup logging
         logging.basicConfig(level=logging.INFO, 
@@ -81,18 +174,37 @@ class DroneNLPController:
         self.processing_thread.start()
     
     def adjust_microphone(self):
-        """Adjust microphone for ambient noise"""
+        """Open the microphone and adjust it for ambient noise"""
         if not VOICE_AVAILABLE:
             return
-            
-        print("Adjusting microphone for ambient noise... Please be quiet.")
-        with self.microphone as source:
-            self.recognizer.adjust_for_ambient_noise(source, duration=2)
-        print("Microphone adjusted.")
+        
+        import speech_recognition as sr
+        try:
+            self.recognizer = sr.Recognizer()
+            self.microphone = sr.Microphone()
+            print("Adjusting microphone for ambient noise... Please be quiet.")
+            with self.microphone as source:
+                self.recognizer.adjust_for_ambient_noise(source, duration=2)
+            print("Microphone adjusted.")
+        finally:
+            self.microphone_ready.set()
+    
+    def _adjust_microphone_in_background(self):
+        try:
+            self.adjust_microphone()
+        except Exception as e:
+            logging.getLogger(__name__).warning(f"Microphone unavailable: {e}")
+    
+    def create_tts_engine(self):
+        """Create and configure the TTS engine (called on the speech worker thread)"""
+        import pyttsx3
+        self.tts_engine = pyttsx3.init()
+        self.setup_tts()
+        return self.tts_engine
     
     def setup_tts(self):
         """Configure text-to-speech engine"""
-        if not TTS_AVAILABLE:
+        if not TTS_AVAILABLE or self.tts_engine is None:
             return
             
         voices = self.tts_engine.getProperty('voices')
@@ -106,145 +218,429 @@ class DroneNLPController:
         self.tts_engine.setProperty('rate', 180)  # Speed of speech
         self.tts_engine.setProperty('volume', 0.8)  # Volume level
     
-    def speak(self, text):
-        """Convert text to speech"""
+    def speak(self, text, urgent=False):
+        """
+        Convert text to speech without blocking the caller
+        
+        Args:
+            text (str): What to say
+            urgent (bool): Safety message; spoken before routine confirmations,
+                which are dropped when they pile up
+        """
+        if not self.voice:
+            return
         print(f"🔊 {text}")
-        if TTS_AVAILABLE:
-            self.tts_engine.say(text)
-            self.tts_engine.runAndWait()
+        if self.speech_worker is not None:
+            self.speech_worker.say(text, urgent=urgent)
     
-    def connect_arduino(self):
-        """Establish serial connection with Arduino"""
+    def connect_arduino(self, port=None, ready_timeout=READY_TIMEOUT):
+        """
+        Establish serial connection with Arduino
+        
+        Returns as soon as the firmware prints its startup banner ("Ready for
+        commands!"), or after ready_timeout for boards that do not reset when
+        the port opens. Reconnecting (to the same or another port) reuses
+        this controller. If another client in this process (e.g. the GUI and
+        the web API) already has the port open, the link is shared.
+        
+        Once connected, a dropped port is reopened in the background and
+        is_connected stays True; state.link_up tells whether it is up.
+        
+        Args:
+            port (str): Switch to this port first (default: arduino_port)
+            ready_timeout (float): Longest wait for the banner, in seconds
+        """
+        if self.link is not None:
+            self.disconnect_arduino()
+        if port:
+            self.arduino_port = port
+        self.device_ready.clear()
+        self.state_store.update(device_ready=False)
         try:
-            self.serial_connection = serial.Serial(
-                port=self.arduino_port,
-                baudrate=self.baud_rate,
-                timeout=1
-            )
-            time.sleep(2)  # Allow Arduino to reset
-            self.is_connected = True
-            self.logger.info(f"Connected to Arduino on {self.arduino_port}")
-            self.speak("Connected to drone controller")
-            return True
-        except serial.SerialException as e:
+            link = serial_link.acquire(self.arduino_port, self.baud_rate,
+                                       policy=self.outage_policy,
+                                       ready_timeout=ready_timeout)
+        except (serial.SerialException, ValueError) as e:
             self.logger.error(f"Failed to connect to Arduino: {e}")
-            self.speak("Failed to connect to drone controller")
+            self.speak("Failed to connect to drone controller", urgent=True)
             return False
+        self.link = link
+        self.vocabulary.start_watching()
+        self.link_client = link.add_client(self.handle_device_event, self.handle_link_state,
+                                           self.ack_tracker)
+        if link.device_ready:
+            # The banner was printed before we attached
+            self.device_ready.set()
+        self.state_store.update(connected=True, link_up=link.is_up,
+                                device_ready=self.device_ready.is_set())
+        self.logger.info(f"Connected to Arduino on {self.arduino_port}")
+        self.speak("Connected to drone controller")
+        return True
     
     def disconnect_arduino(self):
-        """Close serial connection"""
-        if self.serial_connection and self.serial_connection.is_open:
-            self.serial_connection.close()
+        """Detach from the serial link (the port closes when no client is left)"""
+        self.stop_streaming()
+        self.stop_flight_log()
+        link = self.link
+        if link is not None:
             self.is_connected = False
+            link.remove_client(self.link_client)
+            self.link = None
+            self.link_client = None
+            serial_link.release(link)
+            self.vocabulary.stop_watching()
+            self.state_store.update(link_up=False)
             self.logger.info("Disconnected from Arduino")
     
-    def send_command_to_arduino(self, command):
+    def send_command_to_arduino(self, command, trace=None):
         """Send command to Arduino via serial"""
-        if not self.is_connected or not self.serial_connection:
+        if not self.is_connected or self.link is None:
             self.logger.error("Not connected to Arduino")
+            self._finish_trace(trace, 'failed')
             return False
         
         try:
-            command_str = f"{command}\n"
-            self.serial_connection.write(command_str.encode())
-            self.logger.info(f"Sent command: {command}")
+            setpoint = apply_command(self.setpoint, command)
+            if self.is_streaming:
+                # The stream loop sends the full setpoint every tick; the
+                # command only moves the target
+                if setpoint is None:
+                    self.logger.error(f"Command has no stick equivalent: {command}")
+                    self._finish_trace(trace, 'failed')
+                    return False
+                self.setpoint = setpoint
+                self.update_drone_state(command)
+                # The next stream tick carries it; there is no per-command reply
+                self._finish_trace(trace, 'streamed')
+            elif self.protocol == "binary":
+                if setpoint is None:
+                    self.logger.error(f"Command has no stick equivalent: {command}")
+                    self._finish_trace(trace, 'failed')
+                    return False
+                result = self._write(self.packet_codec.encode(setpoint), command, trace=trace)
+                self.setpoint = setpoint
+            else:
+                result = self._write(f"{command}\n".encode(), command, trace=trace)
+                if setpoint is not None:
+                    self.setpoint = setpoint
+            if result == WRITE_BUFFERED:
+                self.logger.warning(f"Link down, buffered command: {command}")
+            else:
+                self.logger.info(f"Sent command: {command}")
             
-            # Update drone state
-            self.update_drone_state(command)
+            # Drone state is updated when the device confirms the command
             return True
         except Exception as e:
             self.logger.error(f"Failed to send command: {e}")
+            self._finish_trace(trace, 'failed')
             return False
     
+    def send_batch_to_arduino(self, intents, trace=None):
+        """
+        Send several intents to the device in a single write
+        
+        Steps go as command words; a scaled movement ("forward slowly")
+        goes as the absolute CUSTOM: setpoint it leads to, worked out from
+        the setpoint the previous step leaves. With the binary protocol each
+        step is one frame. The device answers every step, and the trace is
+        acknowledged with the last one.
+        """
+        if not self.is_connected or self.link is None:
+            self.logger.error("Not connected to Arduino")
+            self._finish_trace(trace, 'failed')
+            return False
+        
+        setpoint = self.setpoint
+        commands = []
+        frames = []
+        for intent in intents:
+            new = apply_command(setpoint, intent.command, intent.magnitude)
+            if new is None:
+                self.logger.error(f"Command has no stick equivalent: {intent.command}")
+                self._finish_trace(trace, 'failed')
+                return False
+            if intent.magnitude == 1.0 or intent.command in WORD_COMMANDS:
+                command = intent.command
+            else:
+                command = to_custom_command(new)
+            commands.append(command)
+            if self.protocol == "binary":
+                # Copied: encode() returns a view of one reused buffer
+                frames.append(bytes(self.packet_codec.encode(new)))
+            else:
+                frames.append(f"{command}\n".encode())
+            setpoint = new
+        if trace is not None:
+            trace.command = " ".join(commands)
+        
+        try:
+            if self.is_streaming:
+                # The stream carries the final setpoint on its next tick
+                self.setpoint = setpoint
+                for command in commands:
+                    self.update_drone_state(command)
+                self._finish_trace(trace, 'streamed')
+                return True
+            result = self._write(b"".join(frames), commands, trace=trace)
+            self.setpoint = setpoint
+            if result == WRITE_BUFFERED:
+                self.logger.warning(f"Link down, buffered batch: {' '.join(commands)}")
+            else:
+                self.logger.info(f"Sent batch of {len(commands)}: {' '.join(commands)}")
+            return True
+        except Exception as e:
+            self.logger.error(f"Failed to send batch: {e}")
+            self._finish_trace(trace, 'failed')
+            return False
+    
+    def _write(self, data, command, source="command", trace=None):
+        """
+        Write through the link and register the write for acknowledgement
+        
+        Args:
+            command: Command word, or a list of them for a batch (one reply
+                expected per command; the trace goes with the last)
+        
+        Returns:
+            str: serial_link.WRITE_SENT, or WRITE_BUFFERED during an outage
+                (stream setpoints are never buffered; the next tick replaces them)
+        """
+        commands = command if isinstance(command, list) else [command]
+        entry = []
+        if isinstance(data, memoryview):
+            # A view of the codec's reused buffer; `after` may only run when
+            # a buffered write is flushed, after later encodes
+            data = bytes(data)
+        
+        def before():
+            # Register first: the reply can arrive before write() returns
+            for c in commands[:-1]:
+                entry.append(self.ack_tracker.sent_command(c, source))
+            entry.append(self.ack_tracker.sent_command(commands[-1], source, trace))
+        
+        def after():
+            if self.flight_recorder is not None:
+                self.flight_recorder.log_frame(data, stream=source == "stream",
+                                               binary=self.protocol == "binary")
+            if trace is not None and not trace.stamps[WRITTEN]:
+                trace.mark(WRITTEN)
+        
+        try:
+            return self.link.write(data, before, after,
+                                   on_expired=lambda: self._finish_trace(trace, 'expired'),
+                                   buffer=source != "stream")
+        except SerialLinkDown:
+            for pending in entry:
+                self.ack_tracker.cancel(pending)
+            raise
+    
+    def send_raw(self, data, command=None):
+        """Write pre-encoded bytes (e.g. a replayed frame), bypassing the scheduler"""
+        if not self.is_connected or self.link is None:
+            self.logger.error("Not connected to Arduino")
+            return False
+        try:
+            self._write(data, command, source="replay")
+            return True
+        except Exception as e:
+            self.logger.error(f"Failed to send frame: {e}")
+            return False
+    
+    def send_setpoint_to_arduino(self, setpoint):
+        """Write one absolute setpoint (CUSTOM: line or binary frame)"""
+        custom = to_custom_command(setpoint)
+        if self.protocol == "binary":
+            self._write(self.packet_codec.encode(setpoint), custom, source="stream")
+        else:
+            self._write(f"{custom}\n".encode(), custom, source="stream")
+    
+    def handle_device_event(self, event):
+        """Apply one decoded message from the device (runs on the reader thread)"""
+        if self.flight_recorder is not None:
+            self.flight_recorder.log_response(event)
+        entry = self.ack_tracker.handle_event(event)
+        if entry is not None and entry.trace is not None:
+            trace = entry.trace
+            trace.mark_seconds(ACKNOWLEDGED, event.timestamp)
+            if not trace.stamps[WRITTEN]:
+                # The reply beat the writer thread back from write()
+                trace.stamps[WRITTEN] = trace.stamps[ACKNOWLEDGED]
+            self._finish_trace(trace, 'ok' if entry.ok else 'rejected')
+        if entry is not None and entry.source == "command":
+            if entry.ok:
+                self.update_drone_state(entry.command)
+            else:
+                self.state_store.update(last_error=f"Device rejected {entry.command}")
+                self.logger.warning(f"Device rejected command: {entry.command} "
+                                    f"({event.text or 'NACK'})")
+        elif event.kind in (EVENT_UNKNOWN, EVENT_INVALID, EVENT_NACK) and entry is None:
+            self.logger.warning(f"Device reported a failure: {event.text or 'NACK'}")
+        
+        if event.kind == EVENT_READY:
+            self.state_store.update(device_ready=True)
+            self.device_ready.set()
+        elif event.kind == EVENT_ERROR:
+            self.state_store.update(last_error=event.text)
+            self.logger.error(f"Device error: {event.text}")
+    
+    def handle_link_state(self, up, error):
+        """The serial link went down (e.g. the USB cable was pulled) or came back"""
+        if up:
+            self.state_store.update(link_up=True)
+            self.logger.info(f"Serial link to {self.arduino_port} restored")
+        else:
+            self.device_ready.clear()
+            changes = {'link_up': False, 'device_ready': False}
+            if error is not None:
+                changes['last_error'] = str(error)
+            self.state_store.update(**changes)
+    
+    def get_link_stats(self):
+        """Reconnect and outage statistics of the serial link (None if not connected)"""
+        link = self.link
+        return link.get_stats() if link is not None else None
+    
+    def _state_changed(self):
+        if self.on_state_change is not None:
+            self.on_state_change()
+    
+    @property
+    def state(self):
+        """Current DroneState snapshot (lock-free; fields never change under you)"""
+        return self.state_store.current
+    
+    @property
+    def drone_state(self):
+        """The current state as a dict (a copy; use update_drone_state to change it)"""
+        return self.state_store.current._asdict()
+    
+    @property
+    def is_connected(self):
+        return self.state_store.current.connected
+    
+    @is_connected.setter
+    def is_connected(self, connected):
+        self.state_store.update(connected=connected)
+    
+    @property
+    def is_streaming(self):
+        return self.streamer is not None and self.streamer.is_running
+    
+    def start_streaming(self, rate_hz=MIN_RATE_HZ):
+        """
+        Send the full setpoint at a fixed rate instead of one word per command
+        
+        Args:
+            rate_hz (int): Control loop rate, 50-200 Hz; the text protocol's
+                replies cap it lower (133 Hz at 115200 baud, see
+                setpoint_streamer.max_rate_hz)
+        """
+        if not self.is_connected:
+            self.logger.error("Not connected to Arduino")
+            return False
+        self.stop_streaming()
+        self.streamer = SetpointStreamer(lambda: self.setpoint,
+                                         self.send_setpoint_to_arduino,
+                                         rate_hz=rate_hz,
+                                         max_rate=max_rate_hz(self.protocol, self.baud_rate))
+        self.streamer.start()
+        self.logger.info(f"Streaming setpoints at {rate_hz} Hz")
+        return True
+    
+    def stop_streaming(self):
+        """Stop the fixed-rate setpoint stream"""
+        if self.is_streaming:
+            self.streamer.stop()
+            self.logger.info("Setpoint streaming stopped")
+    
+    def get_stream_stats(self):
+        """Jitter/overrun statistics of the setpoint stream (None if never started)"""
+        return self.streamer.get_stats() if self.streamer else None
+    
     def update_drone_state(self, command):
         """Update internal drone state based on command"""
-        self.drone_state['last_command'] = command
-        self.drone_state['last_command_time'] = datetime.now()
+        changes = {'last_command': command, 'last_command_time': datetime.now()}
         
         if command == "TAKEOFF":
-            self.drone_state['armed'] = True
-            self.drone_state['flying'] = True
+            changes.update(armed=True, flying=True)
         elif command == "LAND":
-            self.drone_state['flying'] = False
-            self.drone_state['armed'] = False
+            changes.update(armed=False, flying=False)
+        self.state_store.update(**changes)
     
     def load_command_patterns(self):
         """Load natural language command patterns"""
-        return {
-            'takeoff': [
-                r'\b(take\s*off|launch|start\s*flying|lift\s*off|go\s*up)\b',
-                r'\b(begin\s*flight|start\s*drone)\b'
-            ],
-            'land': [
-                r'\b(land|landing|come\s*down|touch\s*down)\b',
-                r'\b(stop\s*flying|end\s*flight)\b'
-            ],
-            'up': [
-                r'\b(go\s*up|move\s*up|rise|ascend|higher|climb)\b',
-                r'\b(increase\s*altitude|fly\s*higher)\b'
-            ],
-            'down': [
-                r'\b(go\s*down|move\s*down|descend|lower|drop)\b',
-                r'\b(decrease\s*altitude|fly\s*lower)\b'
-            ],
-            'forward': [
-                r'\b(go\s*forward|move\s*forward|ahead|front)\b',
-                r'\b(fly\s*forward|move\s*ahead)\b'
-            ],
-            'backward': [
-                r'\b(go\s*back|move\s*back|backward|behind|reverse)\b',
-                r'\b(fly\s*backward|move\s*back)\b'
-            ],
-            'left': [
-                r'\b(go\s*left|move\s*left|turn\s*left|left\s*side)\b',
-                r'\b(fly\s*left|drift\s*left)\b'
-            ],
-            'right': [
-                r'\b(go\s*right|move\s*right|turn\s*right|right\s*side)\b',
-                r'\b(fly\s*right|drift\s*right)\b'
-            ],
-            'rotate_left': [
-                r'\b(rotate\s*left|spin\s*left|turn\s*around\s*left)\b',
-                r'\b(yaw\s*left|twist\s*left)\b'
-            ],
-            'rotate_right': [
-                r'\b(rotate\s*right|spin\s*right|turn\s*around\s*right)\b',
-                r'\b(yaw\s*right|twist\s*right)\b'
-            ],
-            'stop': [
-                r'\b(stop|halt|freeze|hover|stay|pause)\b',
-                r'\b(hold\s*position|stay\s*still)\b'
-            ]
-        }
+        return {command: list(patterns) for command, patterns in self.vocabulary.current.patterns.items()}
+    
+    @property
+    def command_patterns(self):
+        """The command table in use (built-in plus the vocabulary file)"""
+        return self.vocabulary.current.patterns
+    
+    @property
+    def intent_matcher(self):
+        return self.vocabulary.current.matcher
+    
+    @property
+    def fuzzy_matcher(self):
+        return self.vocabulary.current.fuzzy
+    
+    def reload_vocabulary(self):
+        """Reload the vocabulary file now instead of at the next poll"""
+        return self.vocabulary.reload()
     
     def parse_natural_language(self, text):
         """Parse natural language input and convert to drone command"""
-        text = text.lower().strip()
-        self.logger.info(f"Parsing: '{text}'")
+        self.logger.info(f"Parsing: '{text.lower().strip()}'")
         
-        # Check for each command pattern
-        for command, patterns in self.command_patterns.items():
-            for pattern in patterns:
-                if re.search(pattern, text, re.IGNORECASE):
-                    return command.upper()
+        # Single scan over the precompiled pattern table (emergency phrases
+        # and speed modifiers included), cached per normalized utterance.
+        # One table for the whole parse, even if a reload swaps it meanwhile.
+        vocabulary = self.vocabulary.current
+        command = vocabulary.matcher.parse(text)
+        if command is None:
+            command = self.recover_intent(text, vocabulary)
+        return command
+    
+    def parse_intents(self, text):
+        """
+        Every command in an utterance, in order, with its magnitude
         
-        # Check for emergency stop
-        if re.search(r'\b(emergency|help|stop\s*now|kill)\b', text, re.IGNORECASE):
-            return "LAND"  # Emergency landing
+        "take off then go forward slowly and rotate right" gives TAKEOFF,
+        FORWARD (0.5) and ROTATE_RIGHT from one scan of the text.
         
-        # Check for speed/intensity modifiers
-        speed_match = re.search(r'\b(slowly|slow|fast|quickly|quick)\b', text, re.IGNORECASE)
-        if speed_match:
-            # Could modify command intensity here
-            pass
+        Returns:
+            tuple: intent_matcher.Intent(command, magnitude) per command
+        """
+        self.logger.info(f"Parsing: '{text.lower().strip()}'")
+        return parse_intents(self.vocabulary.current, text, self.logger)
+    
+    def recover_intent(self, text, vocabulary=None):
+        """
+        Closest command to a misheard utterance, if close enough to act on
         
-        return None
+        See fuzzy_matcher.py; intents that arm or climb need a higher
+        confidence and are never guessed from a single word.
+        
+        Args:
+            text (str): Utterance the exact matcher found nothing in
+            vocabulary (vocabulary.Vocabulary): Table to use (default: the current one)
+        
+        Returns:
+            str: Command (e.g. 'LAND') or None
+        """
+        if vocabulary is None:
+            vocabulary = self.vocabulary.current
+        return recover_intent(vocabulary, text, self.logger)
     
     def listen_for_voice_command(self):
         """Listen for voice input and convert to text"""
         if not VOICE_AVAILABLE:
             return None
         
+        import speech_recognition as sr
+        self.microphone_ready.wait()
+        if self.microphone is None:
+            return None
         try:
             with self.microphone as source:
                 print("🎤 Listening for command...")
@@ -265,34 +661,270 @@ class DroneNLPController:
             print(f"❌ Speech recognition error: {e}")
             return None
     
-    def process_text_command(self, text):
+    def process_text_command(self, text, trace=None):
         """Process text command and add to queue"""
-        command = self.parse_natural_language(text)
-        if command:
-            self.command_queue.put(command)
-            self.speak(f"Executing {command.lower().replace('_', ' ')}")
+        return self.submit_intents(text, self.parse_intents(text), trace)
+    
+    def submit_intents(self, text, intents, trace=None):
+        """Queue the intents parsed from `text` (see parse_intents); False if there are none"""
+        if intents:
+            if trace is None:
+                trace = CommandTrace()
+            trace.mark(PARSED)
+            if len(intents) == 1 and intents[0].magnitude == 1.0:
+                self.enqueue_command(intents[0].command, trace, text)
+            else:
+                # Several commands, or a scaled one: one write of absolute setpoints
+                self.enqueue_batch(intents, trace, text)
+            commands = [i.command for i in intents]
+            self.speak("Executing " + ", then ".join(c.lower().replace('_', ' ') for c in commands),
+                       urgent="LAND" in commands or "STOP" in commands)
             return True
         else:
+            if self.flight_recorder is not None:
+                self.flight_recorder.log_intent(text, None)
             self.speak("I didn't understand that command")
             return False
     
+    def enqueue_command(self, command, trace=None, text=None):
+        """Schedule a command word, tracing its latency from here on"""
+        if self.flight_recorder is not None:
+            self.flight_recorder.log_intent(text or "", command)
+        mission = self.mission
+        if (command in ("LAND", "STOP") and mission is not None and mission.is_running
+                and not mission.on_mission_thread()):
+            # Returns once the mission can no longer queue anything after this
+            mission.abort(MISSION_PREEMPTED, f"preempted by {command}")
+        if trace is None:
+            trace = CommandTrace()
+        trace.command = command
+        trace.mark(ENQUEUED)
+        self.command_queue.put(command, trace)
+    
+    def enqueue_batch(self, intents, trace=None, text=None):
+        """Schedule several intents to be written to the device in one write"""
+        intents = tuple(intents)
+        commands = [i.command for i in intents]
+        if self.flight_recorder is not None:
+            self.flight_recorder.log_intent(text or "", " ".join(commands))
+        mission = self.mission
+        if (("LAND" in commands or "STOP" in commands) and mission is not None
+                and mission.is_running and not mission.on_mission_thread()):
+            mission.abort(MISSION_PREEMPTED, "preempted by " + ("LAND" if "LAND" in commands else "STOP"))
+        if trace is None:
+            trace = CommandTrace()
+        trace.command = BATCH
+        trace.mark(ENQUEUED)
+        self.command_queue.put_batch(intents, trace)
+    
     def process_commands(self):
         """Background thread to process command queue"""
         while True:
             try:
-                command = self.command_queue.get(timeout=1)
-                if self.is_connected:
-                    self.send_command_to_arduino(command)
-                    time.sleep(0.1)  # Small delay between commands
+                self.wait_for_link()
+                entry = self.command_queue.get(timeout=1)
+                trace = entry.trace
+                if trace is not None:
+                    trace.mark(DEQUEUED)
+                if self.is_connected and entry.batch is not None:
+                    self.send_batch_to_arduino(entry.batch, trace)
+                elif self.is_connected:
+                    command = self.resolve_scheduled(entry)
+                    if trace is not None:
+                        trace.command = command
+                    self.send_command_to_arduino(command, trace)
+                else:
+                    self._finish_trace(trace, 'failed')
                 self.command_queue.task_done()
             except queue.Empty:
                 continue
             except Exception as e:
                 self.logger.error(f"Error processing command: {e}")
     
-    def run_voice_mode(self):
+    def resolve_scheduled(self, entry):
+        """Turn a scheduler entry into the command word to send"""
+        steps = entry.throttle_steps
+        if abs(steps) > 1:
+            # Merged UP/DOWN: one absolute setpoint instead of N words
+            throttle = clamp(self.setpoint.throttle + steps * THROTTLE_STEP)
+            return to_custom_command(self.setpoint._replace(throttle=throttle))
+        return entry.command
+    
+    def wait_for_link(self):
+        """
+        Pace sends to the device instead of sleeping a fixed time
+        
+        Waits until fewer than max_in_flight commands are unanswered (or
+        ack_wait passes), then for the previous write to leave the UART.
+        Returns at once while streaming or when a LAND is waiting.
+        """
+        if self.is_streaming or not self.is_connected:
+            return
+        deadline = time.monotonic() + self.ack_wait
+        while not self.command_queue.has_critical():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if self.ack_tracker.wait_for_outstanding(self.max_in_flight - 1,
+                                                     timeout=min(remaining, 0.005)):
+                break
+        
+        link = self.link
+        if link is not None and not link.is_up:
+            # Give the reconnect a moment before handing the link more to buffer
+            link.wait_up(self.ack_wait)
+            return
+        out_waiting = link.out_waiting if link is not None else 0
+        if out_waiting and not self.command_queue.has_critical():
+            # Bytes still queued in the driver: 10 bits per byte on the wire
+            time.sleep(out_waiting * 10 / self.baud_rate)
+    
+    def _finish_trace(self, trace, outcome):
+        if trace is not None:
+            self.latency.record(trace, outcome)
+            on_trace_finished = self.on_trace_finished
+            if on_trace_finished is not None:
+                on_trace_finished(trace)
+    
+    def process_voice_result(self, result):
+        """
+        Queue a VoiceResult: the intents the pipeline picked out for it
+        (see VoicePipeline), or else its text, parsed
+        """
+        trace = self.trace_from_voice(result)
+        if result.intents is None:
+            return self.process_text_command(result.text, trace)
+        return self.submit_intents(result.text, result.intents, trace)
+    
+    def trace_from_voice(self, result):
+        """Start a trace from a VoiceResult's capture and recognition times"""
+        trace = CommandTrace()
+        captured = result.speech_end or result.speech_start
+        if captured:
+            trace.mark_seconds(CAPTURED, captured)
+        if result.recognized:
+            trace.mark_seconds(RECOGNIZED, result.recognized)
+        return trace
+    
+    def get_latency_stats(self):
+        """Per-stage latency percentiles (see LatencyRecorder.get_stats)"""
+        return self.latency.get_stats()
+    
+    def export_latency(self, path):
+        """Write latency statistics and recent traces to a JSON file"""
+        return self.latency.export(path)
+    
+    def start_flight_log(self, directory="flight_logs"):
+        """Record intents, frames and device responses to a binary flight log"""
+        self.stop_flight_log()
+        self.flight_recorder = FlightRecorder(directory, session={
+            'protocol': self.protocol,
+            'port': self.arduino_port,
+            'baud_rate': self.baud_rate,
+        })
+        self.logger.info(f"Recording flight log to {self.flight_recorder.path}")
+        return self.flight_recorder.path
+    
+    def stop_flight_log(self):
+        recorder, self.flight_recorder = self.flight_recorder, None
+        if recorder is not None:
+            recorder.close()
+            self.logger.info(f"Flight log closed ({recorder.records} records)")
+    
+    def run_mission(self, script, on_change=None, on_finish=None):
+        """
+        Compile a timed mission and fly it in the background
+        
+        Any mission still running is aborted first. See mission.py for the
+        script language.
+        
+        Args:
+            script (str): Steps ("take off, then go forward for 2 seconds, then land")
+            on_change (callable): Called with each SetpointChange as it is queued
+            on_finish (callable): Called with the MissionRunner when it stops
+        
+        Returns:
+            MissionRunner: Or None if not connected
+        
+        Raises:
+            MissionError: The script does not compile
+        """
+        if not self.is_connected:
+            self.logger.error("Not connected to Arduino")
+            return None
+        self.abort_mission()
+        mission = compile_mission(script, self.setpoint, self.state.flying, self.vocabulary.current)
+        runner = MissionRunner(mission, self.enqueue_command, on_change, on_finish)
+        self.mission = runner
+        self.logger.info(f"Mission started: {len(mission.steps)} steps, {mission.duration:.1f} s")
+        return runner.start()
+    
+    def abort_mission(self, land=False):
+        """
+        Stop the running mission; False if none was running
+        
+        The sticks are centred so the drone hovers (see MissionRunner.abort),
+        or with land=True it lands instead.
+        """
+        runner = self.mission
+        if runner is None or not runner.is_running:
+            return False
+        runner.abort(reason="aborted by operator", hover=not land)
+        if land:
+            self.enqueue_command("LAND")
+        self.logger.info("Mission aborted")
+        return True
+    
+    def get_mission_stats(self):
+        """Status and timing of the last mission (None if none was flown)"""
+        runner = self.mission
+        return runner.get_stats() if runner is not None else None
+    
+    def get_queue_stats(self):
+        """Depth and drop/merge counters of the command scheduler"""
+        return self.command_queue.get_stats()
+    
+    EXIT_PHRASES = ('exit', 'quit', 'stop listening')
+    
+    def early_intent(self, partial):
+        """
+        Intents of a partial transcript, or None if it is too early to act
+        
+        A partial ending in the first word of an exit phrase ("stop" of
+        "stop listening") is held back until the final transcript. Only the
+        leading intents that set the sticks to fixed values are acted on
+        early; UP and DOWN step the throttle, so they wait for the final
+        transcript ("go up" could still become "go up a lot"), which then
+        cannot repeat anything that was already applied.
+        """
+        words = partial.lower().split()
+        if not words or any(phrase.startswith(words[-1]) and phrase != words[-1]
+                            for phrase in self.EXIT_PHRASES):
+            return None
+        if any(phrase in partial.lower() for phrase in self.EXIT_PHRASES):
+            return None
+        return idempotent_prefix(self.intent_matcher.parse_all(partial)) or None
+    
+    def create_voice_pipeline(self, on_result, source=None, recognizer=None):
+        """
+        Build a pipelined voice front end
+        
+        Args:
+            on_result (callable): Called with each VoiceResult
+            source (AudioSource): Defaults to the microphone; pass a
+                WavFileSource or PCMStreamSource to run without one
+            recognizer (OfflineRecognizer): Defaults to the best installed engine
+        """
+        if source is None:
+            source = MicrophoneSource()
+        if recognizer is None:
+            recognizer = default_recognizer()
+        return VoicePipeline(source, recognizer, on_result, intent_filter=self.early_intent,
+                             intent_parser=lambda text: self.intent_matcher.parse_all(text))
+    
+    def run_voice_mode(self, source=None, recognizer=None):
         """Run in continuous voice recognition mode"""
-        if not VOICE_AVAILABLE:
+        if source is None and not VOICE_AVAILABLE:
             print("Voice recognition not available")
             return
         
@@ -300,19 +932,31 @@ class DroneNLPController:
         print("Say commands like: 'take off', 'move forward', 'land', etc.")
         print("Say 'exit' or 'quit' to stop")
         
-        while True:
-            try:
-                text = self.listen_for_voice_command()
-                if text:
-                    if any(word in text.lower() for word in ['exit', 'quit', 'stop listening']):
-                        self.speak("Voice control deactivated")
-                        break
-                    
-                    self.process_text_command(text)
-                
-            except KeyboardInterrupt:
-                print("\nVoice control stopped")
-                break
+        finished = threading.Event()
+        
+        def on_result(result):
+            text = result.text
+            print(f"🗣️ You said: '{text}'" + (" (partial)" if result.early else ""))
+            if any(word in text.lower() for word in self.EXIT_PHRASES):
+                self.speak("Voice control deactivated")
+                finished.set()
+                return
+            self.process_voice_result(result)
+        
+        self.voice_pipeline = self.create_voice_pipeline(on_result, source, recognizer)
+        self.voice_pipeline.start()
+        try:
+            while not finished.is_set() and self.voice_pipeline.is_alive:
+                finished.wait(0.2)
+        except KeyboardInterrupt:
+            print("\nVoice control stopped")
+        finally:
+            self.voice_pipeline.stop()
+    
+    def stop_voice_mode(self):
+        """Stop run_voice_mode from another thread"""
+        if self.voice_pipeline is not None:
+            self.voice_pipeline.stop()
     
     def run_text_mode(self):
         """Run in text input mode"""
@@ -330,6 +974,16 @@ class DroneNLPController:
                     self.show_help()
                 elif text.lower() == 'status':
                     self.show_status()
+                elif text.lower().startswith('stream'):
+                    self.handle_stream_command(text.lower().split()[1:])
+                elif text.lower().startswith('latency'):
+                    self.handle_latency_command(text.split()[1:])
+                elif text.lower().startswith('record'):
+                    self.handle_record_command(text.split()[1:])
+                elif text.lower().startswith('mission'):
+                    self.handle_mission_command(text[len('mission'):].strip())
+                elif text.lower().split()[:1] in (['vocab'], ['vocabulary']):
+                    self.handle_vocabulary_command(text.lower().split()[1:])
                 elif text:
                     self.process_text_command(text)
                 
@@ -337,6 +991,217 @@ class DroneNLPController:
                 print("\nText control stopped")
                 break
     
+    def run_batch_mode(self, lines, rate=None, output=None, drain_timeout=BATCH_DRAIN_TIMEOUT):
+        """
+        Send every command line of a transcript without prompting (scripts,
+        replays, load)
+        
+        Blank lines and lines starting with '#' are skipped. A list (e.g. a
+        file's lines) is parsed in full before the first command is sent;
+        any other iterable (stdin, a named pipe) is parsed line by line as
+        it arrives. One JSON object per command line is written to `output`
+        in input order once the command has an outcome, then a summary:
+        
+            {"type": "result", "line": 3, "text": "go up", "commands": ["UP"],
+             "sent": "UP", "outcome": "ok", "parse_us": 41.2, "submitted_s": 0.104,
+             "dequeued_ms": 0.05, "written_ms": 0.31, "acknowledged_ms": 2.87}
+        
+        The *_ms times are from the command being queued. Outcomes are those
+        of LatencyRecorder ('ok', 'rejected', 'lost', 'dropped' when the
+        scheduler coalesced it into a later command, ...), 'unparsed' for a
+        line with no command and 'timeout' for one still unanswered after
+        drain_timeout.
+        
+        Args:
+            lines (iterable): Command lines
+            rate (float): Commands per second; None or 0 sends each one as
+                soon as the previous has left the queue, so the link's own
+                pacing (max_in_flight, ack_wait) sets the rate
+            output (file): Where results go (default: sys.stdout)
+            drain_timeout (float): Seconds to wait for the last outcomes
+        
+        Returns:
+            dict: The summary (also written to output)
+        """
+        if output is None:
+            output = sys.stdout
+        
+        def parse(numbered):
+            for number, line in numbered:
+                text = line.strip()
+                if not text or text.startswith('#'):
+                    continue
+                start = time.perf_counter_ns()
+                intents = self.parse_intents(text)
+                yield number, text, intents, (time.perf_counter_ns() - start) / 1000
+        
+        jobs = parse(enumerate(lines, 1))
+        if isinstance(lines, (list, tuple)):
+            jobs = list(jobs)
+        
+        finished = threading.Event()
+        # (result, trace) in input order; a result is written once its trace has an outcome
+        pending = deque()
+        outcomes = {}
+        acknowledged_ms = []
+        parse_us = []
+        
+        def emit():
+            while pending:
+                result, trace = pending[0]
+                if trace is not None:
+                    if trace.outcome is None:
+                        break
+                    result['sent'] = trace.command
+                    result['outcome'] = trace.outcome
+                    enqueued = trace.stamps[ENQUEUED]
+                    for stage in (DEQUEUED, WRITTEN, ACKNOWLEDGED):
+                        if trace.stamps[stage]:
+                            result[f"{STAGES[stage]}_ms"] = round((trace.stamps[stage] - enqueued) / 1e6, 3)
+                    if trace.outcome == 'ok' and 'acknowledged_ms' in result:
+                        acknowledged_ms.append(result['acknowledged_ms'])
+                pending.popleft()
+                outcomes[result['outcome']] = outcomes.get(result['outcome'], 0) + 1
+                output.write(json.dumps(result) + "\n")
+            output.flush()
+        
+        def wait(seconds):
+            finished.wait(seconds)
+            finished.clear()
+            emit()
+        
+        self.on_trace_finished = lambda trace: finished.set()
+        start = time.monotonic()
+        sent = 0
+        try:
+            for number, text, intents, parse_time in jobs:
+                if rate:
+                    # Deadline-based, so a slow write does not shift every later command
+                    due = start + sent / rate
+                    while time.monotonic() < due:
+                        wait(due - time.monotonic())
+                else:
+                    self.command_queue.wait_empty()
+                parse_us.append(parse_time)
+                result = {'type': 'result', 'line': number, 'text': text,
+                          'commands': [i.command for i in intents],
+                          'parse_us': round(parse_time, 1),
+                          'submitted_s': round(time.monotonic() - start, 4)}
+                if not intents:
+                    result['outcome'] = 'unparsed'
+                    pending.append((result, None))
+                else:
+                    trace = CommandTrace()
+                    pending.append((result, trace))
+                    self.submit_intents(text, intents, trace)
+                    sent += 1
+                emit()
+            
+            deadline = time.monotonic() + drain_timeout
+            while pending and time.monotonic() < deadline:
+                wait(min(deadline - time.monotonic(), 0.05))
+        finally:
+            self.on_trace_finished = None
+        for result, trace in pending:
+            if trace is not None and trace.outcome is None:
+                trace.outcome = 'timeout'
+        emit()
+        
+        elapsed = time.monotonic() - start
+        summary = {
+            'type': 'summary',
+            'lines': sum(outcomes.values()),
+            'sent': sent,
+            'outcomes': outcomes,
+            'elapsed_s': round(elapsed, 3),
+            'commands_per_s': round(sent / elapsed, 1) if elapsed else 0.0,
+            'parse_us': {'p50': round(percentile(parse_us, 0.50), 1),
+                         'p99': round(percentile(parse_us, 0.99), 1)},
+            'acknowledged_ms': {'count': len(acknowledged_ms),
+                                'p50': percentile(acknowledged_ms, 0.50),
+                                'p95': percentile(acknowledged_ms, 0.95),
+                                'p99': percentile(acknowledged_ms, 0.99),
+                                'max': max(acknowledged_ms, default=0.0)},
+            'queue': self.get_queue_stats(),
+        }
+        output.write(json.dumps(summary) + "\n")
+        output.flush()
+        return summary
+    
+    def handle_latency_command(self, args):
+        """Handle 'latency' / 'latency <file.json>' typed in text mode"""
+        if args:
+            try:
+                print(f"📝 Latency traces written to {self.export_latency(args[0])}")
+            except OSError as e:
+                print(f"❌ Could not write {args[0]}: {e}")
+        else:
+            print(self.latency.format_table())
+    
+    def handle_record_command(self, args):
+        """Handle 'record [directory]' / 'record off' typed in text mode"""
+        if args and args[0].lower() == 'off':
+            self.stop_flight_log()
+            print("⏹️ Flight log stopped")
+            return
+        try:
+            print(f"⏺️ Recording flight log to {self.start_flight_log(*args[:1])}")
+        except OSError as e:
+            print(f"❌ Could not start flight log: {e}")
+    
+    def handle_mission_command(self, args):
+        """Handle 'mission <steps|file>' / 'mission abort' / 'mission report' typed in text mode"""
+        if args.lower() in ('abort', 'stop'):
+            if not self.abort_mission():
+                print("No mission is running")
+            return
+        if args.lower() in ('report', ''):
+            if self.mission is None:
+                print("No mission has been flown")
+            else:
+                print(self.mission.format_report())
+            return
+        try:
+            script = load_mission_file(args) if os.path.isfile(args) else args
+            runner = self.run_mission(
+                script,
+                on_change=lambda change: print(f"🧭 {change.at:6.2f} s  {change.command}"),
+                on_finish=lambda runner: print(f"\n{runner.format_report()}"))
+        except (MissionError, OSError) as e:
+            print(f"❌ {e}")
+            return
+        if runner is not None:
+            print(f"🧭 Mission: {len(runner.mission.steps)} steps, {runner.mission.duration:.1f} s "
+                  f"(say 'land' or type 'mission abort' to stop)")
+    
+    def handle_vocabulary_command(self, args):
+        """Handle 'vocab' / 'vocab reload' typed in text mode"""
+        if args and args[0] == 'reload':
+            changed = self.reload_vocabulary()
+            if self.vocabulary.last_error:
+                print(f"❌ Vocabulary not reloaded: {self.vocabulary.last_error}")
+                return
+            print("📖 Vocabulary reloaded" if changed else "📖 Vocabulary unchanged")
+        stats = self.vocabulary.get_stats()
+        print(f"📖 {stats['patterns']} patterns, {stats['phrases']} phrases from {stats['source']} "
+              f"(version {stats['version']}, loaded in {stats['load_ms']:.1f} ms"
+              + (f", last reload {stats['last_reload_ms']:.1f} ms" if stats['last_reload_ms'] else "")
+              + ")")
+        if stats['last_error']:
+            print(f"⚠️ Last error: {stats['last_error']}")
+    
+    def handle_stream_command(self, args):
+        """Handle 'stream <hz>' / 'stream off' typed in text mode"""
+        if args and args[0] == 'off':
+            self.stop_streaming()
+            return
+        try:
+            rate_hz = int(args[0]) if args else MIN_RATE_HZ
+            if self.start_streaming(rate_hz):
+                print(f"📡 Streaming setpoints at {rate_hz} Hz")
+        except ValueError as e:
+            print(f"❌ {e}")
+    
     def show_help(self):
         """Display available commands"""
         help_text = """
@@ -356,53 +1221,179 @@ class DroneNLPController:
 🔧 Control Commands:
 - help: Show this help
 - status: Show drone status
+- stream <hz>: Send the full setpoint at a fixed rate (50-200 Hz)
+- stream off: Back to one command per message
+- latency [file.json]: Per-stage command latency (or export traces)
+- record [directory]: Record a binary flight log (replay with flight_log.py)
+- record off: Stop recording
+- mission <steps>: Fly timed steps ("take off, then go forward for 2 seconds, then land")
+- mission <file>: Fly a mission script file (one step per line)
+- mission abort / mission report: Stop the mission / show its step timing
+- vocab [reload]: Show (or reload now) the command vocabulary (commands.json)
 - quit/exit: Exit program
         """
         print(help_text)
     
     def show_status(self):
         """Display current drone status"""
+        state = self.state
         status = f"""
 🚁 Drone Status:
-- Connected: {self.is_connected}
-- Armed: {self.drone_state['armed']}
-- Flying: {self.drone_state['flying']}
-- Last Command: {self.drone_state['last_command']}
-- Last Command Time: {self.drone_state['last_command_time']}
+- Connected: {state.connected} (link {'up' if state.link_up else 'down'})
+- Armed: {state.armed}
+- Flying: {state.flying}
+- Last Command: {state.last_command}
+- Last Command Time: {state.last_command_time}
 - Arduino Port: {self.arduino_port}
+- Protocol: {self.protocol}
+- Device Ready: {state.device_ready}
+- Last Error: {state.last_error}
+- Setpoint: T={self.setpoint.throttle} Y={self.setpoint.yaw} P={self.setpoint.pitch} R={self.setpoint.roll}
         """
         print(status)
+        
+        queue_stats = self.get_queue_stats()
+        print(f"📥 Queue depth: {queue_stats['depth']}, dispatched: {queue_stats['dispatched']}, "
+              f"dropped: {queue_stats['dropped']}, merged: {queue_stats['merged']}")
+        
+        link = self.get_link_stats()
+        if link:
+            reconnect = (f", last reconnect {link['last_reconnect_ms']:.0f} ms"
+                         if link['last_reconnect_ms'] is not None else "")
+            print(f"🔌 Link {link['state']} - clients: {link['clients']}, outages: {link['outages']}, "
+                  f"down {link['total_outage_s']:.1f} s total{reconnect}, "
+                  f"buffered: {link['buffered']}, expired: {link['expired']}")
+        
+        acks = self.ack_tracker.get_stats()
+        print(f"📨 Sent: {acks['sent']}, confirmed: {acks['confirmed']}, "
+              f"rejected: {acks['failed']}, lost: {acks['lost']}, pending: {acks['outstanding']}")
+        
+        stats = self.get_stream_stats()
+        if stats and stats['running']:
+            print(f"📡 Streaming {stats['rate_hz']} Hz - ticks: {stats['ticks']}, "
+                  f"overruns: {stats['overruns']}, jitter p99: {stats['jitter_p99'] * 1000:.2f} ms")
+        
+        if self.flight_recorder is not None:
+            log = self.flight_recorder.get_stats()
+            print(f"⏺️ Recording: {log['records']} records in {log['path']}")
+        
+        mission = self.get_mission_stats()
+        if mission:
+            print(f"🧭 Mission {mission['status']}: {mission['sent']}/{mission['changes']} changes, "
+                  f"queued late p50 {mission['queued_late_p50_ms']:.2f} ms, "
+                  f"max {mission['queued_late_max_ms']:.2f} ms")
+        
+        if self.latency.recorded:
+            print("⏱️ Command latency:")
+            print(self.latency.format_table())
+
+
+def read_batch_input(path):
+    """
+    Lines of a batch: all of a regular file at once (parsed in bulk), or an
+    iterator over stdin ('-') or a named pipe, read as lines arrive
+    """
+    if path == '-':
+        return sys.stdin
+    if os.path.isfile(path):
+        with open(path, encoding='utf-8') as f:
+            return f.readlines()
+    # Opened here so a bad path fails before the batch starts
+    stream = open(path, encoding='utf-8')
+
+    def arriving():
+        with stream:
+            yield from stream
+
+    return arriving()
 
 
 def main():
     """Main function to run the drone controller"""
-    print("🚁 P8 PRO Drone Natural Language Controller")
-    print("=" * 50)
+    parser = argparse.ArgumentParser(description="P8 PRO Drone Natural Language Controller")
+    parser.add_argument('--port', default="COM3", help='Serial port of the Arduino')
+    parser.add_argument('--baud', type=int, default=115200, help='Serial baud rate')
+    parser.add_argument('--protocol', choices=DroneNLPController.PROTOCOLS, default="text",
+                        help='text for drone_controller.ino, binary for arduino_bridge.ino')
+    parser.add_argument('--emulate', action='store_true',
+                        help='Connect to an emulated device instead (device_emulator.py)')
+    parser.add_argument('--mode', choices=('voice', 'text'), help='Control mode (skips the prompt)')
+    parser.add_argument('--batch', metavar='FILE',
+                        help="Send the commands in FILE ('-' for stdin, or a named pipe) without "
+                             "prompting and print one JSON result per command")
+    parser.add_argument('--rate', type=float, default=0,
+                        help='Batch commands per second (default: as fast as the link allows)')
+    parser.add_argument('--drain', type=float, default=BATCH_DRAIN_TIMEOUT,
+                        help='Seconds to wait for the last batch outcomes')
+    parser.add_argument('--no-calibration', action='store_true',
+                        help='Skip the microphone calibration')
+    parser.add_argument('--no-tts', action='store_true', help='Do not speak confirmations')
+    parser.add_argument('--vocabulary', default=VOCABULARY_FILE, metavar='FILE',
+                        help='Command vocabulary file (see vocabulary.py)')
+    args = parser.parse_args()
+    
+    batch = args.batch is not None
+    if batch:
+        # stdout carries the results; logs stay on stderr and only report problems
+        logging.basicConfig(level=logging.WARNING, stream=sys.stderr,
+                            format='%(asctime)s - %(levelname)s - %(message)s')
+    else:
+        print("🚁 P8 PRO Drone Natural Language Controller")
+        print("=" * 50)
     
-    # Initialize controller
-    controller = DroneNLPController()
+    emulator = None
+    if args.emulate:
+        from device_emulator import DeviceEmulator
+        emulator = DeviceEmulator(firmware='bridge' if args.protocol == "binary" else 'controller',
+                                  baud_rate=args.baud)
+        args.port = emulator.start()
     
-    # Connect to Arduino
-    if not controller.connect_arduino():
-        print("Failed to connect to Arduino. Please check connection and try again.")
-        return
+    # Initialize controller (no microphone or speech at all for a batch)
+    controller = DroneNLPController(arduino_port=args.port, baud_rate=args.baud,
+                                    protocol=args.protocol, voice=not batch,
+                                    vocabulary_file=args.vocabulary,
+                                    calibrate=not args.no_calibration, tts=not args.no_tts)
     
     try:
-        # Choose control mode
-        print("\nSelect control mode:")
-        print("1. Voice control (requires microphone)")
-        print("2. Text control (keyboard input)")
+        # Connect to Arduino
+        if not controller.connect_arduino():
+            print("Failed to connect to Arduino. Please check connection and try again.",
+                  file=sys.stderr if batch else sys.stdout)
+            if batch:
+                sys.exit(2)
+            return
         
-        mode = input("Enter choice (1 or 2): ").strip()
+        if batch:
+            try:
+                lines = read_batch_input(args.batch)
+            except OSError as e:
+                print(f"Cannot read {args.batch}: {e}", file=sys.stderr)
+                sys.exit(2)
+            summary = controller.run_batch_mode(lines, rate=args.rate, drain_timeout=args.drain)
+            failed = sum(count for outcome, count in summary['outcomes'].items()
+                         if outcome not in ('ok', 'streamed'))
+            sys.exit(1 if failed else 0)
+        
+        mode = args.mode
+        if mode is None:
+            # Choose control mode
+            print("\nSelect control mode:")
+            print("1. Voice control (requires microphone)")
+            print("2. Text control (keyboard input)")
+            
+            mode = "voice" if input("Enter choice (1 or 2): ").strip() == "1" else "text"
         
-        if mode == "1" and VOICE_AVAILABLE:
+        if mode == "voice" and VOICE_AVAILABLE:
             controller.run_voice_mode()
         else:
             controller.run_text_mode()
     
     finally:
         controller.disconnect_arduino()
-        print("🚁 Drone controller shutdown complete")
+        if emulator is not None:
+            emulator.stop()
+        if not batch:
+            print("🚁 Drone controller shutdown complete")
 
 
 if __name__ == "__main__":
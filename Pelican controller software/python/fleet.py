@@ -0,0 +1,472 @@
+"""
+Multi-drone fleet control for the P8 PRO Drone Controller
+
+A DroneNLPController flies one drone through one port. A Fleet flies many:
+one controller per bridge (arduino_bridge.ino, binary protocol by default),
+each with its own command scheduler, its own processing thread and its own
+serial_link.SerialLink reader, so a slow or reconnecting link only ever
+delays its own drone.
+
+- phrases are parsed once, the way DroneNLPController parses them (chained
+  and scaled commands, the vocabulary file, fuzzy recovery), and routed to
+  one drone, a group or everyone: "alpha take off", "left: land",
+  "all stop", "bravo go up then forward slowly"
+- a broadcast is put on every target's queue in one tight loop and each
+  processing thread writes it on its own, so the skew between the first and
+  the last drone is a few thread wake-ups, not N serial writes in a row
+- connect and disconnect fan out over a thread pool, so N ready banners are
+  waited for at once
+- get_status() folds every drone's state, queue, link and acknowledgement
+  statistics into one view
+
+Usage:
+    python fleet.py alpha=COM3 bravo=COM4 --group left=alpha,bravo
+    python fleet.py --emulate 8
+"""
+
+import argparse
+import logging
+import threading
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from drone_nlp_controller import DroneNLPController, READY_TIMEOUT
+from latency_trace import CommandTrace, percentile, PARSED, WRITTEN
+from vocabulary import shared_store, VOCABULARY_FILE, parse_intents
+
+ALL = 'all'
+# Leading words that address every drone
+ALL_WORDS = (ALL, 'everyone', 'everybody', 'fleet')
+
+Broadcast = namedtuple('Broadcast', ['command', 'targets', 'traces'])
+Broadcast.__doc__ = ("One command (or, for several intents, the commands joined by spaces) "
+                     "routed to one or more drones, with a trace per drone")
+
+
+def broadcast_skew(broadcast):
+    """
+    Spread of the write times of a broadcast
+
+    Drones that never wrote it (the command was coalesced away or failed)
+    are left out.
+
+    Returns:
+        float: Seconds between the first and the last drone's write, or None
+            while a drone may still write it or fewer than two did
+    """
+    written = []
+    for trace in broadcast.traces:
+        if trace.stamps[WRITTEN]:
+            written.append(trace.stamps[WRITTEN])
+        elif trace.outcome is None:
+            return None
+    if len(written) < 2:
+        return None
+    return (max(written) - min(written)) / 1e9
+
+
+class Fleet:
+    """Routes commands to many drones, each on its own link and worker thread"""
+
+    def __init__(self, protocol="binary", baud_rate=115200, max_workers=32, history=256,
+                 vocabulary_file=VOCABULARY_FILE):
+        """
+        Args:
+            protocol (str): "binary" for arduino_bridge.ino, "text" for
+                drone_controller.ino (see DroneNLPController)
+            baud_rate (int): Serial baud rate of every link
+            vocabulary_file (str): Command vocabulary for the fleet and every
+                drone (see vocabulary.py); None for the built-in commands
+            max_workers (int): Most connects/disconnects run at once
+            history (int): Recent broadcasts kept for the skew statistics
+        """
+        self.protocol = protocol
+        self.baud_rate = baud_rate
+        self.max_workers = max_workers
+        # Replaced, never mutated, so routing reads them without a lock
+        self.drones = {}
+        self.groups = {}
+        self.vocabulary_file = vocabulary_file
+        # The drones' store: watched while any of them is connected
+        self.vocabulary = shared_store(vocabulary_file)
+        self.logger = logging.getLogger(__name__)
+
+        self._lock = threading.Lock()
+        self._broadcasts = deque(maxlen=history)
+        self.sent = 0
+        self.not_understood = 0
+
+    # Membership -----------------------------------------------------------
+
+    def add_drone(self, name, port, groups=()):
+        """
+        Add a drone on its own port (not connected yet)
+
+        Args:
+            name (str): One word, used to address the drone
+            port (str): Serial port of its bridge
+            groups (iterable): Groups to put it in (created as needed)
+
+        Returns:
+            DroneNLPController: The drone's controller
+        """
+        name = self._check_name(name)
+        controller = DroneNLPController(arduino_port=port, baud_rate=self.baud_rate,
+                                        protocol=self.protocol, fast_start=True, voice=False,
+                                        vocabulary_file=self.vocabulary_file)
+        controller.logger = self.logger.getChild(name)
+        with self._lock:
+            if name in self.drones or name in self.groups:
+                raise ValueError(f"'{name}' is already a drone or group")
+            drones = dict(self.drones)
+            drones[name] = controller
+            self.drones = drones
+        for group in groups:
+            self.set_group(group, self.groups.get(group, ()) + (name,))
+        return controller
+
+    def remove_drone(self, name):
+        """Disconnect a drone and take it out of the fleet and its groups"""
+        with self._lock:
+            drones = dict(self.drones)
+            controller = drones.pop(name)
+            self.drones = drones
+            groups = {group: tuple(m for m in members if m != name)
+                      for group, members in self.groups.items()}
+            self.groups = {group: members for group, members in groups.items() if members}
+        controller.disconnect_arduino()
+
+    def set_group(self, group, members):
+        """
+        Define (or with no members, delete) a named group of drones
+
+        Args:
+            group (str): One word, used to address the group
+            members (iterable): Drone names
+        """
+        group = self._check_name(group)
+        members = tuple(dict.fromkeys(m.lower() for m in members))
+        with self._lock:
+            if group in self.drones:
+                raise ValueError(f"'{group}' is already a drone")
+            unknown = [m for m in members if m not in self.drones]
+            if unknown:
+                raise KeyError(f"Unknown drones: {', '.join(unknown)}")
+            groups = dict(self.groups)
+            if members:
+                groups[group] = members
+            else:
+                groups.pop(group, None)
+            self.groups = groups
+
+    def resolve(self, target=ALL):
+        """
+        Drone names addressed by a target
+
+        Args:
+            target: ALL (or None), a drone name, a group name or a list of them
+
+        Returns:
+            tuple: Drone names, in the order they were added
+        """
+        if target is None:
+            target = ALL
+        if not isinstance(target, str):
+            names = dict.fromkeys(name for t in target for name in self.resolve(t))
+            return tuple(names)
+        target = target.lower()
+        if target in ALL_WORDS:
+            return tuple(self.drones)
+        if target in self.drones:
+            return (target,)
+        if target in self.groups:
+            return self.groups[target]
+        raise KeyError(f"Unknown drone or group '{target}'")
+
+    def __len__(self):
+        return len(self.drones)
+
+    def __getitem__(self, name):
+        return self.drones[name.lower()]
+
+    def _check_name(self, name):
+        name = name.strip().lower()
+        if not name or len(name.split()) != 1 or name.endswith((':', ',')):
+            raise ValueError(f"Drone and group names are single words, got '{name}'")
+        if name in ALL_WORDS:
+            raise ValueError(f"'{name}' already addresses the whole fleet")
+        return name
+
+    # Connections ------------------------------------------------------------
+
+    def connect(self, target=ALL, ready_timeout=READY_TIMEOUT):
+        """
+        Connect drones in parallel
+
+        Returns:
+            dict: Drone name -> True if it connected
+        """
+        return self._fan_out(target, lambda c: c.connect_arduino(ready_timeout=ready_timeout))
+
+    def disconnect(self, target=ALL):
+        """Disconnect drones in parallel"""
+        self._fan_out(target, lambda c: c.disconnect_arduino())
+
+    def _fan_out(self, target, call):
+        drones = self.drones
+        names = self.resolve(target)
+        if not names:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(len(names), self.max_workers)) as pool:
+            return dict(zip(names, pool.map(lambda name: call(drones[name]), names)))
+
+    # Commands ---------------------------------------------------------------
+
+    def send(self, command, target=ALL, text=None):
+        """
+        Queue a command word on every addressed drone
+
+        Each drone's processing thread sends it as soon as its own link is
+        ready; nothing here waits for a drone.
+
+        Args:
+            command (str): Command word (e.g. 'TAKEOFF', 'CUSTOM:...')
+            target: See resolve()
+            text (str): Utterance it came from, for the flight logs
+
+        Returns:
+            Broadcast: The drones addressed and one CommandTrace per drone
+        """
+        drones = self.drones
+        names = self.resolve(target)
+        traces = [CommandTrace() for _ in names]
+        for name, trace in zip(names, traces):
+            trace.mark(PARSED)
+            drones[name].enqueue_command(command, trace, text)
+        return self._sent(command, names, traces)
+
+    def send_intents(self, intents, target=ALL, text=None):
+        """
+        Queue parsed intents on every addressed drone
+
+        A single unscaled intent goes out as its command word (see send());
+        several, or a scaled one, as one batch per drone (see
+        DroneNLPController.enqueue_batch).
+
+        Args:
+            intents (sequence): intent_matcher.Intent per command, in order
+            target: See resolve()
+            text (str): Utterance they came from, for the flight logs
+
+        Returns:
+            Broadcast: The drones addressed and one CommandTrace per drone
+        """
+        intents = tuple(intents)
+        if len(intents) == 1 and intents[0].magnitude == 1.0:
+            return self.send(intents[0].command, target, text)
+        drones = self.drones
+        names = self.resolve(target)
+        traces = [CommandTrace() for _ in names]
+        for name, trace in zip(names, traces):
+            trace.mark(PARSED)
+            drones[name].enqueue_batch(intents, trace, text)
+        return self._sent(" ".join(i.command for i in intents), names, traces)
+
+    def _sent(self, command, names, traces):
+        broadcast = Broadcast(command, names, tuple(traces))
+        self._broadcasts.append(broadcast)
+        self.sent += 1
+        return broadcast
+
+    def process_text_command(self, text, target=None):
+        """
+        Parse a phrase once and route its commands
+
+        Parsed like DroneNLPController.parse_intents, with the fleet's copy
+        of the same vocabulary, so "alpha take off then go forward slowly"
+        sends alpha both commands.
+
+        Args:
+            text (str): Phrase, optionally addressed with a leading drone or
+                group name ("alpha take off", "left: land")
+            target: Overrides any address in the phrase (default: whoever
+                the phrase addresses, else the whole fleet)
+
+        Returns:
+            Broadcast: Or None if no command was understood
+        """
+        if target is None:
+            target, text = self.split_target(text)
+        intents = parse_intents(self.vocabulary.current, text, self.logger)
+        if not intents:
+            self.not_understood += 1
+            self.logger.warning(f"No command in '{text}'")
+            return None
+        return self.send_intents(intents, target, text)
+
+    def split_target(self, text):
+        """
+        Separate a leading address from the phrase
+
+        Returns:
+            tuple: (target, rest of the phrase); ALL when nobody is addressed
+        """
+        words = text.strip().split(None, 1)
+        if words:
+            head = words[0].rstrip(':,').lower()
+            if head in ALL_WORDS or head in self.drones or head in self.groups:
+                return head, words[1] if len(words) > 1 else ""
+        return ALL, text
+
+    def land_all(self):
+        """LAND on every drone (jumps each drone's queue, see CommandScheduler)"""
+        return self.send("LAND", ALL)
+
+    # Status -----------------------------------------------------------------
+
+    def get_status(self):
+        """
+        One view of the whole fleet
+
+        Returns:
+            dict: Per-drone state, queue, link and acknowledgement figures
+                under 'drones', fleet-wide counts, and broadcast skew
+        """
+        drones = {}
+        for name, controller in self.drones.items():
+            state = controller.state
+            link = controller.get_link_stats()
+            acks = controller.ack_tracker.get_stats()
+            drones[name] = {
+                'port': controller.arduino_port,
+                'connected': state.connected,
+                'link_up': state.link_up,
+                'device_ready': state.device_ready,
+                'armed': state.armed,
+                'flying': state.flying,
+                'last_command': state.last_command,
+                'last_error': state.last_error,
+                'queue_depth': controller.command_queue.get_stats()['depth'],
+                'sent': acks['sent'],
+                'confirmed': acks['confirmed'],
+                'rejected': acks['failed'],
+                'lost': acks['lost'],
+                'outages': link['outages'] if link else 0,
+            }
+        rows = drones.values()
+        return {
+            'drones': drones,
+            'groups': {group: list(members) for group, members in self.groups.items()},
+            'total': len(drones),
+            'connected': sum(d['connected'] for d in rows),
+            'link_down': [name for name, d in drones.items() if d['connected'] and not d['link_up']],
+            'flying': sum(d['flying'] for d in rows),
+            'queued': sum(d['queue_depth'] for d in rows),
+            'lost': sum(d['lost'] for d in rows),
+            'commands_sent': self.sent,
+            'not_understood': self.not_understood,
+            'skew': self.get_skew_stats(),
+        }
+
+    def get_skew_stats(self):
+        """Write-time spread of recent multi-drone broadcasts, in milliseconds"""
+        skews = [s for s in map(broadcast_skew, list(self._broadcasts)) if s is not None]
+        return {
+            'broadcasts': len(skews),
+            'p50_ms': percentile(skews, 0.50) * 1000,
+            'p99_ms': percentile(skews, 0.99) * 1000,
+            'max_ms': max(skews) * 1000 if skews else 0.0,
+        }
+
+    def format_status(self):
+        """The fleet status as a text table"""
+        status = self.get_status()
+        lines = [f"{'drone':<10} {'port':<16} {'link':<5} {'ready':<5} {'flying':<6} "
+                 f"{'queue':>5} {'sent':>6} {'ok':>6} {'lost':>5}  last command"]
+        for name, d in status['drones'].items():
+            link = ('up' if d['link_up'] else 'down') if d['connected'] else '-'
+            lines.append(f"{name:<10} {d['port']:<16} {link:<5} {str(d['device_ready']):<5} "
+                         f"{str(d['flying']):<6} {d['queue_depth']:>5} {d['sent']:>6} "
+                         f"{d['confirmed']:>6} {d['lost']:>5}  {d['last_command'] or ''}")
+        skew = status['skew']
+        lines.append(f"{status['connected']}/{status['total']} connected, {status['flying']} flying, "
+                     f"{len(status['link_down'])} reconnecting; broadcast skew "
+                     f"p50 {skew['p50_ms']:.2f} ms, max {skew['max_ms']:.2f} ms")
+        for group, members in status['groups'].items():
+            lines.append(f"group {group}: {', '.join(members)}")
+        return "\n".join(lines)
+
+
+def run_text_mode(fleet):
+    """Type '<drone|group|all> <phrase>', 'status' or 'quit'"""
+    print("\n⌨️ Fleet control: '<drone|group|all> <command>', 'status', 'quit'")
+    while True:
+        try:
+            text = input("\n🚁 Fleet command: ").strip()
+        except (KeyboardInterrupt, EOFError):
+            print()
+            break
+        if text.lower() in ('quit', 'exit', 'q'):
+            break
+        if text.lower() == 'status':
+            print(fleet.format_status())
+        elif text:
+            try:
+                broadcast = fleet.process_text_command(text)
+            except KeyError as e:
+                print(f"❌ {e.args[0]}")
+                continue
+            if broadcast is None:
+                print("❓ I didn't understand that command")
+            else:
+                print(f"➡️ {broadcast.command} to {', '.join(broadcast.targets) or 'nobody'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('drones', nargs='*', metavar='NAME=PORT', help='Drones and their bridge ports')
+    parser.add_argument('--group', action='append', default=[], metavar='NAME=D1,D2',
+                        help='Define a group (repeatable)')
+    parser.add_argument('--emulate', type=int, default=0, metavar='N',
+                        help='Add N emulated bridges (drone1..droneN)')
+    parser.add_argument('--protocol', choices=DroneNLPController.PROTOCOLS, default='binary')
+    parser.add_argument('--baud', type=int, default=115200)
+    parser.add_argument('--vocabulary', default=VOCABULARY_FILE, metavar='FILE',
+                        help='Command vocabulary file (see vocabulary.py)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    fleet = Fleet(protocol=args.protocol, baud_rate=args.baud, vocabulary_file=args.vocabulary)
+    emulators = []
+    try:
+        for spec in args.drones:
+            name, _, port = spec.partition('=')
+            if not port:
+                parser.error(f"Expected NAME=PORT, got '{spec}'")
+            fleet.add_drone(name, port)
+        if args.emulate:
+            from device_emulator import DeviceEmulator
+            firmware = 'bridge' if args.protocol == 'binary' else 'controller'
+            for i in range(args.emulate):
+                emulator = DeviceEmulator(firmware, baud_rate=args.baud)
+                emulators.append(emulator)
+                fleet.add_drone(f"drone{i + 1}", emulator.start())
+        if not len(fleet):
+            parser.error("No drones: give NAME=PORT arguments or --emulate N")
+        for spec in args.group:
+            name, _, members = spec.partition('=')
+            fleet.set_group(name, [m for m in members.split(',') if m])
+
+        results = fleet.connect()
+        failed = [name for name, ok in results.items() if not ok]
+        print(f"🔌 {len(results) - len(failed)}/{len(results)} drones connected"
+              + (f" (failed: {', '.join(failed)})" if failed else ""))
+        run_text_mode(fleet)
+    finally:
+        fleet.disconnect()
+        for emulator in emulators:
+            emulator.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,400 @@
+"""
+Binary flight recorder and replay for the P8 PRO Drone Controller
+
+A FlightRecorder appends every parsed intent, every frame written to the
+serial port and every message from the device to preallocated,
+memory-mapped segment files. Each event is one struct.pack_into() into the
+map under a short lock - no formatting, no write() call, no flush - so
+recording stays on while flying. When a segment is full, the next one is
+started.
+
+Record layout (little endian):
+
+    segment header  magic(8) index(u32) reserved(u32) wall_time(f64) start_ns(u64)
+    record          timestamp_ns(u64) kind(u8) flags(u8) length(u16) payload
+
+Timestamps are time.monotonic_ns(). A zero kind marks the end of the data
+in a segment that was not closed cleanly.
+
+FlightLogReader streams records back one segment at a time without loading
+the log, and FlightReplayer feeds a recorded session back through a
+DroneNLPController at 1x, Nx or as-fast-as-possible speed. Replayed intents
+go through parsing and the scheduler; replayed frames go straight to the
+port.
+
+Usage:
+    python flight_log.py info logs/
+    python flight_log.py dump logs/flight-20250101-120000-000000-0000.p8log
+    python flight_log.py replay logs/ --port /dev/pts/3 --speed 4
+    python flight_log.py replay logs/ --emulate --speed max --mode frames
+"""
+
+import argparse
+import glob
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+
+MAGIC = b'P8FLOG1\0'
+SEGMENT_HEADER = struct.Struct('<8sIIdQ')
+RECORD_HEADER = struct.Struct('<QBBH')
+SEGMENT_SUFFIX = '.p8log'
+DEFAULT_SEGMENT_SIZE = 4 << 20
+MAX_PAYLOAD = 0xFFFF
+
+# Record kinds
+KIND_END = 0
+KIND_SESSION = 1      # JSON: protocol, port, baud rate
+KIND_INTENT = 2       # utterance \0 command ('' if nothing matched)
+KIND_FRAME = 3        # bytes written to the port
+KIND_RESPONSE = 4     # event kind \0 command \0 text
+KIND_NAMES = {KIND_SESSION: 'session', KIND_INTENT: 'intent',
+              KIND_FRAME: 'frame', KIND_RESPONSE: 'response'}
+
+# Frame flags
+FLAG_STREAM = 0x01    # written by the setpoint streamer, not a command
+FLAG_BINARY = 0x02    # 0xFF-framed bridge packet
+
+LogRecord = namedtuple('LogRecord', ['timestamp_ns', 'kind', 'flags', 'payload'])
+LogRecord.__doc__ = "One flight log record; payload is a bytes copy"
+
+_now_ns = time.monotonic_ns
+
+
+class FlightRecorder:
+    """Append-only recorder writing to memory-mapped segment files"""
+
+    def __init__(self, directory, segment_size=DEFAULT_SEGMENT_SIZE, session=None):
+        """
+        Args:
+            directory (str): Where segment files are created
+            segment_size (int): Bytes preallocated per segment file
+            session (dict): Written as the first record (protocol, port, ...)
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.segment_size = segment_size
+        self.prefix = os.path.join(directory, datetime.now().strftime('flight-%Y%m%d-%H%M%S-%f'))
+        self._lock = threading.Lock()
+        self._file = None
+        self._map = None
+        self._offset = 0
+        self._index = -1
+        self.records = 0
+        self.bytes = 0
+        self._open_segment()
+        if session is not None:
+            self.append(KIND_SESSION, json.dumps(session).encode())
+
+    @property
+    def path(self):
+        """Path of the segment being written"""
+        return f"{self.prefix}-{self._index:04d}{SEGMENT_SUFFIX}"
+
+    def _open_segment(self):
+        self._index += 1
+        self._file = open(self.path, 'w+b')
+        self._file.truncate(self.segment_size)
+        self._map = mmap.mmap(self._file.fileno(), self.segment_size)
+        SEGMENT_HEADER.pack_into(self._map, 0, MAGIC, self._index, 0, time.time(), _now_ns())
+        self._offset = SEGMENT_HEADER.size
+
+    def _close_segment(self):
+        used = self._offset
+        self._map.close()
+        # Trim the unused preallocation; readers also stop at a zero kind
+        self._file.truncate(used)
+        self._file.close()
+        self._map = None
+        self._file = None
+
+    def append(self, kind, payload, flags=0, timestamp_ns=None):
+        """Append one record (payload is truncated to 64 KiB)"""
+        if timestamp_ns is None:
+            timestamp_ns = _now_ns()
+        payload = payload[:MAX_PAYLOAD]
+        size = RECORD_HEADER.size + len(payload)
+        with self._lock:
+            if self._map is None:
+                return
+            if self._offset + size + RECORD_HEADER.size > self.segment_size:
+                self._close_segment()
+                self._open_segment()
+            offset = self._offset
+            RECORD_HEADER.pack_into(self._map, offset, timestamp_ns, kind, flags, len(payload))
+            start = offset + RECORD_HEADER.size
+            self._map[start:start + len(payload)] = payload
+            self._offset = start + len(payload)
+            self.records += 1
+            self.bytes += size
+
+    def log_intent(self, text, command):
+        self.append(KIND_INTENT, f"{text}\0{command or ''}".encode())
+
+    def log_frame(self, data, stream=False, binary=False):
+        flags = (FLAG_STREAM if stream else 0) | (FLAG_BINARY if binary else 0)
+        self.append(KIND_FRAME, bytes(data), flags)
+
+    def log_response(self, event):
+        """Record a serial_reader.DeviceEvent at the time it was received"""
+        payload = f"{event.kind}\0{event.command or ''}\0{event.text or ''}".encode()
+        self.append(KIND_RESPONSE, payload, timestamp_ns=int(event.timestamp * 1e9))
+
+    def close(self):
+        with self._lock:
+            if self._map is not None:
+                self._close_segment()
+
+    def get_stats(self):
+        return {'path': self.path, 'segments': self._index + 1,
+                'records': self.records, 'bytes': self.bytes}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def session_segments(path):
+    """
+    Segment files of one recording, in order
+
+    Args:
+        path (str): A segment file, its prefix, or a directory (latest session)
+    """
+    if os.path.isdir(path):
+        segments = sorted(glob.glob(os.path.join(path, f"flight-*{SEGMENT_SUFFIX}")))
+        if not segments:
+            return []
+        path = segments[-1]
+    if path.endswith(SEGMENT_SUFFIX):
+        path = path[:-len(SEGMENT_SUFFIX)].rsplit('-', 1)[0]
+    return sorted(glob.glob(glob.escape(path) + f"-[0-9][0-9][0-9][0-9]{SEGMENT_SUFFIX}"))
+
+
+class FlightLogReader:
+    """Stream records from a recorded session, one segment mapped at a time"""
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): A segment file, its prefix, or a directory (latest session)
+        """
+        self.segments = session_segments(path)
+        if not self.segments:
+            raise FileNotFoundError(f"No flight log found at {path}")
+
+    def __iter__(self):
+        header_size = RECORD_HEADER.size
+        for segment in self.segments:
+            with open(segment, 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                if size < SEGMENT_HEADER.size:
+                    continue
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    magic = SEGMENT_HEADER.unpack_from(data, 0)[0]
+                    if magic != MAGIC:
+                        raise ValueError(f"{segment} is not a flight log segment")
+                    offset = SEGMENT_HEADER.size
+                    while offset + header_size <= size:
+                        timestamp, kind, flags, length = RECORD_HEADER.unpack_from(data, offset)
+                        if kind == KIND_END:
+                            break
+                        start = offset + header_size
+                        yield LogRecord(timestamp, kind, flags, data[start:start + length])
+                        offset = start + length
+
+    def summary(self):
+        """Record counts per kind and the recorded duration"""
+        counts = {}
+        first = last = None
+        session = None
+        for record in self:
+            name = KIND_NAMES.get(record.kind, str(record.kind))
+            counts[name] = counts.get(name, 0) + 1
+            if first is None:
+                first = record.timestamp_ns
+            last = record.timestamp_ns
+            if record.kind == KIND_SESSION and session is None:
+                session = json.loads(record.payload)
+        return {
+            'segments': len(self.segments),
+            'records': sum(counts.values()),
+            'by_kind': counts,
+            'duration_s': (last - first) / 1e9 if first is not None else 0.0,
+            'session': session,
+        }
+
+
+def decode_record(record):
+    """Human-readable fields of a record"""
+    if record.kind == KIND_INTENT:
+        text, command = record.payload.decode('utf-8', 'replace').split('\0', 1)
+        return {'text': text, 'command': command or None}
+    if record.kind == KIND_FRAME:
+        return {'data': record.payload, 'stream': bool(record.flags & FLAG_STREAM),
+                'binary': bool(record.flags & FLAG_BINARY)}
+    if record.kind == KIND_RESPONSE:
+        kind, command, text = record.payload.decode('utf-8', 'replace').split('\0', 2)
+        return {'event': kind, 'command': command or None, 'text': text or None}
+    if record.kind == KIND_SESSION:
+        return json.loads(record.payload)
+    return {'payload': record.payload}
+
+
+class FlightReplayer:
+    """Feed a recorded session back through a DroneNLPController"""
+
+    MODES = ('intents', 'frames')
+
+    def __init__(self, controller, path, speed=1.0, mode='intents', include_stream=False):
+        """
+        Args:
+            controller (DroneNLPController): Connected controller to replay into
+            path (str): Flight log (see session_segments)
+            speed (float): 1.0 = recorded timing, N = N times faster,
+                None or 0 = as fast as possible
+            mode (str): 'intents' re-parses recorded utterances and runs them
+                through the scheduler; 'frames' writes the recorded frames
+                to the port unchanged
+            include_stream (bool): In frames mode, also replay setpoint-stream frames
+        """
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown replay mode '{mode}', expected one of {self.MODES}")
+        self.controller = controller
+        self.reader = FlightLogReader(path)
+        self.speed = speed or None
+        self.mode = mode
+        self.include_stream = include_stream
+        self._stop = threading.Event()
+
+        self.replayed = 0
+        self.late = 0
+        self.max_lateness = 0.0
+
+    def stop(self):
+        self._stop.set()
+
+    def _events(self):
+        for record in self.reader:
+            if self.mode == 'intents' and record.kind == KIND_INTENT:
+                yield record
+            elif self.mode == 'frames' and record.kind == KIND_FRAME:
+                if self.include_stream or not record.flags & FLAG_STREAM:
+                    yield record
+
+    def run(self):
+        """Replay the session; returns statistics"""
+        start = time.monotonic()
+        first_ns = None
+        for record in self._events():
+            if self._stop.is_set():
+                break
+            if first_ns is None:
+                first_ns = record.timestamp_ns
+            if self.speed:
+                due = start + (record.timestamp_ns - first_ns) / 1e9 / self.speed
+                delay = due - time.monotonic()
+                if delay > 0:
+                    if self._stop.wait(delay):
+                        break
+                elif delay < -0.002:
+                    self.late += 1
+                    self.max_lateness = max(self.max_lateness, -delay)
+            self._replay(record)
+            self.replayed += 1
+        if self.mode == 'intents':
+            self.controller.command_queue.join()
+        return self.get_stats(time.monotonic() - start)
+
+    def _replay(self, record):
+        fields = decode_record(record)
+        if self.mode == 'intents':
+            if fields['text']:
+                self.controller.process_text_command(fields['text'])
+            elif fields['command']:
+                self.controller.enqueue_command(fields['command'])
+        else:
+            data = fields['data']
+            command = None if fields['binary'] else data.decode('ascii', 'replace').strip()
+            self.controller.send_raw(data, command)
+
+    def get_stats(self, elapsed=None):
+        stats = {'mode': self.mode, 'speed': self.speed or 'max', 'replayed': self.replayed,
+                 'late': self.late, 'max_lateness_ms': self.max_lateness * 1000}
+        if elapsed is not None:
+            stats['elapsed_s'] = elapsed
+        return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    sub = parser.add_subparsers(dest='action', required=True)
+    info = sub.add_parser('info', help='Summarize a recorded session')
+    info.add_argument('log')
+    dump = sub.add_parser('dump', help='Print every record')
+    dump.add_argument('log')
+    replay = sub.add_parser('replay', help='Replay a session into a port')
+    replay.add_argument('log')
+    replay.add_argument('--port', help='Serial port to replay into')
+    replay.add_argument('--emulate', action='store_true', help='Replay into a device emulator')
+    replay.add_argument('--protocol', choices=('text', 'binary'),
+                        help='Default: the protocol recorded in the session')
+    replay.add_argument('--speed', default='1', help="Speed factor, or 'max'")
+    replay.add_argument('--mode', choices=FlightReplayer.MODES, default='intents')
+    replay.add_argument('--include-stream', action='store_true')
+    args = parser.parse_args()
+
+    reader = FlightLogReader(args.log)
+    if args.action == 'info':
+        print(json.dumps(reader.summary(), indent=2))
+        return
+    if args.action == 'dump':
+        first = None
+        for record in reader:
+            first = record.timestamp_ns if first is None else first
+            print(f"{(record.timestamp_ns - first) / 1e6:12.3f} ms  "
+                  f"{KIND_NAMES.get(record.kind, record.kind):<9} {decode_record(record)}")
+        return
+
+    session = reader.summary()['session'] or {}
+    protocol = args.protocol or session.get('protocol', 'text')
+    speed = None if args.speed == 'max' else float(args.speed)
+
+    from drone_nlp_controller import DroneNLPController
+
+    emulator = None
+    port = args.port
+    if args.emulate:
+        from device_emulator import DeviceEmulator
+        emulator = DeviceEmulator('bridge' if protocol == 'binary' else 'controller')
+        port = emulator.start()
+    if not port:
+        parser.error("replay needs --port or --emulate")
+
+    controller = DroneNLPController(arduino_port=port, protocol=protocol)
+    if not controller.connect_arduino():
+        return
+    try:
+        replayer = FlightReplayer(controller, args.log, speed, args.mode, args.include_stream)
+        try:
+            stats = replayer.run()
+        except KeyboardInterrupt:
+            replayer.stop()
+            stats = replayer.get_stats()
+        print(json.dumps(stats, indent=2))
+        print(f"Device acknowledgements: {controller.ack_tracker.get_stats()}")
+    finally:
+        controller.disconnect_arduino()
+        if emulator is not None:
+            emulator.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,237 @@
+"""
+Fuzzy intent recovery for the P8 PRO Drone Natural Language Controller
+
+When speech recognition mishears a command ("take of", "lend", "rotate
+rite"), the exact IntentMatcher finds nothing and the operator has to speak
+again. FuzzyIntentMatcher is the fallback: it finds the closest command
+phrase and says how sure it is.
+
+Every literal phrase of the command table ("take off", "lift off", "land",
+"rotate right", ...) is reduced to a rough phonetic key: silent and
+look-alike letters folded ("right" and "rite" both give "rt"), vowels after
+the first letter dropped, doubled letters collapsed. The character trigrams
+of these keys go into an inverted index once, when the matcher is built. A
+lookup keys each run of words of the utterance the same way and counts shared
+trigrams through the index, so only phrases that sound alike are ever looked
+at. Those few are then scored on spelling too, and the confidence is the mean
+of the two similarities.
+
+Intents that put the drone in the air (SAFETY_CRITICAL) are only guessed
+above a higher confidence, and never from a single word ("lunch" sounds just
+like "launch"); otherwise the matcher gives up rather than guess.
+"""
+
+import re
+from collections import namedtuple
+from difflib import SequenceMatcher
+from functools import lru_cache
+
+from intent_matcher import COMMAND_PATTERNS, EMERGENCY_PATTERN, compile_pattern, normalize_utterance
+
+# Lowest confidence at which any intent is guessed
+MIN_CONFIDENCE = 0.7
+# Intents that arm or climb, and the confidence they need before being guessed
+SAFETY_CRITICAL = ('TAKEOFF', 'UP')
+CRITICAL_CONFIDENCE = 0.9
+# Phonetic similarity a phrase needs to be scored at all
+CANDIDATE_SIMILARITY = 0.5
+
+FuzzyMatch = namedtuple('FuzzyMatch', ['command', 'confidence', 'phrase', 'heard'])
+FuzzyMatch.__doc__ = "A recovered intent, the phrase it was matched to and the words it was heard in"
+
+_WORD = re.compile(r"[a-z']+")
+_LITERAL = re.compile(r"[a-z ]+")
+_SPACE = re.compile(r"\\s[*+]")
+
+# Spellings that sound alike, folded before vowels are dropped (order matters)
+_FOLDS = (
+    ("'", ""), ("ph", "f"), ("ght", "t"), ("gh", "g"), ("ck", "k"), ("wr", "r"),
+    ("sce", "se"), ("sci", "si"),
+    ("kn", "n"), ("wh", "w"), ("qu", "kw"), ("x", "ks"), ("c", "k"), ("z", "s"),
+)
+_VOWELS = str.maketrans("", "", "aeiouy")
+
+
+def phonetic_key(word):
+    """
+    Rough sound of one word: "right", "rite" and "write" all give "rt"
+
+    Args:
+        word (str): Lower-case word
+    """
+    for spelling, sound in _FOLDS:
+        word = word.replace(spelling, sound)
+    if not word:
+        return word
+    key = word[0] + word[1:].translate(_VOWELS)
+    # Doubled letters sound like one ("off" and "of")
+    return "".join(c for i, c in enumerate(key) if i == 0 or c != key[i - 1])
+
+
+def trigrams(key):
+    """Character trigrams of a key, padded so short keys still have some"""
+    padded = f" {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+@lru_cache(maxsize=4096)
+def phrase_trigrams(phrase):
+    """Trigrams of a whole phrase's phonetic key (kept across rebuilds)"""
+    return frozenset(trigrams(" ".join(phonetic_key(w) for w in phrase.split())))
+
+
+@lru_cache(maxsize=1 << 18)
+def pattern_matches(pattern, phrase):
+    """Whether one source pattern matches a phrase (kept across rebuilds)"""
+    return compile_pattern(pattern).search(phrase) is not None
+
+
+def phrase_command(phrase, command_patterns):
+    """
+    The command IntentMatcher would give a phrase: the first in priority
+    order with a matching pattern, else LAND (an emergency phrase)
+    """
+    for command, patterns in command_patterns.items():
+        for pattern in patterns:
+            if pattern_matches(pattern, phrase):
+                return command.upper()
+    return "LAND"
+
+
+def literal_phrases(pattern):
+    """
+    The phrases a command pattern spells out
+
+    Only the plain form the command table uses is understood:
+    r'\\b(take\\s*off|launch)\\b' gives ["take off", "launch"]. Anything else
+    gives no phrases (it is still matched exactly by IntentMatcher).
+    """
+    body = pattern
+    if body.startswith(r'\b(') and body.endswith(r')\b'):
+        body = body[3:-3]
+    phrases = []
+    for alternative in body.split('|'):
+        phrase = " ".join(_SPACE.sub(" ", alternative).split())
+        if phrase and _LITERAL.fullmatch(phrase):
+            phrases.append(phrase)
+    return phrases
+
+
+class FuzzyIntentMatcher:
+    """Closest-sounding command phrase, found through a phonetic trigram index"""
+
+    def __init__(self, command_patterns=None, min_confidence=MIN_CONFIDENCE,
+                 critical_confidence=CRITICAL_CONFIDENCE, cache_size=1024, phrases=None):
+        """
+        Index every literal phrase of a command table
+
+        Args:
+            command_patterns (dict): Command name to regex list, in priority
+                order (default: COMMAND_PATTERNS). Each phrase stands for
+                the command IntentMatcher gives it ("stop now" is STOP).
+            min_confidence (float): Lowest confidence that is guessed
+            critical_confidence (float): Lowest confidence for SAFETY_CRITICAL intents
+            cache_size (int): Number of normalized utterances kept in the LRU cache
+            phrases (list): (phrase, command, trigrams) per phrase, as
+                phrase_table() gives for the same command_patterns; skips
+                labelling the phrases (vocabulary.py keeps this on disk)
+        """
+        if command_patterns is None:
+            command_patterns = COMMAND_PATTERNS
+        self.min_confidence = min_confidence
+        self.critical_confidence = critical_confidence
+
+        if phrases is None:
+            vocabulary = {}
+            for pattern in [p for patterns in command_patterns.values() for p in patterns] + [EMERGENCY_PATTERN]:
+                for phrase in literal_phrases(pattern):
+                    if phrase not in vocabulary:
+                        vocabulary[phrase] = phrase_command(phrase, command_patterns)
+            grams_of = phrase_trigrams
+        else:
+            vocabulary = {phrase: command for phrase, command, _ in phrases}
+            known = {phrase: frozenset(grams) for phrase, _, grams in phrases}
+            grams_of = known.__getitem__
+        self.vocabulary = vocabulary
+
+        # Phrase number -> (phrase, command, trigram count); the index maps
+        # (word count, trigram) -> phrase numbers, so a run of n words is
+        # only compared with n-word phrases
+        self._phrases = []
+        self._index = {}
+        for number, (phrase, command) in enumerate(vocabulary.items()):
+            length = phrase.count(' ') + 1
+            grams = grams_of(phrase)
+            self._phrases.append((phrase, command, len(grams)))
+            for gram in grams:
+                self._index.setdefault((length, gram), []).append(number)
+        self._lengths = sorted({p.count(' ') + 1 for p in vocabulary})
+
+        self._cached_best = lru_cache(maxsize=cache_size)(self._best_normalized)
+
+    def phrase_table(self):
+        """Every indexed phrase as [phrase, command, sorted trigrams] (plain JSON data)"""
+        return [[phrase, command, sorted(phrase_trigrams(phrase))] for phrase, command, _ in self._phrases]
+
+    def _best_normalized(self, text):
+        words = _WORD.findall(text)
+        keys = [phonetic_key(w) for w in words]
+        index = self._index
+        phrases = self._phrases
+        best = None
+        for n in self._lengths:
+            for start in range(len(words) - n + 1):
+                grams = trigrams(" ".join(keys[start:start + n]))
+                shared = {}
+                for gram in grams:
+                    for number in index.get((n, gram), ()):
+                        shared[number] = shared.get(number, 0) + 1
+                heard = None
+                for number, count in shared.items():
+                    phrase, command, size = phrases[number]
+                    sound = 2 * count / (len(grams) + size)
+                    if sound < CANDIDATE_SIMILARITY:
+                        continue
+                    if heard is None:
+                        heard = " ".join(words[start:start + n])
+                    spelling = SequenceMatcher(None, heard, phrase).ratio()
+                    confidence = (sound + spelling) / 2
+                    if best is None or confidence > best.confidence:
+                        best = FuzzyMatch(command, confidence, phrase, heard)
+        return best
+
+    def best(self, text):
+        """
+        The closest phrase however unsure, or None if nothing sounds alike
+
+        Args:
+            text (str): Raw utterance
+
+        Returns:
+            FuzzyMatch: (command, confidence 0..1, phrase, heard)
+        """
+        return self._cached_best(normalize_utterance(text))
+
+    def match(self, text):
+        """
+        The intent to act on, or None when a guess would be too unsure
+
+        A SAFETY_CRITICAL intent below critical_confidence, or matched to a
+        one-word phrase, gives None rather than the next best phrase.
+
+        Returns:
+            FuzzyMatch: As best(), or None
+        """
+        best = self.best(text)
+        if best is None:
+            return None
+        if best.command in SAFETY_CRITICAL:
+            if best.confidence < self.critical_confidence or ' ' not in best.phrase:
+                return None
+        elif best.confidence < self.min_confidence:
+            return None
+        return best
+
+    def cache_info(self):
+        """Expose LRU cache statistics"""
+        return self._cached_best.cache_info()
@@ -0,0 +1,272 @@
+"""
+Compiled intent matcher for the P8 PRO Drone Natural Language Controller
+
+All command patterns are folded into a single regular expression that is
+compiled once. One scan over the utterance finds every intent that matches and
+the winner is picked by the same priority order that the original
+pattern-by-pattern loop used (command table order, then emergency).
+
+parse_all() reads the same scan in order of position instead, for utterances
+that chain several commands ("take off then go forward slowly and rotate
+right"), and attaches speed modifiers to the command they belong to.
+"""
+
+import re
+from collections import namedtuple
+from functools import lru_cache
+from itertools import repeat
+
+# Natural language command patterns, in priority order
+COMMAND_PATTERNS = {
+    'takeoff': [
+        r'\b(take\s*off|launch|start\s*flying|lift\s*off|go\s*up)\b',
+        r'\b(begin\s*flight|start\s*drone)\b'
+    ],
+    'land': [
+        r'\b(land|landing|come\s*down|touch\s*down)\b',
+        r'\b(stop\s*flying|end\s*flight)\b'
+    ],
+    'up': [
+        r'\b(go\s*up|move\s*up|rise|ascend|higher|climb)\b',
+        r'\b(increase\s*altitude|fly\s*higher)\b'
+    ],
+    'down': [
+        r'\b(go\s*down|move\s*down|descend|lower|drop)\b',
+        r'\b(decrease\s*altitude|fly\s*lower)\b'
+    ],
+    'forward': [
+        r'\b(go\s*forward|move\s*forward|ahead|front)\b',
+        r'\b(fly\s*forward|move\s*ahead)\b'
+    ],
+    'backward': [
+        r'\b(go\s*back|move\s*back|backward|behind|reverse)\b',
+        r'\b(fly\s*backward|move\s*back)\b'
+    ],
+    'left': [
+        r'\b(go\s*left|move\s*left|turn\s*left|left\s*side)\b',
+        r'\b(fly\s*left|drift\s*left)\b'
+    ],
+    'right': [
+        r'\b(go\s*right|move\s*right|turn\s*right|right\s*side)\b',
+        r'\b(fly\s*right|drift\s*right)\b'
+    ],
+    'rotate_left': [
+        r'\b(rotate\s*left|spin\s*left|turn\s*around\s*left)\b',
+        r'\b(yaw\s*left|twist\s*left)\b'
+    ],
+    'rotate_right': [
+        r'\b(rotate\s*right|spin\s*right|turn\s*around\s*right)\b',
+        r'\b(yaw\s*right|twist\s*right)\b'
+    ],
+    'stop': [
+        r'\b(stop|halt|freeze|hover|stay|pause)\b',
+        r'\b(hold\s*position|stay\s*still)\b'
+    ]
+}
+
+# Emergency phrases map to LAND but rank below every regular command
+EMERGENCY_PATTERN = r'\b(emergency|help|stop\s*now|kill)\b'
+
+# Speed/intensity modifiers (not an intent on their own) and the stick
+# deflection they stand for, relative to the firmware's fixed step
+MAGNITUDES = {
+    'slowly': 0.5, 'slow': 0.5, 'gently': 0.5, 'slightly': 0.5,
+    'a little': 0.5, 'a bit': 0.5,
+    'fast': 1.5, 'quickly': 1.5, 'quick': 1.5,
+    'a lot': 2.0,
+}
+SPEED_PATTERN = r'\b(' + '|'.join(w.replace(' ', r'\s+') for w in MAGNITUDES) + r')\b'
+
+# Words between two commands that start a new step for a modifier
+_CONNECTOR = re.compile(r'\b(then|and|after that)\b|[,;]')
+
+Intent = namedtuple('Intent', ['command', 'magnitude'])
+Intent.__doc__ = "One command of an utterance and its stick deflection factor (1.0 = firmware step)"
+
+
+_WORD_START = re.compile(r"\b\w")
+
+
+def _word_starts(text):
+    """Offsets of every word start in `text`"""
+    return [m.start() for m in _WORD_START.finditer(text)]
+
+
+def normalize_utterance(text):
+    """Lower-case an utterance and collapse runs of whitespace"""
+    return " ".join(text.lower().split())
+
+
+@lru_cache(maxsize=1024)
+def compile_pattern(pattern):
+    """
+    One source pattern, compiled only the first time it is seen
+
+    Rebuilding a matcher after a vocabulary change only compiles the
+    patterns that are new. The most recently used 1024 are kept, well over
+    the built-in table plus a large vocabulary file, so patterns dropped
+    from the file over a long run are eventually freed.
+
+    Raises:
+        re.error: The pattern is not a valid regular expression
+    """
+    return re.compile(pattern)
+
+
+def pattern_groups(pattern):
+    """Number of capture groups of one source pattern"""
+    return compile_pattern(pattern).groups
+
+
+class IntentMatcher:
+    """Single-pass matcher over a priority-ordered command pattern table"""
+
+    def __init__(self, command_patterns=None, cache_size=4096):
+        """
+        Compile the command table into one combined expression
+
+        Args:
+            command_patterns (dict): Mapping of command name to regex list, in
+                priority order. Defaults to COMMAND_PATTERNS.
+            cache_size (int): Number of normalized utterances kept in the LRU cache
+        """
+        if command_patterns is None:
+            command_patterns = COMMAND_PATTERNS
+        self.command_patterns = command_patterns
+
+        # Each source pattern becomes one alternative wrapped in its own group;
+        # the wrapping group closes after any groups inside the source pattern,
+        # so Match.lastindex identifies which alternative matched.
+        alternatives = []
+        self._group_intent = {}
+        self._group_priority = {}
+        priority = 0
+        group = 1
+        for command, patterns in command_patterns.items():
+            for pattern in patterns:
+                alternatives.append(f"({pattern})")
+                self._group_intent[group] = command.upper()
+                self._group_priority[group] = priority
+                group += 1 + pattern_groups(pattern)
+            priority += 1
+
+        alternatives.append(f"({EMERGENCY_PATTERN})")
+        self._group_intent[group] = "LAND"
+        self._group_priority[group] = priority
+        self._emergency_group = group
+        group += 1 + pattern_groups(EMERGENCY_PATTERN)
+
+        alternatives.append(f"({SPEED_PATTERN})")
+        self._speed_group = group
+
+        # Utterances are lower-cased before matching, so no IGNORECASE
+        # (which makes the engine noticeably slower).
+        combined = "|".join(alternatives)
+        all_patterns = [p for patterns in command_patterns.values() for p in patterns]
+        self._word_anchored = all(p.startswith(r"\b") for p in all_patterns)
+        if self._word_anchored:
+            # Every alternative starts at a word boundary: try the alternation
+            # only where a word starts. A match at one word never consumes text
+            # that a higher priority pattern needs at a later word.
+            self.pattern = re.compile(combined)
+        else:
+            # Generic fallback: a zero-width lookahead tried at every position
+            self.pattern = re.compile(f"(?={combined})")
+
+        self._cached_match = lru_cache(maxsize=cache_size)(self._match_normalized)
+        self._cached_parse_all = lru_cache(maxsize=cache_size)(self._parse_all_normalized)
+
+    def _scan(self, text):
+        """Return one match object per position where some alternative matches"""
+        if self._word_anchored:
+            match_at = self.pattern.match
+            return [m for m in map(match_at, repeat(text), _word_starts(text)) if m is not None]
+        return list(self.pattern.finditer(text))
+
+    def _match_normalized(self, text):
+        """Scan a normalized utterance and return (intent, speed_modifier)"""
+        group_priority = self._group_priority
+        best_group = None
+        best_priority = None
+        speed = None
+        for m in self._scan(text):
+            group = m.lastindex
+            priority = group_priority.get(group)
+            if priority is None:
+                if speed is None:
+                    speed = m.group(group)
+            elif best_priority is None or priority < best_priority:
+                best_group = group
+                best_priority = priority
+
+        intent = self._group_intent[best_group] if best_group is not None else None
+        return intent, speed
+
+    def _parse_all_normalized(self, text):
+        """Scan a normalized utterance and return its intents in spoken order"""
+        group_intent = self._group_intent
+        speed_group = self._speed_group
+        intents = []
+        pending = None
+        last_end = 0
+        consumed = 0
+        for m in self._scan(text):
+            group = m.lastindex
+            start = m.start(group)
+            if start < consumed:
+                # Inside the words of the previous match
+                continue
+            consumed = m.end(group)
+            if group == self._emergency_group:
+                # An emergency overrides everything else that was said
+                return (Intent("LAND", 1.0),)
+            if group == speed_group:
+                factor = MAGNITUDES[" ".join(m.group(group).split())]
+                if (intents and intents[-1].magnitude == 1.0
+                        and not _CONNECTOR.search(text, last_end, start)):
+                    # "go forward slowly"
+                    intents[-1] = intents[-1]._replace(magnitude=factor)
+                else:
+                    # "slowly go forward", "... then slowly go forward"
+                    pending = factor
+                continue
+            intents.append(Intent(group_intent[group], pending or 1.0))
+            pending = None
+            last_end = consumed
+        return tuple(intents)
+
+    def match(self, text):
+        """
+        Find the winning intent for an utterance
+
+        Args:
+            text (str): Raw utterance
+
+        Returns:
+            tuple: (intent or None, speed modifier or None)
+        """
+        return self._cached_match(normalize_utterance(text))
+
+    def parse(self, text):
+        """Return only the winning intent (e.g. 'TAKEOFF') or None"""
+        return self.match(text)[0]
+
+    def parse_all(self, text):
+        """
+        Every intent of an utterance, in the order spoken, from the same single scan
+
+        Each match claims its words, so "go back" is one BACKWARD rather than
+        BACKWARD plus whatever "back" alone might match. An emergency phrase
+        anywhere returns just LAND.
+
+        Args:
+            text (str): Raw utterance
+
+        Returns:
+            tuple: Intent(command, magnitude) per command (empty if none)
+        """
+        return self._cached_parse_all(normalize_utterance(text))
+
+    def cache_info(self):
+        """Expose LRU cache statistics"""
+        return self._cached_match.cache_info()
@@ -0,0 +1,153 @@
+"""
+Per-command latency tracing for the P8 PRO Drone Controller
+
+Every command carries a CommandTrace: one monotonic timestamp per pipeline
+stage, from audio capture to the device's acknowledgement. Finished traces
+feed a LatencyRecorder that keeps a rolling window of stage-to-stage
+latencies and reports p50/p95/p99 per stage. Marking a stage is a clock read
+and a list store, cheap enough to leave on all the time.
+"""
+
+import json
+import threading
+import time
+from collections import deque
+
+STAGES = ('captured', 'recognized', 'parsed', 'enqueued', 'dequeued', 'written', 'acknowledged')
+STAGE_INDEX = {name: index for index, name in enumerate(STAGES)}
+
+CAPTURED, RECOGNIZED, PARSED, ENQUEUED, DEQUEUED, WRITTEN, ACKNOWLEDGED = range(len(STAGES))
+
+_now_ns = time.monotonic_ns
+
+
+def percentile(samples, fraction):
+    """Nearest-rank percentile of a sequence (0.0 for an empty one)"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))
+    return ordered[index]
+
+
+class CommandTrace:
+    """Monotonic nanosecond timestamps of one command, indexed by stage"""
+
+    __slots__ = ('command', 'stamps', 'outcome')
+
+    def __init__(self, command=None):
+        self.command = command
+        self.stamps = [0] * len(STAGES)
+        self.outcome = None
+
+    def mark(self, stage, timestamp_ns=None):
+        """Record that the command reached `stage` (now, or at timestamp_ns)"""
+        self.stamps[stage] = _now_ns() if timestamp_ns is None else timestamp_ns
+
+    def mark_seconds(self, stage, monotonic_seconds):
+        """Record a stage from a time.monotonic() value"""
+        self.stamps[stage] = int(monotonic_seconds * 1e9)
+
+    def as_dict(self):
+        return {
+            'command': self.command,
+            'outcome': self.outcome,
+            'stamps_ns': {STAGES[i]: t for i, t in enumerate(self.stamps) if t},
+        }
+
+
+class LatencyRecorder:
+    """Rolling per-stage latency histograms"""
+
+    def __init__(self, window=2048):
+        """
+        Args:
+            window (int): Number of recent samples kept per stage
+        """
+        self.window = window
+        self._lock = threading.Lock()
+        # Latency into each stage from the previous stage the trace reached
+        self._stage_samples = {name: deque(maxlen=window) for name in STAGES[1:]}
+        self._total_samples = deque(maxlen=window)
+        self._recent = deque(maxlen=min(window, 256))
+        self.recorded = 0
+        self.outcomes = {}
+
+    def record(self, trace, outcome='ok'):
+        """Add a finished (or abandoned) trace"""
+        trace.outcome = outcome
+        stamps = trace.stamps
+        samples = []
+        previous = None
+        first = None
+        for index, stamp in enumerate(stamps):
+            if not stamp:
+                continue
+            if previous is None:
+                first = stamp
+            else:
+                samples.append((STAGES[index], stamp - previous))
+            previous = stamp
+        with self._lock:
+            for name, delta in samples:
+                self._stage_samples[name].append(delta)
+            if first is not None and previous != first:
+                self._total_samples.append(previous - first)
+            self._recent.append(trace)
+            self.recorded += 1
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+
+    @staticmethod
+    def _summary(samples):
+        return {
+            'count': len(samples),
+            'p50_ms': percentile(samples, 0.50) / 1e6,
+            'p95_ms': percentile(samples, 0.95) / 1e6,
+            'p99_ms': percentile(samples, 0.99) / 1e6,
+            'max_ms': (max(samples) if samples else 0) / 1e6,
+        }
+
+    def get_stats(self):
+        """
+        Per-stage percentiles
+
+        Returns:
+            dict: {'stages': {stage: {count, p50_ms, p95_ms, p99_ms, max_ms}},
+                   'total': {...}, 'recorded': n, 'outcomes': {...}}
+        """
+        with self._lock:
+            stage_samples = {name: list(s) for name, s in self._stage_samples.items()}
+            total = list(self._total_samples)
+            recorded = self.recorded
+            outcomes = dict(self.outcomes)
+        return {
+            'stages': {name: self._summary(s) for name, s in stage_samples.items() if s},
+            'total': self._summary(total),
+            'recorded': recorded,
+            'outcomes': outcomes,
+        }
+
+    def export(self, path):
+        """Write the current statistics and the most recent traces as JSON"""
+        with self._lock:
+            recent = [trace.as_dict() for trace in self._recent]
+        data = self.get_stats()
+        data['exported_at'] = time.time()
+        data['recent_traces'] = recent
+        with open(path, 'w') as f:
+            json.dump(data, f, indent=2)
+        return path
+
+    def format_table(self):
+        """Human-readable per-stage table for the CLI"""
+        stats = self.get_stats()
+        lines = [f"{'stage':<14}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"]
+        for name in STAGES[1:]:
+            s = stats['stages'].get(name)
+            if s:
+                lines.append(f"{name:<14}{s['count']:>7}{s['p50_ms']:>10.2f}"
+                             f"{s['p95_ms']:>10.2f}{s['p99_ms']:>10.2f}")
+        t = stats['total']
+        lines.append(f"{'total':<14}{t['count']:>7}{t['p50_ms']:>10.2f}"
+                     f"{t['p95_ms']:>10.2f}{t['p99_ms']:>10.2f}")
+        return "\n".join(lines)
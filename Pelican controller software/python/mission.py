@@ -0,0 +1,385 @@
+"""
+Timed missions for the P8 PRO Drone Controller
+
+A mission is a script of steps, one per line or chained in one utterance:
+"take off, then go forward slowly for 2 seconds, then rotate right for half a
+second, then land". compile_mission() turns it into a timeline of absolute
+setpoint changes, each at a fixed offset from the start of the mission:
+
+- "for N seconds" sets how long a movement lasts; the stick returns to centre
+  when it is over. Without one, a movement lasts DEFAULT_MOVE_S.
+- "slowly", "fast", "a lot", ... scale the stick deflection and the throttle
+  step (intent_matcher.MAGNITUDES)
+- step phrases are parsed like live commands (vocabulary.parse_intents), so
+  phrases from the vocabulary file and misheard words work here too
+- "stop", "hover" and "wait", with or without a duration, hold position:
+  the sticks centre and the throttle is kept (unlike the firmware's STOP,
+  which also cuts the throttle)
+- "go up" and "go down" with a duration climb or sink for that long; without
+  one they change the throttle for good, like the firmware's UP and DOWN
+- LAND ends the mission
+
+A MissionRunner plays the timeline on its own thread. Every change has an
+absolute monotonic-clock deadline computed from the start time, so a late
+change never pushes later ones back (no sleep drift), and the runner records
+how late each one was queued and written. abort() stops a mission between
+changes and centres the sticks, so a drone stopped mid-movement hovers
+instead of flying on; a LAND or STOP from anyone else preempts it.
+
+In script files, '#' starts a comment.
+"""
+
+import re
+import threading
+import time
+from collections import namedtuple
+
+from intent_matcher import IntentMatcher, normalize_utterance
+from latency_trace import CommandTrace, percentile, WRITTEN
+from setpoint import NEUTRAL, CENTER, TAKEOFF_THROTTLE, apply_command, to_custom_command
+from vocabulary import shared_store, parse_intents
+
+# Step timing defaults, in seconds
+DEFAULT_MOVE_S = 1.0
+TAKEOFF_SETTLE_S = 2.0
+MAX_STEP_S = 60.0
+
+# Runner states
+MISSION_READY = 'ready'
+MISSION_RUNNING = 'running'
+MISSION_DONE = 'done'
+MISSION_ABORTED = 'aborted'
+MISSION_PREEMPTED = 'preempted'
+MISSION_FAILED = 'failed'
+
+HOVER = 'HOVER'
+
+STEP_SEPARATOR = re.compile(r'\s*(?:[,;]|\band then\b|\bthen\b|\bafter that\b|\band\b)\s*')
+WAIT_PATTERN = re.compile(r'^(wait|hold|sleep|delay)\b')
+NUMBER_WORDS = {
+    'half a': 0.5, 'a': 1, 'an': 1, 'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5,
+    'six': 6, 'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10,
+}
+DURATION_PATTERN = re.compile(
+    r'\b(?:for\s+)?(\d+(?:\.\d+)?|' + '|'.join(NUMBER_WORDS) + r')\s*'
+    r'(milliseconds?|ms|seconds?|secs?|s)\b')
+
+MissionStep = namedtuple('MissionStep', ['index', 'text', 'command', 'magnitude', 'start', 'duration'])
+MissionStep.__doc__ = "One parsed step; start and duration in seconds from the mission start"
+
+SetpointChange = namedtuple('SetpointChange', ['at', 'step', 'command', 'setpoint', 'label'])
+SetpointChange.__doc__ = "One timeline entry: the command word to queue `at` seconds in"
+
+Mission = namedtuple('Mission', ['steps', 'changes', 'duration'])
+Mission.__doc__ = "A compiled mission: its steps, its timeline and its length in seconds"
+
+
+class MissionError(ValueError):
+    """A mission script that cannot be compiled"""
+
+
+# Vocabulary digest -> the vocabulary without its takeoff phrases
+_airborne = {}
+
+
+def airborne_vocabulary(vocabulary):
+    """
+    A vocabulary for steps flown in the air
+
+    "go up" is a TAKEOFF phrase on the ground but a climb once airborne, so
+    the exact matcher leaves the takeoff phrases out. Built once per table.
+    """
+    matcher = _airborne.get(vocabulary.digest)
+    if matcher is None:
+        matcher = IntentMatcher({command: patterns for command, patterns in vocabulary.patterns.items()
+                                 if command != 'takeoff'})
+        _airborne.clear()
+        _airborne[vocabulary.digest] = matcher
+    return vocabulary._replace(matcher=matcher)
+
+
+def split_steps(script):
+    """Split a script or a chained utterance into step phrases"""
+    steps = []
+    for line in script.splitlines():
+        line = line.split('#', 1)[0]
+        steps.extend(part.strip() for part in STEP_SEPARATOR.split(line) if part.strip())
+    return steps
+
+
+def parse_duration(phrase):
+    """Seconds named in a phrase ("for 2 seconds", "half a second", "500 ms"), or None"""
+    m = DURATION_PATTERN.search(phrase)
+    if m is None:
+        return None
+    amount, unit = m.groups()
+    value = NUMBER_WORDS[amount] if amount in NUMBER_WORDS else float(amount)
+    return value / 1000 if unit.startswith('m') else float(value)
+
+
+def compile_mission(script, setpoint=NEUTRAL, flying=False, vocabulary=None):
+    """
+    Compile a mission script into a timeline of setpoint changes
+
+    Args:
+        script (str): Steps, one per line or separated by "then", "and" or commas
+        setpoint (Setpoint): Stick values when the mission starts
+        flying (bool): Whether the drone is already in the air
+        vocabulary (vocabulary.Vocabulary): Table to parse the steps with
+            (default: that of vocabulary.VOCABULARY_FILE)
+
+    Returns:
+        Mission
+
+    Raises:
+        MissionError: A step has no command, moves the drone on the ground,
+            lasts too long or follows LAND
+    """
+    if vocabulary is None:
+        vocabulary = shared_store().current
+    steps = []
+    changes = []
+    t = 0.0
+    phrases = split_steps(script)
+    if not phrases:
+        raise MissionError("The mission has no steps")
+
+    for index, text in enumerate(phrases):
+        if steps and steps[-1].command == 'LAND':
+            raise MissionError(f"Step {index + 1} ('{text}') comes after LAND")
+        phrase = normalize_utterance(text)
+        duration = parse_duration(phrase)
+        magnitude = 1.0
+        if duration is not None and not 0 <= duration <= MAX_STEP_S:
+            raise MissionError(f"Step {index + 1} ('{text}') must last 0-{MAX_STEP_S:.0f} s")
+
+        if WAIT_PATTERN.match(phrase):
+            command = HOVER
+        else:
+            intents = parse_intents(airborne_vocabulary(vocabulary) if flying else vocabulary, phrase)
+            if not intents:
+                raise MissionError(f"Step {index + 1}: no command in '{text}'")
+            command, magnitude = intents[0]
+            if command == 'STOP':
+                command = HOVER
+        if not flying and command not in ('TAKEOFF', 'LAND', HOVER):
+            raise MissionError(f"Step {index + 1} ('{text}') needs the drone in the air")
+
+        def change(at, new, word=None):
+            changes.append(SetpointChange(at, index, word or to_custom_command(new), new,
+                                          f"{command.lower()} {index + 1}"))
+
+        if command == 'TAKEOFF':
+            setpoint = NEUTRAL._replace(throttle=TAKEOFF_THROTTLE)
+            change(t, setpoint, 'TAKEOFF')
+            hold = TAKEOFF_SETTLE_S if duration is None else duration
+            flying = True
+        elif command == 'LAND':
+            setpoint = NEUTRAL
+            change(t, setpoint, 'LAND')
+            hold = 0.0
+            flying = False
+        elif command == HOVER:
+            hovering = setpoint._replace(yaw=CENTER, pitch=CENTER, roll=CENTER)
+            if hovering != setpoint or not changes:
+                change(t, hovering)
+            setpoint = hovering
+            hold = duration or 0.0
+        elif command in ('UP', 'DOWN'):
+            moved = apply_command(setpoint, command, magnitude)
+            change(t, moved)
+            if duration:
+                change(t + duration, setpoint)
+            else:
+                setpoint = moved
+            hold = duration or 0.0
+        else:
+            hold = DEFAULT_MOVE_S if duration is None else duration
+            change(t, apply_command(setpoint, command, magnitude))
+            change(t + hold, setpoint)
+
+        steps.append(MissionStep(index, text, command, magnitude, t, hold))
+        t += hold
+
+    # A stick released at the moment the next step moves another one: the
+    # next step's setpoint already has it centred
+    changes.sort(key=lambda c: c.at)
+    timeline = [c for c, following in zip(changes, changes[1:] + [None])
+                if following is None or following.at != c.at or not c.command.startswith('CUSTOM:')]
+    return Mission(tuple(steps), tuple(timeline), t)
+
+
+def load_mission_file(path):
+    """Read a mission script file (one step per line, '#' comments)"""
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+StepTiming = namedtuple('StepTiming', ['change', 'deadline', 'queued', 'trace'])
+
+
+class MissionRunner:
+    """Plays a compiled mission against monotonic-clock deadlines"""
+
+    def __init__(self, mission, send, on_change=None, on_finish=None):
+        """
+        Args:
+            mission (Mission): Compiled timeline
+            send (callable): send(command, trace, text) queues one command
+                word for the device (e.g. DroneNLPController.enqueue_command)
+            on_change (callable): Called with each SetpointChange after it is
+                queued, on the mission thread
+            on_finish (callable): Called with the runner when it stops
+        """
+        self.mission = mission
+        self.send = send
+        self.on_change = on_change
+        self.on_finish = on_finish
+        self.status = MISSION_READY
+        self._abort_status = MISSION_ABORTED
+        self.reason = None
+        self.started = None
+        self.finished = None
+        self.timings = []
+
+        self._abort = threading.Event()
+        # Held while queueing a change, so nothing is queued after abort() returns
+        self._send_lock = threading.Lock()
+        # Setpoint of the last change queued (under _send_lock)
+        self._setpoint = None
+        self._thread = None
+
+    @property
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def on_mission_thread(self):
+        return threading.current_thread() is self._thread
+
+    def start(self):
+        """Start flying the mission in the background"""
+        if self._thread is not None:
+            raise RuntimeError("A mission runner can only be started once")
+        self.status = MISSION_RUNNING
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def abort(self, status=MISSION_ABORTED, reason=None, hover=True):
+        """
+        Stop before the next change; returns once no further change can be queued
+
+        If a stick was deflected when the mission stopped, a setpoint with
+        the sticks centred and the throttle kept is queued before returning,
+        so the drone hovers rather than flying on. Not when preempted: the
+        LAND or STOP that preempted it already takes the sticks back.
+
+        Args:
+            status (str): MISSION_ABORTED or MISSION_PREEMPTED
+            reason (str): Shown in the report
+            hover (bool): Centre the sticks (False when landing straight after)
+        """
+        if self._abort.is_set() or self.status != MISSION_RUNNING:
+            return
+        self.reason = reason
+        self._abort_status = status
+        self._abort.set()
+        with self._send_lock:
+            setpoint = self._setpoint
+            if not hover or status == MISSION_PREEMPTED or setpoint is None:
+                return
+            hovering = setpoint._replace(yaw=CENTER, pitch=CENTER, roll=CENTER)
+            if hovering != setpoint:
+                self.send(to_custom_command(hovering), CommandTrace(), f"mission {status}: hover")
+
+    def wait(self, timeout=None):
+        """Wait for the mission to finish; True if it did"""
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return not self.is_running
+
+    def _run(self):
+        clock = time.monotonic
+        mission = self.mission
+        start = self.started = clock()
+        try:
+            for change in mission.changes:
+                deadline = start + change.at
+                delay = deadline - clock()
+                if delay > 0 and self._abort.wait(delay):
+                    break
+                with self._send_lock:
+                    if self._abort.is_set():
+                        break
+                    trace = CommandTrace()
+                    queued = clock()
+                    self.send(change.command, trace, mission.steps[change.step].text)
+                    self._setpoint = change.setpoint
+                self.timings.append(StepTiming(change, deadline, queued, trace))
+                if self.on_change is not None:
+                    self.on_change(change)
+            else:
+                # Hold the last step for its full duration
+                self._abort.wait(max(0.0, start + mission.duration - clock()))
+            self.status = self._abort_status if self._abort.is_set() else MISSION_DONE
+        except Exception as e:
+            self.status = MISSION_FAILED
+            self.reason = str(e)
+        finally:
+            self.finished = clock()
+            if self.on_finish is not None:
+                self.on_finish(self)
+
+    def report(self):
+        """
+        Timing of every change queued so far
+
+        Returns:
+            list: One dict per change: step, label, planned_s (offset from
+                the start), queued_late_ms and written_late_ms (None until
+                written) relative to its deadline
+        """
+        rows = []
+        for timing in list(self.timings):
+            written = timing.trace.stamps[WRITTEN]
+            rows.append({
+                'step': timing.change.step + 1,
+                'label': timing.change.label,
+                'command': timing.change.command,
+                'planned_s': timing.change.at,
+                'queued_late_ms': (timing.queued - timing.deadline) * 1000,
+                'written_late_ms': (written / 1e9 - timing.deadline) * 1000 if written else None,
+            })
+        return rows
+
+    def get_stats(self):
+        rows = self.report()
+        late = [r['queued_late_ms'] for r in rows]
+        written = [r['written_late_ms'] for r in rows if r['written_late_ms'] is not None]
+        end = self.finished if self.finished is not None else time.monotonic()
+        return {
+            'status': self.status,
+            'reason': self.reason,
+            'steps': len(self.mission.steps),
+            'changes': len(self.mission.changes),
+            'sent': len(rows),
+            'planned_s': self.mission.duration,
+            'elapsed_s': end - self.started if self.started is not None else 0.0,
+            'queued_late_p50_ms': percentile(late, 0.50),
+            'queued_late_max_ms': max(late) if late else 0.0,
+            'written_late_p50_ms': percentile(written, 0.50),
+            'written_late_max_ms': max(written) if written else 0.0,
+        }
+
+    def format_report(self):
+        """The per-step timing report as a text table"""
+        stats = self.get_stats()
+        lines = [f"{'step':>4} {'at (s)':>7} {'queued +ms':>10} {'written +ms':>11}  command"]
+        for row in self.report():
+            written = f"{row['written_late_ms']:.2f}" if row['written_late_ms'] is not None else "-"
+            lines.append(f"{row['step']:>4} {row['planned_s']:>7.2f} {row['queued_late_ms']:>10.2f} "
+                         f"{written:>11}  {row['command']}")
+        reason = f" ({stats['reason']})" if stats['reason'] else ""
+        lines.append(f"Mission {stats['status']}{reason}: {stats['sent']}/{stats['changes']} changes "
+                     f"in {stats['elapsed_s']:.2f} s (planned {stats['planned_s']:.2f} s)")
+        return "\n".join(lines)
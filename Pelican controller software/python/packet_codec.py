@@ -0,0 +1,165 @@
+"""
+Binary packet codec for the P8 PRO Drone Controller
+
+Implements the framed serial protocol spoken by arduino_bridge.ino:
+
+    0xFF | throttle | roll | pitch | yaw | aux1 | aux2      (7 bytes, host -> bridge)
+    0xAA (radio write succeeded) / 0xEE (failed)           (1 byte, bridge -> host)
+
+Both 7-byte radio packet layouts used by the sketches are described by one
+schema (PacketLayout):
+
+- DRONE_CONTROL   (drone_controller.ino): throttle, yaw, pitch, roll unsigned,
+                  128 = centre, checksum over every data byte
+- CONTROL_PACKET  (arduino_bridge.ino):   throttle unsigned, roll/pitch/yaw
+                  signed (-127..127, 0 = centre), checksum over the four sticks
+
+Setpoints are always held in DroneControl units (see setpoint.py); layouts
+convert to their own representation while packing. Encoding reuses one
+preallocated buffer per codec, so no objects are allocated per frame.
+"""
+
+import struct
+
+from setpoint import Setpoint, CENTER, STICK_MIN, STICK_MAX
+
+START_BYTE = 0xFF
+ACK_OK = 0xAA
+ACK_FAIL = 0xEE
+
+SIGNED_MIN = -127
+SIGNED_MAX = 127
+
+
+class PacketLayout:
+    """Field order, signedness and checksum coverage of a 7-byte radio packet"""
+
+    def __init__(self, name, fields, signed_fields, checksum_fields):
+        """
+        Args:
+            name (str): Name of the C struct the layout mirrors
+            fields (tuple): Data field names in wire order (checksum excluded)
+            signed_fields (tuple): Stick fields sent as int8_t around 0
+            checksum_fields (tuple): Fields summed (mod 256) into the checksum
+        """
+        self.name = name
+        self.fields = fields
+        self.signed_fields = frozenset(signed_fields)
+        self.checksum_fields = checksum_fields
+        fmt = "".join('b' if f in self.signed_fields else 'B' for f in fields)
+
+        # Radio packet: data fields followed by the checksum byte
+        self.packet_struct = struct.Struct('<' + fmt + 'B')
+        # Serial frame: start byte followed by the data fields
+        self.frame_struct = struct.Struct('<B' + fmt)
+
+        self._checksum_index = tuple(fields.index(f) for f in checksum_fields)
+
+    def to_wire(self, setpoint):
+        """Convert a setpoint to a tuple of field values in wire order"""
+        values = []
+        for field in self.fields:
+            value = getattr(setpoint, field)
+            if field in self.signed_fields:
+                value = max(SIGNED_MIN, min(SIGNED_MAX, value - CENTER))
+            else:
+                value = max(STICK_MIN, min(STICK_MAX, value))
+            values.append(value)
+        return values
+
+    def from_wire(self, values):
+        """Convert field values in wire order back to a Setpoint"""
+        fields = {}
+        for field, value in zip(self.fields, values):
+            if field in self.signed_fields:
+                value += CENTER
+            fields[field] = value
+        return Setpoint(**fields)
+
+    def checksum(self, values):
+        """Checksum as the sketch computes it (uint8_t sum of the covered fields)"""
+        return sum(values[i] for i in self._checksum_index) & 0xFF
+
+
+DRONE_CONTROL = PacketLayout(
+    'DroneControl',
+    fields=('throttle', 'yaw', 'pitch', 'roll', 'aux1', 'aux2'),
+    signed_fields=(),
+    checksum_fields=('throttle', 'yaw', 'pitch', 'roll', 'aux1', 'aux2'),
+)
+
+CONTROL_PACKET = PacketLayout(
+    'ControlPacket',
+    fields=('throttle', 'roll', 'pitch', 'yaw', 'aux1', 'aux2'),
+    signed_fields=('roll', 'pitch', 'yaw'),
+    checksum_fields=('throttle', 'roll', 'pitch', 'yaw'),
+)
+
+
+class FrameCodec:
+    """Encode setpoints into 0xFF-framed serial packets and radio packets"""
+
+    def __init__(self, layout=CONTROL_PACKET):
+        """
+        Args:
+            layout (PacketLayout): Layout of the frame payload. arduino_bridge.ino
+                expects CONTROL_PACKET.
+        """
+        self.layout = layout
+        self.frame_size = layout.frame_struct.size
+        self.packet_size = layout.packet_struct.size
+        self._frame = bytearray(self.frame_size)
+        self._frame_view = memoryview(self._frame)
+        self._packet = bytearray(self.packet_size)
+        self._packet_view = memoryview(self._packet)
+
+    def encode(self, setpoint):
+        """
+        Pack a setpoint into the serial frame buffer
+
+        The returned memoryview aliases the codec's buffer and is only valid
+        until the next call to encode().
+        """
+        self.layout.frame_struct.pack_into(self._frame, 0, START_BYTE,
+                                           *self.layout.to_wire(setpoint))
+        return self._frame_view
+
+    def decode(self, frame):
+        """Decode a serial frame into a Setpoint (ValueError on a bad start byte)"""
+        start, *values = self.layout.frame_struct.unpack_from(frame)
+        if start != START_BYTE:
+            raise ValueError(f"Bad start byte 0x{start:02X}")
+        return self.layout.from_wire(values)
+
+    def encode_packet(self, setpoint):
+        """
+        Pack a setpoint into the radio packet buffer, checksum included
+
+        The returned memoryview is only valid until the next call to encode_packet().
+        """
+        values = self.layout.to_wire(setpoint)
+        self.layout.packet_struct.pack_into(self._packet, 0, *values,
+                                            self.layout.checksum(values))
+        return self._packet_view
+
+    def decode_packet(self, packet):
+        """
+        Decode a radio packet
+
+        Returns:
+            tuple: (Setpoint, checksum_ok)
+        """
+        *values, checksum = self.layout.packet_struct.unpack_from(packet)
+        return self.layout.from_wire(values), checksum == self.layout.checksum(values)
+
+
+def parse_acks(data):
+    """
+    Extract bridge acknowledgements from raw serial input
+
+    Bytes other than ACK_OK/ACK_FAIL (e.g. the ASCII startup banner) are skipped.
+
+    Returns:
+        list: One bool per acknowledgement, True for success, in arrival order
+    """
+    return [b == ACK_OK for b in data if b == ACK_OK or b == ACK_FAIL]
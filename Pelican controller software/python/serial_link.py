@@ -0,0 +1,562 @@
+"""
+Shared, self-healing serial link for the P8 PRO Drone Controller
+
+A SerialLink owns one serial port for the whole process. Front ends and other
+in-process clients attach to it instead of opening the port themselves, so a
+CLI, the Tk GUI and the web API can drive the same Arduino at once. Every
+DeviceEvent read from the port is delivered to every client, except replies
+to a command: those go only to the client whose AckTracker holds the oldest
+command they answer.
+
+The link notices when the port goes away: a failed read or write, or a failed
+heartbeat. A heartbeat is a driver query (no bytes on the wire) every
+heartbeat_interval. The link then reconnects with exponential backoff, and it
+counts as up again once the firmware has printed its ready banner. Writes made
+during an outage follow an explicit OutagePolicy. They are either buffered
+for a bounded time and sent in order after reconnecting, or refused at once.
+
+Links are shared through acquire()/release(), which reference-count one link
+per port.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+
+import serial
+
+from serial_reader import SerialReader, EVENT_READY, REPLY_KINDS
+
+LINK_DOWN = 'down'
+LINK_UP = 'up'
+LINK_CLOSED = 'closed'
+
+# write() results
+WRITE_SENT = 'sent'
+WRITE_BUFFERED = 'buffered'
+
+OUTAGE_BUFFER = 'buffer'
+OUTAGE_DROP = 'drop'
+
+logger = logging.getLogger(__name__)
+
+
+class SerialLinkDown(serial.SerialException):
+    """The link is down (or closed) and the write was not accepted"""
+
+
+class OutagePolicy:
+    """What happens to writes while the link is down"""
+
+    def __init__(self, mode=OUTAGE_BUFFER, max_buffered=32, max_age=1.0):
+        """
+        Args:
+            mode (str): OUTAGE_BUFFER keeps writes and sends them after the
+                reconnect; OUTAGE_DROP refuses them with SerialLinkDown
+            max_buffered (int): Most writes kept; the oldest expires first
+            max_age (float): Seconds a buffered write stays worth sending
+                (a stick command from several seconds ago is not)
+        """
+        if mode not in (OUTAGE_BUFFER, OUTAGE_DROP):
+            raise ValueError(f"Unknown outage mode '{mode}'")
+        self.mode = mode
+        self.max_buffered = max_buffered
+        self.max_age = max_age
+
+    def __repr__(self):
+        return f"OutagePolicy({self.mode}, max_buffered={self.max_buffered}, max_age={self.max_age})"
+
+
+class _BufferedWrite:
+    __slots__ = ('data', 'deadline', 'before', 'after', 'on_expired')
+
+    def __init__(self, data, deadline, before, after, on_expired):
+        self.data = data
+        self.deadline = deadline
+        self.before = before
+        self.after = after
+        self.on_expired = on_expired
+
+
+class LinkClient:
+    """One attached client: its event and link-state callbacks and its AckTracker"""
+
+    __slots__ = ('on_event', 'on_state', 'acks')
+
+    def __init__(self, on_event, on_state=None, acks=None):
+        self.on_event = on_event
+        self.on_state = on_state
+        self.acks = acks
+
+
+class SerialLink:
+    """One serial port shared by several clients, reconnected on failure"""
+
+    def __init__(self, port, baud_rate=115200, policy=None, ready_timeout=3.0,
+                 backoff_initial=0.05, backoff_max=2.0, heartbeat_interval=0.5,
+                 read_timeout=0.1, write_timeout=1.0, serial_factory=None):
+        """
+        Args:
+            port (str): Serial port name
+            baud_rate (int): Line rate
+            policy (OutagePolicy): Handling of writes during outages
+            ready_timeout (float): Longest wait for the firmware banner after
+                (re)opening; boards that never print one are used anyway
+            backoff_initial (float): First delay between reconnect attempts
+            backoff_max (float): Longest delay between reconnect attempts
+            heartbeat_interval (float): Seconds between port health checks
+            read_timeout (float): Port read timeout (bounds reader shutdown)
+            write_timeout (float): Port write timeout (a hung USB write fails
+                instead of blocking every client)
+            serial_factory (callable): Opens the port; defaults to serial.Serial
+        """
+        self.port = port
+        self.baud_rate = baud_rate
+        self.policy = policy or OutagePolicy()
+        self.ready_timeout = ready_timeout
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.heartbeat_interval = heartbeat_interval
+        self.read_timeout = read_timeout
+        self.write_timeout = write_timeout
+        self.serial_factory = serial_factory or serial.Serial
+
+        # Guards the connection, the state and the outage buffer; re-entrant
+        # because a failed write marks the link down while holding it
+        self._lock = threading.RLock()
+        self._connection = None
+        self._reader = None
+        self._state = LINK_DOWN
+        self._buffer = deque()
+        # Replaced, never mutated, so dispatch iterates without a lock
+        self._clients = ()
+        self._ready = threading.Event()
+        self._up = threading.Event()
+        self._wake = threading.Event()
+        self._supervisor = None
+        self._down_since = None
+
+        self.connects = 0
+        self.outages = 0
+        self.reconnect_attempts = 0
+        self.last_error = None
+        self.last_reconnect_ms = None
+        self.last_outage_s = None
+        self.longest_outage_s = 0.0
+        self.total_outage_s = 0.0
+        self.heartbeats = 0
+        self.bytes_written = 0
+        self.buffered = 0
+        self.flushed = 0
+        self.expired = 0
+        self.refused = 0
+
+    # Lifecycle -------------------------------------------------------------
+
+    def open(self):
+        """
+        Connect once, synchronously, then keep the link up in the background
+
+        Raises:
+            serial.SerialException: If the first connection fails
+        """
+        with self._lock:
+            if self._state == LINK_CLOSED:
+                raise SerialLinkDown(f"{self.port} is closed")
+            if self._supervisor is not None:
+                return
+        self._connect()
+        self._supervisor = threading.Thread(target=self._supervise, daemon=True)
+        self._supervisor.start()
+
+    def close(self):
+        """Close the port for good; buffered writes expire"""
+        with self._lock:
+            if self._state == LINK_CLOSED:
+                return
+            self._state = LINK_CLOSED
+            self._up.clear()
+            self._drop_connection()
+            self._expire_buffer(force=True)
+        self._wake.set()
+        if self._supervisor is not None and self._supervisor is not threading.current_thread():
+            self._supervisor.join(timeout=2)
+        self._supervisor = None
+        self._notify_state(False, None)
+
+    @property
+    def state(self):
+        return self._state
+
+    @property
+    def is_up(self):
+        return self._state == LINK_UP
+
+    @property
+    def out_waiting(self):
+        """Bytes still queued in the driver (0 when down or unknown)"""
+        connection = self._connection
+        try:
+            return connection.out_waiting if connection is not None else 0
+        except Exception:
+            return 0
+
+    @property
+    def device_ready(self):
+        """The firmware printed its banner since the port was last opened"""
+        return self._ready.is_set()
+
+    def wait_up(self, timeout=None):
+        """Block until the link is up; False on timeout"""
+        return self._up.wait(timeout)
+
+    # Clients ---------------------------------------------------------------
+
+    def add_client(self, on_event, on_state=None, acks=None):
+        """
+        Attach a client
+
+        Args:
+            on_event (callable): Called with every DeviceEvent, on the reader thread
+            on_state (callable): Called with (up, error) when the link goes
+                down or comes back
+            acks (serial_reader.AckTracker): Where the client registers what
+                it writes; with more than one client, replies are only
+                delivered to the client they answer
+
+        Returns:
+            LinkClient: Handle for remove_client
+        """
+        client = LinkClient(on_event, on_state, acks)
+        with self._lock:
+            self._clients = self._clients + (client,)
+        return client
+
+    def remove_client(self, client):
+        with self._lock:
+            self._clients = tuple(c for c in self._clients if c is not client)
+
+    @property
+    def client_count(self):
+        return len(self._clients)
+
+    # Writing ---------------------------------------------------------------
+
+    def write(self, data, before=None, after=None, on_expired=None, buffer=True):
+        """
+        Write bytes now, or handle them by the outage policy if the link is down
+
+        Args:
+            data (bytes): What to write (any bytes-like object; it is copied
+                if it has to be buffered)
+            before (callable): Called right before the bytes go out (e.g. to
+                register them for acknowledgement - the reply can arrive
+                before write() returns)
+            after (callable): Called right after they went out
+            on_expired (callable): Called if a buffered write is given up on
+            buffer (bool): False to refuse rather than buffer during an outage
+                (e.g. periodic setpoints, which the next tick replaces)
+
+        Returns:
+            str: WRITE_SENT or WRITE_BUFFERED
+
+        Raises:
+            SerialLinkDown: Closed, refused by the policy, or the write failed
+        """
+        with self._lock:
+            if self._state == LINK_UP:
+                self._send(data, before, after)
+                return WRITE_SENT
+            if self._state == LINK_CLOSED:
+                raise SerialLinkDown(f"{self.port} is closed")
+            if not buffer or self.policy.mode == OUTAGE_DROP:
+                self.refused += 1
+                raise SerialLinkDown(f"{self.port} is down")
+            self._expire_buffer()
+            if len(self._buffer) >= self.policy.max_buffered:
+                self._expire(self._buffer.popleft())
+            # Copied: callers may pass a view of a buffer they reuse (FrameCodec.encode)
+            self._buffer.append(_BufferedWrite(bytes(data), time.monotonic() + self.policy.max_age,
+                                               before, after, on_expired))
+            self.buffered += 1
+            return WRITE_BUFFERED
+
+    def _send(self, data, before, after):
+        if before is not None:
+            before()
+        try:
+            self._connection.write(data)
+        except Exception as e:
+            self._lost(e)
+            raise SerialLinkDown(f"Write to {self.port} failed: {e}") from e
+        self.bytes_written += len(data)
+        if after is not None:
+            after()
+
+    def _expire(self, item):
+        self.expired += 1
+        if item.on_expired is not None:
+            item.on_expired()
+
+    def _expire_buffer(self, force=False):
+        now = time.monotonic()
+        buffer = self._buffer
+        while buffer and (force or buffer[0].deadline <= now):
+            self._expire(buffer.popleft())
+
+    def _flush(self):
+        """Send what was buffered during the outage (lock held, link up)"""
+        self._expire_buffer()
+        while self._buffer and self._state == LINK_UP:
+            item = self._buffer.popleft()
+            try:
+                self._send(item.data, item.before, item.after)
+            except SerialLinkDown:
+                self._expire(item)
+                break
+            self.flushed += 1
+
+    # Connection management -------------------------------------------------
+
+    def _connect(self):
+        """Open the port and wait for the banner; raises on failure"""
+        connection = self.serial_factory(port=self.port, baudrate=self.baud_rate,
+                                         timeout=self.read_timeout,
+                                         write_timeout=self.write_timeout)
+        self._ready.clear()
+        reader = SerialReader(connection, self._dispatch, self._lost)
+        with self._lock:
+            if self._state == LINK_CLOSED:
+                connection.close()
+                raise SerialLinkDown(f"{self.port} is closed")
+            self._connection = connection
+            self._reader = reader
+        reader.start()
+        # The board resets when the port opens; wait for setup() to finish
+        if not self._ready.wait(self.ready_timeout):
+            logger.warning(f"No ready banner from {self.port} after "
+                           f"{self.ready_timeout:.1f} s, continuing")
+        with self._lock:
+            if self._connection is not connection:
+                # Lost again while waiting for the banner
+                raise SerialLinkDown(f"{self.port} dropped during start-up")
+            self._state = LINK_UP
+            self.connects += 1
+            if self._down_since is not None:
+                outage = time.monotonic() - self._down_since
+                self._down_since = None
+                self.last_outage_s = outage
+                self.last_reconnect_ms = outage * 1000
+                self.total_outage_s += outage
+                self.longest_outage_s = max(self.longest_outage_s, outage)
+            self._up.set()
+            self._flush()
+        self._notify_state(True, None)
+
+    def _lost(self, error):
+        """The port failed (reader, writer or heartbeat); start reconnecting"""
+        with self._lock:
+            if self._state != LINK_UP and self._connection is None:
+                return
+            was_up = self._state == LINK_UP
+            if self._state != LINK_CLOSED:
+                self._state = LINK_DOWN
+            self._up.clear()
+            self.last_error = str(error)
+            self._drop_connection()
+            if was_up:
+                self.outages += 1
+                self._down_since = time.monotonic()
+        if was_up:
+            logger.error(f"Serial link {self.port} lost: {error}")
+            self._notify_state(False, error)
+        self._wake.set()
+
+    def _drop_connection(self):
+        reader, connection = self._reader, self._connection
+        self._reader = None
+        self._connection = None
+        if reader is not None:
+            reader.stop(timeout=0.5)
+        if connection is not None:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+    def _supervise(self):
+        backoff = self.backoff_initial
+        while self._state != LINK_CLOSED:
+            if self._state == LINK_UP:
+                self._wake.wait(self.heartbeat_interval)
+                self._wake.clear()
+                if self._state == LINK_UP:
+                    self._heartbeat()
+                backoff = self.backoff_initial
+                continue
+
+            self.reconnect_attempts += 1
+            try:
+                self._connect()
+                logger.info(f"Serial link {self.port} restored after "
+                            f"{self.last_outage_s or 0:.2f} s")
+                continue
+            except Exception as e:
+                self.last_error = str(e)
+                with self._lock:
+                    if self._state != LINK_CLOSED:
+                        self._drop_connection()
+                        # Nobody is going to send these any more
+                        self._expire_buffer()
+            self._wake.wait(backoff)
+            self._wake.clear()
+            backoff = min(self.backoff_max, backoff * 2)
+
+    def _heartbeat(self):
+        """Cheap liveness check: a driver query and a live reader thread"""
+        self.heartbeats += 1
+        connection, reader = self._connection, self._reader
+        try:
+            if connection is None or reader is None:
+                raise serial.SerialException("no connection")
+            connection.in_waiting
+            if not reader.is_alive:
+                raise serial.SerialException("reader stopped")
+        except Exception as e:
+            self._lost(e)
+
+    def _dispatch(self, event):
+        if event.kind == EVENT_READY:
+            self._ready.set()
+        clients = self._clients
+        if event.kind in REPLY_KINDS and len(clients) > 1:
+            owner = self._reply_owner(event, clients)
+            if owner is not None:
+                clients = (owner,)
+        for client in clients:
+            try:
+                client.on_event(event)
+            except Exception as e:
+                logger.error(f"Serial link client failed on {event.kind}: {e}")
+
+    @staticmethod
+    def _reply_owner(event, clients):
+        """The client that wrote the earliest command a reply can answer, or None"""
+        owner = None
+        order = None
+        for client in clients:
+            if client.acks is None:
+                continue
+            entry = client.acks.candidate(event)
+            if entry is not None and (order is None or entry.order < order):
+                owner, order = client, entry.order
+        return owner
+
+    def _notify_state(self, up, error):
+        for client in self._clients:
+            if client.on_state is not None:
+                try:
+                    client.on_state(up, error)
+                except Exception as e:
+                    logger.error(f"Serial link client failed on state change: {e}")
+
+    def get_stats(self):
+        with self._lock:
+            pending = len(self._buffer)
+            down_for = (time.monotonic() - self._down_since
+                        if self._down_since is not None else 0.0)
+        return {
+            'port': self.port,
+            'state': self._state,
+            'clients': len(self._clients),
+            'connects': self.connects,
+            'outages': self.outages,
+            'reconnect_attempts': self.reconnect_attempts,
+            'last_reconnect_ms': self.last_reconnect_ms,
+            'longest_outage_s': self.longest_outage_s,
+            'total_outage_s': self.total_outage_s + down_for,
+            'down_for_s': down_for,
+            'last_error': self.last_error,
+            'heartbeats': self.heartbeats,
+            'bytes_written': self.bytes_written,
+            'buffered': self.buffered,
+            'pending': pending,
+            'flushed': self.flushed,
+            'expired': self.expired,
+            'refused': self.refused,
+            'policy': repr(self.policy),
+        }
+
+
+# Process-wide sharing ------------------------------------------------------
+
+_links = {}
+_refcounts = {}
+# Ports being opened, each with an Event set once its first acquire() is done
+_opening = {}
+_registry_lock = threading.Lock()
+
+
+def acquire(port, baud_rate=115200, **options):
+    """
+    The shared link for `port`, opened on first use
+
+    Every acquire() must be paired with a release(). Options only apply when
+    the link is created. Opening (and waiting for the ready banner) happens
+    outside the registry lock, so different ports open in parallel; other
+    callers for the same port wait for the first one's link.
+
+    Raises:
+        serial.SerialException: If the port cannot be opened
+        ValueError: If the port is already open at another baud rate
+    """
+    while True:
+        with _registry_lock:
+            link = _links.get(port)
+            if link is not None:
+                if link.baud_rate != baud_rate:
+                    raise ValueError(f"{port} is already open at {link.baud_rate} baud")
+                _refcounts[port] += 1
+                return link
+            opening = _opening.get(port)
+            if opening is None:
+                opening = _opening[port] = threading.Event()
+                break
+        # Someone else is opening it: take their link, or try ourselves if they failed
+        opening.wait()
+
+    opened = False
+    try:
+        link = SerialLink(port, baud_rate, **options)
+        link.open()
+        opened = True
+    finally:
+        with _registry_lock:
+            del _opening[port]
+            if opened:
+                _links[port] = link
+                _refcounts[port] = 1
+        opening.set()
+    return link
+
+
+def release(link):
+    """Drop one reference; the last one closes the port"""
+    with _registry_lock:
+        port = link.port
+        if _links.get(port) is not link:
+            link.close()
+            return
+        _refcounts[port] -= 1
+        if _refcounts[port] > 0:
+            return
+        del _links[port]
+        del _refcounts[port]
+    link.close()
+
+
+def shared_links():
+    """Currently open shared links, by port"""
+    with _registry_lock:
+        return dict(_links)
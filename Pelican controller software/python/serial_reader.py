@@ -0,0 +1,383 @@
+"""
+Serial telemetry reader for the P8 PRO Drone Controller
+
+Decodes everything the Arduino sends back - the text lines printed by
+drone_controller.ino and the 0xAA/0xEE acknowledgement bytes written by
+arduino_bridge.ino - on a dedicated thread, and matches it against the
+commands the host has written so each command is confirmed or rejected by
+the device itself.
+"""
+
+import itertools
+import threading
+import time
+from collections import deque, namedtuple
+
+from packet_codec import ACK_OK, ACK_FAIL
+
+DeviceEvent = namedtuple('DeviceEvent', ['kind', 'command', 'text', 'timestamp'])
+DeviceEvent.__doc__ = "One decoded message from the device"
+
+# Event kinds
+EVENT_PROCESSING = 'processing'   # "Processing command: X"
+EVENT_EXECUTED = 'executed'       # per-action confirmation line
+EVENT_UNKNOWN = 'unknown'         # "Unknown command!"
+EVENT_INVALID = 'invalid'         # "Invalid custom command format"
+EVENT_ACK = 'ack'                 # bridge 0xAA
+EVENT_NACK = 'nack'               # bridge 0xEE
+EVENT_READY = 'ready'             # startup banner finished
+EVENT_ERROR = 'error'             # radio/hardware error line
+EVENT_LINE = 'line'               # anything else
+
+# Confirmation lines printed by the drone_controller.ino action helpers
+ACTION_LINES = {
+    'TAKEOFF initiated': 'TAKEOFF',
+    'LANDING initiated': 'LAND',
+    'Moving UP': 'UP',
+    'Moving DOWN': 'DOWN',
+    'Moving LEFT': 'LEFT',
+    'Moving RIGHT': 'RIGHT',
+    'Moving FORWARD': 'FORWARD',
+    'Moving BACKWARD': 'BACKWARD',
+    'Rotating LEFT': 'ROTATE_LEFT',
+    'Rotating RIGHT': 'ROTATE_RIGHT',
+    'STOPPING - hovering': 'STOP',
+    'Custom command executed': 'CUSTOM',
+}
+
+READY_LINES = ('Ready for commands!', 'Arduino Drone Bridge Ready')
+# Event kinds that answer one written command (the others are unsolicited)
+REPLY_KINDS = (EVENT_PROCESSING, EVENT_EXECUTED, EVENT_UNKNOWN, EVENT_INVALID, EVENT_ACK, EVENT_NACK)
+ERROR_PREFIXES = ('ERROR:', 'Radio hardware not responding')
+PROCESSING_PREFIX = 'Processing command:'
+
+
+def classify_line(line, timestamp=None):
+    """Turn one text line from the device into a DeviceEvent"""
+    if timestamp is None:
+        timestamp = time.monotonic()
+    if line.startswith(PROCESSING_PREFIX):
+        return DeviceEvent(EVENT_PROCESSING, line[len(PROCESSING_PREFIX):].strip(), line, timestamp)
+    command = ACTION_LINES.get(line)
+    if command is not None:
+        return DeviceEvent(EVENT_EXECUTED, command, line, timestamp)
+    if line == 'Unknown command!':
+        return DeviceEvent(EVENT_UNKNOWN, None, line, timestamp)
+    if line == 'Invalid custom command format':
+        return DeviceEvent(EVENT_INVALID, 'CUSTOM', line, timestamp)
+    if line in READY_LINES:
+        return DeviceEvent(EVENT_READY, None, line, timestamp)
+    if line.startswith(ERROR_PREFIXES):
+        return DeviceEvent(EVENT_ERROR, None, line, timestamp)
+    return DeviceEvent(EVENT_LINE, None, line, timestamp)
+
+
+class DeviceStreamDecoder:
+    """Incremental decoder for the mixed text/ACK byte stream"""
+
+    def __init__(self, max_line=256):
+        """
+        Args:
+            max_line (int): Longest line kept; longer garbage is discarded
+        """
+        self.max_line = max_line
+        self._buffer = bytearray()
+
+    def feed(self, data):
+        """
+        Decode a chunk of bytes
+
+        Partial lines are kept until the rest arrives.
+
+        Returns:
+            list: DeviceEvents in arrival order
+        """
+        now = time.monotonic()
+        events = []
+        if ACK_OK in data or ACK_FAIL in data:
+            # Split ACK bytes out of the text; they can arrive between lines
+            text = bytearray()
+            for b in data:
+                if b == ACK_OK:
+                    events.extend(self._feed_text(text, now))
+                    text.clear()
+                    events.append(DeviceEvent(EVENT_ACK, None, None, now))
+                elif b == ACK_FAIL:
+                    events.extend(self._feed_text(text, now))
+                    text.clear()
+                    events.append(DeviceEvent(EVENT_NACK, None, None, now))
+                else:
+                    text.append(b)
+            events.extend(self._feed_text(text, now))
+        else:
+            events.extend(self._feed_text(data, now))
+        return events
+
+    def _feed_text(self, data, now):
+        if not data:
+            return []
+        self._buffer += data
+        if b'\n' not in data:
+            if len(self._buffer) > self.max_line:
+                self._buffer.clear()
+            return []
+        *lines, rest = self._buffer.split(b'\n')
+        self._buffer = bytearray(rest[-self.max_line:])
+        events = []
+        for raw in lines:
+            line = raw.decode('ascii', 'replace').strip()
+            if line:
+                events.append(classify_line(line, now))
+        return events
+
+
+# Order of writes across every AckTracker in the process; sent_command() runs
+# under the link lock, so this is the order the commands reached the wire
+_wire_order = itertools.count()
+
+
+def command_name(command):
+    """The word a device reply names: 'CUSTOM:180,128,128,128' gives 'CUSTOM'"""
+    return command.strip().upper().split(':', 1)[0]
+
+
+class PendingCommand:
+    """A command written to the device that has not been confirmed yet"""
+
+    __slots__ = ('seq', 'order', 'command', 'source', 'sent_time', 'acknowledged', 'ok',
+                 'done_time', 'trace')
+
+    def __init__(self, seq, command, source, sent_time, trace=None):
+        self.seq = seq
+        self.order = next(_wire_order)
+        self.command = command
+        self.source = source        # 'command' or 'stream'
+        self.trace = trace
+        self.sent_time = sent_time
+        self.acknowledged = False   # device has seen it (Processing command:)
+        self.ok = None              # True confirmed, False rejected
+        self.done_time = None
+
+    @property
+    def round_trip(self):
+        return None if self.done_time is None else self.done_time - self.sent_time
+
+
+class AckTracker:
+    """Matches device responses to written commands by name, oldest first"""
+
+    def __init__(self, ack_timeout=1.0, max_pending=256, on_lost=None):
+        """
+        Args:
+            ack_timeout (float): Seconds after which an unanswered command is lost
+            max_pending (int): Most unanswered commands remembered
+            on_lost (callable): Called with each PendingCommand given up on
+        """
+        self.ack_timeout = ack_timeout
+        self.on_lost = on_lost
+        self._pending = deque(maxlen=max_pending)
+        self._cond = threading.Condition()
+        self._seq = 0
+
+        self.sent = 0
+        self.confirmed = 0
+        self.failed = 0
+        self.lost = 0
+        self.last_round_trip = None
+
+    def sent_command(self, command, source='command', trace=None):
+        """Record a command that was just written; returns its PendingCommand"""
+        with self._cond:
+            self._expire(time.monotonic())
+            self._seq += 1
+            entry = PendingCommand(self._seq, command, source, time.monotonic(), trace)
+            if len(self._pending) == self._pending.maxlen:
+                self._lose(self._pending[0])
+            self._pending.append(entry)
+            self.sent += 1
+            return entry
+
+    def cancel(self, entry):
+        """Forget a command whose write failed"""
+        with self._cond:
+            if entry in self._pending:
+                self._pending.remove(entry)
+                self.sent -= 1
+                self._cond.notify_all()
+
+    @property
+    def outstanding(self):
+        with self._cond:
+            self._expire(time.monotonic())
+            return len(self._pending)
+
+    def _lose(self, entry):
+        self._pending.remove(entry)
+        self.lost += 1
+        if self.on_lost is not None:
+            self.on_lost(entry)
+
+    def _expire(self, now):
+        pending = self._pending
+        while pending and now - pending[0].sent_time > self.ack_timeout:
+            self._lose(pending[0])
+
+    def _finish(self, entry, ok, now):
+        entry.ok = ok
+        entry.done_time = now
+        self._pending.remove(entry)
+        if ok:
+            self.confirmed += 1
+        else:
+            self.failed += 1
+        self.last_round_trip = entry.round_trip
+        self._cond.notify_all()
+
+    def _match(self, event):
+        """The pending command a reply is about (lock held), or None"""
+        kind = event.kind
+        if kind == EVENT_ACK or kind == EVENT_NACK:
+            # The bridge answers every frame, in order, with no name
+            return self._pending[0] if self._pending else None
+        if kind == EVENT_PROCESSING:
+            # The firmware echoes the upper-cased, trimmed line
+            for entry in self._pending:
+                if not entry.acknowledged and entry.command.strip().upper() == event.command:
+                    return entry
+            return None
+        if kind in (EVENT_EXECUTED, EVENT_UNKNOWN, EVENT_INVALID):
+            # Only a command the firmware has echoed can finish, and only
+            # under its own name ("Unknown command!" names none)
+            for entry in self._pending:
+                if entry.acknowledged and (event.command is None
+                                           or command_name(entry.command) == event.command):
+                    return entry
+        return None
+
+    def candidate(self, event):
+        """
+        The pending command a reply would resolve, without applying it
+
+        Used by a shared serial_link.SerialLink to hand each reply only to
+        the client that wrote the command (the one whose candidate has the
+        lowest `order`).
+        """
+        with self._cond:
+            return self._match(event)
+
+    def handle_event(self, event):
+        """
+        Apply one DeviceEvent
+
+        Returns:
+            PendingCommand: The command the event resolved, or None
+        """
+        kind = event.kind
+        with self._cond:
+            now = event.timestamp
+            self._expire(now)
+            match = self._match(event)
+            if match is None:
+                return None
+
+            if kind == EVENT_PROCESSING:
+                # Anything written before it that was never echoed did not
+                # reach the firmware intact
+                for entry in list(self._pending):
+                    if entry is match:
+                        break
+                    if not entry.acknowledged:
+                        self._lose(entry)
+                match.acknowledged = True
+                return None
+
+            self._finish(match, kind in (EVENT_EXECUTED, EVENT_ACK), now)
+            return match
+
+    def wait_for_outstanding(self, limit=0, timeout=None):
+        """
+        Block until at most `limit` commands are unanswered
+
+        Returns:
+            bool: False if the timeout expired first
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._expire(now)
+                if len(self._pending) <= limit:
+                    return True
+                remaining = self.ack_timeout if deadline is None else deadline - now
+                if remaining <= 0:
+                    return False
+                # Wake at least when the oldest entry would expire
+                oldest = self._pending[0].sent_time + self.ack_timeout - now
+                self._cond.wait(max(0.001, min(remaining, oldest)))
+
+    def get_stats(self):
+        with self._cond:
+            return {
+                'sent': self.sent,
+                'confirmed': self.confirmed,
+                'failed': self.failed,
+                'lost': self.lost,
+                'outstanding': len(self._pending),
+                'last_round_trip': self.last_round_trip,
+            }
+
+
+class SerialReader:
+    """Background thread that reads the serial port and dispatches DeviceEvents"""
+
+    def __init__(self, connection, on_event, on_error=None):
+        """
+        Args:
+            connection: Open serial.Serial (a read timeout must be set)
+            on_event (callable): Called with each DeviceEvent, on the reader thread
+            on_error (callable): Called with the exception if reading fails
+        """
+        self.connection = connection
+        self.on_event = on_event
+        self.on_error = on_error
+        self.decoder = DeviceStreamDecoder()
+        self.bytes_read = 0
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    @property
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def stop(self, timeout=1.0):
+        self._running = False
+        cancel_read = getattr(self.connection, 'cancel_read', None)
+        if cancel_read is not None:
+            try:
+                cancel_read()
+            except Exception:
+                pass
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        connection = self.connection
+        while self._running:
+            try:
+                # Blocks for at most the port's read timeout when idle
+                data = connection.read(connection.in_waiting or 1)
+            except Exception as e:
+                if self._running and self.on_error:
+                    self.on_error(e)
+                break
+            if not data:
+                continue
+            self.bytes_read += len(data)
+            for event in self.decoder.feed(data):
+                self.on_event(event)
@@ -0,0 +1,129 @@
+"""
+Stick setpoint model for the P8 PRO Drone Controller
+
+Mirrors the control arithmetic in arduino/drone_controller.ino (processCommand,
+the move/rotate helpers and parseCustomCommand) so the host can know the
+absolute throttle/yaw/pitch/roll values a command produces without asking the
+device.
+"""
+
+import re
+from collections import namedtuple
+
+CENTER = 128
+STICK_MIN = 0
+STICK_MAX = 255
+TAKEOFF_THROTTLE = 180
+THROTTLE_STEP = 30
+STICK_OFFSET = 60
+
+Setpoint = namedtuple('Setpoint', ['throttle', 'yaw', 'pitch', 'roll', 'aux1', 'aux2'])
+Setpoint.__doc__ = "Absolute stick values in DroneControl units (0-255, 128 = centre)"
+
+NEUTRAL = Setpoint(throttle=0, yaw=CENTER, pitch=CENTER, roll=CENTER, aux1=0, aux2=0)
+
+# Commands that step from the current setpoint: sent twice, they move twice.
+# Every other command sets its sticks to fixed values.
+RELATIVE_COMMANDS = frozenset({"UP", "DOWN"})
+
+# Matches what Arduino's String.toInt() accepts: optional sign then digits
+_LEADING_INT = re.compile(r'\s*([-+]?\d+)')
+
+
+def clamp(value, low=STICK_MIN, high=STICK_MAX):
+    """Constrain a value to the stick range"""
+    return max(low, min(high, value))
+
+
+def _to_int(text):
+    """Arduino String.toInt(): leading integer, or 0 when there is none"""
+    m = _LEADING_INT.match(text)
+    return int(m.group(1)) if m else 0
+
+
+def parse_custom_command(command):
+    """
+    Parse 'CUSTOM:throttle,yaw,pitch,roll' the way parseCustomCommand does
+
+    Returns:
+        tuple: (throttle, yaw, pitch, roll) constrained to 0-255, or None if
+        the command does not contain three commas
+    """
+    parts = command[7:].split(',', 3)
+    if len(parts) != 4:
+        return None
+    return tuple(clamp(_to_int(p)) for p in parts)
+
+
+def apply_command(setpoint, command, magnitude=1.0):
+    """
+    Apply one firmware command word to a setpoint
+
+    Args:
+        setpoint (Setpoint): Current stick values
+        command (str): Command as sent over serial (e.g. 'UP', 'CUSTOM:150,128,100,180')
+        magnitude (float): Scales the throttle step and stick offset of the
+            movement commands ("slowly" = 0.5); the result is then only
+            reachable on the device as a CUSTOM: setpoint
+
+    Returns:
+        Setpoint: New stick values, or None for commands the firmware rejects
+    """
+    command = command.strip().upper()
+    step = THROTTLE_STEP
+    offset = STICK_OFFSET
+    if magnitude != 1.0:
+        step = round(THROTTLE_STEP * magnitude)
+        offset = min(CENTER - 1, round(STICK_OFFSET * magnitude))
+
+    if command == "TAKEOFF":
+        return NEUTRAL._replace(throttle=TAKEOFF_THROTTLE)
+    elif command == "LAND":
+        return NEUTRAL
+    elif command == "UP":
+        return setpoint._replace(throttle=min(STICK_MAX, setpoint.throttle + step))
+    elif command == "DOWN":
+        return setpoint._replace(throttle=max(STICK_MIN, setpoint.throttle - step))
+    elif command == "LEFT":
+        return setpoint._replace(roll=CENTER - offset)
+    elif command == "RIGHT":
+        return setpoint._replace(roll=CENTER + offset)
+    elif command == "FORWARD":
+        return setpoint._replace(pitch=CENTER - offset)
+    elif command == "BACKWARD":
+        return setpoint._replace(pitch=CENTER + offset)
+    elif command == "ROTATE_LEFT":
+        return setpoint._replace(yaw=CENTER - offset)
+    elif command == "ROTATE_RIGHT":
+        return setpoint._replace(yaw=CENTER + offset)
+    elif command == "STOP":
+        # stopDrone() calls resetControlPacket(), which also zeroes throttle
+        return NEUTRAL
+    elif command.startswith("CUSTOM:"):
+        values = parse_custom_command(command)
+        if values is None:
+            return None
+        throttle, yaw, pitch, roll = values
+        return setpoint._replace(throttle=throttle, yaw=yaw, pitch=pitch, roll=roll)
+    return None
+
+
+def idempotent_prefix(intents):
+    """
+    The leading intents that can be applied again without moving further
+
+    Args:
+        intents (tuple): intent_matcher.Intent(command, magnitude) in order
+
+    Returns:
+        tuple: The intents before the first relative one (UP, DOWN)
+    """
+    for i, intent in enumerate(intents):
+        if intent.command in RELATIVE_COMMANDS:
+            return tuple(intents[:i])
+    return tuple(intents)
+
+
+def to_custom_command(setpoint):
+    """Format a setpoint as an absolute 'CUSTOM:throttle,yaw,pitch,roll' command"""
+    return f"CUSTOM:{setpoint.throttle},{setpoint.yaw},{setpoint.pitch},{setpoint.roll}"
@@ -0,0 +1,156 @@
+"""
+Fixed-rate setpoint streaming for the P8 PRO Drone Controller
+
+Instead of sending one command word per intent, the streamer sends the full
+throttle/yaw/pitch/roll setpoint on every tick of a fixed-rate control loop.
+Ticks are scheduled against absolute monotonic-clock deadlines, so sleep
+overshoot on one tick does not push every later tick back.
+"""
+
+import threading
+import time
+from collections import deque
+
+from latency_trace import percentile
+
+MIN_RATE_HZ = 50
+MAX_RATE_HZ = 200
+
+# Longest line each way per tick: (host -> device, device -> host) bytes. A
+# binary frame is answered with one ack byte; a CUSTOM:255,255,255,255 line
+# with "Processing command: CUSTOM:..." and "Custom command executed" (CRLFs).
+TICK_BYTES = {
+    "binary": (7, 1),
+    "text": (len("CUSTOM:255,255,255,255\n"),
+             len("Processing command: CUSTOM:255,255,255,255\r\n") + len("Custom command executed\r\n")),
+}
+BITS_PER_BYTE = 10  # 8N1
+# Share of the line a stream may take, leaving room for commands and telemetry
+LINE_SHARE = 0.8
+
+
+def max_rate_hz(protocol, baud_rate):
+    """
+    Highest stream rate the serial line can carry both ways
+
+    Above it the device's replies queue up faster than they drain and the
+    backlog grows for as long as the stream runs (the text firmware's 69-byte
+    echo limits 115200 baud to 133 Hz).
+
+    Args:
+        protocol (str): "binary" or "text" (see DroneNLPController)
+        baud_rate (int): Serial line rate
+
+    Returns:
+        int: Rate in Hz, at most MAX_RATE_HZ (below MIN_RATE_HZ if the line
+            is too slow to stream at all)
+    """
+    per_tick = max(TICK_BYTES[protocol])
+    return min(MAX_RATE_HZ, int(baud_rate / BITS_PER_BYTE * LINE_SHARE / per_tick))
+
+
+class SetpointStreamer:
+    """Background control loop that sends the current setpoint every tick"""
+
+    def __init__(self, get_setpoint, send_setpoint, rate_hz=MIN_RATE_HZ, window=1000,
+                 max_rate=MAX_RATE_HZ):
+        """
+        Args:
+            get_setpoint (callable): Returns the setpoint to send this tick
+            send_setpoint (callable): Writes one setpoint to the device
+            rate_hz (int): Loop rate, MIN_RATE_HZ to max_rate
+            window (int): Number of recent ticks kept for jitter percentiles
+            max_rate (int): Highest rate the link carries (see max_rate_hz())
+        """
+        if max_rate < MIN_RATE_HZ:
+            raise ValueError(f"The serial line is too slow to stream at {MIN_RATE_HZ} Hz "
+                             f"(at most {max_rate} Hz)")
+        if not MIN_RATE_HZ <= rate_hz <= max_rate:
+            raise ValueError(f"Stream rate must be {MIN_RATE_HZ}-{max_rate} Hz, got {rate_hz}")
+
+        self.get_setpoint = get_setpoint
+        self.send_setpoint = send_setpoint
+        self.rate_hz = rate_hz
+        self.period = 1.0 / rate_hz
+
+        self._stop_event = threading.Event()
+        self._thread = None
+
+        self._jitter = deque(maxlen=window)
+        self.ticks = 0
+        self.overruns = 0
+        self.missed_ticks = 0
+        self.send_errors = 0
+        self.max_jitter = 0.0
+
+    @property
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Start the control loop thread"""
+        if self.is_running:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=1.0):
+        """Stop the control loop and wait for the thread to exit"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        period = self.period
+        clock = time.monotonic
+        deadline = clock() + period
+
+        while not self._stop_event.is_set():
+            delay = deadline - clock()
+            if delay > 0:
+                time.sleep(delay)
+
+            now = clock()
+            jitter = now - deadline
+            self._jitter.append(jitter)
+            if jitter > self.max_jitter:
+                self.max_jitter = jitter
+
+            try:
+                self.send_setpoint(self.get_setpoint())
+            except Exception:
+                self.send_errors += 1
+            self.ticks += 1
+
+            # Next deadline stays on the original grid. If we are already
+            # past it, count the overrun and skip the ticks we missed rather
+            # than bursting to catch up.
+            deadline += period
+            now = clock()
+            if now >= deadline:
+                missed = int((now - deadline) / period) + 1
+                self.overruns += 1
+                self.missed_ticks += missed
+                deadline += missed * period
+
+    def get_stats(self):
+        """
+        Loop timing statistics
+
+        Jitter is how late a tick started relative to its deadline, in seconds.
+        """
+        samples = list(self._jitter)
+        return {
+            'rate_hz': self.rate_hz,
+            'running': self.is_running,
+            'ticks': self.ticks,
+            'overruns': self.overruns,
+            'missed_ticks': self.missed_ticks,
+            'send_errors': self.send_errors,
+            'jitter_mean': sum(samples) / len(samples) if samples else 0.0,
+            'jitter_p50': percentile(samples, 0.50),
+            'jitter_p99': percentile(samples, 0.99),
+            'jitter_max': self.max_jitter,
+        }
@@ -0,0 +1,532 @@
+"""
+Sniffer capture tools for reverse-engineering the P8 PRO radio frame
+
+Sniffer/sketch_nov4a.ino prints every 32-byte payload it receives as
+
+    12345 ms | pipe 0 | payload: A5 80 80 80 ...
+
+This module turns such logs (saved to a file, or read live from the serial
+port) into a compact capture file: a 16-byte header followed by fixed-size
+records (sniffer time, pipe, payload) that is opened as a memory-mapped NumPy
+structured array, so captures of millions of packets are analysed without
+loading them. The analyses are vectorized over the whole array:
+
+- per-byte-offset entropy and change rate (constant bytes, counters, sticks)
+- candidate checksum bytes (sum, negated sum or XOR of a byte range, plus a
+  constant)
+- correlation of each byte offset with the stick values we sent
+
+Requires numpy (pip install numpy).
+
+Usage:
+    python sniffer_tools.py ingest session1.txt session2.txt -o capture.cap
+    python sniffer_tools.py live --port COM5 -o capture.cap [--duration 60]
+    python sniffer_tools.py analyze capture.cap [--sent sent.csv --auto-lag] [--json report.json]
+"""
+
+import argparse
+import json
+import os
+import re
+import struct
+import sys
+import time
+
+import numpy as np
+
+PAYLOAD_SIZE = 32
+
+CAPTURE_DTYPE = np.dtype([
+    ('time_ms', '<u4'),                      # sniffer millis()
+    ('pipe', 'u1'),
+    ('payload', 'u1', (PAYLOAD_SIZE,)),
+])
+
+MAGIC = b'P8SNIFF1'
+HEADER = struct.Struct('<8sII')              # magic, record size, reserved
+HEADER_SIZE = HEADER.size
+
+STICKS = ('throttle', 'yaw', 'pitch', 'roll')
+
+# One sniffer line; the payload is always 32 zero-padded hex bytes
+_LINE = re.compile(r'^\s*(\d+) ms \| pipe (\d) \| payload: ((?:[0-9A-Fa-f]{2} ){31}[0-9A-Fa-f]{2})\s*$',
+                   re.MULTILINE)
+
+CHUNK_BYTES = 8 << 20
+
+
+# Capture files -----------------------------------------------------------------
+
+def _write_header(f):
+    f.write(HEADER.pack(MAGIC, CAPTURE_DTYPE.itemsize, 0))
+
+
+def open_capture(path, append=False):
+    """Open a capture file for writing records (creates the header if new)"""
+    exists = append and os.path.exists(path) and os.path.getsize(path) >= HEADER_SIZE
+    f = open(path, 'ab' if exists else 'wb')
+    if not exists:
+        _write_header(f)
+    return f
+
+
+def load_capture(path):
+    """
+    Memory-map a capture file
+
+    Returns:
+        numpy.memmap: Structured array with CAPTURE_DTYPE records (read-only)
+    """
+    with open(path, 'rb') as f:
+        magic, record_size, _ = HEADER.unpack(f.read(HEADER_SIZE))
+    if magic != MAGIC or record_size != CAPTURE_DTYPE.itemsize:
+        raise ValueError(f"{path} is not a sniffer capture file")
+    count = (os.path.getsize(path) - HEADER_SIZE) // record_size
+    if count == 0:
+        return np.zeros(0, dtype=CAPTURE_DTYPE)
+    return np.memmap(path, dtype=CAPTURE_DTYPE, mode='r', offset=HEADER_SIZE, shape=(count,))
+
+
+def parse_lines(text):
+    """
+    Parse a block of sniffer output; lines that are not packets are skipped
+
+    Returns:
+        numpy.ndarray: Records with CAPTURE_DTYPE
+    """
+    matches = _LINE.findall(text)
+    records = np.empty(len(matches), dtype=CAPTURE_DTYPE)
+    if not matches:
+        return records
+    times, pipes, payloads = zip(*matches)
+    records['time_ms'] = np.array(times, dtype=np.int64)
+    records['pipe'] = np.array(pipes, dtype=np.uint8)
+    records['payload'] = np.frombuffer(bytes.fromhex(' '.join(payloads)),
+                                       dtype=np.uint8).reshape(-1, PAYLOAD_SIZE)
+    return records
+
+
+def ingest_logs(paths, output, append=False):
+    """
+    Convert saved sniffer logs into a capture file, a large chunk at a time
+
+    Returns:
+        int: Number of packets written
+    """
+    written = 0
+    with open_capture(output, append) as out:
+        for path in paths:
+            with open(path, 'r', encoding='latin-1', newline='') as f:
+                tail = ''
+                while True:
+                    block = f.read(CHUNK_BYTES)
+                    if not block:
+                        break
+                    block = tail + block
+                    # Keep the partial last line for the next chunk
+                    cut = block.rfind('\n') + 1
+                    tail = block[cut:]
+                    records = parse_lines(block[:cut])
+                    out.write(records.tobytes())
+                    written += len(records)
+                if tail:
+                    records = parse_lines(tail)
+                    out.write(records.tobytes())
+                    written += len(records)
+    return written
+
+
+def capture_serial(port, output, baud_rate=115200, duration=None, append=False,
+                   flush_interval=0.5, on_batch=None):
+    """
+    Record the sniffer live from its serial port into a capture file
+
+    Args:
+        port (str): Serial port of the sniffer Arduino
+        output (str): Capture file to write
+        baud_rate (int): Sniffer baud rate
+        duration (float): Seconds to record (None = until Ctrl+C)
+        append (bool): Add to an existing capture instead of replacing it
+        flush_interval (float): Seconds between writes to the file
+        on_batch (callable): Called with the running packet count after each write
+
+    Returns:
+        int: Number of packets written
+    """
+    import serial
+
+    written = 0
+    deadline = time.monotonic() + duration if duration else None
+    pending = ''
+    with serial.Serial(port, baud_rate, timeout=0.1) as link, open_capture(output, append) as out:
+        last_flush = time.monotonic()
+        try:
+            while deadline is None or time.monotonic() < deadline:
+                data = link.read(link.in_waiting or 1)
+                if data:
+                    pending += data.decode('latin-1')
+                now = time.monotonic()
+                if now - last_flush >= flush_interval and '\n' in pending:
+                    cut = pending.rfind('\n') + 1
+                    records = parse_lines(pending[:cut])
+                    pending = pending[cut:]
+                    out.write(records.tobytes())
+                    out.flush()
+                    written += len(records)
+                    last_flush = now
+                    if on_batch is not None:
+                        on_batch(written)
+        except KeyboardInterrupt:
+            pass
+        records = parse_lines(pending)
+        out.write(records.tobytes())
+        written += len(records)
+    return written
+
+
+# Analyses --------------------------------------------------------------------------
+
+def _chunks(array, size=1 << 18):
+    for start in range(0, len(array), size):
+        yield array[start:start + size]
+
+
+def byte_histograms(payloads):
+    """Value counts per offset: shape (offsets, 256)"""
+    offsets = payloads.shape[1]
+    base = np.arange(offsets, dtype=np.int64) * 256
+    counts = np.zeros(offsets * 256, dtype=np.int64)
+    for chunk in _chunks(payloads):
+        counts += np.bincount((chunk.astype(np.int64) + base).ravel(), minlength=offsets * 256)
+    return counts.reshape(offsets, 256)
+
+
+def byte_entropy(payloads):
+    """Shannon entropy (bits, 0-8) of each byte offset"""
+    counts = byte_histograms(payloads)
+    totals = counts.sum(axis=1, keepdims=True)
+    p = np.divide(counts, totals, out=np.zeros(counts.shape), where=totals > 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # + 0.0 turns the -0.0 of constant offsets into 0.0
+        return -np.where(p > 0, p * np.log2(p), 0.0).sum(axis=1) + 0.0
+
+
+def change_rate(payloads):
+    """Fraction of consecutive packets in which each byte offset changed"""
+    if len(payloads) < 2:
+        return np.zeros(payloads.shape[1])
+    changes = np.zeros(payloads.shape[1], dtype=np.int64)
+    previous = None
+    for chunk in _chunks(payloads):
+        if previous is not None:
+            changes += chunk[0] != previous
+        changes += (chunk[1:] != chunk[:-1]).sum(axis=0)
+        previous = chunk[-1]
+    return changes / (len(payloads) - 1)
+
+
+def find_checksums(payloads, min_match=0.99, sample=5000, min_span=2):
+    """
+    Search for bytes that are a checksum of a byte range
+
+    For each offset k and range [start, end) not containing k, tests whether
+    payload[k] - sum(range), payload[k] + sum(range) or payload[k] ^ xor(range)
+    is the same constant (mod 256) in nearly every packet. Candidates are
+    found on a sample and then verified on the whole capture.
+
+    Returns:
+        list: dicts (offset, kind, start, end, constant, match_rate), best first
+    """
+    n, offsets = payloads.shape
+    if n == 0:
+        return []
+    if n > sample:
+        rows = np.linspace(0, n - 1, sample).astype(np.int64)
+        data = np.asarray(payloads[rows])
+    else:
+        data = np.asarray(payloads)
+    data16 = data.astype(np.int16)
+
+    # Range sums/xors for every [start, end): shape (rows, offsets+1, offsets+1)
+    prefix_sum = np.zeros((len(data), offsets + 1), dtype=np.int16)
+    prefix_sum[:, 1:] = np.cumsum(data16, axis=1) & 0xFF
+    prefix_xor = np.zeros((len(data), offsets + 1), dtype=np.uint8)
+    prefix_xor[:, 1:] = np.bitwise_xor.accumulate(data, axis=1)
+    range_sum = (prefix_sum[:, None, :] - prefix_sum[:, :, None]) & 0xFF
+    range_xor = prefix_xor[:, None, :] ^ prefix_xor[:, :, None]
+
+    starts, ends = np.meshgrid(np.arange(offsets + 1), np.arange(offsets + 1), indexing='ij')
+    valid_range = ends - starts >= min_span
+    varying = (data != data[0]).any(axis=0)
+
+    candidates = []
+    for k in range(offsets):
+        if not varying[k]:
+            continue
+        allowed = valid_range & ~((starts <= k) & (k < ends))
+        target = data16[:, k, None, None]
+        for kind, residual in (('sum', (target - range_sum) & 0xFF),
+                               ('neg_sum', (target + range_sum) & 0xFF),
+                               ('xor', target.astype(np.uint8) ^ range_xor)):
+            match = (residual == residual[0]).mean(axis=0)
+            for start, end in zip(*np.nonzero(allowed & (match >= min_match))):
+                candidates.append((k, kind, int(start), int(end), int(residual[0, start, end])))
+
+    results = []
+    for k, kind, start, end, constant in candidates:
+        rate = _verify_checksum(payloads, k, kind, start, end, constant)
+        if rate >= min_match:
+            results.append({'offset': k, 'kind': kind, 'start': start, 'end': end,
+                            'constant': constant, 'match_rate': rate})
+    # Prefer exact matches, then ranges covering the most varying bytes and
+    # the fewest constant ones (which only shift the constant)
+    varying_full = np.asarray(change_rate(payloads) > 0)
+
+    def rank(r):
+        span = varying_full[r['start']:r['end']]
+        return -r['match_rate'], -int(span.sum()), int((~span).sum())
+
+    results.sort(key=rank)
+    return results
+
+
+def _verify_checksum(payloads, k, kind, start, end, constant):
+    matched = 0
+    for chunk in _chunks(payloads):
+        span = chunk[:, start:end]
+        if kind == 'xor':
+            value = np.bitwise_xor.reduce(span, axis=1) ^ constant
+        else:
+            total = span.sum(axis=1, dtype=np.int64)
+            value = (constant + total if kind == 'sum' else constant - total) & 0xFF
+        matched += int((chunk[:, k] == value).sum())
+    return matched / len(payloads)
+
+
+def load_sent_log(path):
+    """
+    Load the stick values we sent: CSV with a header of time_ms and any of
+    throttle, yaw, pitch, roll (times on the sniffer's clock, or shifted
+    with a lag)
+
+    Returns:
+        tuple: (times_ms array, {stick: values array})
+    """
+    table = np.genfromtxt(path, delimiter=',', names=True, dtype=np.float64)
+    sticks = {name: table[name] for name in STICKS if name in table.dtype.names}
+    return table['time_ms'], sticks
+
+
+def _zscore(matrix):
+    """Standardize columns; constant columns become NaN"""
+    matrix = matrix - matrix.mean(axis=0)
+    std = matrix.std(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(std > 0, matrix / std, np.nan).astype(np.float32)
+
+
+def _payload_zscores(payloads):
+    """Standardized payload bytes read as unsigned and as signed values"""
+    payloads = np.asarray(payloads)
+    return (_zscore(payloads.astype(np.float32)),
+            _zscore(payloads.view(np.int8).astype(np.float32)))
+
+
+def _sent_index(times_ms, sent_times, lag_ms):
+    """Index of the most recent sent command for each packet (-1 if none yet)"""
+    return np.searchsorted(sent_times, np.asarray(times_ms, dtype=np.float64) - lag_ms,
+                           side='right') - 1
+
+
+def _correlate(z_payload, sent_values, index):
+    """r per offset, keeping the stronger of the unsigned/signed readings"""
+    z_unsigned, z_signed = z_payload
+    stick = _zscore(sent_values[index].astype(np.float32)[:, None])
+    r_unsigned = (z_unsigned * stick).mean(axis=0)
+    r_signed = (z_signed * stick).mean(axis=0)
+    return np.where(np.abs(r_signed) > np.abs(r_unsigned), r_signed, r_unsigned)
+
+
+def _sorted_sent(sent_times_ms, sent_sticks):
+    order = np.argsort(sent_times_ms, kind='stable')
+    times = np.asarray(sent_times_ms, dtype=np.float64)[order]
+    return times, {name: np.asarray(v, dtype=np.float64)[order] for name, v in sent_sticks.items()}
+
+
+def stick_correlation(times_ms, payloads, sent_times_ms, sent_sticks, lag_ms=0.0):
+    """
+    Pearson correlation of every byte offset with every stick we sent
+
+    Each packet is paired with the most recent command sent at least lag_ms
+    earlier. Bytes are correlated both as unsigned and as signed values and
+    the stronger correlation is kept.
+
+    Returns:
+        dict: {stick: array of r per offset (NaN where a byte never changes)}
+    """
+    sent_times, sticks = _sorted_sent(sent_times_ms, sent_sticks)
+    index = _sent_index(times_ms, sent_times, lag_ms)
+    usable = index >= 0
+    if not usable.any():
+        return {name: np.full(payloads.shape[1], np.nan) for name in sticks}
+    z_payload = _payload_zscores(np.asarray(payloads)[usable])
+    return {name: _correlate(z_payload, values, index[usable]) for name, values in sticks.items()}
+
+
+def estimate_lag(times_ms, payloads, sent_times_ms, sent_sticks,
+                 lags_ms=range(-2000, 2001, 20), max_packets=20000):
+    """
+    Lag (ms) at which the sticks correlate best with some byte offset
+
+    Uses at most max_packets evenly spaced packets. The payload statistics
+    are computed once; only the pairing with sent commands changes per lag.
+    """
+    sent_times, sticks = _sorted_sent(sent_times_ms, sent_sticks)
+    times = np.asarray(times_ms, dtype=np.float64)
+    # Only packets that have a preceding command at every lag tried
+    rows = np.nonzero(times - max(lags_ms) >= sent_times[0])[0] if len(sent_times) else []
+    if len(rows) == 0:
+        return 0
+    if len(rows) > max_packets:
+        rows = rows[np.linspace(0, len(rows) - 1, max_packets).astype(np.int64)]
+    z_payload = _payload_zscores(np.asarray(payloads)[rows])
+    times = times[rows]
+
+    best_lag, best_score = 0, -1.0
+    for lag in lags_ms:
+        index = _sent_index(times, sent_times, lag)
+        scores = []
+        for values in sticks.values():
+            r = np.abs(_correlate(z_payload, values, index))
+            scores.append(np.nanmax(r) if np.isfinite(r).any() else 0.0)
+        score = float(np.mean(scores))
+        if score > best_score:
+            best_lag, best_score = lag, score
+    return best_lag
+
+
+def analyze(capture, sent=None, lag_ms=0.0, auto_lag=False):
+    """
+    Run every analysis on a capture
+
+    Args:
+        capture (numpy.ndarray): Records with CAPTURE_DTYPE (e.g. load_capture())
+        sent (tuple): (times_ms, sticks) from load_sent_log(), optional
+        lag_ms (float): Sniffer time minus send time
+        auto_lag (bool): Estimate lag_ms from the data instead
+
+    Returns:
+        dict: JSON-serializable report
+    """
+    payloads = capture['payload']
+    report = {'packets': int(len(capture))}
+    if len(capture) == 0:
+        return report
+    times = capture['time_ms']
+    duration = (int(times[-1]) - int(times[0])) / 1000
+    report['duration_s'] = duration
+    report['packet_rate_hz'] = (len(capture) - 1) / duration if duration > 0 else None
+    report['pipes'] = {int(p): int(c) for p, c in zip(*np.unique(capture['pipe'], return_counts=True))}
+
+    entropy = byte_entropy(payloads)
+    changes = change_rate(payloads)
+    histograms = byte_histograms(payloads)
+    report['offsets'] = [{
+        'offset': i,
+        'entropy_bits': round(float(entropy[i]), 3),
+        'change_rate': round(float(changes[i]), 4),
+        'distinct_values': int((histograms[i] > 0).sum()),
+        'most_common': int(histograms[i].argmax()),
+    } for i in range(payloads.shape[1])]
+    report['constant_offsets'] = [i for i in range(payloads.shape[1]) if entropy[i] == 0]
+    report['checksum_candidates'] = find_checksums(payloads)[:10]
+
+    if sent is not None:
+        sent_times, sticks = sent
+        if auto_lag:
+            lag_ms = estimate_lag(times, payloads, sent_times, sticks)
+        corr = stick_correlation(times, payloads, sent_times, sticks, lag_ms)
+        report['lag_ms'] = lag_ms
+        report['stick_offsets'] = {}
+        for name, r in corr.items():
+            finite = np.where(np.isfinite(r), np.abs(r), -1.0)
+            best = np.argsort(finite)[::-1][:3]
+            report['stick_offsets'][name] = [{'offset': int(i), 'r': round(float(r[i]), 4)}
+                                             for i in best if finite[i] >= 0]
+    return report
+
+
+def print_report(report):
+    print(f"Packets: {report['packets']}")
+    if not report['packets']:
+        return
+    rate = report['packet_rate_hz']
+    print(f"Duration: {report['duration_s']:.1f} s" + (f", {rate:.1f} packets/s" if rate else ""))
+    print(f"Pipes: {report['pipes']}")
+    print(f"\n{'offset':>6}{'entropy':>9}{'change':>9}{'values':>8}{'mode':>6}")
+    for o in report['offsets']:
+        print(f"{o['offset']:>6}{o['entropy_bits']:>9.3f}{o['change_rate']:>9.4f}"
+              f"{o['distinct_values']:>8}{o['most_common']:>6}")
+    print(f"\nConstant offsets: {report['constant_offsets']}")
+    print("Checksum candidates:")
+    for c in report['checksum_candidates'] or [None]:
+        if c is None:
+            print("  none found")
+            break
+        print(f"  byte {c['offset']} = {c['kind']}(bytes {c['start']}..{c['end'] - 1}) "
+              f"+ 0x{c['constant']:02X} ({c['match_rate']:.2%})")
+    if 'stick_offsets' in report:
+        print(f"\nStick correlation (lag {report['lag_ms']} ms):")
+        for name, best in report['stick_offsets'].items():
+            shown = ", ".join(f"byte {b['offset']} r={b['r']:+.3f}" for b in best)
+            print(f"  {name:<9} {shown}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    sub = parser.add_subparsers(dest='action', required=True)
+
+    ingest = sub.add_parser('ingest', help='Convert saved sniffer logs')
+    ingest.add_argument('logs', nargs='+')
+    ingest.add_argument('-o', '--output', required=True)
+    ingest.add_argument('--append', action='store_true')
+
+    live = sub.add_parser('live', help='Record from the sniffer serial port')
+    live.add_argument('--port', required=True)
+    live.add_argument('--baud', type=int, default=115200)
+    live.add_argument('--duration', type=float)
+    live.add_argument('-o', '--output', required=True)
+    live.add_argument('--append', action='store_true')
+
+    report = sub.add_parser('analyze', help='Analyse a capture file')
+    report.add_argument('capture')
+    report.add_argument('--sent', help='CSV of sent sticks (time_ms,throttle,yaw,pitch,roll)')
+    report.add_argument('--lag-ms', type=float, default=0.0)
+    report.add_argument('--auto-lag', action='store_true')
+    report.add_argument('--json', help='Also write the report here')
+
+    args = parser.parse_args()
+
+    if args.action == 'ingest':
+        start = time.perf_counter()
+        count = ingest_logs(args.logs, args.output, args.append)
+        elapsed = time.perf_counter() - start
+        print(f"Wrote {count} packets to {args.output} in {elapsed:.2f} s")
+    elif args.action == 'live':
+        def progress(count):
+            print(f"\r{count} packets", end='', flush=True)
+        count = capture_serial(args.port, args.output, args.baud, args.duration,
+                               args.append, on_batch=progress)
+        print(f"\nWrote {count} packets to {args.output}")
+    else:
+        capture = load_capture(args.capture)
+        sent = load_sent_log(args.sent) if args.sent else None
+        result = analyze(capture, sent, args.lag_ms, args.auto_lag)
+        print_report(result)
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump(result, f, indent=2)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""
+Non-blocking speech output for the P8 PRO Drone Controller
+
+pyttsx3's runAndWait() blocks for as long as the sentence takes to say. The
+SpeechWorker owns the TTS engine on its own thread so callers only enqueue
+text. When confirmations arrive faster than they can be spoken, only the most
+recent one is kept; urgent (safety) messages are spoken before any of them.
+"""
+
+import threading
+import time
+from collections import deque
+
+
+class SpeechWorker:
+    """Background text-to-speech queue with stale-message dropping"""
+
+    def __init__(self, engine_factory, max_urgent=8, max_age=3.0):
+        """
+        Args:
+            engine_factory (callable): Creates the TTS engine; called once, on
+                the worker thread (pyttsx3 engines are bound to the thread
+                that created them)
+            max_urgent (int): Most urgent messages kept waiting
+            max_age (float): Seconds after which a routine message is not worth
+                saying any more
+        """
+        self.engine_factory = engine_factory
+        self.max_age = max_age
+        self.engine = None
+
+        self._urgent = deque(maxlen=max_urgent)
+        self._routine = None
+        self._cond = threading.Condition()
+        self._running = True
+
+        self.spoken = 0
+        self.dropped = 0
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def say(self, text, urgent=False):
+        """
+        Queue text to be spoken; returns immediately
+
+        Args:
+            text (str): What to say
+            urgent (bool): Safety message - spoken before routine confirmations
+                and never replaced by them
+        """
+        with self._cond:
+            if urgent:
+                if len(self._urgent) == self._urgent.maxlen:
+                    self.dropped += 1
+                self._urgent.append(text)
+                # Routine chatter queued before a safety message is obsolete
+                if self._routine is not None:
+                    self._routine = None
+                    self.dropped += 1
+            else:
+                if self._routine is not None:
+                    self.dropped += 1
+                self._routine = (text, time.monotonic())
+            self._cond.notify()
+
+    def stop(self, timeout=1.0):
+        """Stop the worker after the sentence being spoken finishes"""
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        self._thread.join(timeout)
+
+    @property
+    def pending(self):
+        with self._cond:
+            return len(self._urgent) + (self._routine is not None)
+
+    def _next_message(self):
+        """Wait for and pop the next message (None when stopping)"""
+        with self._cond:
+            while True:
+                if not self._running:
+                    return None
+                if self._urgent:
+                    return self._urgent.popleft()
+                if self._routine is not None:
+                    text, queued_at = self._routine
+                    self._routine = None
+                    if time.monotonic() - queued_at <= self.max_age:
+                        return text
+                    self.dropped += 1
+                    continue
+                self._cond.wait()
+
+    def _run(self):
+        try:
+            self.engine = self.engine_factory()
+        except Exception as e:
+            print(f"Text-to-speech engine failed to start: {e}")
+            return
+
+        while True:
+            text = self._next_message()
+            if text is None:
+                break
+            try:
+                self.engine.say(text)
+                self.engine.runAndWait()
+                self.spoken += 1
+            except Exception as e:
+                print(f"Text-to-speech error: {e}")
+
+    def get_stats(self):
+        with self._cond:
+            return {
+                'spoken': self.spoken,
+                'dropped': self.dropped,
+                'pending': len(self._urgent) + (self._routine is not None),
+            }
@@ -0,0 +1,69 @@
+"""
+Versioned, immutable drone state for the P8 PRO Drone Controller
+
+The controller's state used to be a dict mutated in place by the serial
+reader and command threads while the GUIs, the web API and the publisher read
+it from theirs. Now every change builds a new DroneState (a namedtuple) and
+swaps it in with a single reference assignment:
+
+- readers take `store.current` once and get a consistent snapshot; they never
+  take a lock and never see a half-applied change
+- writers serialize on a short lock that only covers building the new tuple
+- `version` increases by one per change, so a reader can tell whether
+  anything happened since its last look without comparing fields
+"""
+
+import threading
+from collections import namedtuple
+
+DroneState = namedtuple('DroneState', [
+    'version',
+    'connected',
+    'link_up',
+    'armed',
+    'flying',
+    'last_command',
+    'last_command_time',
+    'device_ready',
+    'last_error',
+])
+
+INITIAL_STATE = DroneState(version=0, connected=False, link_up=False, armed=False, flying=False,
+                           last_command=None, last_command_time=None,
+                           device_ready=False, last_error=None)
+
+
+class StateStore:
+    """Holds the current DroneState and replaces it atomically on change"""
+
+    def __init__(self, on_change=None):
+        """
+        Args:
+            on_change (callable): Called with the new DroneState after each
+                change, outside the store lock, on the writer's thread
+        """
+        self.on_change = on_change
+        self._state = INITIAL_STATE
+        self._lock = threading.Lock()
+
+    @property
+    def current(self):
+        """The latest snapshot (never blocks)"""
+        return self._state
+
+    def update(self, **changes):
+        """
+        Apply field changes as one new version
+
+        Returns:
+            DroneState: The new snapshot, or the current one if nothing changed
+        """
+        with self._lock:
+            old = self._state
+            if all(getattr(old, name) == value for name, value in changes.items()):
+                return old
+            new = old._replace(version=old.version + 1, **changes)
+            self._state = new
+        if self.on_change is not None:
+            self.on_change(new)
+        return new
@@ -0,0 +1,40 @@
+"""
+Shared pytest setup: the modules under test live one directory up
+
+Run from the python directory:
+    python -m pytest tests
+"""
+
+import contextlib
+import io
+import logging
+import os
+import sys
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, os.path.join(os.path.dirname(HERE), 'benchmarks'))
+
+logging.basicConfig(level=logging.WARNING)
+
+
+@pytest.fixture
+def emulator():
+    """A running pty emulator of drone_controller.ino (POSIX only)"""
+    if os.name != 'posix':
+        pytest.skip("the device emulator needs a pty")
+    from device_emulator import DeviceEmulator
+    with DeviceEmulator() as device, contextlib.redirect_stdout(io.StringIO()):
+        yield device
+
+
+@pytest.fixture
+def bridge():
+    """A running pty emulator of arduino_bridge.ino (POSIX only)"""
+    if os.name != 'posix':
+        pytest.skip("the device emulator needs a pty")
+    from device_emulator import DeviceEmulator
+    with DeviceEmulator('bridge') as device, contextlib.redirect_stdout(io.StringIO()):
+        yield device
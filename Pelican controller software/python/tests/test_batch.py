@@ -0,0 +1,89 @@
+"""Several intents written to the device in one write"""
+
+import contextlib
+import io
+import os
+import time
+
+import pytest
+import serial
+
+from intent_matcher import Intent
+from packet_codec import FrameCodec, CONTROL_PACKET
+from setpoint import apply_command
+
+INTENTS = (Intent("TAKEOFF", 1.0), Intent("FORWARD", 0.5), Intent("ROTATE_LEFT", 1.0), Intent("UP", 2.0))
+
+
+def test_binary_batch_sends_one_frame_per_intent(bridge):
+    from drone_nlp_controller import DroneNLPController
+
+    controller = DroneNLPController(arduino_port=bridge.port, protocol="binary", fast_start=True,
+                                    voice=False, tts=False, vocabulary_file=None)
+    try:
+        assert controller.connect_arduino(ready_timeout=3.0)
+        bridge.clear_records()
+        start = controller.setpoint
+        assert controller.send_batch_to_arduino(INTENTS)
+        assert bridge.wait_for_packets(len(INTENTS))
+    finally:
+        controller.disconnect_arduino()
+
+    codec = FrameCodec(CONTROL_PACKET)
+    expected = []
+    setpoint = start
+    for intent in INTENTS:
+        setpoint = apply_command(setpoint, intent.command, intent.magnitude)
+        # As the bridge sees it: clamped to its signed stick range
+        expected.append(codec.decode(bytes(codec.encode(setpoint))))
+    assert bridge.setpoints('frame') == expected
+    assert len(set(expected)) == len(INTENTS)
+    assert controller.setpoint == setpoint
+
+
+@pytest.mark.skipif(os.name != 'posix', reason="the device emulator needs a pty")
+def test_emulator_takes_each_line_as_it_arrives():
+    from device_emulator import DeviceEmulator
+
+    # 9600 baud: about 1 ms a byte, so the whole 74-byte write takes 77 ms
+    with DeviceEmulator(baud_rate=9600) as device, contextlib.redirect_stdout(io.StringIO()):
+        with serial.Serial(device.port, 9600, timeout=2) as port:
+            assert b"Ready for commands!" in port.read_until(b"Ready for commands!\r\n")
+            start = time.monotonic()
+            port.write(b"STOP\n" + b"CUSTOM:128,128,128,128\n" * 3)
+            assert device.wait_for_commands(4, timeout=2.0)
+            first = device.received()[0]
+    assert first.command == "STOP" and first.timestamp - start < 0.03
+
+
+@pytest.mark.skipif(not hasattr(os, 'mkfifo'), reason="needs named pipes")
+def test_named_pipe_is_read_as_lines_arrive_and_closed(tmp_path, monkeypatch):
+    import threading
+    import drone_nlp_controller
+
+    opened = []
+
+    def recording_open(*args, **kwargs):
+        opened.append(open(*args, **kwargs))
+        return opened[-1]
+
+    monkeypatch.setattr(drone_nlp_controller, 'open', recording_open, raising=False)
+
+    path = tmp_path / "commands"
+    os.mkfifo(path)
+
+    def write():
+        with open(path, 'w') as f:
+            f.write("take off\n")
+            f.flush()
+            time.sleep(0.05)
+            f.write("land\n")
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    lines = drone_nlp_controller.read_batch_input(str(path))
+    assert next(lines) == "take off\n"
+    assert not opened[0].closed
+    assert list(lines) == ["land\n"]
+    writer.join()
+    assert opened[0].closed
@@ -0,0 +1,139 @@
+"""Priority order and coalescing of the command scheduler"""
+
+import queue
+import threading
+
+import pytest
+
+from command_scheduler import CommandScheduler, BATCH
+from intent_matcher import Intent
+
+
+def drain(scheduler):
+    entries = []
+    while True:
+        try:
+            entries.append(scheduler.get(block=False))
+        except queue.Empty:
+            return entries
+
+
+def commands(scheduler):
+    return [entry.command for entry in drain(scheduler)]
+
+
+def test_fifo_within_a_priority():
+    scheduler = CommandScheduler()
+    for command in ("TAKEOFF", "FORWARD", "ROTATE_LEFT", "UP"):
+        scheduler.put(command)
+    assert commands(scheduler) == ["TAKEOFF", "FORWARD", "ROTATE_LEFT", "UP"]
+
+
+def test_land_drops_everything_pending_and_goes_first():
+    dropped = []
+    scheduler = CommandScheduler(on_drop=dropped.append)
+    for command in ("FORWARD", "STOP", "UP"):
+        scheduler.put(command)
+    scheduler.put("land")
+    assert commands(scheduler) == ["LAND"]
+    assert sorted(e.command for e in dropped) == ["FORWARD", "STOP", "UP"]
+    assert scheduler.get_stats()['dropped'] == 3
+
+
+def test_stop_drops_pending_moves_but_not_land():
+    scheduler = CommandScheduler()
+    scheduler.put("LAND")
+    scheduler.put("FORWARD")
+    scheduler.put("STOP")
+    assert commands(scheduler) == ["LAND", "STOP"]
+
+
+def test_repeated_safety_commands_merge():
+    scheduler = CommandScheduler()
+    scheduler.put("STOP")
+    scheduler.put("STOP")
+    assert commands(scheduler) == ["STOP"]
+    assert scheduler.get_stats()['merged'] == 1
+
+
+def test_throttle_steps_merge_and_cancel():
+    scheduler = CommandScheduler()
+    for _ in range(3):
+        scheduler.put("UP")
+    (entry,) = drain(scheduler)
+    assert entry.command == "UP" and entry.throttle_steps == 3
+
+    scheduler.put("UP")
+    scheduler.put("DOWN")
+    assert drain(scheduler) == []
+
+
+def test_newer_direction_on_an_axis_replaces_the_older():
+    scheduler = CommandScheduler()
+    scheduler.put("LEFT")
+    scheduler.put("FORWARD")
+    scheduler.put("RIGHT")
+    assert commands(scheduler) == ["FORWARD", "RIGHT"]
+
+
+def test_coalescing_stops_at_a_barrier():
+    scheduler = CommandScheduler()
+    scheduler.put("LEFT")
+    scheduler.put("TAKEOFF")
+    scheduler.put("RIGHT")
+    scheduler.put("CUSTOM:180,128,128,128")
+    scheduler.put("UP")
+    scheduler.put("UP")
+    assert commands(scheduler) == ["LEFT", "TAKEOFF", "RIGHT", "CUSTOM:180,128,128,128", "UP"]
+
+
+def test_batches_are_never_coalesced_but_keep_their_priority():
+    scheduler = CommandScheduler()
+    scheduler.put("LEFT")
+    scheduler.put_batch([Intent("RIGHT", 0.5), Intent("FORWARD", 1.0)])
+    scheduler.put("RIGHT")
+    entries = drain(scheduler)
+    assert [e.command for e in entries] == ["LEFT", BATCH, "RIGHT"]
+
+    scheduler.put("FORWARD")
+    scheduler.put_batch([Intent("FORWARD", 1.0), Intent("LAND", 1.0)])
+    (entry,) = drain(scheduler)
+    assert entry.command == BATCH and len(entry.batch) == 2
+
+
+def test_get_blocks_until_a_command_arrives():
+    scheduler = CommandScheduler()
+    with pytest.raises(queue.Empty):
+        scheduler.get(timeout=0.01)
+    threading.Timer(0.02, scheduler.put, args=("LAND",)).start()
+    assert scheduler.get(timeout=2).command == "LAND"
+
+
+def test_join_waits_for_task_done():
+    scheduler = CommandScheduler()
+    scheduler.put("UP")
+    scheduler.get()
+    finished = threading.Event()
+    threading.Thread(target=lambda: (scheduler.join(), finished.set()), daemon=True).start()
+    assert not finished.wait(0.05)
+    scheduler.task_done()
+    assert finished.wait(2)
+
+
+def test_wait_empty_returns_once_the_last_entry_is_taken():
+    scheduler = CommandScheduler()
+    assert scheduler.wait_empty(timeout=0)
+    scheduler.put("UP")
+    scheduler.put("FORWARD")
+    assert not scheduler.wait_empty(timeout=0.01)
+    scheduler.get()
+    threading.Timer(0.02, scheduler.get).start()
+    # No task_done() needed, unlike join()
+    assert scheduler.wait_empty(timeout=2)
+
+
+def test_cancelled_throttle_steps_leave_the_scheduler_empty():
+    scheduler = CommandScheduler()
+    scheduler.put("UP")
+    scheduler.put("DOWN")
+    assert scheduler.wait_empty(timeout=0)
@@ -0,0 +1,74 @@
+"""Access rules of the control server: token, JSON bodies, same origin only"""
+
+import http.client
+import socket
+
+import pytest
+
+from control_server import ControlServer
+
+TOKEN = "test-token"
+
+
+@pytest.fixture(scope="module")
+def port():
+    server = ControlServer(host='127.0.0.1', port=0, token=TOKEN)
+    port = server.start()
+    yield port
+    server.stop()
+
+
+def request(port, method, path, body=None, **headers):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+    connection.request(method, path, body, {k.replace('_', '-'): v for k, v in headers.items()})
+    response = connection.getresponse()
+    response.read()
+    connection.close()
+    return response
+
+
+def test_requests_without_the_token_are_refused(port):
+    assert request(port, 'GET', '/status').status == 401
+    assert request(port, 'GET', '/status', Authorization="Bearer nope").status == 401
+    response = request(port, 'GET', '/status', Authorization=f"Bearer {TOKEN}")
+    assert response.status == 200
+    assert response.getheader('Access-Control-Allow-Origin') is None
+
+
+def test_posts_must_be_json(port):
+    auth = f"Bearer {TOKEN}"
+    body = '{"command": "hover"}'
+    assert request(port, 'POST', '/command', body, Authorization=auth).status == 415
+    assert request(port, 'POST', '/command', body, Authorization=auth,
+                   Content_Type="text/plain").status == 415
+    assert request(port, 'POST', '/command', body, Authorization=auth,
+                   Content_Type="application/json").status == 200
+
+
+def test_cross_origin_requests_are_refused(port):
+    response = request(port, 'POST', '/command', '{"command": "land"}', Authorization=f"Bearer {TOKEN}",
+                       Content_Type="application/json", Origin="http://example.com")
+    assert response.status == 403
+
+
+def handshake(port, target, origin=None):
+    lines = [f"GET {target} HTTP/1.1", f"Host: 127.0.0.1:{port}", "Upgrade: websocket",
+             "Connection: Upgrade", "Sec-WebSocket-Key: dGhlIHNhbXBsZSBub25jZQ==",
+             "Sec-WebSocket-Version: 13"]
+    if origin:
+        lines.append(f"Origin: {origin}")
+    with socket.create_connection(('127.0.0.1', port), timeout=5) as sock:
+        sock.sendall(("\r\n".join(lines) + "\r\n\r\n").encode('ascii'))
+        return sock.recv(4096).split(b"\r\n", 1)[0]
+
+
+def test_websocket_handshake_checks_token_and_origin(port):
+    assert b" 401 " in handshake(port, "/ws")
+    assert b" 403 " in handshake(port, f"/ws?token={TOKEN}", origin="http://evil.example")
+    assert b" 101 " in handshake(port, f"/ws?token={TOKEN}", origin=f"http://127.0.0.1:{port}")
+    assert b" 101 " in handshake(port, f"/ws?token={TOKEN}")
+
+
+def test_a_token_is_required():
+    with pytest.raises(ValueError):
+        ControlServer(port=0)
@@ -0,0 +1,53 @@
+"""Parsing and routing of fleet phrases"""
+
+import queue
+
+import pytest
+
+from command_scheduler import BATCH
+from fleet import Fleet
+from intent_matcher import Intent
+
+
+@pytest.fixture
+def fleet():
+    # Never connected: commands stay on each drone's queue
+    fleet = Fleet(vocabulary_file=None)
+    for name in ("alpha", "bravo", "charlie"):
+        fleet.add_drone(name, f"FAKE-{name.upper()}", groups=["left"] if name != "charlie" else ())
+    return fleet
+
+
+def queued(controller):
+    entries = []
+    while True:
+        try:
+            entries.append(controller.command_queue.get(block=False))
+        except queue.Empty:
+            return entries
+
+
+def test_single_command_goes_to_the_addressed_drone(fleet):
+    broadcast = fleet.process_text_command("alpha take off")
+    assert broadcast.command == "TAKEOFF" and broadcast.targets == ("alpha",)
+    assert [e.command for e in queued(fleet["alpha"])] == ["TAKEOFF"]
+    assert queued(fleet["bravo"]) == []
+
+
+def test_chained_and_scaled_commands_are_not_lost(fleet):
+    broadcast = fleet.process_text_command("left: rotate left then go forward slowly")
+    assert broadcast.command == "ROTATE_LEFT FORWARD" and broadcast.targets == ("alpha", "bravo")
+    for name in broadcast.targets:
+        (entry,) = queued(fleet[name])
+        assert entry.command == BATCH
+        assert entry.batch == (Intent("ROTATE_LEFT", 1.0), Intent("FORWARD", 0.5))
+    assert queued(fleet["charlie"]) == []
+
+
+def test_misheard_phrase_is_recovered_like_the_controller(fleet):
+    text = "lnad"
+    expected = fleet["alpha"].parse_intents(text)
+    broadcast = fleet.process_text_command("all " + text)
+    assert expected and broadcast.command == expected[0].command
+    assert fleet.process_text_command("bravo sing a song") is None
+    assert fleet.not_understood == 1
@@ -0,0 +1,137 @@
+"""Flight log recording, segment rollover, crash recovery and replay timing"""
+
+import os
+import time
+
+import pytest
+
+from flight_log import (FlightRecorder, FlightLogReader, FlightReplayer, decode_record,
+                        session_segments, KIND_SESSION, KIND_INTENT, KIND_FRAME, KIND_RESPONSE,
+                        SEGMENT_HEADER, RECORD_HEADER)
+from serial_reader import DeviceEvent
+
+# Recorded one step apart; the replay tests check the spacing the device sees
+STEP_S = 0.2
+UTTERANCES = ("take off", "move forward", "rotate left", "move right")
+
+
+def test_records_round_trip(tmp_path):
+    event = DeviceEvent('ack', 'UP', 'Command executed: UP', 12.5)
+    with FlightRecorder(str(tmp_path), session={'protocol': 'text', 'port': 'COM3'}) as recorder:
+        recorder.log_intent("go up a bit", "UP")
+        recorder.log_intent("banana", None)
+        recorder.log_frame(b"UP\n")
+        recorder.log_frame(b"\xff\x01\x02", stream=True, binary=True)
+        recorder.log_response(event)
+
+    records = list(FlightLogReader(str(tmp_path)))
+    assert [r.kind for r in records] == [KIND_SESSION, KIND_INTENT, KIND_INTENT, KIND_FRAME,
+                                         KIND_FRAME, KIND_RESPONSE]
+    assert [decode_record(r) for r in records] == [
+        {'protocol': 'text', 'port': 'COM3'},
+        {'text': "go up a bit", 'command': "UP"},
+        {'text': "banana", 'command': None},
+        {'data': b"UP\n", 'stream': False, 'binary': False},
+        {'data': b"\xff\x01\x02", 'stream': True, 'binary': True},
+        {'event': 'ack', 'command': 'UP', 'text': 'Command executed: UP'},
+    ]
+    # Responses keep the time the reader received them
+    assert records[-1].timestamp_ns == 12_500_000_000
+    assert records[1].timestamp_ns <= records[3].timestamp_ns
+
+    # A clean close trims the preallocated space
+    (segment,) = session_segments(str(tmp_path))
+    payloads = sum(len(r.payload) for r in records)
+    assert os.path.getsize(segment) == SEGMENT_HEADER.size + len(records) * RECORD_HEADER.size + payloads
+
+    summary = FlightLogReader(segment).summary()
+    assert summary['records'] == 6 and summary['by_kind']['frame'] == 2
+    assert summary['session'] == {'protocol': 'text', 'port': 'COM3'}
+
+
+def test_records_roll_over_into_new_segments(tmp_path):
+    with FlightRecorder(str(tmp_path), segment_size=256) as recorder:
+        for i in range(100):
+            recorder.log_frame(f"CUSTOM:{i},128,128,128\n".encode())
+        stats = recorder.get_stats()
+
+    segments = session_segments(str(tmp_path))
+    assert stats['segments'] == len(segments) > 10
+    assert all(os.path.getsize(s) <= 256 for s in segments)
+    frames = [decode_record(r)['data'] for r in FlightLogReader(segments[3])]
+    assert frames == [f"CUSTOM:{i},128,128,128\n".encode() for i in range(100)]
+
+
+def test_reader_stops_at_the_end_of_an_unclosed_segment(tmp_path):
+    recorder = FlightRecorder(str(tmp_path), segment_size=4096)
+    try:
+        recorder.log_intent("take off", "TAKEOFF")
+        recorder.log_frame(b"TAKEOFF\n")
+        # As after a crash: the segment keeps its zero-filled preallocation
+        (segment,) = session_segments(str(tmp_path))
+        assert os.path.getsize(segment) == 4096
+        records = list(FlightLogReader(segment))
+    finally:
+        recorder.close()
+    assert [r.kind for r in records] == [KIND_INTENT, KIND_FRAME]
+
+
+def record_flight(directory):
+    """A session of UTTERANCES spoken STEP_S apart"""
+    with FlightRecorder(str(directory)) as recorder:
+        start = time.monotonic_ns()
+        for i, text in enumerate(UTTERANCES):
+            recorder.append(KIND_INTENT, f"{text}\0".encode(), timestamp_ns=start + int(i * STEP_S * 1e9))
+            recorder.log_frame(b"CUSTOM:128,128,128,128\n", stream=True)
+    return str(directory)
+
+
+def replay(device, log, speed):
+    from drone_nlp_controller import DroneNLPController
+
+    controller = DroneNLPController(arduino_port=device.port, fast_start=True,
+                                    voice=False, tts=False, vocabulary_file=None)
+    assert controller.connect_arduino(ready_timeout=3.0)
+    try:
+        before = device.commands
+        stats = FlightReplayer(controller, log, speed=speed).run()
+        assert device.wait_for_commands(before + len(UTTERANCES), timeout=3.0)
+    finally:
+        controller.disconnect_arduino()
+    received = device.received()[-len(UTTERANCES):]
+    assert [c.command for c in received] == ["TAKEOFF", "FORWARD", "ROTATE_LEFT", "RIGHT"]
+    return stats, [b.timestamp - a.timestamp for a, b in zip(received, received[1:])]
+
+
+@pytest.mark.parametrize("speed", [1, 4])
+def test_replay_keeps_the_recorded_timing(emulator, tmp_path, speed):
+    stats, gaps = replay(emulator, record_flight(tmp_path), speed)
+    step = STEP_S / speed
+    assert stats['replayed'] == len(UTTERANCES) and stats['late'] == 0
+    assert stats['elapsed_s'] >= (len(UTTERANCES) - 1) * step
+    assert all(abs(gap - step) < 0.03 for gap in gaps), gaps
+
+
+def test_replay_at_max_speed_does_not_wait(emulator, tmp_path):
+    stats, gaps = replay(emulator, record_flight(tmp_path), None)
+    assert stats['speed'] == 'max' and stats['replayed'] == len(UTTERANCES)
+    assert stats['elapsed_s'] < STEP_S
+    assert max(gaps) < STEP_S / 2
+
+
+def test_frame_replay_skips_stream_frames_unless_asked(emulator, tmp_path):
+    from drone_nlp_controller import DroneNLPController
+
+    log = record_flight(tmp_path)
+    controller = DroneNLPController(arduino_port=emulator.port, fast_start=True,
+                                    voice=False, tts=False, vocabulary_file=None)
+    assert controller.connect_arduino(ready_timeout=3.0)
+    try:
+        assert FlightReplayer(controller, log, speed=None, mode='frames').run()['replayed'] == 0
+        before = emulator.commands
+        stats = FlightReplayer(controller, log, speed=None, mode='frames', include_stream=True).run()
+        assert stats['replayed'] == len(UTTERANCES)
+        assert emulator.wait_for_commands(before + len(UTTERANCES), timeout=3.0)
+    finally:
+        controller.disconnect_arduino()
+    assert {c.command for c in emulator.received()[-len(UTTERANCES):]} == {"CUSTOM:128,128,128,128"}
@@ -0,0 +1,77 @@
+"""Timeline compilation and aborting of timed missions"""
+
+import json
+import threading
+
+import pytest
+
+from mission import (MissionRunner, compile_mission, MISSION_ABORTED, MISSION_PREEMPTED,
+                     MISSION_DONE)
+from setpoint import NEUTRAL, CENTER, TAKEOFF_THROTTLE, apply_command, to_custom_command
+from vocabulary import VocabularyStore
+
+FLYING = NEUTRAL._replace(throttle=150)
+
+
+def test_movement_returns_its_stick_to_centre():
+    mission = compile_mission("go forward for 2 seconds, then wait 1 second, then land", FLYING, flying=True)
+    forward, back, land = mission.changes
+    assert forward.at == 0 and forward.setpoint.pitch != CENTER
+    assert back.at == 2.0 and back.setpoint == FLYING
+    assert land.at == 3.0 and land.command == "LAND"
+
+
+def start(script):
+    sent = []
+    first = threading.Event()
+
+    def send(command, trace, text):
+        sent.append(command)
+        first.set()
+
+    runner = MissionRunner(compile_mission(script, FLYING, flying=True), send).start()
+    assert first.wait(2)
+    return runner, sent
+
+
+def test_abort_centres_the_sticks():
+    runner, sent = start("go forward for 5 seconds, then land")
+    runner.abort()
+    assert runner.wait(2) and runner.status == MISSION_ABORTED
+    assert sent == [runner.mission.changes[0].command, to_custom_command(FLYING)]
+
+
+@pytest.mark.parametrize("status, hover", [(MISSION_PREEMPTED, True), (MISSION_ABORTED, False)])
+def test_no_hover_when_preempted_or_landing(status, hover):
+    runner, sent = start("rotate left for 5 seconds, then land")
+    runner.abort(status, hover=hover)
+    assert runner.wait(2) and runner.status == status
+    assert sent == [runner.mission.changes[0].command]
+
+
+def test_no_hover_when_the_sticks_are_already_centred():
+    runner, sent = start("hover for 5 seconds, then land")
+    runner.abort()
+    runner.wait(2)
+    assert len(sent) == 1
+
+
+def test_a_finished_mission_is_not_aborted():
+    runner, sent = start("go up")
+    assert runner.wait(2) and runner.status == MISSION_DONE
+    runner.abort()
+    assert len(sent) == 1
+
+
+def test_steps_use_the_vocabulary_file(tmp_path):
+    path = tmp_path / "commands.json"
+    path.write_text(json.dumps({"commands": {"takeoff": ["get airborne"], "forward": ["scoot ahead"]}}))
+    vocabulary = VocabularyStore(str(path), cache_dir=None).current
+    mission = compile_mission("get airborne, then scoot ahead slowly for 1 second, then go up for 1 second, then land",
+                              vocabulary=vocabulary)
+    assert [step.command for step in mission.steps] == ["TAKEOFF", "FORWARD", "UP", "LAND"]
+    hovering = NEUTRAL._replace(throttle=TAKEOFF_THROTTLE)
+    forward, up = ([c.setpoint for c in mission.changes if c.step == step] for step in (1, 2))
+    assert forward == [apply_command(hovering, "FORWARD", 0.5)]
+    # Once airborne, "go up" climbs rather than taking off again
+    assert up == [apply_command(hovering, "UP")]
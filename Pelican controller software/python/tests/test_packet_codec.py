@@ -0,0 +1,58 @@
+"""Frame and radio packet round trips for both packet layouts"""
+
+import pytest
+
+from packet_codec import (FrameCodec, CONTROL_PACKET, DRONE_CONTROL, START_BYTE,
+                          ACK_OK, ACK_FAIL, parse_acks)
+from setpoint import Setpoint, NEUTRAL, CENTER
+
+SETPOINTS = [
+    NEUTRAL,
+    Setpoint(throttle=180, yaw=CENTER, pitch=68, roll=188, aux1=0, aux2=0),
+    Setpoint(throttle=255, yaw=1, pitch=255, roll=1, aux1=7, aux2=200),
+]
+
+
+@pytest.mark.parametrize("layout", [CONTROL_PACKET, DRONE_CONTROL], ids=lambda l: l.name)
+@pytest.mark.parametrize("setpoint", SETPOINTS)
+def test_frame_round_trip(layout, setpoint):
+    codec = FrameCodec(layout)
+    frame = codec.encode(setpoint)
+    assert len(frame) == 7 and frame[0] == START_BYTE
+    assert codec.decode(frame) == setpoint
+
+
+@pytest.mark.parametrize("layout", [CONTROL_PACKET, DRONE_CONTROL], ids=lambda l: l.name)
+@pytest.mark.parametrize("setpoint", SETPOINTS)
+def test_packet_round_trip_with_checksum(layout, setpoint):
+    codec = FrameCodec(layout)
+    packet = bytearray(codec.encode_packet(setpoint))
+    assert codec.decode_packet(packet) == (setpoint, True)
+    packet[0] ^= 0x01
+    assert codec.decode_packet(packet)[1] is False
+
+
+def test_signed_sticks_are_clamped_to_the_bridge_range():
+    codec = FrameCodec(CONTROL_PACKET)
+    frame = bytes(codec.encode(Setpoint(throttle=0, yaw=0, pitch=255, roll=CENTER, aux1=0, aux2=0)))
+    # roll, pitch, yaw as int8 around the centre: 0, 127, -127
+    assert frame == bytes([START_BYTE, 0, 0, 127, 0x81, 0, 0])
+
+
+def test_encode_reuses_its_buffer():
+    codec = FrameCodec()
+    first = codec.encode(SETPOINTS[1])
+    kept = bytes(first)
+    codec.encode(SETPOINTS[2])
+    # Callers that keep a frame must copy it (see FrameCodec.encode)
+    assert bytes(first) != kept
+    assert codec.decode(kept) == SETPOINTS[1]
+
+
+def test_decode_rejects_a_bad_start_byte():
+    with pytest.raises(ValueError):
+        FrameCodec().decode(bytes([0x00] * 7))
+
+
+def test_parse_acks_skips_text():
+    assert parse_acks(b"Bridge Ready\r\n" + bytes([ACK_OK, ACK_FAIL, ACK_OK])) == [True, False, True]
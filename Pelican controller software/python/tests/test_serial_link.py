@@ -0,0 +1,131 @@
+"""Outage buffering and sharing of SerialLink, over an in-memory port"""
+
+import threading
+import time
+
+import pytest
+
+import serial_link
+from packet_codec import FrameCodec
+from serial_link import SerialLink, SerialLinkDown, OutagePolicy, OUTAGE_DROP, WRITE_BUFFERED
+from setpoint import NEUTRAL
+
+
+class FakeSerial:
+    """Just enough of serial.Serial: prints the banner, records writes"""
+
+    def __init__(self, port, baudrate, timeout, write_timeout, banner=b"Ready for commands!\n"):
+        self.port = port
+        self.timeout = timeout
+        self.written = bytearray()
+        self._incoming = bytearray(banner)
+        self._closed = threading.Event()
+
+    @property
+    def in_waiting(self):
+        return len(self._incoming)
+
+    @property
+    def out_waiting(self):
+        return 0
+
+    def read(self, size=1):
+        if not self._incoming:
+            self._closed.wait(self.timeout)
+            return b""
+        data = bytes(self._incoming[:size])
+        del self._incoming[:size]
+        return data
+
+    def write(self, data):
+        self.written += data
+        return len(data)
+
+    def cancel_read(self):
+        pass
+
+    def close(self):
+        self._closed.set()
+
+
+def test_buffered_write_keeps_a_copy_of_a_reused_buffer():
+    ports = []
+    link = SerialLink("FAKE", ready_timeout=1.0,
+                      serial_factory=lambda **kw: ports.append(FakeSerial(**kw)) or ports[-1])
+    codec = FrameCodec()
+    takeoff = NEUTRAL._replace(throttle=180)
+    # Down until opened: the write is buffered
+    assert link.write(codec.encode(takeoff)) == WRITE_BUFFERED
+    codec.encode(NEUTRAL)
+    link.open()
+    try:
+        assert bytes(ports[0].written) == bytes(FrameCodec().encode(takeoff))
+        assert link.get_stats()['flushed'] == 1
+    finally:
+        link.close()
+
+
+def test_drop_policy_refuses_writes_while_down():
+    link = SerialLink("FAKE", policy=OutagePolicy(mode=OUTAGE_DROP))
+    with pytest.raises(SerialLinkDown):
+        link.write(b"UP\n")
+    assert link.get_stats()['refused'] == 1
+
+
+def test_old_buffered_writes_expire():
+    expired = []
+    link = SerialLink("FAKE", policy=OutagePolicy(max_age=0.01))
+    link.write(b"UP\n", on_expired=lambda: expired.append("UP"))
+    time.sleep(0.02)
+    link.write(b"DOWN\n")
+    assert expired == ["UP"] and link.get_stats()['pending'] == 1
+
+
+def test_acquire_shares_one_link_per_port(monkeypatch):
+    monkeypatch.setattr(serial_link.serial, "Serial", FakeSerial)
+    first = serial_link.acquire("FAKE-SHARED", ready_timeout=1.0)
+    second = serial_link.acquire("FAKE-SHARED")
+    try:
+        assert first is second and first.is_up
+        with pytest.raises(ValueError):
+            serial_link.acquire("FAKE-SHARED", baud_rate=9600)
+    finally:
+        serial_link.release(second)
+        assert first.is_up
+        serial_link.release(first)
+    assert not first.is_up and "FAKE-SHARED" not in serial_link.shared_links()
+
+
+class SlowBootSerial(FakeSerial):
+    """A board that prints its banner 0.3 s after the port opens"""
+
+    def __init__(self, **kwargs):
+        super().__init__(banner=b"", **kwargs)
+        threading.Timer(0.3, lambda: self._incoming.extend(b"Ready for commands!\n")).start()
+
+
+def test_acquire_opens_different_ports_in_parallel(monkeypatch):
+    monkeypatch.setattr(serial_link.serial, "Serial", SlowBootSerial)
+    ports = [f"FAKE-SLOW-{i}" for i in range(4)] + ["FAKE-SLOW-0"]
+    links = [None] * len(ports)
+
+    def open_port(i):
+        links[i] = serial_link.acquire(ports[i], ready_timeout=2.0)
+
+    threads = [threading.Thread(target=open_port, args=(i,)) for i in range(len(ports))]
+    start = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - start
+    try:
+        # One banner wait for all of them, not one after another
+        assert elapsed < 0.9
+        assert all(link is not None and link.is_up for link in links)
+        assert links[0] is links[-1] and len(set(map(id, links))) == 4
+    finally:
+        for link in links:
+            if link is not None:
+                serial_link.release(link)
+    assert not any(p in serial_link.shared_links() for p in ports)
@@ -0,0 +1,127 @@
+"""Matching device replies to the commands that were written"""
+
+from serial_link import SerialLink
+from serial_reader import (AckTracker, DeviceStreamDecoder, classify_line,
+                           EVENT_ACK, EVENT_NACK, EVENT_READY)
+
+
+def lines(*text):
+    return DeviceStreamDecoder().feed("".join(line + "\n" for line in text).encode())
+
+
+def feed(tracker, events):
+    return [entry for entry in map(tracker.handle_event, events) if entry is not None]
+
+
+def test_decoder_splits_ack_bytes_from_text():
+    decoder = DeviceStreamDecoder()
+    events = decoder.feed(b"Ready for com")
+    assert events == []
+    events = decoder.feed(b"mands!\n\xaa\xee")
+    assert [e.kind for e in events] == [EVENT_READY, EVENT_ACK, EVENT_NACK]
+
+
+def test_executed_line_confirms_its_own_command():
+    tracker = AckTracker()
+    up = tracker.sent_command("UP")
+    left = tracker.sent_command("LEFT")
+    # Both echoed, then LEFT's confirmation arrives first
+    resolved = feed(tracker, lines("Processing command: UP", "Processing command: LEFT",
+                                   "Moving LEFT"))
+    assert resolved == [left]
+    assert left.ok and up.ok is None
+    assert feed(tracker, lines("Moving UP")) == [up]
+    assert tracker.get_stats()['confirmed'] == 2
+
+
+def test_executed_line_for_another_command_is_ignored():
+    tracker = AckTracker()
+    up = tracker.sent_command("UP")
+    assert feed(tracker, lines("Processing command: UP", "Moving DOWN")) == []
+    assert up.ok is None and tracker.outstanding == 1
+
+
+def test_custom_and_unknown_replies():
+    tracker = AckTracker()
+    custom = tracker.sent_command("CUSTOM:180,128,98,128")
+    bogus = tracker.sent_command("WIGGLE")
+    assert feed(tracker, lines("Processing command: CUSTOM:180,128,98,128",
+                               "Custom command executed")) == [custom]
+    assert feed(tracker, lines("Processing command: WIGGLE", "Unknown command!")) == [bogus]
+    assert custom.ok is True and bogus.ok is False
+
+
+def test_unechoed_command_is_lost_when_a_later_one_is_echoed():
+    lost = []
+    tracker = AckTracker(on_lost=lost.append)
+    first = tracker.sent_command("UP")
+    tracker.sent_command("DOWN")
+    feed(tracker, lines("Processing command: DOWN"))
+    assert lost == [first]
+
+
+def test_bridge_acks_answer_frames_in_order():
+    tracker = AckTracker()
+    first = tracker.sent_command("FRAME")
+    second = tracker.sent_command("FRAME")
+    assert feed(tracker, DeviceStreamDecoder().feed(b"\xaa\xee")) == [first, second]
+    assert first.ok is True and second.ok is False
+
+
+def test_unanswered_command_expires():
+    lost = []
+    tracker = AckTracker(ack_timeout=0.01, on_lost=lost.append)
+    entry = tracker.sent_command("UP")
+    assert tracker.wait_for_outstanding(0, timeout=1)
+    assert lost == [entry] and tracker.get_stats()['lost'] == 1
+
+
+def shared_link(*trackers):
+    """
+    A link that is never opened, with one client per tracker that records
+    its events and applies them, as the controller does on the reader thread
+    """
+    link = SerialLink("TEST")
+    received = []
+    for tracker in trackers:
+        events = []
+
+        def on_event(event, events=events, tracker=tracker):
+            events.append(event)
+            tracker.handle_event(event)
+
+        link.add_client(on_event, acks=tracker)
+        received.append(events)
+    return link, received
+
+
+def test_shared_link_delivers_replies_only_to_the_writer():
+    gui, web = AckTracker(), AckTracker()
+    link, (gui_events, web_events) = shared_link(gui, web)
+    gui_up = gui.sent_command("UP")
+    web_up = web.sent_command("UP")
+
+    for event in lines("Processing command: UP", "Moving UP", "Processing command: UP", "Moving UP"):
+        link._dispatch(event)
+
+    assert [e.text for e in gui_events] == ["Processing command: UP", "Moving UP"]
+    assert [e.text for e in web_events] == ["Processing command: UP", "Moving UP"]
+    assert gui_up.ok and web_up.ok
+    assert gui.get_stats()['confirmed'] == web.get_stats()['confirmed'] == 1
+
+
+def test_shared_link_routes_bridge_acks_by_write_order():
+    first, second = AckTracker(), AckTracker()
+    link, (first_events, second_events) = shared_link(first, second)
+    a = second.sent_command("FRAME")
+    b = first.sent_command("FRAME")
+    for event in DeviceStreamDecoder().feed(b"\xaa"):
+        link._dispatch(event)
+    assert [e.kind for e in second_events] == [EVENT_ACK] and first_events == []
+    assert a.ok and b.ok is None
+
+
+def test_shared_link_broadcasts_unsolicited_events():
+    link, received = shared_link(AckTracker(), AckTracker())
+    link._dispatch(classify_line("Ready for commands!"))
+    assert [len(events) for events in received] == [1, 1]
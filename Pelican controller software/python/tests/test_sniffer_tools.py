@@ -0,0 +1,104 @@
+"""Sniffer log parsing and the capture analyses, on synthetic packets"""
+
+import numpy as np
+import pytest
+
+import sniffer_tools
+from sniffer_tools import (parse_lines, ingest_logs, load_capture, find_checksums,
+                           stick_correlation, estimate_lag, PAYLOAD_SIZE)
+
+BANNER = "Sniffer started. Listening on channel 22, 250kbps, payload 32 bytes.\r\n"
+
+
+def sniffer_line(time_ms, pipe, payload):
+    """One packet as Sniffer/sketch_nov4a.ino prints it (Serial.println ends in CRLF)"""
+    return f"{time_ms} ms | pipe {pipe} | payload: " + " ".join(f"{b:02X}" for b in payload) + "\r\n"
+
+
+def random_payloads(count, seed=1):
+    return np.random.default_rng(seed).integers(0, 256, size=(count, PAYLOAD_SIZE), dtype=np.uint8)
+
+
+def test_parse_lines_reads_sketch_output():
+    payloads = random_payloads(3)
+    text = BANNER + "".join(sniffer_line(1000 + 7 * i, i % 2, p) for i, p in enumerate(payloads))
+    text += "Radio hardware not responding!\r\n"
+
+    records = parse_lines(text)
+    assert records['time_ms'].tolist() == [1000, 1007, 1014]
+    assert records['pipe'].tolist() == [0, 1, 0]
+    assert (records['payload'] == payloads).all()
+    assert len(parse_lines(BANNER)) == 0
+
+
+@pytest.mark.parametrize("chunk_bytes", [len(BANNER) + 40, 7])
+def test_ingest_keeps_lines_split_across_chunks(tmp_path, monkeypatch, chunk_bytes):
+    monkeypatch.setattr(sniffer_tools, 'CHUNK_BYTES', chunk_bytes)
+    payloads = random_payloads(20)
+    log = tmp_path / "session.txt"
+    text = BANNER + "".join(sniffer_line(5 * i, 0, p) for i, p in enumerate(payloads))
+    # The last line arrives without its line ending
+    log.write_bytes(text.rstrip("\r\n").encode('latin-1'))
+
+    capture = tmp_path / "capture.cap"
+    assert ingest_logs([str(log)], str(capture)) == len(payloads)
+    records = load_capture(str(capture))
+    assert records['time_ms'].tolist() == [5 * i for i in range(len(payloads))]
+    assert (records['payload'] == payloads).all()
+
+
+@pytest.mark.parametrize("kind", ["sum", "xor"])
+def test_find_checksums_finds_a_synthetic_checksum(kind):
+    payloads = random_payloads(400)
+    payloads[:, 0] = 0xA5
+    span = payloads[:, 1:16]
+    if kind == "sum":
+        payloads[:, 31] = (span.sum(axis=1) + 0x5A) & 0xFF
+    else:
+        payloads[:, 31] = np.bitwise_xor.reduce(span, axis=1) ^ 0x5A
+
+    best = find_checksums(payloads, sample=200)[0]
+    # Not [0, 16): the constant header byte only shifts the constant
+    assert best == {'offset': 31, 'kind': kind, 'start': 1, 'end': 16,
+                    'constant': 0x5A, 'match_rate': 1.0}
+
+
+def test_find_checksums_ignores_random_bytes():
+    assert find_checksums(random_payloads(400)) == []
+
+
+LAG_MS = 40
+STICK_OFFSETS = {'throttle': 4, 'yaw': 9, 'pitch': 17, 'roll': 22}
+
+
+def sent_and_sniffed():
+    """Sticks sent every 50 ms, and 10 ms packets carrying them LAG_MS later"""
+    rng = np.random.default_rng(2)
+    sent_times = np.arange(0, 10000, 50, dtype=np.float64)
+    sticks = {name: rng.integers(0, 256, len(sent_times)).astype(np.float64) for name in STICK_OFFSETS}
+    times = np.arange(LAG_MS, 10000 + LAG_MS, 10)
+    index = np.searchsorted(sent_times, times - LAG_MS, side='right') - 1
+    payloads = random_payloads(len(times), seed=3)
+    payloads[:, STICK_OFFSETS['throttle']] = sticks['throttle'][index]
+    # Centred on zero and sent as a signed byte
+    payloads[:, STICK_OFFSETS['yaw']] = (sticks['yaw'][index] - 128).astype(np.int8).view(np.uint8)
+    payloads[:, STICK_OFFSETS['pitch']] = sticks['pitch'][index]
+    # Reversed channel
+    payloads[:, STICK_OFFSETS['roll']] = 255 - sticks['roll'][index]
+    return times, payloads, sent_times, sticks
+
+
+def test_stick_correlation_picks_the_stick_offsets():
+    times, payloads, sent_times, sticks = sent_and_sniffed()
+    corr = stick_correlation(times, payloads, sent_times, sticks, lag_ms=LAG_MS)
+    for name, offset in STICK_OFFSETS.items():
+        r = np.nan_to_num(corr[name])
+        assert int(np.abs(r).argmax()) == offset, name
+    assert corr['throttle'][STICK_OFFSETS['throttle']] == pytest.approx(1.0, abs=1e-4)
+    assert corr['yaw'][STICK_OFFSETS['yaw']] == pytest.approx(1.0, abs=1e-4)
+    assert corr['roll'][STICK_OFFSETS['roll']] == pytest.approx(-1.0, abs=1e-4)
+
+
+def test_estimate_lag_finds_the_radio_delay():
+    times, payloads, sent_times, sticks = sent_and_sniffed()
+    assert estimate_lag(times, payloads, sent_times, sticks, lags_ms=range(0, 201, 20)) == LAG_MS
@@ -0,0 +1,47 @@
+"""Fast start: lazy imports, no calibration wait, connect on the ready banner"""
+
+import os
+import subprocess
+import sys
+import time
+
+PYTHON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_import_does_not_load_speech_packages():
+    code = ("import sys, drone_nlp_controller; "
+            "print(sorted(m for m in ('speech_recognition', 'pyttsx3') if m in sys.modules))")
+    out = subprocess.run([sys.executable, "-c", code], cwd=PYTHON_DIR, check=True,
+                         capture_output=True, text=True).stdout
+    assert out.strip() == "[]"
+
+
+def test_fast_start_connects_on_the_banner_and_reconnects(emulator):
+    from drone_nlp_controller import DroneNLPController
+
+    start = time.perf_counter()
+    controller = DroneNLPController(arduino_port=emulator.port, fast_start=True, vocabulary_file=None)
+    construct_s = time.perf_counter() - start
+    processing_thread = controller.processing_thread
+    try:
+        start = time.perf_counter()
+        assert controller.connect_arduino(ready_timeout=3.0)
+        connect_s = time.perf_counter() - start
+        assert controller.state.device_ready
+
+        controller.disconnect_arduino()
+        # Let the emulator see the port close and reset, as a board would
+        time.sleep(0.1)
+        start = time.perf_counter()
+        assert controller.connect_arduino(ready_timeout=3.0)
+        reconnect_s = time.perf_counter() - start
+        assert controller.state.device_ready
+    finally:
+        controller.disconnect_arduino()
+
+    # No 2 s calibration and no fixed 2 s sleep; connecting returned on the
+    # banner rather than at the timeout
+    assert construct_s < 1.0
+    assert connect_s < 1.0
+    assert reconnect_s < 1.0
+    assert controller.processing_thread is processing_thread
@@ -0,0 +1,66 @@
+"""Snapshot consistency of StateStore and of DroneAPI under concurrent callers"""
+
+import argparse
+import os
+import threading
+
+import pytest
+
+from state_store import StateStore, INITIAL_STATE
+
+
+def test_update_builds_a_new_version_only_on_change():
+    changes = []
+    store = StateStore(on_change=changes.append)
+    first = store.update(armed=True, flying=True)
+    assert first.version == 1 and first is store.current
+    assert INITIAL_STATE.armed is False
+    assert store.update(armed=True) is first
+    assert changes == [first]
+
+
+def test_concurrent_writers_and_readers_see_whole_snapshots():
+    store = StateStore()
+    stop = threading.Event()
+    problems = []
+
+    def writer(armed):
+        for _ in range(2000):
+            store.update(armed=armed, flying=armed)
+            armed = not armed
+
+    def reader():
+        last = -1
+        while not stop.is_set():
+            state = store.current
+            if state.version < last:
+                problems.append(f"version went back {last} -> {state.version}")
+            if state.armed != state.flying:
+                problems.append(f"torn snapshot {state}")
+            last = state.version
+
+    readers = [threading.Thread(target=reader) for _ in range(4)]
+    writers = [threading.Thread(target=writer, args=(i % 2 == 0,)) for i in range(8)]
+    for t in readers + writers:
+        t.start()
+    for t in writers:
+        t.join()
+    stop.set()
+    for t in readers:
+        t.join()
+    assert problems == []
+    # Every call either changed the state (one version) or found it already set
+    assert 0 < store.current.version <= 8 * 2000
+
+
+@pytest.mark.skipif(os.name != 'posix', reason="the device emulator needs a pty")
+def test_api_stress_against_the_emulator():
+    """A short run of benchmarks/stress_api.py: 16 callers and a reconnect"""
+    import stress_api
+    args = argparse.Namespace(callers=16, duration=1.5, reconnects=1, baud=115200, seed=1)
+    result = stress_api.run(args)
+    assert result['errors'] == []
+    assert result['violations'] == []
+    assert result['calls'].get('get_status', 0) > 100
+    assert result['calls'].get('reconnect') == 1
+    assert result['status_max_ms'] < 250
@@ -0,0 +1,72 @@
+"""Setpoint streaming rates the serial line can carry"""
+
+import time
+
+import pytest
+
+from setpoint_streamer import SetpointStreamer, MAX_RATE_HZ, max_rate_hz
+
+
+def controller_for(device, protocol):
+    from drone_nlp_controller import DroneNLPController
+
+    controller = DroneNLPController(arduino_port=device.port, protocol=protocol, fast_start=True,
+                                    voice=False, tts=False, vocabulary_file=None)
+    assert controller.connect_arduino(ready_timeout=3.0)
+    return controller
+
+
+def stream_backlog(device, streamer, duration=1.5):
+    """Largest reply backlog seen while streaming, and the one at the end"""
+    streamer.start()
+    worst = 0.0
+    try:
+        deadline = time.monotonic() + duration
+        while time.monotonic() < deadline:
+            worst = max(worst, device.output_backlog)
+            time.sleep(0.05)
+        return worst, device.output_backlog
+    finally:
+        streamer.stop()
+
+
+def test_text_rate_is_capped_by_the_firmware_replies():
+    assert max_rate_hz("text", 115200) == 133
+    assert max_rate_hz("binary", 115200) == MAX_RATE_HZ
+    with pytest.raises(ValueError):
+        SetpointStreamer(lambda: None, lambda s: None, rate_hz=134, max_rate=max_rate_hz("text", 115200))
+    with pytest.raises(ValueError):
+        SetpointStreamer(lambda: None, lambda s: None, rate_hz=50, max_rate=max_rate_hz("text", 9600))
+
+
+def test_text_stream_at_the_top_rate_keeps_the_replies_bounded(emulator):
+    controller = controller_for(emulator, "text")
+    try:
+        top = max_rate_hz("text", emulator.baud_rate)
+        with pytest.raises(ValueError):
+            controller.start_streaming(top + 1)
+        assert controller.start_streaming(top)
+        controller.stop_streaming()
+
+        worst, last = stream_backlog(emulator, controller.streamer)
+        # A few ticks of replies in flight, not a queue that keeps growing
+        assert worst < 0.05 and last < 0.05
+
+        # Past the cap the same stream falls further behind every second
+        too_fast = SetpointStreamer(lambda: controller.setpoint, controller.send_setpoint_to_arduino,
+                                    rate_hz=MAX_RATE_HZ)
+        _, last = stream_backlog(emulator, too_fast)
+        assert last > 0.1
+    finally:
+        controller.disconnect_arduino()
+
+
+def test_binary_stream_may_use_the_full_range(bridge):
+    controller = controller_for(bridge, "binary")
+    try:
+        assert controller.start_streaming(MAX_RATE_HZ)
+        controller.stop_streaming()
+        worst, last = stream_backlog(bridge, controller.streamer)
+        assert worst < 0.05 and last < 0.05
+    finally:
+        controller.disconnect_arduino()
@@ -0,0 +1,146 @@
+"""Reloading the command vocabulary, and one shared watcher per file"""
+
+import json
+import os
+import threading
+import time
+
+import pytest
+
+import vocabulary
+from fuzzy_matcher import phrase_trigrams
+from intent_matcher import compile_pattern
+from vocabulary import VocabularyStore, shared_store
+
+
+def write(path, commands):
+    with open(path, 'w') as f:
+        json.dump({"commands": commands}, f)
+    # Make the change visible to a watcher even within one mtime tick
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+def watchers():
+    return sum(t.name == 'vocabulary-watch' for t in threading.enumerate())
+
+
+def test_an_edited_file_is_picked_up_and_a_bad_one_ignored(tmp_path):
+    path = str(tmp_path / "commands.json")
+    write(path, {"takeoff": ["get airborne"]})
+    store = VocabularyStore(path, poll_interval=0.02)
+    before = store.current
+    assert before.matcher.parse("get airborne") == "TAKEOFF"
+    store.start_watching()
+    try:
+        write(path, {"land": ["set it down"]})
+        assert wait_until(lambda: store.current.matcher.parse("set it down") == "LAND")
+        assert store.current.version == before.version + 1 and store.reloads == 1
+        # A parse in flight keeps the table it started with
+        assert before.matcher.parse("set it down") != "LAND"
+
+        good = store.current
+        write(path, {"hover": ["(unbalanced"]})
+        assert wait_until(lambda: store.last_error is not None)
+        assert store.current is good
+    finally:
+        store.stop_watching()
+    assert not store.is_watching
+
+
+def test_one_store_and_one_watcher_per_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(vocabulary, "_stores", {})
+    path = str(tmp_path / "commands.json")
+    write(path, {"takeoff": ["get airborne"]})
+    store = shared_store(path)
+    assert shared_store(os.path.join(str(tmp_path), ".", "commands.json")) is store
+    assert shared_store(None) is not store
+
+    running = watchers()
+    store.start_watching()
+    store.start_watching()
+    try:
+        assert watchers() == running + 1
+        store.stop_watching()
+        assert store.is_watching
+    finally:
+        store.stop_watching()
+    assert not store.is_watching and watchers() == running
+    # Extra stops do not go negative and block a later start
+    store.stop_watching()
+    store.start_watching()
+    assert store.is_watching
+    store.stop_watching()
+
+
+def test_controllers_watch_only_while_connected(tmp_path, monkeypatch, bridge):
+    from drone_nlp_controller import DroneNLPController
+
+    monkeypatch.setattr(vocabulary, "_stores", {})
+    path = str(tmp_path / "commands.json")
+    write(path, {"takeoff": ["get airborne"]})
+    controllers = [DroneNLPController(arduino_port=bridge.port, fast_start=True, voice=False,
+                                      vocabulary_file=path) for _ in range(3)]
+    store = controllers[0].vocabulary
+    assert all(c.vocabulary is store for c in controllers)
+    assert not store.is_watching
+    try:
+        for controller in controllers:
+            assert controller.connect_arduino(ready_timeout=3.0)
+        assert store.is_watching
+        controllers[0].disconnect_arduino()
+        assert store.is_watching
+    finally:
+        for controller in controllers:
+            controller.disconnect_arduino()
+    assert not store.is_watching
+
+
+def test_pattern_caches_are_bounded():
+    # What years of vocabulary edits leave behind
+    for i in range(5000):
+        compile_pattern(rf"\b(drone\s+word{i})\b")
+        phrase_trigrams(f"drone word{i}")
+    assert compile_pattern.cache_info().currsize <= 1024
+    assert phrase_trigrams.cache_info().currsize <= 4096
+    assert VocabularyStore(None).current.matcher.parse("take off") == "TAKEOFF"
+
+
+def test_a_cold_start_reuses_the_phrase_table_on_disk(tmp_path):
+    path = str(tmp_path / "commands.json")
+    cache_dir = str(tmp_path / "cache")
+    write(path, {"land": ["set it down"], "rotate_left": ["spin left"]})
+    first = VocabularyStore(path, cache_dir=cache_dir)
+    (cached,) = os.listdir(cache_dir)
+    assert cached == first.current.digest + ".json" and first.cache_hits == 0
+
+    second = VocabularyStore(path, cache_dir=cache_dir)
+    assert second.cache_hits == 1
+    assert second.current.fuzzy.phrase_table() == first.current.fuzzy.phrase_table()
+    for heard in ("set it dawn", "spin lift", "lend", "take of"):
+        assert second.current.fuzzy.best(heard) == first.current.fuzzy.best(heard)
+
+
+@pytest.mark.parametrize("contents", [
+    "{not json",
+    '{"format": 1, "phrases": [["land", "SELF_DESTRUCT", ["lnd"]]]}',
+    '{"format": 1, "phrases": [["land", "LAND"]]}',
+    '{"format": 0, "phrases": []}',
+])
+def test_a_bad_cache_file_is_ignored(tmp_path, contents):
+    cache_dir = str(tmp_path / "cache")
+    expected = VocabularyStore(None, cache_dir=cache_dir).current
+    with open(os.path.join(cache_dir, expected.digest + ".json"), "w") as f:
+        f.write(contents)
+    store = VocabularyStore(None, cache_dir=cache_dir)
+    assert store.cache_hits == 0
+    assert store.current.fuzzy.phrase_table() == expected.fuzzy.phrase_table()
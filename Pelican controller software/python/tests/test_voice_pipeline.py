@@ -0,0 +1,133 @@
+"""Early intents from partial transcripts, and what the final one adds"""
+
+import pytest
+
+from intent_matcher import IntentMatcher, Intent
+from setpoint import NEUTRAL, TAKEOFF_THROTTLE, apply_command, idempotent_prefix
+from voice_pipeline import VoicePipeline, AudioSource, OfflineRecognizer
+
+HOVERING = NEUTRAL._replace(throttle=TAKEOFF_THROTTLE)
+
+
+class ScriptSource(AudioSource):
+    """One utterance as VAD events: start, one speech chunk per partial, end"""
+
+    def __init__(self, partials):
+        self.partials = partials
+
+    def chunks(self):
+        yield 'start'
+        for _ in self.partials:
+            yield 'speech'
+        yield 'end'
+
+
+class ScriptVAD:
+    def process(self, event):
+        return event, [] if event == 'start' else b'audio'
+
+
+class ScriptRecognizer(OfflineRecognizer):
+    """Streams the partials it is given, then the final transcript"""
+
+    supports_streaming = True
+
+    def __init__(self, partials, final):
+        self.partials = list(partials)
+        self.final = final
+
+    def start_stream(self, sample_rate):
+        pass
+
+    def accept_chunk(self, chunk):
+        return self.partials.pop(0) if chunk and self.partials else ""
+
+    def finish_stream(self):
+        return self.final
+
+
+def results_for(partials, final):
+    results = []
+    matcher = IntentMatcher()
+    source = ScriptSource(partials)
+    pipeline = VoicePipeline(source, ScriptRecognizer(partials, final), results.append,
+                             intent_filter=lambda text: idempotent_prefix(matcher.parse_all(text)),
+                             intent_parser=matcher.parse_all, vad=ScriptVAD())
+    pipeline.run()
+    return [(r.text, r.early, r.intents) for r in results]
+
+
+
+def flown(results, setpoint=HOVERING):
+    """The setpoint after acting on every result, as process_voice_result does"""
+    matcher = IntentMatcher()
+    for text, _, intents in results:
+        for intent in intents or matcher.parse_all(text):
+            setpoint = apply_command(setpoint, intent.command, intent.magnitude)
+    return setpoint
+
+def test_final_that_repeats_the_partial_is_dropped():
+    assert results_for(["take off"], "take off") == [("take off", True, (Intent("TAKEOFF", 1.0),))]
+
+
+def test_final_carries_the_rest_of_a_chained_phrase():
+    results = results_for(["take off", "take off then go"], "take off then go forward slowly")
+    assert results == [
+        ("take off", True, (Intent("TAKEOFF", 1.0),)),
+        ("take off then go forward slowly", False, (Intent("FORWARD", 0.5),)),
+    ]
+
+
+def test_final_that_scales_the_fired_intent_is_sent_whole():
+    results = results_for(["go forward"], "go forward slowly")
+    assert results == [
+        ("go forward", True, (Intent("FORWARD", 1.0),)),
+        ("go forward slowly", False, None),
+    ]
+
+
+def test_without_an_early_intent_the_final_is_sent_for_parsing():
+    assert results_for(["um"], "land") == [("land", False, None)]
+
+
+
+@pytest.mark.parametrize("partial, final", [
+    ("go up", "go up a lot"),
+    ("move up", "move up a lot"),
+    ("turn left", "turn left a lot"),
+    ("take off then climb", "take off then climb quickly"),
+])
+def test_a_differing_final_does_not_repeat_a_step(partial, final):
+    # The result of hearing the whole phrase at once, with no partial
+    (whole,) = results_for([], final)
+    assert flown(results_for([partial], final)) == flown([whole])
+
+
+def test_a_throttle_step_is_not_fired_early():
+    assert results_for(["move up"], "move up a lot") == [("move up a lot", False, None)]
+
+
+def test_fixed_commands_before_a_step_still_fire_early():
+    results = results_for(["take off", "take off then climb"], "take off then climb")
+    assert results == [
+        ("take off", True, (Intent("TAKEOFF", 1.0),)),
+        ("take off then climb", False, (Intent("UP", 1.0),)),
+    ]
+
+
+def test_the_controller_fires_no_throttle_step_early():
+    from drone_nlp_controller import DroneNLPController
+
+    controller = DroneNLPController(fast_start=True, voice=False, vocabulary_file=None)
+    assert controller.early_intent("move up") is None
+    assert controller.early_intent("land then move up") == (Intent("LAND", 1.0),)
+    results = []
+    pipeline = controller.create_voice_pipeline(results.append, source=ScriptSource(["take off then climb"]),
+                                                recognizer=ScriptRecognizer(["take off then climb"],
+                                                                            "take off then climb a lot"))
+    pipeline.vad = ScriptVAD()
+    pipeline.run()
+    assert [(r.text, r.early, r.intents) for r in results] == [
+        ("take off then climb", True, (Intent("TAKEOFF", 1.0),)),
+        ("take off then climb a lot", False, (Intent("UP", 2.0),)),
+    ]
@@ -0,0 +1,464 @@
+"""
+Hot-reloadable command vocabulary for the P8 PRO Drone Natural Language Controller
+
+The built-in intent table (intent_matcher.COMMAND_PATTERNS) can be extended,
+or replaced, by a JSON file that is watched while the controller runs:
+
+    {
+      "replace_builtin": false,
+      "commands": {
+        "takeoff": ["get airborne"],
+        "land": ["set down", "\\\\b(bring\\\\s+it\\\\s+down)\\\\b"]
+      }
+    }
+
+Entries are plain phrases (any whitespace between the words, whole words
+only) or regular expressions in the form the built-in table uses. They are
+added after the built-in patterns of their command, so the priority of the
+commands does not change. Only commands the firmware knows may be listed.
+
+Changes are picked up within a poll interval, without reconnecting or
+recalibrating:
+
+- the new table is compiled off to the side while parsing goes on with the
+  old one, then swapped in with a single reference assignment (like
+  state_store.StateStore), so a parse in flight finishes on the table it
+  started with
+- recompiling is incremental: patterns and phrases seen before are not
+  compiled, indexed or labelled again (intent_matcher.compile_pattern,
+  fuzzy_matcher.phrase_trigrams and pattern_matches); only the combined
+  expression is compiled from scratch
+- a file that does not parse, names an unknown command or has a bad pattern
+  is logged and the old table stays in use
+- every controller (and the fleet) in a process shares one store per file
+  (shared_store()), so a file is compiled once and watched by one thread,
+  and only while some client is connected
+- the costly part of a cold start, labelling every phrase of the fuzzy
+  matcher with its command, is kept on disk as plain JSON keyed by the
+  table's hash, so an unchanged file is not labelled again; the file is
+  only data, checked against the table before use, and anything that does
+  not fit is ignored and rebuilt
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import namedtuple
+
+import intent_matcher
+from intent_matcher import IntentMatcher, Intent, COMMAND_PATTERNS
+from fuzzy_matcher import FuzzyIntentMatcher
+
+VOCABULARY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'commands.json')
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.vocabulary_cache')
+# Seconds between checks of the file's modification time and size
+POLL_INTERVAL = 1.0
+# Bump when the phrase labels or trigrams of fuzzy_matcher change
+CACHE_FORMAT = 1
+# Phrase tables kept in the cache directory
+CACHE_ENTRIES = 8
+
+_REGEX_CHARS = re.compile(r"[\\()\[\]|?*+^${}.]")
+
+Vocabulary = namedtuple('Vocabulary', ['version', 'patterns', 'matcher', 'fuzzy', 'digest', 'source'])
+Vocabulary.__doc__ = ("A compiled command table: the patterns, the exact and fuzzy matchers built "
+                      "from them, a hash of their source and where they came from")
+
+logger = logging.getLogger(__name__)
+
+
+class VocabularyError(ValueError):
+    """A vocabulary file that cannot be used"""
+
+
+def phrase_pattern(phrase):
+    """The regular expression for a plain phrase: its words, whole, any spacing"""
+    return r'\b(' + r'\s+'.join(re.escape(w) for w in phrase.lower().split()) + r')\b'
+
+
+def parse_vocabulary(text, builtin=None):
+    """
+    Merge a vocabulary file into the built-in table
+
+    Args:
+        text (str): JSON file contents
+        builtin (dict): Command name to regex list (default: COMMAND_PATTERNS)
+
+    Returns:
+        dict: Command name to regex list, in the built-in priority order
+
+    Raises:
+        VocabularyError: Bad JSON, unknown command or invalid pattern
+    """
+    if builtin is None:
+        builtin = COMMAND_PATTERNS
+    try:
+        document = json.loads(text)
+    except ValueError as e:
+        raise VocabularyError(f"Not valid JSON: {e}")
+    if not isinstance(document, dict) or not isinstance(document.get('commands', {}), dict):
+        raise VocabularyError("Expected an object with a 'commands' object")
+    commands = {name.lower(): entries for name, entries in document.get('commands', {}).items()}
+
+    unknown = [name for name in commands if name not in builtin]
+    if unknown:
+        raise VocabularyError(f"Unknown command(s) {', '.join(unknown)}; "
+                              f"expected one of {', '.join(builtin)}")
+    replace = bool(document.get('replace_builtin', False))
+    table = {}
+    for command, patterns in builtin.items():
+        entries = commands.get(command, [])
+        if not isinstance(entries, list) or not all(isinstance(e, str) and e.strip() for e in entries):
+            raise VocabularyError(f"'{command}' must be a list of phrases or patterns")
+        merged = [] if replace else list(patterns)
+        for entry in entries:
+            pattern = entry if _REGEX_CHARS.search(entry) else phrase_pattern(entry)
+            try:
+                intent_matcher.pattern_groups(pattern)
+            except re.error as e:
+                raise VocabularyError(f"'{command}': bad pattern {entry!r}: {e}")
+            if pattern not in merged:
+                merged.append(pattern)
+        if merged:
+            table[command] = merged
+    if not table:
+        raise VocabularyError("The vocabulary has no commands")
+    return table
+
+
+def table_digest(table):
+    """Hash of a command table and of the code that compiles it"""
+    source = json.dumps([CACHE_FORMAT, table, intent_matcher.EMERGENCY_PATTERN,
+                         intent_matcher.SPEED_PATTERN], sort_keys=False)
+    return hashlib.sha256(source.encode('utf-8')).hexdigest()
+
+
+def compile_table(table, phrases=None):
+    """
+    Exact and fuzzy matchers for a table; returns (matcher, fuzzy)
+
+    Args:
+        table (dict): Command name to regex list
+        phrases (list): The fuzzy matcher's phrase_table() for this table, if known
+    """
+    matcher = IntentMatcher(table)
+    return matcher, FuzzyIntentMatcher(table, phrases=phrases)
+
+
+def read_phrase_table(text, table):
+    """
+    Phrase table from a cache file, checked against the table it is for
+
+    Returns:
+        list: (phrase, command, trigrams) per phrase
+
+    Raises:
+        ValueError: Not valid JSON, or not a phrase table of `table`
+    """
+    document = json.loads(text)
+    if not isinstance(document, dict) or document.get('format') != CACHE_FORMAT:
+        raise ValueError("not a phrase table of this format")
+    commands = {command.upper() for command in table} | {'LAND'}
+    phrases = []
+    for entry in document['phrases']:
+        phrase, command, grams = entry
+        if (not isinstance(phrase, str) or command not in commands
+                or not all(isinstance(g, str) and len(g) == 3 for g in grams)):
+            raise ValueError(f"bad entry {entry!r}")
+        phrases.append((phrase, command, tuple(grams)))
+    return phrases
+
+
+def recover_intent(vocabulary, text, log=logger):
+    """
+    Closest command to a misheard utterance, if close enough to act on
+
+    See fuzzy_matcher.py; intents that arm or climb need a higher
+    confidence and are never guessed from a single word.
+
+    Args:
+        vocabulary (Vocabulary): Table to use
+        text (str): Utterance the exact matcher found nothing in
+        log (logging.Logger): Where to report the guess
+
+    Returns:
+        str: Command (e.g. 'LAND') or None
+    """
+    guess = vocabulary.fuzzy.match(text)
+    if guess is None:
+        return None
+    log.info(f"Heard '{guess.heard}' as '{guess.phrase}' -> {guess.command} "
+             f"(confidence {guess.confidence:.2f})")
+    return guess.command
+
+
+def parse_intents(vocabulary, text, log=logger):
+    """
+    Every command in an utterance, in order, with its magnitude
+
+    One scan with the exact matcher (intent_matcher.IntentMatcher.parse_all);
+    if that finds nothing, the fuzzy matcher's guess as a single intent.
+
+    Args:
+        vocabulary (Vocabulary): Table to use, taken once for the whole parse
+        text (str): Utterance
+        log (logging.Logger): Where to report a fuzzy guess
+
+    Returns:
+        tuple: intent_matcher.Intent(command, magnitude) per command
+    """
+    intents = vocabulary.matcher.parse_all(text)
+    if not intents:
+        command = recover_intent(vocabulary, text, log)
+        if command is not None:
+            intents = (Intent(command, 1.0),)
+    return intents
+
+
+class VocabularyStore:
+    """
+    The current compiled vocabulary, reloaded when its file changes
+
+    Readers take `store.current` once per parse and use its matchers; they
+    never lock and never see half a table.
+    """
+
+    def __init__(self, path=VOCABULARY_FILE, cache_dir=CACHE_DIR, poll_interval=POLL_INTERVAL,
+                 on_reload=None):
+        """
+        Load the vocabulary (the built-in table if `path` does not exist)
+
+        Args:
+            path (str): Vocabulary file to watch, or None for the built-in table only
+            cache_dir (str): Where phrase tables are kept, or None for no disk cache
+            poll_interval (float): Seconds between checks for changes
+            on_reload (callable): Called with the new Vocabulary after each
+                reload, on the watcher thread
+        """
+        self.path = path
+        self.cache_dir = cache_dir
+        self.poll_interval = poll_interval
+        self.on_reload = on_reload
+        self._lock = threading.Lock()
+        self._signature = None
+        self._watch_lock = threading.Lock()
+        self._watchers = 0
+        self._thread = None
+        self._stop = None
+        self.reloads = 0
+        self.cache_hits = 0
+        self.last_error = None
+        self.load_ms = 0.0
+        self.last_reload_ms = None
+
+        start = time.perf_counter()
+        self._current = None
+        try:
+            self._current = self._load()
+        except VocabularyError as e:
+            # Start on the built-in table rather than not at all
+            logger.error(f"Vocabulary {self.path}: {e}; using the built-in commands")
+            self.last_error = str(e)
+            self._current = self._build(dict(COMMAND_PATTERNS), 'built-in', 0)
+        self.load_ms = (time.perf_counter() - start) * 1000
+
+    @property
+    def current(self):
+        """The latest compiled vocabulary (never blocks)"""
+        return self._current
+
+    def _file_signature(self):
+        try:
+            st = os.stat(self.path)
+        except (OSError, TypeError):
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _load(self):
+        """Read, merge and compile the file (or the built-ins); raises VocabularyError"""
+        version = self._current.version + 1 if self._current is not None else 0
+        self._signature = self._file_signature()
+        if self._signature is None:
+            return self._build(dict(COMMAND_PATTERNS), 'built-in', version)
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                text = f.read()
+        except OSError as e:
+            raise VocabularyError(f"Cannot read: {e}")
+        return self._build(parse_vocabulary(text), self.path, version)
+
+    def _build(self, table, source, version):
+        digest = table_digest(table)
+        current = self._current
+        if current is not None and current.digest == digest:
+            return current._replace(source=source)
+        phrases = self._read_cache(digest, table)
+        matcher, fuzzy = compile_table(table, phrases)
+        if phrases is None:
+            self._write_cache(digest, fuzzy.phrase_table())
+        else:
+            self.cache_hits += 1
+        return Vocabulary(version, table, matcher, fuzzy, digest, source)
+
+    # Disk cache
+
+    def _cache_path(self, digest):
+        return os.path.join(self.cache_dir, digest + '.json')
+
+    def _read_cache(self, digest, table):
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._cache_path(digest), encoding='utf-8') as f:
+                return read_phrase_table(f.read(), table)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, TypeError, KeyError) as e:
+            # Truncated or edited: label the phrases again
+            logger.debug(f"Ignoring vocabulary cache {digest[:12]}: {e}")
+            return None
+
+    def _write_cache(self, digest, phrases):
+        if not self.cache_dir:
+            return
+        path = self._cache_path(digest)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Written whole, then renamed, so a reader never sees half a file
+            with open(path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump({'format': CACHE_FORMAT, 'phrases': phrases}, f)
+            os.replace(path + '.tmp', path)
+            entries = sorted((os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir)
+                              if name.endswith('.json')), key=os.path.getmtime)
+            for old in entries[:-CACHE_ENTRIES]:
+                os.remove(old)
+        except OSError as e:
+            logger.debug(f"Could not cache the vocabulary: {e}")
+
+    # Reloading
+
+    def reload(self):
+        """
+        Recompile from the file now and swap the new table in
+
+        Returns:
+            bool: True if the table changed; False if it was the same or the
+                file was rejected (see last_error)
+        """
+        with self._lock:
+            start = time.perf_counter()
+            old = self._current
+            try:
+                new = self._load()
+            except VocabularyError as e:
+                logger.error(f"Vocabulary {self.path} not reloaded: {e}")
+                self.last_error = str(e)
+                return False
+            self.last_error = None
+            if new.digest == old.digest:
+                self._current = new
+                return False
+            self._current = new
+            self.reloads += 1
+            self.last_reload_ms = (time.perf_counter() - start) * 1000
+        logger.info(f"Vocabulary reloaded from {new.source} "
+                    f"({sum(len(p) for p in new.patterns.values())} patterns, "
+                    f"{self.last_reload_ms:.1f} ms)")
+        if self.on_reload is not None:
+            self.on_reload(new)
+        return True
+
+    def check(self):
+        """Reload if the file was created, changed or removed since the last load"""
+        if self._file_signature() != self._signature:
+            return self.reload()
+        return False
+
+    def start_watching(self):
+        """
+        Check the file every poll_interval on a background thread
+
+        Calls are counted: the thread runs until stop_watching() has been
+        called as many times, so each client of a shared store starts and
+        stops it once.
+        """
+        if not self.path:
+            return
+        with self._watch_lock:
+            self._watchers += 1
+            if self._thread is not None:
+                return
+            # One event per thread, so a quick restart cannot revive the old one
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._watch, args=(self._stop,),
+                                            name='vocabulary-watch', daemon=True)
+            self._thread.start()
+
+    def stop_watching(self):
+        """Undo one start_watching(); the last one stops the thread"""
+        with self._watch_lock:
+            if self._watchers == 0:
+                return
+            self._watchers -= 1
+            if self._watchers > 0:
+                return
+            thread, self._thread = self._thread, None
+            self._stop.set()
+        thread.join(timeout=1)
+
+    @property
+    def is_watching(self):
+        """Whether the watcher thread is running"""
+        return self._thread is not None
+
+    def _watch(self, stop):
+        while not stop.wait(self.poll_interval):
+            try:
+                self.check()
+            except Exception as e:
+                logger.error(f"Vocabulary watch error: {e}")
+
+    def get_stats(self):
+        vocabulary = self._current
+        return {
+            'source': vocabulary.source,
+            'version': vocabulary.version,
+            'patterns': sum(len(p) for p in vocabulary.patterns.values()),
+            'phrases': len(vocabulary.fuzzy.vocabulary),
+            'load_ms': self.load_ms,
+            'last_reload_ms': self.last_reload_ms,
+            'reloads': self.reloads,
+            'cache_hits': self.cache_hits,
+            'last_error': self.last_error,
+        }
+
+
+# Process-wide sharing ------------------------------------------------------
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def shared_store(path=VOCABULARY_FILE):
+    """
+    The store for `path` that every client in this process uses
+
+    Loaded on first use. Clients that want the file watched call
+    start_watching() and, when done, stop_watching() on it.
+
+    Args:
+        path (str): Vocabulary file, or None for the built-in table only
+
+    Returns:
+        VocabularyStore: The same object for the same file
+    """
+    key = os.path.abspath(path) if path else None
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = VocabularyStore(path)
+        return store
@@ -0,0 +1,503 @@
+"""
+Pipelined voice front end for the P8 PRO Drone Controller
+
+listen_for_voice_command() captures a phrase, sends it to Google and only then
+listens again, so the microphone is deaf while recognition runs. Here the
+stages run concurrently:
+
+    [audio source] -> capture + VAD thread -> segment queue -> recognizer thread -> on_text
+
+Audio sources are interchangeable (microphone, WAV file, raw 16-bit PCM
+stream), so throughput and end-to-end latency can be measured without a
+microphone or network. Recognizers implement a small interface; offline
+engines (Vosk, PocketSphinx) are preferred when installed. Streaming
+recognizers report partial results while the operator is still speaking, and
+a partial in which intent_filter finds intents fires them immediately. The
+final transcript then only carries what the partial did not: nothing if it
+says exactly the same, the rest of a chained phrase, or all of it when it
+differs ("go forward" fired early, "go forward slowly" heard in the end).
+Replaying a differing final is only safe for intents that can be applied
+twice, so the filter must not return relative ones (see
+DroneNLPController.early_intent and setpoint.idempotent_prefix).
+"""
+
+import importlib.util
+import json
+import math
+import os
+import queue
+import sys
+import threading
+import time
+import wave
+from array import array
+
+SAMPLE_WIDTH = 2  # 16-bit signed PCM only
+DEFAULT_SAMPLE_RATE = 16000
+DEFAULT_CHUNK_MS = 30
+
+
+def chunk_rms(chunk):
+    """Root-mean-square level of a chunk of 16-bit little-endian PCM"""
+    samples = array('h')
+    samples.frombytes(chunk[:len(chunk) - len(chunk) % SAMPLE_WIDTH])
+    if sys.byteorder == 'big':
+        samples.byteswap()
+    if not samples:
+        return 0.0
+    return math.sqrt(sum(s * s for s in samples) / len(samples))
+
+
+# ---------------------------------------------------------------------------
+# Audio sources
+# ---------------------------------------------------------------------------
+
+class AudioSource:
+    """Produces mono 16-bit PCM in fixed-size chunks"""
+
+    sample_rate = DEFAULT_SAMPLE_RATE
+    chunk_ms = DEFAULT_CHUNK_MS
+
+    @property
+    def chunk_bytes(self):
+        return int(self.sample_rate * self.chunk_ms / 1000) * SAMPLE_WIDTH
+
+    def chunks(self):
+        """Yield PCM chunks until the source is exhausted or closed"""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class PCMStreamSource(AudioSource):
+    """Raw little-endian 16-bit mono PCM from a binary file object"""
+
+    def __init__(self, stream, sample_rate=DEFAULT_SAMPLE_RATE,
+                 chunk_ms=DEFAULT_CHUNK_MS, realtime=False):
+        """
+        Args:
+            stream: Binary file-like object (file, pipe, socket.makefile('rb'))
+            sample_rate (int): Samples per second of the stream
+            chunk_ms (int): Chunk length handed to the VAD
+            realtime (bool): Pace reads to the audio clock, as a microphone would
+        """
+        self.stream = stream
+        self.sample_rate = sample_rate
+        self.chunk_ms = chunk_ms
+        self.realtime = realtime
+
+    def _read(self, size):
+        return self.stream.read(size)
+
+    def chunks(self):
+        size = self.chunk_bytes
+        period = self.chunk_ms / 1000
+        next_time = time.monotonic()
+        while True:
+            chunk = self._read(size)
+            if not chunk:
+                return
+            if self.realtime:
+                next_time += period
+                delay = next_time - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            yield chunk
+
+    def close(self):
+        self.stream.close()
+
+
+class WavFileSource(PCMStreamSource):
+    """16-bit mono WAV file"""
+
+    def __init__(self, path, chunk_ms=DEFAULT_CHUNK_MS, realtime=False):
+        self.wav = wave.open(str(path), 'rb')
+        if self.wav.getsampwidth() != SAMPLE_WIDTH or self.wav.getnchannels() != 1:
+            self.wav.close()
+            raise ValueError(f"{path}: expected 16-bit mono WAV")
+        super().__init__(self.wav, self.wav.getframerate(), chunk_ms, realtime)
+
+    def _read(self, size):
+        return self.wav.readframes(size // SAMPLE_WIDTH)
+
+
+class MicrophoneSource(AudioSource):
+    """Live microphone input through speech_recognition/PyAudio"""
+
+    def __init__(self, sample_rate=DEFAULT_SAMPLE_RATE, chunk_ms=DEFAULT_CHUNK_MS):
+        import speech_recognition as sr
+        self.sample_rate = sample_rate
+        self.chunk_ms = chunk_ms
+        self.microphone = sr.Microphone(sample_rate=sample_rate,
+                                        chunk_size=int(sample_rate * chunk_ms / 1000))
+        self._closed = threading.Event()
+
+    def chunks(self):
+        with self.microphone as source:
+            while not self._closed.is_set():
+                yield source.stream.read(source.CHUNK)
+
+    def close(self):
+        self._closed.set()
+
+
+# ---------------------------------------------------------------------------
+# Voice activity detection
+# ---------------------------------------------------------------------------
+
+class EnergyVAD:
+    """
+    Energy-based speech segmenter
+
+    A segment starts after `start_ms` of chunks above the threshold and ends
+    after `hangover_ms` of chunks below it. The threshold follows the ambient
+    noise floor while nobody is speaking, replacing the blocking
+    adjust_for_ambient_noise() calibration.
+    """
+
+    def __init__(self, chunk_ms=DEFAULT_CHUNK_MS, threshold=300.0, start_ms=90,
+                 hangover_ms=450, max_segment_ms=5000, pre_roll_ms=150,
+                 dynamic=True, noise_ratio=2.5):
+        self.chunk_ms = chunk_ms
+        self.threshold = threshold
+        self.start_chunks = max(1, start_ms // chunk_ms)
+        self.hangover_chunks = max(1, hangover_ms // chunk_ms)
+        self.max_chunks = max(1, max_segment_ms // chunk_ms)
+        self.pre_roll = max(0, pre_roll_ms // chunk_ms)
+        self.dynamic = dynamic
+        self.noise_ratio = noise_ratio
+
+        self.in_speech = False
+        self._history = []
+        self._voiced_run = 0
+        self._silent_run = 0
+        self._segment = []
+
+    def process(self, chunk):
+        """
+        Feed one chunk
+
+        Returns:
+            tuple: (event, data) where event is None, 'start' (data = chunks
+            buffered so far), 'speech' (data = this chunk) or 'end' (data =
+            the whole segment as bytes)
+        """
+        level = chunk_rms(chunk)
+        voiced = level > self.threshold
+
+        if not self.in_speech:
+            if self.dynamic and not voiced:
+                # Track the noise floor slowly while idle
+                floor = self.threshold / self.noise_ratio
+                floor += (level - floor) * 0.05
+                self.threshold = max(100.0, floor * self.noise_ratio)
+            self._history.append(chunk)
+            if len(self._history) > self.pre_roll + self.start_chunks:
+                del self._history[0]
+            self._voiced_run = self._voiced_run + 1 if voiced else 0
+            if self._voiced_run >= self.start_chunks:
+                self.in_speech = True
+                self._silent_run = 0
+                self._segment = list(self._history)
+                self._history = []
+                return 'start', list(self._segment)
+            return None, None
+
+        self._segment.append(chunk)
+        self._silent_run = 0 if voiced else self._silent_run + 1
+        if self._silent_run >= self.hangover_chunks or len(self._segment) >= self.max_chunks:
+            self.in_speech = False
+            self._voiced_run = 0
+            segment = b''.join(self._segment)
+            self._segment = []
+            return 'end', segment
+        return 'speech', chunk
+
+
+# ---------------------------------------------------------------------------
+# Recognizers
+# ---------------------------------------------------------------------------
+
+class OfflineRecognizer:
+    """
+    Speech-to-text engine interface
+
+    Every recognizer implements recognize(). Streaming recognizers also set
+    supports_streaming and implement start_stream/accept_chunk/finish_stream.
+    """
+
+    name = 'base'
+    supports_streaming = False
+
+    def recognize(self, pcm, sample_rate):
+        """Transcribe one complete segment; return text or None"""
+        raise NotImplementedError
+
+    def start_stream(self, sample_rate):
+        raise NotImplementedError
+
+    def accept_chunk(self, chunk):
+        """Feed audio; return the current partial transcript (may be empty)"""
+        raise NotImplementedError
+
+    def finish_stream(self):
+        """Return the final transcript of the current stream"""
+        raise NotImplementedError
+
+
+class VoskRecognizer(OfflineRecognizer):
+    """Offline streaming recognition with Vosk (pip install vosk + a model)"""
+
+    name = 'vosk'
+    supports_streaming = True
+
+    def __init__(self, model_path):
+        import vosk
+        vosk.SetLogLevel(-1)
+        self._vosk = vosk
+        self.model = vosk.Model(model_path)
+        self._stream = None
+
+    def recognize(self, pcm, sample_rate):
+        self.start_stream(sample_rate)
+        self._stream.AcceptWaveform(pcm)
+        return self.finish_stream()
+
+    def start_stream(self, sample_rate):
+        self._stream = self._vosk.KaldiRecognizer(self.model, sample_rate)
+
+    def accept_chunk(self, chunk):
+        if self._stream.AcceptWaveform(chunk):
+            return json.loads(self._stream.Result()).get('text', '')
+        return json.loads(self._stream.PartialResult()).get('partial', '')
+
+    def finish_stream(self):
+        text = json.loads(self._stream.FinalResult()).get('text', '')
+        self._stream = None
+        return text or None
+
+
+class SpeechRecognitionRecognizer(OfflineRecognizer):
+    """Whole-segment recognition through a speech_recognition backend"""
+
+    def __init__(self, method='recognize_sphinx'):
+        """
+        Args:
+            method (str): Recognizer method, e.g. 'recognize_sphinx' (offline,
+                needs pocketsphinx) or 'recognize_google' (online)
+        """
+        import speech_recognition as sr
+        self._sr = sr
+        self.recognizer = sr.Recognizer()
+        self.method = getattr(self.recognizer, method)
+        self.name = method.replace('recognize_', '')
+
+    def recognize(self, pcm, sample_rate):
+        audio = self._sr.AudioData(pcm, sample_rate, SAMPLE_WIDTH)
+        try:
+            return self.method(audio)
+        except self._sr.UnknownValueError:
+            return None
+
+
+def default_recognizer():
+    """
+    Best available recognizer: Vosk (VOSK_MODEL_PATH set), then PocketSphinx,
+    then Google's online service
+    """
+    model_path = os.environ.get('VOSK_MODEL_PATH')
+    if model_path:
+        try:
+            return VoskRecognizer(model_path)
+        except Exception as e:
+            print(f"Vosk unavailable ({e}), falling back")
+    if importlib.util.find_spec('pocketsphinx') is not None:
+        return SpeechRecognitionRecognizer('recognize_sphinx')
+    return SpeechRecognitionRecognizer('recognize_google')
+
+
+# ---------------------------------------------------------------------------
+# Pipeline
+# ---------------------------------------------------------------------------
+
+class VoiceResult:
+    """One recognized utterance with its timing"""
+
+    __slots__ = ('text', 'early', 'speech_start', 'speech_end', 'recognized', 'captured', 'intents')
+
+    def __init__(self, text, early, speech_start, speech_end, recognized, intents=None):
+        self.text = text
+        self.early = early                # fired from a partial result
+        self.speech_start = speech_start  # monotonic time the VAD opened
+        self.speech_end = speech_end      # monotonic time the VAD closed (None if early)
+        self.recognized = recognized      # monotonic time the text was available
+        self.intents = intents            # what to act on, if not the whole text (None)
+
+    @property
+    def latency(self):
+        """Seconds from end of speech (or start, for early results) to text"""
+        reference = self.speech_end if self.speech_end is not None else self.speech_start
+        return self.recognized - reference
+
+
+class VoicePipeline:
+    """Concurrent capture/VAD and recognition stages"""
+
+    def __init__(self, source, recognizer, on_result, intent_filter=None,
+                 vad=None, max_pending=4, intent_parser=None):
+        """
+        Args:
+            source (AudioSource): Where audio comes from
+            recognizer (OfflineRecognizer): Speech-to-text engine
+            on_result (callable): Called with each VoiceResult, on the
+                recognizer thread
+            intent_filter (callable): text -> tuple of intents (empty or
+                None for none). When set, a partial transcript that yields
+                intents fires early with them, and the final transcript of
+                that utterance carries only the intents it adds. Must only
+                return intents that can safely be applied twice.
+            vad (EnergyVAD): Segmenter; defaults to one matching the source
+            max_pending (int): Segments buffered between the stages; the
+                oldest is dropped when recognition falls behind (0 = unbounded)
+            intent_parser (callable): text -> every intent of a final
+                transcript, to tell what it adds to an early one (default:
+                intent_filter)
+        """
+        self.source = source
+        self.recognizer = recognizer
+        self.on_result = on_result
+        self.intent_filter = intent_filter
+        self.intent_parser = intent_parser or intent_filter
+        self.vad = vad or EnergyVAD(chunk_ms=source.chunk_ms)
+        self._queue = queue.Queue(maxsize=max_pending if not recognizer.supports_streaming else 0)
+        self._running = threading.Event()
+        self._threads = []
+
+        self.segments = 0
+        self.recognized = 0
+        self.early_results = 0
+        self.dropped_segments = 0
+        self.latencies = []
+
+    def start(self):
+        """Start both stages in the background"""
+        self._running.set()
+        self._threads = [
+            threading.Thread(target=self._capture_loop, daemon=True),
+            threading.Thread(target=self._recognize_loop, daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        """Stop capturing; recognition of queued segments is abandoned"""
+        self._running.clear()
+        self.source.close()
+
+    @property
+    def is_alive(self):
+        """True until both stages have finished"""
+        return any(thread.is_alive() for thread in self._threads)
+
+    def run(self):
+        """Process the source to the end (or until stop()) and wait for results"""
+        self.start()
+        for thread in self._threads:
+            thread.join()
+
+    def _put(self, item):
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            # Recognition is behind: the oldest utterance is the least useful
+            try:
+                self._queue.get_nowait()
+                self.dropped_segments += 1
+            except queue.Empty:
+                pass
+            self._queue.put_nowait(item)
+
+    def _capture_loop(self):
+        streaming = self.recognizer.supports_streaming
+        speech_start = None
+        try:
+            for chunk in self.source.chunks():
+                if not self._running.is_set():
+                    break
+                event, data = self.vad.process(chunk)
+                if event == 'start':
+                    speech_start = time.monotonic()
+                    self.segments += 1
+                    if streaming:
+                        self._put(('start', speech_start, b''.join(data)))
+                elif event == 'speech' and streaming:
+                    self._put(('chunk', None, data))
+                elif event == 'end':
+                    self._put(('end', (speech_start, time.monotonic()),
+                               None if streaming else data))
+        finally:
+            self._queue.put(None)
+
+    def _emit(self, text, early, speech_start, speech_end, intents=None):
+        result = VoiceResult(text, early, speech_start, speech_end, time.monotonic(), intents)
+        self.recognized += 1
+        if early:
+            self.early_results += 1
+        self.latencies.append(result.latency)
+        self.on_result(result)
+
+    def _recognize_loop(self):
+        recognizer = self.recognizer
+        sample_rate = self.source.sample_rate
+        speech_start = None
+        fired = ()
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            kind, stamp, data = item
+            try:
+                if kind == 'start':
+                    speech_start = stamp
+                    fired = ()
+                    recognizer.start_stream(sample_rate)
+                    if data:
+                        recognizer.accept_chunk(data)
+                elif kind == 'chunk':
+                    partial = recognizer.accept_chunk(data)
+                    if partial and not fired and self.intent_filter:
+                        intents = self.intent_filter(partial)
+                        if intents:
+                            fired = tuple(intents)
+                            self._emit(partial, True, speech_start, None, fired)
+                elif kind == 'end':
+                    start, end = stamp
+                    if recognizer.supports_streaming:
+                        text = recognizer.finish_stream()
+                    else:
+                        text = recognizer.recognize(data, sample_rate)
+                    if not text:
+                        continue
+                    remainder = None
+                    if fired:
+                        final = tuple(self.intent_parser(text) or ())
+                        if final == fired:
+                            continue  # already acted on the partial
+                        if final[:len(fired)] == fired:
+                            remainder = final[len(fired):]
+                    self._emit(text, False, start, end, remainder)
+            except Exception as e:
+                print(f"❌ Speech recognition error: {e}")
+
+    def get_stats(self):
+        latencies = sorted(self.latencies)
+        return {
+            'segments': self.segments,
+            'recognized': self.recognized,
+            'early_results': self.early_results,
+            'dropped_segments': self.dropped_segments,
+            'latency_mean': sum(latencies) / len(latencies) if latencies else 0.0,
+            'latency_max': latencies[-1] if latencies else 0.0,
+        }
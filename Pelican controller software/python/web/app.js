@@ -1,8 +1,88 @@
+// Lines kept in the activity log; older ones are removed from the DOM
+const MAX_LOG_LINES = 500;
+
+// Receives pushes from DroneAPI (UIPublisher) and applies them at most once
+// per animation frame, however many arrive in between
+const droneUI = (() => {
+  let pendingState = {};
+  let pendingLog = [];
+  let scheduled = false;
+
+  function schedule(){
+    if(scheduled) return;
+    scheduled = true;
+    requestAnimationFrame(flush);
+  }
+
+  function flush(){
+    scheduled = false;
+    const state = pendingState;
+    const lines = pendingLog;
+    pendingState = {};
+    pendingLog = [];
+    renderState(state);
+    appendLog(lines);
+  }
+
+  function apply(update){
+    if(update.state) Object.assign(pendingState, update.state);
+    if(update.log){
+      pendingLog.push(...update.log);
+      // Only the newest lines would survive the DOM cap anyway
+      if(pendingLog.length > MAX_LOG_LINES) pendingLog.splice(0, pendingLog.length - MAX_LOG_LINES);
+    }
+    schedule();
+  }
+
+  function add(msg, level){
+    apply({log: [[Date.now(), level || 'info', msg]]});
+  }
+
+  return {apply, log: add};
+})();
+window.droneUI = droneUI;
+
 function log(msg){
+  droneUI.log(msg);
+}
+
+function appendLog(lines){
+  if(!lines.length) return;
   const el = document.getElementById('log');
-  const ts = new Date().toLocaleTimeString();
-  el.innerHTML += `[${ts}] ${msg}<br>`;
-  el.scrollTop = el.scrollHeight;
+  const atBottom = el.scrollHeight - el.scrollTop - el.clientHeight < 4;
+  const frag = document.createDocumentFragment();
+  lines.forEach(([ts, level, msg]) => {
+    const line = document.createElement('div');
+    line.className = 'line ' + level;
+    line.textContent = `[${new Date(ts).toLocaleTimeString()}] ${msg}`;
+    frag.appendChild(line);
+  });
+  el.appendChild(frag);
+  while(el.childElementCount > MAX_LOG_LINES) el.firstElementChild.remove();
+  if(atBottom) el.scrollTop = el.scrollHeight;
+}
+
+function setConnected(connected){
+  const status = document.getElementById('status');
+  status.textContent = connected ? '● Connected' : '● Disconnected';
+  status.className = 'status ' + (connected ? 'connected' : 'disconnected');
+  document.getElementById('connect').disabled = connected;
+  document.getElementById('disconnect').disabled = !connected;
+}
+
+function renderState(s){
+  if('connected' in s) setConnected(s.connected);
+  if('link_up' in s && s.link_up === false && document.getElementById('disconnect').disabled === false){
+    // Connected, but the serial link is reconnecting
+    const status = document.getElementById('status');
+    status.textContent = '● Reconnecting…';
+    status.className = 'status reconnecting';
+  } else if(s.link_up) {
+    setConnected(true);
+  }
+  if('armed' in s) document.getElementById('armed').textContent = s.armed ? 'Yes' : 'No';
+  if('flying' in s) document.getElementById('flying').textContent = s.flying ? 'Yes' : 'No';
+  if('last_command' in s) document.getElementById('last').textContent = s.last_command || 'None';
 }
 
 async function refreshPorts(){
@@ -23,12 +103,8 @@ async function connect(){
   if(!port){ alert('Select a port first'); return; }
   const res = await window.pywebview.api.connect(port);
   if(res && res.connected){
-    document.getElementById('status').textContent = '● Connected';
-    document.getElementById('status').className = 'status connected';
-    document.getElementById('connect').disabled = true;
-    document.getElementById('disconnect').disabled = false;
+    setConnected(true);
     log('Connected to ' + port);
-    updateStatus();
   } else {
     log('Failed to connect');
     alert('Failed to connect');
@@ -37,10 +113,7 @@ async function connect(){
 
 async function disconnect(){
   await window.pywebview.api.disconnect();
-  document.getElementById('status').textContent = '● Disconnected';
-  document.getElementById('status').className = 'status disconnected';
-  document.getElementById('connect').disabled = false;
-  document.getElementById('disconnect').disabled = true;
+  setConnected(false);
   log('Disconnected');
 }
 
@@ -51,7 +124,6 @@ async function send(){
   await window.pywebview.api.send_command(text);
   log('Command sent: ' + text);
   input.value = '';
-  updateStatus();
 }
 
 async function quick(e){
@@ -59,7 +131,6 @@ async function quick(e){
   if(!cmd) return;
   await window.pywebview.api.send_command(cmd);
   log('Quick command: ' + cmd);
-  updateStatus();
 }
 
 async function startVoice(){
@@ -75,12 +146,11 @@ async function stopVoice(){
   log('Voice stopped');
 }
 
-async function updateStatus(){
+// Initial state; every later change is pushed through droneUI.apply
+async function loadStatus(){
   try{
     const s = await window.pywebview.api.get_status();
-    document.getElementById('armed').textContent = s.armed ? 'Yes' : 'No';
-    document.getElementById('flying').textContent = s.flying ? 'Yes' : 'No';
-    document.getElementById('last').textContent = s.last_command || 'None';
+    droneUI.apply({state: s});
   }catch(e){ console.warn(e); }
 }
 
@@ -95,6 +165,8 @@ window.addEventListener('DOMContentLoaded', () => {
 
   document.querySelectorAll('.quick-btn').forEach(b => b.addEventListener('click', quick));
 
-  refreshPorts();
-  setInterval(updateStatus, 1500);
+  // The Python API may be injected after DOMContentLoaded
+  const init = () => { refreshPorts(); loadStatus(); };
+  if(window.pywebview && window.pywebview.api) init();
+  else window.addEventListener('pywebviewready', init);
 });
\ No newline at end of file